@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for
 from flask_login import login_required, current_user
 from db import get_db
-from permissions import tiene_permiso, acceso_denegado
+from permissions import tiene_permiso, acceso_denegado, invalidar_permisos, PANTALLAS
+from utils.empresas import invalidar_empresas
+from utils.usuarios import cambio_usuario
 from datetime import datetime
-from werkzeug.security import generate_password_hash
+from utils.login import hashear
 import secrets
 import string
 from panel.routes import empresa_actual
@@ -119,13 +121,15 @@ def crear_empresa():
         VALUES (?,?,?,?,?,?,1)
     """, (
         username_admin,
-        generate_password_hash(temp_password),
+        hashear(temp_password),
         "admin_empresa",
         empresa_id,
         sucursal_id,
         0
     ))
 
+    invalidar_empresas(conn)
+
     conn.commit()
     conn.close()
 
@@ -161,9 +165,11 @@ def toggle_empresa(id):
             (nueva, id)
         )
 
+        invalidar_empresas(conn)
         conn.commit()
 
     conn.close()
+    invalidar_permisos()
 
     return redirect(url_for("admin.admin_empresas"))
 # ==============================
@@ -180,6 +186,7 @@ def eliminar_empresa(id):
 
     # Borrar usuarios primero
     conn.execute("DELETE FROM usuarios WHERE empresa_id=?", (id,))
+    cambio_usuario(conn)
 
     # Borrar sucursales
     conn.execute("DELETE FROM sucursales WHERE empresa_id=?", (id,))
@@ -187,10 +194,97 @@ def eliminar_empresa(id):
     # Borrar empresa
     conn.execute("DELETE FROM empresas WHERE id=?", (id,))
 
+    invalidar_empresas(conn)
+
     conn.commit()
     conn.close()
 
     return redirect(url_for("admin.admin_empresas"))
+# ==========================
+# USUARIOS (paginados, solo de la empresa)
+# ==========================
+POR_PAGINA = 50
+POR_PAGINA_MAX = 200
+
+
+def _parametros_pagina(args):
+    q = (args.get("q") or "").strip().lower()
+    try:
+        pagina = max(1, int(args.get("pagina") or 1))
+    except ValueError:
+        pagina = 1
+    try:
+        por_pagina = min(POR_PAGINA_MAX, max(1, int(args.get("por_pagina") or POR_PAGINA)))
+    except ValueError:
+        por_pagina = POR_PAGINA
+    return q, pagina, por_pagina
+
+
+def pagina_usuarios(conn, empresa_id, q="", pagina=1, por_pagina=POR_PAGINA):
+    """
+    Una página de usuarios de la empresa con sus permisos.
+    Los permisos se leen solo para los usuarios de la página, por el
+    índice de permisos.user_id.
+    """
+    filtro = "WHERE empresa_id=?"
+    params = [empresa_id]
+    if q:
+        filtro += " AND LOWER(username) LIKE ?"
+        params.append(f"%{q}%")
+
+    total = conn.execute(
+        f"SELECT COUNT(*) AS n FROM usuarios {filtro}",
+        params
+    ).fetchone()["n"]
+
+    paginas = max(1, -(-total // por_pagina))
+    pagina = min(pagina, paginas)
+
+    usuarios = conn.execute(f"""
+        SELECT id, username, rol
+        FROM usuarios
+        {filtro}
+        ORDER BY id DESC
+        LIMIT ? OFFSET ?
+    """, params + [por_pagina, (pagina - 1) * por_pagina]).fetchall()
+
+    usuarios = [
+        {"id": u["id"], "username": u["username"], "rol": u["rol"], "permisos": []}
+        for u in usuarios
+    ]
+
+    if usuarios:
+        por_id = {u["id"]: u for u in usuarios}
+        marcas = ",".join("?" * len(por_id))
+        permisos = conn.execute(f"""
+            SELECT p.user_id, p.pantalla
+            FROM permisos p
+            JOIN usuarios u ON u.id = p.user_id
+            WHERE u.empresa_id=? AND p.user_id IN ({marcas})
+        """, [empresa_id] + list(por_id)).fetchall()
+
+        for p in permisos:
+            por_id[p["user_id"]]["permisos"].append(p["pantalla"])
+
+    return {
+        "usuarios": usuarios,
+        "total": total,
+        "pagina": pagina,
+        "paginas": paginas,
+        "por_pagina": por_pagina,
+        "q": q,
+    }
+
+
+def _volver_a_usuarios():
+    """Redirect al listado conservando búsqueda y página del formulario."""
+    return redirect(url_for(
+        "admin.admin_usuarios",
+        q=request.form.get("q") or None,
+        pagina=request.form.get("pagina") or None
+    ))
+
+
 @admin_bp.route("/usuarios")
 @login_required
 def admin_usuarios():
@@ -205,17 +299,7 @@ def admin_usuarios():
 
     conn = get_db()
 
-    usuarios = conn.execute("""
-        SELECT *
-        FROM usuarios
-        WHERE empresa_id=?
-        ORDER BY id DESC
-    """, (empresa_id,)).fetchall()
-
-    permisos = conn.execute("""
-        SELECT user_id, pantalla
-        FROM permisos
-    """).fetchall()
+    datos = pagina_usuarios(conn, empresa_id, *_parametros_pagina(request.args))
 
     solicitudes = conn.execute("""
         SELECT s.*, u.username
@@ -226,40 +310,147 @@ def admin_usuarios():
 
     conn.close()
 
-    permisos_set = {(p["user_id"], p["pantalla"]) for p in permisos}
-
     return render_template(
         "admin_usuarios.html",
-        usuarios=usuarios,
-        permisos_set=permisos_set,
+        datos=datos,
+        pantallas=PANTALLAS,
         solicitudes=solicitudes
     )
-@admin_bp.route("/permisos", methods=["POST"])
+
+
+@admin_bp.route("/usuarios/datos")
 @login_required
-def guardar_permisos():
+def admin_usuarios_datos():
 
-    if current_user.rol != "admin_empresa":
-        return "No autorizado", 403
+    if not (current_user.es_superadmin or tiene_permiso("admin")):
+        return {"ok": False, "error": "No autorizado"}, 403
 
-    user_id = request.form.get("user_id")
-    permisos = request.form.getlist("permisos")
+    empresa_id = empresa_actual()
+
+    if not empresa_id:
+        return {"ok": False, "error": "Sin empresa"}, 400
 
     conn = get_db()
+    try:
+        datos = pagina_usuarios(conn, empresa_id, *_parametros_pagina(request.args))
+    finally:
+        conn.close()
 
-    # Borrar permisos actuales
-    conn.execute("DELETE FROM permisos WHERE user_id=?", (user_id,))
+    return {"ok": True, **datos}
 
-    # Insertar nuevos
-    for p in permisos:
-        conn.execute(
+
+# ==========================
+# PERMISOS (por diferencia contra lo guardado)
+# ==========================
+def aplicar_permisos(conn, empresa_id, deseados, solo_altas=False):
+    """
+    deseados: {user_id: pantallas que debe tener}. Lee lo actual de esos
+    usuarios, inserta solo lo que falta y borra solo lo que sobra
+    (nada con solo_altas), en lote. Las solicitudes pendientes de lo que
+    se da quedan aprobadas. Ignora usuarios de otras empresas.
+    No hace commit. Devuelve (altas, bajas).
+    """
+    if not deseados:
+        return 0, 0
+
+    marcas = ",".join("?" * len(deseados))
+    validos = {
+        u["id"] for u in conn.execute(f"""
+            SELECT id FROM usuarios
+            WHERE empresa_id=? AND id IN ({marcas})
+        """, [empresa_id] + list(deseados)).fetchall()
+    }
+    if not validos:
+        return 0, 0
+
+    marcas = ",".join("?" * len(validos))
+    actuales = {
+        (p["user_id"], p["pantalla"]) for p in conn.execute(f"""
+            SELECT user_id, pantalla FROM permisos
+            WHERE user_id IN ({marcas})
+        """, list(validos)).fetchall()
+    }
+    pedidos = {(uid, p) for uid in validos for p in deseados[uid]}
+
+    altas = sorted(pedidos - actuales)
+    bajas = [] if solo_altas else sorted(actuales - pedidos)
+
+    if bajas:
+        conn.executemany(
+            "DELETE FROM permisos WHERE user_id=? AND pantalla=?",
+            bajas
+        )
+    if altas:
+        conn.executemany(
             "INSERT INTO permisos (user_id, pantalla) VALUES (?,?)",
-            (user_id, p)
+            altas
         )
+        conn.executemany("""
+            UPDATE solicitudes SET estado='aprobado'
+            WHERE user_id=? AND pantalla=? AND estado='pendiente'
+        """, altas)
+
+    return len(altas), len(bajas)
+
 
+@admin_bp.route("/permisos", methods=["POST"])
+@login_required
+def guardar_permisos():
+
+    if current_user.rol != "admin_empresa":
+        return "No autorizado", 403
+
+    user_id = int(request.form.get("user_id"))
+    permisos = set(request.form.getlist("permisos")) & set(PANTALLAS)
+
+    conn = get_db()
+    aplicar_permisos(conn, empresa_actual(), {user_id: permisos})
     conn.commit()
     conn.close()
+    invalidar_permisos()
+
+    return _volver_a_usuarios()
+
+
+@admin_bp.route("/permisos/lote", methods=["POST"])
+@login_required
+def guardar_permisos_lote():
+    """
+    JSON {"usuarios": {"<user_id>": ["panel", ...], ...}}: para cada
+    usuario, la lista completa de pantallas que debe tener.
+    """
+    if current_user.rol != "admin_empresa":
+        return {"ok": False, "error": "No autorizado"}, 403
+
+    usuarios = (request.get_json(silent=True) or {}).get("usuarios")
+    if not isinstance(usuarios, dict):
+        return {"ok": False, "error": "Falta usuarios"}, 400
+
+    try:
+        deseados = {int(uid): set(pantallas) for uid, pantallas in usuarios.items()}
+    except (TypeError, ValueError):
+        return {"ok": False, "error": "Formato inválido"}, 400
+
+    desconocidas = set().union(*deseados.values()) - set(PANTALLAS) if deseados else set()
+    if desconocidas:
+        return {"ok": False, "error": "Pantalla inválida: " + ", ".join(sorted(desconocidas))}, 400
+
+    conn = get_db()
+    try:
+        altas, bajas = aplicar_permisos(conn, empresa_actual(), deseados)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print("Error guardando permisos:", e)
+        return {"ok": False, "error": "No se pudieron guardar los permisos"}, 500
+    finally:
+        conn.close()
+
+    invalidar_permisos()
+
+    return {"ok": True, "altas": altas, "bajas": bajas}
+
 
-    return redirect(url_for("admin.admin_usuarios"))
 @admin_bp.route("/crear_usuario", methods=["POST"])
 @login_required
 def crear_usuario():
@@ -295,7 +486,7 @@ def crear_usuario():
         VALUES (?,?,?,?,?,1)
     """, (
         username,
-        generate_password_hash(password),
+        hashear(password),
         rol,
         empresa_id,
         sucursal_id
@@ -304,7 +495,7 @@ def crear_usuario():
     conn.commit()
     conn.close()
 
-    return redirect(url_for("admin.admin_usuarios"))
+    return _volver_a_usuarios()
 @admin_bp.route("/eliminar_usuario", methods=["POST"])
 @login_required
 def eliminar_usuario():
@@ -316,70 +507,88 @@ def eliminar_usuario():
 
     # No permitir que se elimine a sí mismo
     if int(user_id) == current_user.id:
-        return redirect(url_for("admin.admin_usuarios"))
+        return _volver_a_usuarios()
 
     conn = get_db()
 
+    cambio_usuario(conn, user_id)
     conn.execute("DELETE FROM permisos WHERE user_id=?", (user_id,))
     conn.execute("DELETE FROM usuarios WHERE id=?", (user_id,))
 
     conn.commit()
     conn.close()
 
-    return redirect(url_for("admin.admin_usuarios"))
+    return _volver_a_usuarios()
 @admin_bp.route("/aprobar_solicitud", methods=["POST"])
 @login_required
 def aprobar_solicitud():
 
-    solicitud_id = request.form.get("id")
+    if current_user.rol != "admin_empresa":
+        return "No autorizado", 403
+
+    # Uno o varios id (botón "Aprobar todas")
+    ids = request.form.getlist("id")
 
     empresa_id = empresa_actual()
 
-    conn = get_db()  # 🔥 FALTABA ESTO
+    if not ids:
+        return _volver_a_usuarios()
+
+    conn = get_db()
 
-    s = conn.execute("""
-        SELECT sol.*
+    marcas = ",".join("?" * len(ids))
+    pedidas = conn.execute(f"""
+        SELECT sol.user_id, sol.pantalla
         FROM solicitudes sol
         JOIN usuarios u ON sol.user_id = u.id
-        WHERE sol.id = ?
+        WHERE sol.id IN ({marcas})
         AND u.empresa_id = ?
-    """, (
-        solicitud_id,
-        empresa_id
-    )).fetchone()
-
-    if s:
-        conn.execute(
-            "INSERT INTO permisos (user_id, pantalla) VALUES (?,?)",
-            (s["user_id"], s["pantalla"])
-        )
-
-        conn.execute(
-            "UPDATE solicitudes SET estado='aprobado' WHERE id=?",
-            (solicitud_id,)
-        )
+        AND sol.estado = 'pendiente'
+    """, ids + [empresa_id]).fetchall()
+
+    # Solo pantallas que existen: lo demás queda pendiente para rechazar
+    deseados = {}
+    for s in pedidas:
+        if s["pantalla"] in PANTALLAS:
+            deseados.setdefault(s["user_id"], set()).add(s["pantalla"])
+
+    aplicar_permisos(conn, empresa_id, deseados, solo_altas=True)
+
+    # Las que pedían algo que el usuario ya tenía
+    validas = ",".join("?" * len(PANTALLAS))
+    conn.execute(f"""
+        UPDATE solicitudes SET estado='aprobado'
+        WHERE id IN ({marcas}) AND estado='pendiente'
+        AND pantalla IN ({validas})
+        AND user_id IN (SELECT id FROM usuarios WHERE empresa_id=?)
+    """, ids + PANTALLAS + [empresa_id])
 
     conn.commit()
     conn.close()
+    invalidar_permisos()
 
-    return redirect(url_for("admin.admin_usuarios"))
+    return _volver_a_usuarios()
 @admin_bp.route("/rechazar_solicitud", methods=["POST"])
 @login_required
 def rechazar_solicitud():
 
+    if current_user.rol != "admin_empresa":
+        return "No autorizado", 403
+
     solicitud_id = request.form.get("id")
 
     conn = get_db()
 
-    conn.execute(
-        "UPDATE solicitudes SET estado='rechazado' WHERE id=?",
-        (solicitud_id,)
-    )
+    conn.execute("""
+        UPDATE solicitudes SET estado='rechazado'
+        WHERE id=?
+        AND user_id IN (SELECT id FROM usuarios WHERE empresa_id=?)
+    """, (solicitud_id, empresa_actual()))
 
     conn.commit()
     conn.close()
 
-    return redirect(url_for("admin.admin_usuarios"))
+    return _volver_a_usuarios()
 @admin_bp.route("/solicitar_acceso/<pantalla>", methods=["POST"])
 @login_required
 def solicitar_acceso(pantalla):
@@ -421,8 +630,11 @@ def reactivar_empresa(id):
         WHERE id=?
     """, (nueva_fecha, id))
 
+    invalidar_empresas(conn)
+
     conn.commit()
     conn.close()
+    invalidar_permisos()
 
     return redirect(url_for("admin.admin_empresas"))
 
@@ -0,0 +1,344 @@
+# api/operaciones.py
+# Operaciones de campo (alta de silo, calado, monitoreo, llenado,
+# camionada, GPS) separadas de sus endpoints: las usan las rutas de a
+# una y /api/sync en lote. Ninguna hace commit.
+# - Datos inválidos → ErrorOperacion; estado del silo que no permite la
+#   operación → Conflicto. Ambas traen el status del endpoint individual.
+# - `fecha` (datetime, hora argentina) es la del momento en que se hizo
+#   en el campo; sin fecha se usa la del servidor.
+
+import cloudinary.uploader
+from flask_login import current_user
+
+from calculos import calcular_comercial
+from utils.auditoria import registrar_auditoria
+from utils.fechas import ARG
+from datetime import datetime
+
+
+class ErrorOperacion(Exception):
+    """Datos faltantes o inválidos."""
+
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.status = status
+
+
+class Conflicto(ErrorOperacion):
+    """El silo, como está en el servidor, no admite la operación."""
+
+
+class ErrorTransitorio(ErrorOperacion):
+    """Falló un servicio externo (subida de la foto): se puede reintentar."""
+
+    def __init__(self, mensaje, status=503):
+        super().__init__(mensaje, status)
+
+
+def _fecha(fecha, formato="%Y-%m-%d %H:%M"):
+    return (fecha or datetime.now(ARG)).strftime(formato)
+
+
+def _silo(conn, qr, columnas="estado_silo"):
+    return conn.execute(
+        f"SELECT {columnas} FROM silos WHERE numero_qr=? AND empresa_id=?",
+        (qr, current_user.empresa_id)
+    ).fetchone()
+
+
+def _to_float(x):
+    try:
+        return float(x) if x not in (None, "", "null") else None
+    except:
+        return None
+
+
+def subir_foto(foto, carpeta):
+    """Archivo del form o data URI (cola offline) → URL; None si no hay foto."""
+    if not foto:
+        return None
+    try:
+        resultado = cloudinary.uploader.upload(
+            foto,
+            folder=carpeta,
+            resource_type="image"
+        )
+        return resultado["secure_url"]
+    except Exception as e:
+        print(f"Error subiendo foto a {carpeta}: {e}")
+        raise ErrorTransitorio("No se pudo subir la foto")
+
+
+def validar_monitoreo(conn, d):
+    """Control sin red, antes de subir la foto y otra vez al aplicar."""
+    silo = _silo(conn, d.get("numero_qr"))
+    if not silo or silo["estado_silo"] == "Extraído":
+        raise Conflicto("Silo extraído")
+
+
+def preparar_monitoreo(d, foto_obligatoria=True):
+    """
+    Sube la foto del evento antes de abrir la transacción (no se
+    retiene la base mientras tanto); `foto` pasa a ser la URL.
+    Sin foto_obligatoria (el form en línea) si la subida falla el
+    evento se guarda sin foto.
+    """
+    try:
+        foto = subir_foto(d.get("foto"), "silobolsas/monitoreos")
+    except ErrorTransitorio:
+        if foto_obligatoria:
+            raise
+        foto = None
+    return {**d, "foto": foto}
+
+
+# ======================
+# REGISTRAR SILO
+# ======================
+def registrar_silo(conn, d, fecha=None):
+
+    qr = d.get("numero_qr")
+    if not qr:
+        raise ErrorOperacion("QR faltante")
+
+    if _silo(conn, qr):
+        raise Conflicto("Silo ya registrado", 409)
+
+    conn.execute("""
+        INSERT INTO silos (
+            numero_qr,
+            empresa_id,
+            sucursal_id,
+            cereal,
+            estado_grano,
+            estado_silo,
+            metros,
+            lat,
+            lon,
+            fecha_confeccion
+        )
+        VALUES (?,?,?,?,?,?,?,?,?,?)
+    """, (
+        qr,
+        current_user.empresa_id,
+        current_user.sucursal_id,
+        d.get("cereal"),
+        d.get("estado_grano"),
+        "Activo",
+        d.get("metros"),
+        d.get("lat"),
+        d.get("lon"),
+        _fecha(fecha)
+    ))
+
+    return {}
+
+
+# ======================
+# INFORMAR CALADO
+# ======================
+def informar_calado(conn, d, fecha=None):
+
+    qr = d.get("numero_qr")
+    if not qr:
+        raise ErrorOperacion("QR faltante")
+
+    empresa_id = current_user.empresa_id
+
+    # 🔒 validar silo
+    silo = _silo(conn, qr)
+
+    if not silo:
+        raise Conflicto("Silo inexistente")
+
+    if silo["estado_silo"] == "Extraído":
+        raise Conflicto("El silo ya fue extraído.")
+
+    # ✅ crear muestreo
+    conn.execute("""
+        INSERT INTO muestreos (
+            numero_qr,
+            empresa_id,
+            fecha_muestreo
+        )
+        VALUES (?,?,?)
+    """, (qr, empresa_id, _fecha(fecha, "%Y-%m-%d %H:%M:%S")))
+
+    # Obtener el id recien insertado (compatible SQLite y PostgreSQL)
+    id_row = conn.execute("""
+        SELECT id FROM muestreos
+        WHERE numero_qr=? AND empresa_id=?
+        ORDER BY id DESC LIMIT 1
+    """, (qr, empresa_id)).fetchone()
+    id_muestreo = id_row["id"]
+
+    # 🧪 Temperaturas
+    if d.get("informar_temperatura"):
+
+        for seccion, campo in [
+            ("punta", "temp_punta"),
+            ("medio", "temp_medio"),
+            ("final", "temp_final")
+        ]:
+
+            temp = d.get(campo)
+
+            if temp not in (None, ""):
+                try:
+                    temp = float(temp)
+                except:
+                    temp = None
+
+            conn.execute("""
+                INSERT INTO analisis (
+                    id_muestreo,
+                    empresa_id,
+                    seccion,
+                    temperatura
+                )
+                VALUES (?,?,?,?)
+            """, (
+                id_muestreo,
+                empresa_id,
+                seccion,
+                temp
+            ))
+
+    return {"id_muestreo": id_muestreo}
+
+
+# ======================
+# MONITOREO — NUEVO EVENTO
+# ======================
+def nuevo_monitoreo(conn, d, fecha=None):
+    """`d` ya pasó por preparar_monitoreo: `foto` es la URL subida."""
+
+    qr = d.get("numero_qr")
+
+    validar_monitoreo(conn, d)
+
+    conn.execute("""
+        INSERT INTO monitoreos (
+            empresa_id,
+            numero_qr,
+            fecha_evento,
+            tipo,
+            detalle,
+            foto_evento
+        )
+        VALUES (?,?,?,?,?,?)
+    """, (
+            current_user.empresa_id,
+            qr,
+            _fecha(fecha),
+            d.get("tipo"),
+            d.get("detalle"),
+            d.get("foto")
+        ))
+
+    return {}
+
+
+# ======================
+# LLENADO — NUEVA CARGA
+# ======================
+def nueva_carga_llenado(conn, d, fecha=None):
+
+    qr = d.get("numero_qr")
+    if not qr:
+        raise ErrorOperacion("QR faltante")
+
+    silo = _silo(conn, qr, "estado_silo, cereal")
+
+    if not silo or silo["estado_silo"] == "Extraído":
+        raise Conflicto("Silo no válido")
+
+    datos = {
+        "temperatura": _to_float(d.get("temperatura")),
+        "humedad":     _to_float(d.get("humedad")),
+        "danados":     _to_float(d.get("danados")),
+        "quebrados":   _to_float(d.get("quebrados")),
+        "materia_extrana": _to_float(d.get("materia_extrana")),
+        "olor":        _to_float(d.get("olor")) or 0,
+        "moho":        _to_float(d.get("moho")) or 0,
+        "chamico":     _to_float(d.get("chamico")),
+        "insectos":    1 if d.get("insectos") else 0,
+    }
+    kg = _to_float(d.get("kg")) or 0
+
+    res = calcular_comercial(silo["cereal"], datos)
+
+    conn.execute("""
+        INSERT INTO llenado (
+            numero_qr, empresa_id, fecha, kg,
+            temperatura, humedad, danados, quebrados,
+            materia_extrana, olor, moho, insectos, chamico,
+            grado, factor, tas, reglas_version
+        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+    """, (
+        qr, current_user.empresa_id, _fecha(fecha), kg,
+        datos["temperatura"], datos["humedad"], datos["danados"], datos["quebrados"],
+        datos["materia_extrana"], datos["olor"], datos["moho"], datos["insectos"], datos["chamico"],
+        str(res.get("grado") or "F/E"), res.get("factor"), res.get("tas"), res.get("reglas_version")
+    ))
+
+    return {}
+
+
+# ======================
+# VACIADO — registrar camionada (solo patente)
+# ======================
+def registrar_camionada(conn, d, fecha=None):
+
+    qr = d.get("numero_qr")
+    patente = (d.get("patente") or "").strip()
+    if not qr or not patente:
+        raise ErrorOperacion("Faltan datos obligatorios (QR y patente)")
+
+    silo = _silo(conn, qr)
+    if not silo:
+        raise Conflicto("Silo inexistente")
+    if silo["estado_silo"] != "En extracción":
+        raise Conflicto("El silo no está en extracción")
+
+    row_count = conn.execute("SELECT COUNT(*) as cant FROM vaciado WHERE numero_qr=? AND empresa_id=?",
+        (qr, current_user.empresa_id)).fetchone()
+    nro_camion = (row_count["cant"] if row_count else 0) + 1
+    conn.execute("""
+        INSERT INTO vaciado (numero_qr, empresa_id, fecha, nro_camion, patente,
+             kg, humedad, factor, tas, insectos, destino, sub_destino, obs)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+    """, (qr, current_user.empresa_id, _fecha(fecha), str(nro_camion), patente.upper(),
+          None, None, None, None, 0, None, None, None))
+    registrar_auditoria(
+        conn, current_user.id, current_user.empresa_id,
+        accion="camionada_vaciado",
+        detalle=f"Silo {qr} — camionada #{nro_camion} (patente: {patente.upper()})",
+        numero_qr=qr
+    )
+
+    return {"nro_camion": nro_camion}
+
+
+# ======================
+# ACTUALIZAR GPS
+# ======================
+def actualizar_gps(conn, d, fecha=None):
+
+    qr  = d.get("numero_qr")
+    lat = d.get("lat")
+    lon = d.get("lon")
+
+    if not qr or lat is None or lon is None:
+        raise ErrorOperacion("Datos incompletos")
+
+    if not _silo(conn, qr, "numero_qr"):
+        raise Conflicto("Silo no encontrado", 404)
+
+    conn.execute(
+        "UPDATE silos SET lat=?, lon=? WHERE numero_qr=? AND empresa_id=?",
+        (lat, lon, qr, current_user.empresa_id)
+    )
+
+    return {}
@@ -9,6 +9,9 @@ import cloudinary.uploader
 from calculos import calcular_comercial
 from flask import request, jsonify
 from utils.auditoria import registrar_auditoria
+from api import operaciones
+from api import sync as sync_lote
+from utils.versiones import clave_empresa, confirmar_cambio_empresa, incrementar_version
 
 # Configurar Cloudinary
 cloudinary.config(
@@ -23,6 +26,36 @@ def ahora():
     from utils.fechas import ahora as _ahora
     return _ahora()
 
+
+def _aplicar(operacion, d, preparar=None, validar=None):
+    """
+    Una operación de api/operaciones.py como request propio. `validar`
+    (con una conexión corta) va antes de `preparar`, que sale a la red.
+    """
+    if preparar:
+        try:
+            if validar:
+                conn = get_db()
+                try:
+                    validar(conn, d)
+                finally:
+                    conn.close()
+            d = preparar(d)
+        except operaciones.ErrorOperacion as e:
+            return jsonify(ok=False, error=e.mensaje), e.status
+
+    conn = get_db()
+    try:
+        resultado = operacion(conn, d)
+        confirmar_cambio_empresa(conn, current_user.empresa_id)
+    except operaciones.ErrorOperacion as e:
+        conn.rollback()
+        return jsonify(ok=False, error=e.mensaje), e.status
+    finally:
+        conn.close()
+
+    return jsonify(ok=True, **resultado)
+
 # ======================
 # REGISTRAR SILO
 # ======================
@@ -38,39 +71,43 @@ def registrar_silo():
     if not d or not d.get("numero_qr"):
         return jsonify(ok=False, error="QR faltante"), 400
 
-    conn = get_db()
+    return _aplicar(operaciones.registrar_silo, d)
 
-    conn.execute("""
-        INSERT INTO silos (
-            numero_qr,
-            empresa_id,
-            sucursal_id,
-            cereal,
-            estado_grano,
-            estado_silo,
-            metros,
-            lat,
-            lon,
-            fecha_confeccion
-        )
-        VALUES (?,?,?,?,?,?,?,?,?,?)
-    """, (
-        d.get("numero_qr"),
-        current_user.empresa_id,
-        current_user.sucursal_id,
-        d.get("cereal"),
-        d.get("estado_grano"),
-        "Activo",
-        d.get("metros"),
-        d.get("lat"),
-        d.get("lon"),
-        ahora()
-    ))
 
-    conn.commit()
-    conn.close()
+# ======================
+# SYNC — lote de operaciones hechas sin señal
+# ======================
+@api_bp.route("/api/sync", methods=["POST"])
+@login_required
+def sync():
 
-    return jsonify(ok=True)
+    d = request.get_json(force=True, silent=True) or {}
+    lote = d.get("operaciones")
+
+    if not isinstance(lote, list):
+        return jsonify(ok=False, error="Faltan operaciones"), 400
+
+    if len(lote) > sync_lote.SYNC_MAX_OPERACIONES:
+        return jsonify(ok=False, error=f"Máximo {sync_lote.SYNC_MAX_OPERACIONES} operaciones por envío"), 413
+
+    conn = get_db()
+    try:
+        resultados = sync_lote.aplicar_lote(conn, lote)
+        if any(r["estado"] == "ok" for r in resultados):
+            incrementar_version(conn, clave_empresa(current_user.empresa_id))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print("Error sync:", e)
+        return jsonify(ok=False, error="No se pudo aplicar el lote; reintentar"), 500
+    finally:
+        conn.close()
+
+    resumen = {}
+    for r in resultados:
+        resumen[r["estado"]] = resumen.get(r["estado"], 0) + 1
+
+    return jsonify(ok=True, resultados=resultados, resumen=resumen)
 
 
 # ======================
@@ -118,7 +155,7 @@ def nuevo_muestreo():
         current_user.empresa_id,
         ahora().strftime("%Y-%m-%d %H:%M")
     ))
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
 
     id_row = conn.execute("""
         SELECT id FROM muestreos
@@ -241,7 +278,8 @@ def guardar_analisis_seccion():
                 acidez=?,
                 grado=?,
                 factor=?,
-                tas=?
+                tas=?,
+                reglas_version=?
             WHERE id_muestreo=? AND seccion=? AND empresa_id=?
         """, (
             d["temperatura"],
@@ -266,6 +304,7 @@ def guardar_analisis_seccion():
             grado,
             res["factor"],
             res["tas"],
+            res["reglas_version"],
             d["id_muestreo"],
             d["seccion"],
             current_user.empresa_id
@@ -297,9 +336,10 @@ def guardar_analisis_seccion():
                 acidez,
                 grado,
                 factor,
-                tas
+                tas,
+                reglas_version
             )
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
         """, (
             d["id_muestreo"],
             current_user.empresa_id,
@@ -325,9 +365,10 @@ def guardar_analisis_seccion():
             d.get("acidez"),
             grado,
             res["factor"],
-            res["tas"]
+            res["tas"],
+            res["reglas_version"]
         ))
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
 
     return jsonify(ok=True)
@@ -458,56 +499,12 @@ def nuevo_monitoreo():
     if not tiene_permiso("form"):
         return jsonify(ok=False), 403
 
-    qr = request.form.get("numero_qr")
-    tipo = request.form.get("tipo")
-    detalle = request.form.get("detalle")
-    foto = request.files.get("foto")
-
-    conn = get_db()
-
-    silo = conn.execute(
-        "SELECT estado_silo FROM silos WHERE numero_qr=? AND empresa_id=?",
-        (qr, current_user.empresa_id)).fetchone()
-    
-    if not silo or silo["estado_silo"] == "Extraído":
-        conn.close()
-        return jsonify(ok=False, error="Silo extraído"), 400
-
-    path = None
-    if foto:
-        try:
-            resultado = cloudinary.uploader.upload(
-                foto,
-                folder="silobolsas/monitoreos",
-                resource_type="image"
-            )
-            path = resultado["secure_url"]
-        except Exception as e:
-            path = None
-
-    conn.execute("""
-        INSERT INTO monitoreos (
-            empresa_id,
-            numero_qr,
-            fecha_evento,
-            tipo,
-            detalle,
-            foto_evento
-        )
-        VALUES (?,?,?,?,?,?)
-    """, (
-            current_user.empresa_id,
-            qr,
-            ahora(),
-            tipo,
-            detalle,
-            path
-        ))
-
-    conn.commit()
-    conn.close()
-
-    return jsonify(ok=True)
+    return _aplicar(operaciones.nuevo_monitoreo, {
+        "numero_qr": request.form.get("numero_qr"),
+        "tipo": request.form.get("tipo"),
+        "detalle": request.form.get("detalle"),
+        "foto": request.files.get("foto"),
+    }, lambda d: operaciones.preparar_monitoreo(d, foto_obligatoria=False), operaciones.validar_monitoreo)
 @api_bp.route("/api/monitoreo/resolver", methods=["POST"])
 @login_required
 def resolver_monitoreo():
@@ -548,7 +545,7 @@ def resolver_monitoreo():
         current_user.empresa_id
     ))
 
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
 
     return jsonify(ok=True)
@@ -564,62 +561,8 @@ def nueva_carga_llenado():
         return jsonify(ok=False, error="No autorizado"), 403
 
     d = request.get_json(force=True, silent=True) or {}
-    qr = d.get("numero_qr")
-
-    if not qr:
-        return jsonify(ok=False, error="QR faltante"), 400
-
-    conn = get_db()
 
-    silo = conn.execute(
-        "SELECT estado_silo, cereal FROM silos WHERE numero_qr=? AND empresa_id=?",
-        (qr, current_user.empresa_id)
-    ).fetchone()
-
-    if not silo or silo["estado_silo"] == "Extraído":
-        conn.close()
-        return jsonify(ok=False, error="Silo no válido"), 400
-
-    def to_float(x):
-        try:
-            return float(x) if x not in (None, "", "null") else None
-        except:
-            return None
-
-    datos = {
-        "temperatura": to_float(d.get("temperatura")),
-        "humedad":     to_float(d.get("humedad")),
-        "danados":     to_float(d.get("danados")),
-        "quebrados":   to_float(d.get("quebrados")),
-        "materia_extrana": to_float(d.get("materia_extrana")),
-        "olor":        to_float(d.get("olor")) or 0,
-        "moho":        to_float(d.get("moho")) or 0,
-        "chamico":     to_float(d.get("chamico")),
-        "insectos":    1 if d.get("insectos") else 0,
-    }
-    kg = to_float(d.get("kg")) or 0
-
-    from calculos import calcular_comercial
-    res = calcular_comercial(silo["cereal"], datos)
-
-    conn.execute("""
-        INSERT INTO llenado (
-            numero_qr, empresa_id, fecha, kg,
-            temperatura, humedad, danados, quebrados,
-            materia_extrana, olor, moho, insectos, chamico,
-            grado, factor, tas
-        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-    """, (
-        qr, current_user.empresa_id, ahora(), kg,
-        datos["temperatura"], datos["humedad"], datos["danados"], datos["quebrados"],
-        datos["materia_extrana"], datos["olor"], datos["moho"], datos["insectos"], datos["chamico"],
-        str(res.get("grado") or "F/E"), res.get("factor"), res.get("tas")
-    ))
-
-    conn.commit()
-    conn.close()
-
-    return jsonify(ok=True)
+    return _aplicar(operaciones.nueva_carga_llenado, d)
 
 # ======================
 
@@ -674,7 +617,7 @@ def registrar_extraccion():
         numero_qr=qr
     )
 
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
 
     return jsonify(ok=True)
@@ -758,7 +701,7 @@ def cerrar_extraccion():
         numero_qr=qr
     )
 
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
 
     return jsonify(
@@ -783,39 +726,7 @@ def registrar_camionada():
     if not tiene_permiso("form"):
         return jsonify(ok=False), 403
     d = request.get_json(silent=True) or {}
-    qr = d.get("numero_qr")
-    patente = d.get("patente", "").strip()
-    if not qr or not patente:
-        return jsonify(ok=False, error="Faltan datos obligatorios (QR y patente)"), 400
-    conn = get_db()
-    silo = conn.execute("SELECT estado_silo FROM silos WHERE numero_qr=? AND empresa_id=?",
-        (qr, current_user.empresa_id)).fetchone()
-    if not silo:
-        conn.close()
-        return jsonify(ok=False, error="Silo inexistente"), 400
-    if silo["estado_silo"] != "En extracción":
-        conn.close()
-        return jsonify(ok=False, error="El silo no está en extracción"), 400
-    row_count = conn.execute("SELECT COUNT(*) as cant FROM vaciado WHERE numero_qr=? AND empresa_id=?",
-        (qr, current_user.empresa_id)).fetchone()
-    nro_camion = (row_count["cant"] if row_count else 0) + 1
-    conn.execute("""
-        INSERT INTO vaciado (numero_qr, empresa_id, fecha, nro_camion, patente,
-             kg, humedad, factor, tas, insectos, destino, sub_destino, obs)
-        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-    """, (qr, current_user.empresa_id, ahora(), str(nro_camion), patente.upper(),
-          None, None, None, None, 0, None, None, None))
-    registrar_auditoria(
-        conn, current_user.id, current_user.empresa_id,
-        accion="camionada_vaciado",
-        detalle=f"Silo {qr} — camionada #{nro_camion} (patente: {patente.upper()})",
-        numero_qr=qr
-    )
-
-    conn.commit()
-    conn.close()
-    return jsonify(ok=True, nro_camion=nro_camion)
-
+    return _aplicar(operaciones.registrar_camionada, d)
 
 # ======================
 # VACIADO — completar/editar camionada (laboratorio)
@@ -869,13 +780,13 @@ def completar_camionada(id_camionada):
             kg=?, temperatura=?, humedad=?, materia_extrana=?,
             danados=?, quebrados=?, ph=?, chamico=?,
             materia_grasa=?, acidez=?, proteinas=?, granos_picados=?,
-            olor=?, moho=?, insectos=?, factor=?, tas=?, destino=?, obs=?
+            olor=?, moho=?, insectos=?, factor=?, tas=?, reglas_version=?, destino=?, obs=?
         WHERE id=? AND empresa_id=?
     """, (kg, datos["temperatura"], datos["humedad"], datos["materia_extrana"],
           datos["danados"], datos["quebrados"], datos["ph"], datos["chamico"],
           datos["materia_grasa"], datos["acidez"], datos["proteinas"], datos["granos_picados"],
           datos["olor"], datos["moho"], datos["insectos"],
-          res.get("factor"), res.get("tas"), destino, d.get("obs"),
+          res.get("factor"), res.get("tas"), res.get("reglas_version"), destino, d.get("obs"),
           id_camionada, current_user.empresa_id))
 
     registrar_auditoria(
@@ -885,7 +796,7 @@ def completar_camionada(id_camionada):
         numero_qr=cam["numero_qr"]
     )
 
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
     return jsonify(ok=True)
 
@@ -939,7 +850,7 @@ def eliminar_camionada(id_camionada):
         numero_qr=row["numero_qr"]
     )
 
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
 
     return jsonify(ok=True)
@@ -987,7 +898,7 @@ def editar_silo():
         current_user.empresa_id
     ))
 
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
     return jsonify(ok=True)
 
@@ -1025,7 +936,7 @@ def borrar_silo():
     conn.execute("DELETE FROM llenado WHERE numero_qr=? AND empresa_id=?", (qr, current_user.empresa_id))
     conn.execute("DELETE FROM silos WHERE numero_qr=? AND empresa_id=?", (qr, current_user.empresa_id))
 
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
     return jsonify(ok=True)
 
@@ -1041,32 +952,8 @@ def actualizar_gps():
         return jsonify(ok=False, error="No autorizado"), 403
 
     d = request.get_json(force=True, silent=True) or {}
-    qr  = d.get("numero_qr")
-    lat = d.get("lat")
-    lon = d.get("lon")
-
-    if not qr or lat is None or lon is None:
-        return jsonify(ok=False, error="Datos incompletos"), 400
-
-    conn = get_db()
-
-    silo = conn.execute(
-        "SELECT numero_qr FROM silos WHERE numero_qr=? AND empresa_id=?",
-        (qr, current_user.empresa_id)
-    ).fetchone()
-
-    if not silo:
-        conn.close()
-        return jsonify(ok=False, error="Silo no encontrado"), 404
-
-    conn.execute(
-        "UPDATE silos SET lat=?, lon=? WHERE numero_qr=? AND empresa_id=?",
-        (lat, lon, qr, current_user.empresa_id)
-    )
-    conn.commit()
-    conn.close()
-    return jsonify(ok=True)
 
+    return _aplicar(operaciones.actualizar_gps, d)
 
 # ======================
 # LLENADO — EDITAR
@@ -1124,16 +1011,16 @@ def editar_carga_llenado(id):
         UPDATE llenado SET
             kg=?, temperatura=?, humedad=?, danados=?, quebrados=?,
             materia_extrana=?, olor=?, moho=?, insectos=?, chamico=?,
-            grado=?, factor=?, tas=?
+            grado=?, factor=?, tas=?, reglas_version=?
         WHERE id=? AND empresa_id=?
     """, (
         kg, datos["temperatura"], datos["humedad"], datos["danados"], datos["quebrados"],
         datos["materia_extrana"], datos["olor"], datos["moho"], datos["insectos"], datos["chamico"],
-        str(res.get("grado") or "F/E"), res.get("factor"), res.get("tas"),
+        str(res.get("grado") or "F/E"), res.get("factor"), res.get("tas"), res.get("reglas_version"),
         id, current_user.empresa_id
     ))
 
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
     return jsonify(ok=True)
 
@@ -1161,6 +1048,51 @@ def eliminar_carga_llenado(id):
 
     conn.execute("DELETE FROM llenado WHERE id=? AND empresa_id=?",
                  (id, current_user.empresa_id))
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
     conn.close()
     return jsonify(ok=True)
+
+
+# ======================
+# VALUACIÓN DEL STOCK
+# ======================
+@api_bp.route("/api/valuacion")
+@login_required
+def api_valuacion():
+
+    if not tiene_permiso("comercial"):
+        return jsonify(ok=False, error="No autorizado"), 403
+
+    from flask import Response, stream_with_context
+    from panel.routes import empresa_actual
+    from comercial.valuacion import valuacion, json_en_partes
+
+    empresa_id = empresa_actual()
+
+    if not empresa_id:
+        return jsonify(ok=False, error="Sin empresa"), 400
+
+    fuente = request.args.get("fuente", "pizarra")
+    posiciones = request.args.getlist("posicion")
+
+    conn = get_db()
+    try:
+        clave, resultado = valuacion(conn, empresa_id, fuente, posiciones)
+    finally:
+        conn.close()
+
+    etag = '"' + clave + '"'
+
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status=304, headers={"ETag": etag})
+
+    if request.args.get("stream") == "1":
+        resp = Response(
+            stream_with_context(json_en_partes(resultado)),
+            mimetype="application/json"
+        )
+    else:
+        resp = jsonify(resultado)
+
+    resp.headers["ETag"] = etag
+    return resp
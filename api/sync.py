@@ -0,0 +1,202 @@
+# api/sync.py
+# Lote de operaciones encoladas en el teléfono sin señal (form.html).
+# - Se aplican en el orden recibido, todas en una transacción; cada
+#   una dentro de un SAVEPOINT: si falla se deshace solo esa y se sigue.
+# - Cada operación trae una clave de idempotencia generada en el
+#   teléfono. Las aplicadas se guardan en sync_operaciones con su
+#   resultado: si el lote se reenvía (se cortó la señal antes de la
+#   respuesta) vuelven como "duplicado" con el mismo resultado.
+# - La fecha del cliente es la del registro (se hizo en el campo horas
+#   antes); no se aceptan fechas futuras.
+# - Lo que sale a la red (subir la foto de un monitoreo) se hace antes
+#   de abrir la transacción del lote, y solo después de los controles
+#   sin red (fecha, estado del silo): una operación rechazada no deja
+#   una foto subida de más.
+# Estados por operación: ok, duplicado, conflicto (el silo no está como
+# el teléfono creía), error (datos, permiso, tipo desconocido). Un error
+# con reintentar (falló la subida de la foto) debe quedar en la cola.
+
+import json
+import os
+from datetime import datetime, timedelta
+
+from flask_login import current_user
+
+from api import operaciones
+from permissions import tiene_permiso
+from utils.fechas import ARG, ahora_completo
+
+# Máximo de operaciones por lote
+SYNC_MAX_OPERACIONES = int(os.getenv("SYNC_MAX_OPERACIONES", "500"))
+
+# Minutos de adelanto tolerados en el reloj del teléfono
+SYNC_TOLERANCIA_MIN = 5
+
+# Días que se recuerdan las claves aplicadas
+SYNC_DIAS = 30
+
+
+def _admin_empresa():
+    return current_user.rol == "admin_empresa" or current_user.es_superadmin
+
+
+# tipo → (operación, quién puede)
+OPERACIONES = {
+    "registrar_silo": (operaciones.registrar_silo, lambda: tiene_permiso("form")),
+    "informar_calado": (operaciones.informar_calado, lambda: tiene_permiso("calado")),
+    "monitoreo": (operaciones.nuevo_monitoreo, lambda: tiene_permiso("form")),
+    "llenado": (operaciones.nueva_carga_llenado, lambda: tiene_permiso("form")),
+    "vaciado": (operaciones.registrar_camionada, lambda: tiene_permiso("form")),
+    "actualizar_gps": (operaciones.actualizar_gps, _admin_empresa),
+}
+
+
+# tipo → paso previo fuera de la transacción
+PREPARAR = {
+    "monitoreo": operaciones.preparar_monitoreo,
+}
+
+# tipo → control sin red que va antes del paso previo
+VALIDAR = {
+    "monitoreo": operaciones.validar_monitoreo,
+}
+
+
+def fecha_cliente(valor):
+    """ISO 8601 (con o sin zona; sin zona = hora argentina) → datetime argentino."""
+    if not valor:
+        return None
+    try:
+        fecha = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+    except ValueError:
+        raise operaciones.ErrorOperacion("Fecha inválida")
+
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=ARG)
+    fecha = fecha.astimezone(ARG)
+
+    if fecha > datetime.now(ARG) + timedelta(minutes=SYNC_TOLERANCIA_MIN):
+        raise operaciones.ErrorOperacion("Fecha futura")
+    return fecha
+
+
+def _ya_aplicada(conn, clave):
+    fila = conn.execute("""
+        SELECT resultado FROM sync_operaciones
+        WHERE user_id=? AND clave=?
+    """, (current_user.id, clave)).fetchone()
+    if not fila:
+        return None
+    return json.loads(fila["resultado"] or "{}")
+
+
+def _error(item, e):
+    if isinstance(e, operaciones.Conflicto):
+        return {**item, "estado": "conflicto", "error": e.mensaje}
+    if isinstance(e, operaciones.ErrorTransitorio):
+        return {**item, "estado": "error", "error": e.mensaje, "reintentar": True}
+    return {**item, "estado": "error", "error": e.mensaje}
+
+
+def _preparar(conn, op, registrados):
+    """
+    Paso previo (PREPARAR) de una operación válida y no aplicada; (op, error).
+    `registrados`: QR dados de alta antes en el mismo lote (todavía no
+    están en la base, así que su silo no se controla acá).
+    """
+    tipo = op.get("tipo")
+    clave = op.get("clave")
+    if tipo not in PREPARAR or not clave or not OPERACIONES[tipo][1]():
+        return op, None
+    if _ya_aplicada(conn, clave) is not None:
+        return op, None
+
+    datos = op.get("datos") or {}
+    try:
+        fecha_cliente(op.get("fecha"))
+        if tipo in VALIDAR and datos.get("numero_qr") not in registrados:
+            VALIDAR[tipo](conn, datos)
+        return {**op, "datos": PREPARAR[tipo](datos)}, None
+    except operaciones.ErrorOperacion as e:
+        return op, e
+
+
+def _aplicar_una(conn, op, fallo=None):
+    clave = op.get("clave")
+    tipo = op.get("tipo")
+    item = {"clave": clave, "tipo": tipo}
+
+    if not clave:
+        return {**item, "estado": "error", "error": "Falta la clave"}
+
+    previo = _ya_aplicada(conn, clave)
+    if previo is not None:
+        return {**item, "estado": "duplicado", "resultado": previo}
+
+    if tipo not in OPERACIONES:
+        return {**item, "estado": "error", "error": "Tipo desconocido"}
+
+    operacion, permitido = OPERACIONES[tipo]
+    if not permitido():
+        return {**item, "estado": "error", "error": "No autorizado"}
+
+    if fallo:
+        return _error(item, fallo)
+
+    conn.execute("SAVEPOINT sync_op")
+    try:
+        fecha = fecha_cliente(op.get("fecha"))
+        resultado = operacion(conn, op.get("datos") or {}, fecha)
+
+        # Si otro envío del mismo lote ganó la clave, esto falla y se deshace todo
+        conn.execute("""
+            INSERT INTO sync_operaciones (user_id, clave, empresa_id, tipo, resultado, fecha_cliente, aplicada)
+            VALUES (?,?,?,?,?,?,?)
+        """, (
+            current_user.id,
+            clave,
+            current_user.empresa_id,
+            tipo,
+            json.dumps(resultado),
+            fecha.strftime("%Y-%m-%d %H:%M:%S") if fecha else None,
+            ahora_completo()
+        ))
+    except operaciones.Conflicto as e:
+        conn.execute("ROLLBACK TO SAVEPOINT sync_op")
+        return {**item, "estado": "conflicto", "error": e.mensaje}
+    except operaciones.ErrorOperacion as e:
+        conn.execute("ROLLBACK TO SAVEPOINT sync_op")
+        return _error(item, e)
+    except Exception as e:
+        conn.execute("ROLLBACK TO SAVEPOINT sync_op")
+        previo = _ya_aplicada(conn, clave)
+        if previo is not None:
+            return {**item, "estado": "duplicado", "resultado": previo}
+        print(f"Error sync {tipo} {clave}: {e}")
+        return {**item, "estado": "error", "error": "Error interno"}
+
+    conn.execute("RELEASE SAVEPOINT sync_op")
+    return {**item, "estado": "ok", "resultado": resultado}
+
+
+def aplicar_lote(conn, lote):
+    """Aplica las operaciones en orden; devuelve un resultado por operación. No hace commit."""
+
+    lote = [op if isinstance(op, dict) else {} for op in lote]
+    preparadas = []
+    registrados = set()
+    for op in lote:
+        preparadas.append(_preparar(conn, op, registrados))
+        if op.get("tipo") == "registrar_silo":
+            registrados.add((op.get("datos") or {}).get("numero_qr"))
+
+    # Primero una escritura común: abre la transacción, así los
+    # SAVEPOINT quedan adentro (en SQLite el primero la abriría y su
+    # RELEASE haría commit)
+    vencidas = (datetime.now(ARG) - timedelta(days=SYNC_DIAS)).strftime("%Y-%m-%d %H:%M:%S")
+    conn.execute(
+        "DELETE FROM sync_operaciones WHERE user_id=? AND aplicada < ?",
+        (current_user.id, vencidas)
+    )
+
+    return [_aplicar_una(conn, op, fallo) for op, fallo in preparadas]
@@ -38,7 +38,7 @@ def inject_permisos():
     return dict(tiene_permiso=tiene_permiso)
 from flask_login import current_user
 from panel.routes import empresa_actual
-from db import get_db
+from utils.empresas import datos_empresa
 from datetime import datetime
 
 
@@ -50,15 +50,7 @@ def inject_estado_contrato():
 
     if current_user.is_authenticated and not current_user.es_superadmin:
 
-        conn = get_db()
-
-        empresa = conn.execute("""
-            SELECT fecha_vencimiento
-            FROM empresas
-            WHERE id=?
-        """, (current_user.empresa_id,)).fetchone()
-
-        conn.close()
+        empresa = datos_empresa(current_user.empresa_id)
 
         if empresa and empresa["fecha_vencimiento"]:
 
@@ -90,15 +82,10 @@ def inject_empresa_contexto():
         empresa_id = empresa_actual()
 
         if empresa_id:
-            conn = get_db()
-            row = conn.execute(
-                "SELECT nombre FROM empresas WHERE id=?",
-                (empresa_id,)
-            ).fetchone()
-            conn.close()
-
-            if row:
-                empresa_nombre = row["nombre"]
+            empresa = datos_empresa(empresa_id)
+
+            if empresa:
+                empresa_nombre = empresa["nombre"]
 
     return dict(empresa_activa=empresa_nombre)
 init_db()
@@ -2,6 +2,12 @@ from flask_login import UserMixin
 from db import get_db
 
 
+COLUMNAS_SESION = (
+    "id", "username", "rol", "empresa_id", "sucursal_id",
+    "es_superadmin", "forzar_cambio_password", "version"
+)
+
+
 class User(UserMixin):
 
     def __init__(self, row):
@@ -20,6 +26,7 @@ class User(UserMixin):
         self.sucursal_id = data.get("sucursal_id")
         self.es_superadmin = data.get("es_superadmin")
         self.forzar_cambio_password = data.get("forzar_cambio_password", 0)
+        self.version = data.get("version") or 0
 
     def get_id(self):
         return str(self._id)
@@ -28,11 +35,15 @@ class User(UserMixin):
     def id(self):
         return self._id
 
+    def sesion(self):
+        """Copia para guardar en la sesión (sin la clave)."""
+        return {c: getattr(self, c) for c in COLUMNAS_SESION}
+
     @staticmethod
     def get(user_id):
         conn = get_db()
         row = conn.execute(
-            "SELECT * FROM usuarios WHERE id=?",
+            "SELECT " + ", ".join(COLUMNAS_SESION) + " FROM usuarios WHERE id=?",
             (user_id,)
         ).fetchone()
         conn.close()
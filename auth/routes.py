@@ -6,10 +6,14 @@ from flask_login import (
     login_required,
     current_user
 )
-from werkzeug.security import check_password_hash, generate_password_hash
 from db import get_db
 from extensions import login_manager
+from utils.empresas import datos_empresa
+from utils.usuarios import version_usuario, cambio_usuario
+from utils import login as proteccion
+import math
 import re
+import time
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -27,7 +31,22 @@ def validar_password(password):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.get(user_id)
+    # La sesión trae una copia del usuario; si su versión sigue siendo
+    # la de la base no hace falta leerlo
+    copia = session.get("usuario")
+    version = version_usuario(user_id)
+
+    if version is None:
+        session.pop("usuario", None)
+        return None
+
+    if copia and str(copia.get("id")) == str(user_id) and copia.get("version") == version:
+        return User(copia)
+
+    user = User.get(user_id)
+    if user:
+        session["usuario"] = user.sesion()
+    return user
 
 # ==========================
 # LOGIN
@@ -47,7 +66,19 @@ def login():
         password = request.form.get("password")
         if not password:
             return render_template("login.html", error="Ingrese contraseña")
-    
+
+        inicio = time.perf_counter()
+
+        # 🔥 DEMASIADOS INTENTOS (antes de gastar CPU en el hash)
+        espera = proteccion.controlar(proteccion.ip_cliente(request), username)
+        if espera:
+            proteccion.registrar("limitado", inicio)
+            segundos = math.ceil(espera)
+            return render_template(
+                "login.html",
+                error=f"Demasiados intentos. Probá de nuevo en {segundos} segundos."
+            ), 429, {"Retry-After": str(segundos)}
+
         conn = get_db()
 
         u = conn.execute(
@@ -57,25 +88,30 @@ def login():
 
         conn.close()
 
-        if u and check_password_hash(u["password"], password):
+        if not u:
+            proteccion.esperar_como_hash()
+            proteccion.fallo(username)
+            proteccion.registrar("usuario_inexistente", inicio)
 
-            # 🔥 SI NO ES SUPERADMIN, VALIDAR EMPRESA
-            if u["es_superadmin"] != 1:
+        elif not proteccion.verificar(u["password"], password):
+            proteccion.fallo(username)
+            proteccion.registrar("clave_incorrecta", inicio)
 
-                conn = get_db()
+        else:
 
-                empresa = conn.execute("""
-                    SELECT activa, fecha_vencimiento
-                    FROM empresas
-                    WHERE id=?
-                """, (u["empresa_id"],)).fetchone()
+            proteccion.exito(username)
 
-                conn.close()
+            # 🔥 SI NO ES SUPERADMIN, VALIDAR EMPRESA
+            if u["es_superadmin"] != 1:
+
+                empresa = datos_empresa(u["empresa_id"])
 
                 if not empresa:
+                    proteccion.registrar("empresa_bloqueada", inicio)
                     return render_template("login.html", error="Empresa no válida")
 
                 if empresa["activa"] == 0:
+                    proteccion.registrar("empresa_bloqueada", inicio)
                     return render_template(
                         "login.html",
                         error="Empresa suspendida. Contacte al administrador."
@@ -86,14 +122,29 @@ def login():
                     hoy = datetime.now().strftime("%Y-%m-%d")
 
                     if empresa["fecha_vencimiento"] < hoy:
+                        proteccion.registrar("empresa_bloqueada", inicio)
                         return render_template(
                             "login.html",
                             error="Contrato vencido. Contacte al administrador."
                         )
 
+            # 🔥 HASH CON OTRO MÉTODO / COSTO → REHASH
+            rehash = proteccion.necesita_rehash(u["password"])
+            if rehash:
+                conn = get_db()
+                conn.execute(
+                    "UPDATE usuarios SET password=? WHERE id=?",
+                    (proteccion.hashear(password), u["id"])
+                )
+                conn.commit()
+                conn.close()
+
+            proteccion.registrar("ok", inicio, rehash=rehash)
+
             # 🔥 CREAR USER
             user = User(u)
             login_user(user)
+            session["usuario"] = user.sesion()
 
             if user.es_superadmin:
                 session.pop("empresa_contexto", None)
@@ -121,6 +172,18 @@ def login():
 
     return render_template("login.html")
 
+# ==========================
+# MÉTRICAS DE LOGIN (superadmin)
+# ==========================
+@auth_bp.route("/login/metricas")
+@login_required
+def metricas_login():
+
+    if not current_user.es_superadmin:
+        return {"ok": False, "error": "No autorizado"}, 403
+
+    return proteccion.metricas()
+
 # ==========================
 # RESET SUPERADMIN
 # ==========================
@@ -148,9 +211,10 @@ def reset_password_admin():
         SET password=?, forzar_cambio_password=1
         WHERE id=?
     """, (
-        generate_password_hash(nueva),
+        proteccion.hashear(nueva),
         user_id
     ))
+    cambio_usuario(conn, user_id)
 
     conn.commit()
     conn.close()
@@ -164,6 +228,7 @@ def reset_password_admin():
 @login_required
 def logout():
     logout_user()
+    session.pop("usuario", None)
     return redirect(url_for("auth.login"))
 @auth_bp.route("/cambiar_password", methods=["GET","POST"])
 @login_required
@@ -191,9 +256,10 @@ def cambiar_password():
             SET password=?, forzar_cambio_password=0
             WHERE id=?
         """, (
-            generate_password_hash(nueva),
+            proteccion.hashear(nueva),
             current_user.id
         ))
+        cambio_usuario(conn, current_user.id)
 
         conn.commit()
         conn.close()
@@ -5,6 +5,8 @@ from permissions import tiene_permiso, acceso_denegado
 from datetime import datetime
 from flask import redirect, url_for
 from bs4 import BeautifulSoup
+from api import operaciones
+from utils.versiones import confirmar_cambio_empresa
 
 calado_bp = Blueprint("calado", __name__, url_prefix="/calado")
 
@@ -25,88 +27,18 @@ def informar_calado():
         return acceso_denegado("calado")
 
     d = request.get_json(force=True, silent=True) or {}
-    qr = d.get("numero_qr")
-
-    if not qr:
-        return jsonify(ok=False, error="QR faltante"), 400
-
-    empresa_id = current_user.empresa_id
-    from utils.fechas import ahora_completo
-    fecha = ahora_completo()
 
     conn = get_db()
-
-    # 🔒 validar silo
-    silo = conn.execute(
-        "SELECT estado_silo FROM silos WHERE numero_qr=? AND empresa_id=?",
-        (qr, empresa_id)
-    ).fetchone()
-
-    if not silo:
+    try:
+        resultado = operaciones.informar_calado(conn, d)
+        confirmar_cambio_empresa(conn, current_user.empresa_id)
+    except operaciones.ErrorOperacion as e:
+        conn.rollback()
+        return jsonify(ok=False, error=e.mensaje), e.status
+    finally:
         conn.close()
-        return jsonify(ok=False, error="Silo inexistente"), 400
-
-    if silo["estado_silo"] == "Extraído":
-        conn.close()
-        return jsonify(
-            ok=False,
-            error="El silo ya fue extraído."
-        ), 400
-
-    # ✅ crear muestreo
-    conn.execute("""
-        INSERT INTO muestreos (
-            numero_qr,
-            empresa_id,
-            fecha_muestreo
-        )
-        VALUES (?,?,?)
-    """, (qr, empresa_id, fecha))
-
-    # Obtener el id recien insertado (compatible SQLite y PostgreSQL)
-    id_row = conn.execute("""
-        SELECT id FROM muestreos
-        WHERE numero_qr=? AND empresa_id=?
-        ORDER BY id DESC LIMIT 1
-    """, (qr, empresa_id)).fetchone()
-    id_muestreo = id_row["id"]
-
-    # 🧪 Temperaturas
-    if d.get("informar_temperatura"):
-
-        for seccion, campo in [
-            ("punta", "temp_punta"),
-            ("medio", "temp_medio"),
-            ("final", "temp_final")
-        ]:
-
-            temp = d.get(campo)
-
-            if temp not in (None, ""):
-                try:
-                    temp = float(temp)
-                except:
-                    temp = None
-
-            conn.execute("""
-                INSERT INTO analisis (
-                    id_muestreo,
-                    empresa_id,
-                    seccion,
-                    temperatura
-                )
-                VALUES (?,?,?,?)
-            """, (
-                id_muestreo,
-                empresa_id,
-                seccion,
-                temp
-            ))
-
-    conn.commit()
-    conn.close()
 
-    return jsonify(ok=True, id_muestreo=id_muestreo)
+    return jsonify(ok=True, **resultado)
 
 @calado_bp.route("/")
 @login_required
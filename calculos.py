@@ -1,3 +1,7 @@
+import numpy as np
+import reglas
+from grillas import GrillaTAS, GrillaMerma, CERCANO
+
 
 # ======================================================
 # UTILIDADES TAS
@@ -33,6 +37,13 @@ def normalizar_grado(grado, usa_grado=True):
     return grado if grado is not None else "F/E"
 
 
+# ======================================================
+# ESTÁNDARES 2025/26 (REFERENCIA)
+# ======================================================
+# calcular_comercial usa las reglas de reglas/campanas/.
+# Estas funciones quedan como referencia de la campaña
+# 2025/26: los tests verifican que el JSON las reproduce.
+
 # ======================================================
 # MAÍZ
 # ======================================================
@@ -476,72 +487,65 @@ TAS_COLZA_GIRASOL = {
 }
 
 
+# ======================================================
+# TAS – GRILLAS (compiladas al importar)
+# ======================================================
+
+GRILLAS_TAS = {
+    "Maíz": GrillaTAS(TAS_MAIZ, "hum_temp"),
+    "Trigo": GrillaTAS(TAS_TRIGO, "temp_hum"),
+    "Soja": GrillaTAS(TAS_SOJA, "hum_temp"),
+    "Girasol": GrillaTAS(TAS_COLZA_GIRASOL, "hum_temp"),
+}
+# TEMPORAL: sorgo usa tabla de maíz
+GRILLAS_TAS["Sorgo"] = GRILLAS_TAS["Maíz"]
+GRILLAS_TAS["Colza"] = GRILLAS_TAS["Girasol"]
+
+
 # ======================================================
 # TAS – FUNCIONES
 # ======================================================
 
 def tas_maiz(d):
-    return _tas_tabla_hum_temp(TAS_MAIZ, d.get("temperatura"), d.get("humedad"))
+    return GRILLAS_TAS["Maíz"].valor(d.get("temperatura"), d.get("humedad"))
 
 def tas_sorgo(d):
     # TEMPORAL: usar tabla de maíz
-    return _tas_tabla_hum_temp(TAS_MAIZ, d.get("temperatura"), d.get("humedad"))
+    return GRILLAS_TAS["Sorgo"].valor(d.get("temperatura"), d.get("humedad"))
 
 
 def tas_trigo(d):
-    return _tas_tabla_temp_hum(TAS_TRIGO, d.get("temperatura"), d.get("humedad"))
+    return GRILLAS_TAS["Trigo"].valor(d.get("temperatura"), d.get("humedad"))
 
 
 def tas_soja(d):
-    return _tas_tabla_hum_temp(TAS_SOJA, d.get("temperatura"), d.get("humedad"))
+    return GRILLAS_TAS["Soja"].valor(d.get("temperatura"), d.get("humedad"))
 
 
 def tas_colza_girasol(d):
-    return _tas_tabla_hum_temp(TAS_COLZA_GIRASOL, d.get("temperatura"), d.get("humedad"))
+    return GRILLAS_TAS["Girasol"].valor(d.get("temperatura"), d.get("humedad"))
+
+
+def tas_lote(cereal, temperaturas, humedades, modo=CERCANO):
+    """TAS para arrays de temperatura/humedad (NaN donde falta dato)."""
+    grilla = GRILLAS_TAS.get(cereal)
+    if grilla is None:
+        raise ValueError(f"Cereal no soportado: {cereal}")
+    return grilla.valores_lote(temperaturas, humedades, modo)
 
 
 # ======================================================
 # SELECTOR FINAL
 # ======================================================
 
-def calcular_comercial(cereal, d):
-    if cereal == "Maíz":
-        g = grado_maiz(d)
-        grado = normalizar_grado(g, usa_grado=True)
-        factor = factor_maiz(d)
-        tas = tas_maiz(d)
-
-    elif cereal == "Trigo":
-        g = grado_trigo(d)
-        grado = normalizar_grado(g, usa_grado=True)
-        factor = factor_trigo(d)
-        tas = tas_trigo(d)
-
-    elif cereal == "Soja":
-        grado = None
-        factor = factor_soja(d)
-        tas = tas_soja(d)
-
-    elif cereal in ("Girasol", "Colza"):
-        grado = None
-        factor = factor_girasol(d)
-        tas = tas_colza_girasol(d)
-
-    elif cereal == "Sorgo":
-        g = grado_sorgo(d)
-        grado = normalizar_grado(g, usa_grado=True)
-        factor = factor_sorgo(d)
-        tas = tas_sorgo(d)
-
-    else:
-        raise ValueError(f"Cereal no soportado: {cereal}")
+def calcular_comercial(cereal, d, fecha=None):
+    """
+    Grado, factor y TAS según las reglas de la campaña vigente
+    en `fecha` (hoy si no se indica). Ver reglas/.
+    """
+    return reglas.evaluador(cereal, fecha)(d)
+
 
-    return {
-        "grado": grado,
-        "factor": factor,
-        "tas": tas,
-    }
-    
 # ======================================================
 # MERMA MAÍZ – TABLA OFICIAL
 # ======================================================
@@ -682,129 +686,71 @@ MERMA_SORGO = {
     24.1: 12.25, 24.2: 12.37, 24.3: 12.49, 24.4: 12.60, 24.5: 12.72,
     24.6: 12.83, 24.7: 12.95, 24.8: 13.06, 24.9: 13.18, 25.0: 13.29,
 }
-def merma_sorgo(humedad):
-
-    if humedad is None:
-        return 0
-    
-    humedad = float(humedad)
-
-    if humedad <= 15.0:
-        return 0
-
-    h = round(humedad, 1)
+# ======================================================
+# MERMA – GRILLAS (compiladas al importar)
+# ======================================================
+# (tabla, humedad base sin merma, manipuleo fijo %)
+
+GRILLAS_MERMA = {
+    "Maíz": GrillaMerma(MERMA_MAIZ, 14.5, 0.25),
+    "Soja": GrillaMerma(MERMA_SOJA, 13.5, 0.25),
+    "Trigo": GrillaMerma(MERMA_TRIGO, 14.0, 0.10),
+    "Girasol": GrillaMerma(MERMA_GIRASOL, 11.0, 0.20),
+    "Sorgo": GrillaMerma(MERMA_SORGO, 15.0, 0.25),
+}
 
-    if h not in MERMA_SORGO:
-        h = min(MERMA_SORGO.keys(), key=lambda x: abs(x - h))
 
-    merma = MERMA_SORGO[h]
+def merma_sorgo(humedad):
+    """
+    Devuelve merma oficial de sorgo
+    + 0.25% fijo por manipuleo
+    """
+    return GRILLAS_MERMA["Sorgo"].valor(humedad)
 
-    # manipuleo fijo
-    merma += 0.25
 
-    return round(merma, 2)
 def merma_maiz(humedad):
     """
     Devuelve merma oficial de maíz
     + 0.25% fijo por manipuleo
     """
+    return GRILLAS_MERMA["Maíz"].valor(humedad)
 
-    if humedad is None:
-        return 0
-
-    humedad = float(humedad)   # 👈 AGREGAR ESTO
-
-    if humedad <= 14.5:
-        return 0
-
-    # Redondeo al decimal más cercano
-    h = round(humedad, 1)
-
-    if h not in MERMA_MAIZ:
-        # si está fuera de tabla usamos el valor más cercano
-        h = min(MERMA_MAIZ.keys(), key=lambda x: abs(x - h))
-
-    merma = MERMA_MAIZ[h]
 
-    # sumar manipuleo fijo
-    merma += 0.25
-
-    return round(merma, 2)
 def merma_soja(humedad):
     """
     Devuelve merma oficial de soja
     + 0.25% fijo por manipuleo
     """
+    return GRILLAS_MERMA["Soja"].valor(humedad)
 
-    if humedad is None:
-        return 0
-    
-    humedad = float(humedad)
-
-    if humedad <= 13.5:
-        return 0
-
-    h = round(humedad, 1)
-
-    if h not in MERMA_SOJA:
-        h = min(MERMA_SOJA.keys(), key=lambda x: abs(x - h))
 
-    merma = MERMA_SOJA[h]
-
-    # sumar manipuleo fijo
-    merma += 0.25
-
-    return round(merma, 2)
 def merma_trigo(humedad):
     """
     Devuelve merma oficial de trigo
     + 0.10% fijo por manipuleo
     """
+    return GRILLAS_MERMA["Trigo"].valor(humedad)
 
-    if humedad is None:
-        return 0
-    
-    humedad = float(humedad)
-
-    if humedad <= 14.0:
-        return 0
 
-    h = round(humedad, 1)
-
-    if h not in MERMA_TRIGO:
-        h = min(MERMA_TRIGO.keys(), key=lambda x: abs(x - h))
-
-    merma = MERMA_TRIGO[h]
-
-    # sumar manipuleo fijo
-    merma += 0.10
-
-    return round(merma, 2)
 def merma_girasol(humedad):
     """
     Devuelve merma oficial de girasol
     + 0.20% fijo por manipuleo
     """
+    return GRILLAS_MERMA["Girasol"].valor(humedad)
 
-    if humedad is None:
-        return 0
-    
-    humedad = float(humedad)
-
-    if humedad <= 11.0:
-        return 0
-
-    h = round(humedad, 1)
-
-    if h not in MERMA_GIRASOL:
-        h = min(MERMA_GIRASOL.keys(), key=lambda x: abs(x - h))
 
-    merma = MERMA_GIRASOL[h]
+def merma_lote(cereal, humedades, modo=CERCANO):
+    """
+    Merma para un array de humedades, con el mismo criterio que
+    calcular_merma_humedad (sorgo hoy no descuenta merma).
+    """
+    grilla = GRILLAS_MERMA.get(cereal)
+    if grilla is None or cereal == "Sorgo":
+        return np.zeros(len(humedades))
+    return grilla.valores_lote(humedades, modo)
 
-    # sumar manipuleo fijo
-    merma += 0.20
 
-    return round(merma, 2)
 def calcular_merma_humedad(cereal, humedad_prom):
 
     if cereal == "Maíz":
@@ -821,37 +767,7 @@ def calcular_merma_humedad(cereal, humedad_prom):
 
     return 0
 def mejor_matba(conn, cereal, factor):
-    prefijos = {
-        "Maíz": "CR",
-        "Soja": "SR",
-        "Trigo": "WR"
-    }
-
-    prefijo = prefijos.get(cereal)
-
-    if not prefijo:
-        return None
+    # Índice en memoria: evita el LIKE sobre matba en cada llamada
+    from comercial.futuros import indice_futuros
 
-    rows = conn.execute("""
-        SELECT posicion, precio, mes
-        FROM matba
-        WHERE posicion LIKE ?
-    """, (f"{prefijo}%",)).fetchall()
-
-    mejor = None
-    mejor_precio = 0
-
-    for r in rows:
-        precio = float(r["precio"])
-        neto = precio * factor
-
-        if neto > mejor_precio:
-            mejor_precio = neto
-            mejor = {
-                "posicion": r["posicion"],
-                "mes": r["mes"],
-                "precio": precio,
-                "neto": round(neto,2)
-            }
-
-    return mejor
\ No newline at end of file
+    return indice_futuros(conn).mejor_neto(cereal, factor)
@@ -0,0 +1,97 @@
+import numpy as np
+
+import reglas
+
+# ======================================================
+# CÁLCULO COMERCIAL EN LOTE
+# ======================================================
+# Misma lógica que calculos.calcular_comercial, pero sobre
+# columnas (arrays NumPy, listas o un DataFrame de pandas)
+# con máscaras vectorizadas. Pensado para importaciones
+# masivas y recálculos históricos.
+#
+# Las reglas salen del evaluador en lote de reglas/. Para que
+# el resultado sea idéntico al escalar:
+#   - un valor faltante (None / NaN / columna ausente) se trata
+#     como la clave ausente en el dict
+#   - los descuentos se restan en el mismo orden que en la
+#     versión escalar (restar 0.0 no altera el resultado)
+#   - el redondeo final usa round() de Python, no np.round
+#   - TAS sale de las grillas de calculos (modo cercano)
+
+
+def _columna(tabla, nombre, n):
+    if nombre not in tabla:
+        return np.full(n, np.nan)
+
+    valores = tabla[nombre]
+
+    if hasattr(valores, "to_numpy"):
+        valores = valores.to_numpy()
+
+    arr = np.asarray(valores)
+
+    if arr.dtype.kind in "fiub":
+        return arr.astype(float)
+
+    def to_float(x):
+        if x is None:
+            return np.nan
+        try:
+            return float(x)
+        except (TypeError, ValueError):
+            return np.nan
+
+    return np.array([to_float(x) for x in arr], dtype=float)
+
+
+def _largo(tabla):
+    if hasattr(tabla, "columns"):
+        return len(tabla)
+    for v in tabla.values():
+        return len(v)
+    return 0
+
+
+# ======================================================
+# API
+# ======================================================
+
+def calcular_comercial_lote(cereal, tabla, fecha=None):
+    """
+    tabla: DataFrame o dict {columna: array/lista} con los campos
+           de análisis (humedad, temperatura, danados, ...).
+    fecha: elige la campaña de reglas (hoy si no se indica).
+
+    Devuelve {"grado": array object (1/2/3/'F/E' o None),
+              "factor": array float,
+              "tas": array float (NaN donde el escalar da None),
+              "reglas_version": versión usada}.
+    """
+    evaluar, version = reglas.evaluador_lote(cereal, fecha)
+
+    n = _largo(tabla)
+    columnas = {}
+
+    def c(nombre):
+        if nombre not in columnas:
+            columnas[nombre] = _columna(tabla, nombre, n)
+        return columnas[nombre]
+
+    with np.errstate(invalid="ignore"):
+        grado, factor, tas = evaluar(c, n)
+
+    return {"grado": grado, "factor": factor, "tas": tas, "reglas_version": version}
+
+
+def a_registros(resultado):
+    """Resultado del lote → lista de dicts como calcular_comercial."""
+    return [
+        {
+            "grado": g,
+            "factor": float(f),
+            "tas": None if np.isnan(t) else int(t),
+            "reglas_version": resultado["reglas_version"],
+        }
+        for g, f, t in zip(resultado["grado"], resultado["factor"], resultado["tas"])
+    ]
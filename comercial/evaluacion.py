@@ -0,0 +1,278 @@
+import re
+import calendar
+import numpy as np
+from datetime import datetime, timedelta
+from calculos import calcular_merma_humedad
+
+# ======================================================
+# MOTOR DE EVALUACIÓN FUTUROS vs PIZARRA
+# ======================================================
+# Matriz silos × posiciones MATBA × posiciones ROFEX.
+# Para cada silo devuelve la mejor opción de venta neta
+# (pizarra hoy o contrato futuro + dólar futuro).
+
+GASTOS_FUTURO_DEFAULT = 34
+GASTOS_PIZARRA_DEFAULT = 0
+
+# Silos procesados por bloque (acota la memoria de la matriz 3D)
+TAMANO_BLOQUE = 2048
+
+MESES = {
+    "ENE": 1, "JAN": 1, "FEB": 2, "MAR": 3, "ABR": 4, "APR": 4,
+    "MAY": 5, "JUN": 6, "JUL": 7, "AGO": 8, "AUG": 8, "SEP": 9,
+    "SET": 9, "OCT": 10, "NOV": 11, "DIC": 12, "DEC": 12,
+}
+
+_RE_MES_NOMBRE = re.compile(
+    r"(" + "|".join(MESES) + r")\s*[/\-.]?\s*(\d{4}|\d{2})(?!\d)"
+)
+_RE_MES_ANIO = re.compile(r"(?<!\d)(\d{1,2})[/\-](\d{4})(?!\d)")
+_RE_ANIO_MES = re.compile(r"(?<!\d)(\d{4})[/\-](\d{1,2})(?!\d)")
+_RE_MMAAAA = re.compile(r"(?<!\d)(\d{2})(20\d{2})(?!\d)")
+
+
+def _fin_de_mes(anio, mes):
+    if not 1 <= mes <= 12:
+        return None
+    ultimo = calendar.monthrange(anio, mes)[1]
+    return np.datetime64(f"{anio:04d}-{mes:02d}-{ultimo:02d}", "D")
+
+
+def mes_contrato(texto):
+    """
+    Devuelve el último día del mes de un contrato como datetime64[D].
+    Acepta 'MAY26', 'SOJ.ROS/MAY26', '05/2026', '2026-05', 'DLR052026'.
+    """
+    if not texto:
+        return None
+
+    t = str(texto).upper()
+
+    m = _RE_MES_NOMBRE.search(t)
+    if m:
+        anio = int(m.group(2))
+        if anio < 100:
+            anio += 2000
+        return _fin_de_mes(anio, MESES[m.group(1)])
+
+    m = _RE_MES_ANIO.search(t)
+    if m:
+        return _fin_de_mes(int(m.group(2)), int(m.group(1)))
+
+    m = _RE_ANIO_MES.search(t)
+    if m:
+        return _fin_de_mes(int(m.group(1)), int(m.group(2)))
+
+    m = _RE_MMAAAA.search(t)
+    if m:
+        return _fin_de_mes(int(m.group(2)), int(m.group(1)))
+
+    return None
+
+
+def _parsear_fecha(val):
+    if not val:
+        return None
+    if not isinstance(val, str):
+        return val
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(val[:19], fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def vencimiento_tas(fecha_base, tas):
+    """Fecha límite de almacenamiento (fecha base + TAS días)."""
+    base = _parsear_fecha(fecha_base)
+    if base is None or tas is None:
+        return None
+    return np.datetime64((base + timedelta(days=int(tas))).date(), "D")
+
+
+def _o_nat(fecha):
+    return np.datetime64("NaT") if fecha is None else fecha
+
+
+def _mes_posicion(f):
+    mes = mes_contrato(f.get("mes"))
+    return mes if mes is not None else mes_contrato(f.get("posicion"))
+
+
+def _a_float(v, default=np.nan):
+    try:
+        return float(v) if v is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+# ======================================================
+# MOTOR
+# ======================================================
+
+def evaluar_contratos(cereal, silos, futuros, rofex, pizarra, dolar,
+                      gastos_futuro=GASTOS_FUTURO_DEFAULT,
+                      gastos_pizarra=GASTOS_PIZARRA_DEFAULT,
+                      hoy=None):
+    """
+    silos:   dicts con numero_qr, kg, factor_prom, humedad_prom,
+             tas_min, fecha_confeccion
+    futuros: dicts con posicion, precio (USD/TN), mes
+    rofex:   dicts con posicion, ajuste (ARS/USD)
+    pizarra: ARS/TN — dolar: ARS/USD hoy
+    gastos:  USD/TN
+
+    Devuelve {numero_qr: mejor opción}. Los silos sin factor
+    quedan afuera (no hay base para valuarlos).
+    """
+    silos = [s for s in silos if s.get("factor_prom") is not None]
+
+    if not silos:
+        return {}
+
+    hoy = np.datetime64(hoy or datetime.now().date(), "D")
+    dolar = _a_float(dolar, 0.0)
+    pizarra = _a_float(pizarra, 0.0)
+
+    # ── Vectores por silo ───────────────────────────────
+    qrs = [s["numero_qr"] for s in silos]
+    kg = np.array([_a_float(s.get("kg"), 0.0) for s in silos])
+    factor = np.array([_a_float(s.get("factor_prom"), 1.0) for s in silos])
+    merma = np.array([
+        _a_float(calcular_merma_humedad(cereal, s.get("humedad_prom")), 0.0)
+        for s in silos
+    ])
+    venc = np.array([
+        _o_nat(vencimiento_tas(s.get("fecha_confeccion"), s.get("tas_min")))
+        for s in silos
+    ], dtype="datetime64[D]")
+
+    kg_neto = kg * (1 - merma / 100)
+
+    # ── Vectores por posición ───────────────────────────
+    futuros = [f for f in futuros if _a_float(f.get("precio"), 0.0) > 0]
+    precio_fut = np.array([_a_float(f["precio"]) for f in futuros])
+    mes_fut = np.array(
+        [_o_nat(_mes_posicion(f)) for f in futuros],
+        dtype="datetime64[D]"
+    )
+
+    # El dólar hoy entra como posición ROFEX de contado
+    rofex = [r for r in rofex if _a_float(r.get("ajuste"), 0.0) > 0]
+    pos_rofex = ["Dólar hoy"] + [r["posicion"] for r in rofex]
+    ajuste = np.array([dolar] + [_a_float(r["ajuste"]) for r in rofex])
+    mes_rofex = np.array(
+        [hoy] + [_o_nat(mes_contrato(r["posicion"])) for r in rofex],
+        dtype="datetime64[D]"
+    )
+
+    # ── Compatibilidades ────────────────────────────────
+    # dólar fijado no después del mes del contrato
+    if len(futuros):
+        compat_mr = (
+            (mes_rofex[None, :] <= mes_fut[:, None])
+            | np.isnat(mes_fut)[:, None]
+        ) & (ajuste[None, :] > 0)
+        compat_mr[:, 0] |= ajuste[0] > 0
+    else:
+        compat_mr = np.zeros((0, len(ajuste)), dtype=bool)
+
+    # ── Pizarra (vender hoy) ────────────────────────────
+    neto_piz_tn = pizarra * factor - gastos_pizarra * dolar
+    valor_piz = kg_neto / 1000 * neto_piz_tn
+
+    resultado = {}
+    M, R = len(futuros), len(ajuste)
+
+    for ini in range(0, len(silos), TAMANO_BLOQUE):
+        fin = min(ini + TAMANO_BLOQUE, len(silos))
+        f_b = factor[ini:fin]
+        kgn_b = kg_neto[ini:fin]
+        venc_b = venc[ini:fin]
+
+        if M:
+            # USD/TN neto por silo y contrato
+            neto_usd = precio_fut[None, :] * f_b[:, None] - gastos_futuro
+            # ARS por silo × contrato × dólar
+            valor = (kgn_b / 1000)[:, None, None] * neto_usd[:, :, None] * ajuste[None, None, :]
+
+            llega = (
+                np.isnat(venc_b)[:, None]
+                | (mes_fut[None, :] <= venc_b[:, None])
+                | np.isnat(mes_fut)[None, :]
+            )
+            valido = llega[:, :, None] & compat_mr[None, :, :]
+            valor = np.where(valido, valor, -np.inf)
+
+            plano = valor.reshape(fin - ini, M * R)
+            mejor_idx = plano.argmax(axis=1)
+            mejor_valor = plano[np.arange(fin - ini), mejor_idx]
+        else:
+            mejor_idx = np.zeros(fin - ini, dtype=int)
+            mejor_valor = np.full(fin - ini, -np.inf)
+
+        for k in range(fin - ini):
+            i = ini + k
+            vence = None if np.isnat(venc[i]) else str(venc[i])
+            base = {
+                "numero_qr": qrs[i],
+                "kg_neto": round(float(kg_neto[i]), 0),
+                "merma": float(merma[i]),
+                "vence_tas": vence,
+            }
+
+            if mejor_valor[k] > valor_piz[i] and np.isfinite(mejor_valor[k]):
+                m, r = divmod(int(mejor_idx[k]), R)
+                neto_usd_tn = float(precio_fut[m] * factor[i] - gastos_futuro)
+                resultado[qrs[i]] = {
+                    **base,
+                    "opcion": "futuro",
+                    "posicion": futuros[m]["posicion"],
+                    "mes": futuros[m].get("mes"),
+                    "rofex": pos_rofex[r],
+                    "dolar": float(ajuste[r]),
+                    "neto_usd_tn": round(neto_usd_tn, 2),
+                    "neto_ars_tn": round(neto_usd_tn * float(ajuste[r]), 2),
+                    "valor_ars": round(float(mejor_valor[k]), 2),
+                    "valor_usd": round(float(mejor_valor[k]) / float(ajuste[r]), 2),
+                }
+            else:
+                neto_ars_tn = float(neto_piz_tn[i])
+                resultado[qrs[i]] = {
+                    **base,
+                    "opcion": "pizarra",
+                    "posicion": None,
+                    "mes": None,
+                    "rofex": None,
+                    "dolar": dolar or None,
+                    "neto_usd_tn": round(neto_ars_tn / dolar, 2) if dolar else None,
+                    "neto_ars_tn": round(neto_ars_tn, 2),
+                    "valor_ars": round(float(valor_piz[i]), 2),
+                    "valor_usd": round(float(valor_piz[i]) / dolar, 2) if dolar else None,
+                }
+
+    return resultado
+
+
+def futuro_mas_cercano_tas(futuros, vencimiento):
+    """
+    Contrato con el mes más tardío que todavía llega antes
+    del vencimiento de TAS. Sin vencimiento → el primero.
+    """
+    if not futuros:
+        return None
+
+    if vencimiento is None or np.isnat(vencimiento):
+        return futuros[0]
+
+    candidatos = []
+    for f in futuros:
+        mes = _mes_posicion(f)
+        if mes is not None and mes <= vencimiento:
+            candidatos.append((mes, f))
+
+    if not candidatos:
+        return futuros[0]
+
+    return max(candidatos, key=lambda x: x[0])[1]
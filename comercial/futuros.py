@@ -0,0 +1,171 @@
+import threading
+import time
+from db import get_db
+from utils.versiones import obtener_versiones
+from comercial.evaluacion import mes_contrato
+
+# ======================================================
+# ÍNDICE EN MEMORIA DE FUTUROS (MATBA / ROFEX)
+# ======================================================
+# Una foto por proceso de las tablas matba y rofex, agrupada
+# por prefijo de cereal y ordenada por mes de contrato.
+# Se reconstruye entera y se reemplaza de una sola vez; los
+# demás workers se enteran por la tabla `versiones`.
+
+PREFIJOS_MATBA = {
+    "Maíz": "CR",
+    "Soja": "SR",
+    "Trigo": "WR"
+}
+
+CLAVES_VERSION = ("matba", "rofex")
+
+# Segundos entre chequeos de versión contra la base
+VERIFICAR_CADA = 5
+
+
+def _precio(v):
+    try:
+        return float(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _mes(f):
+    mes = mes_contrato(f.get("mes"))
+    return mes if mes is not None else mes_contrato(f.get("posicion"))
+
+
+class IndiceFuturos:
+
+    def __init__(self, matba, rofex, versiones=None):
+        self.versiones = dict(versiones or {})
+        self.verificado = time.monotonic()
+
+        self._por_prefijo = {}
+        self._meses = {}
+        self._mejor = {}
+
+        for prefijo in PREFIJOS_MATBA.values():
+            filas = [
+                dict(r) for r in matba
+                if (r["posicion"] or "").startswith(prefijo)
+            ]
+
+            # Mejor precio en orden de la base: ante empate gana
+            # el primero, igual que el recorrido original
+            mejor = None
+            for f in filas:
+                p = _precio(f["precio"])
+                if p is not None and p > 0 and (mejor is None or p > mejor["precio"]):
+                    mejor = {"posicion": f["posicion"], "mes": f["mes"], "precio": p}
+
+            # Sin mes reconocible → al final, en el orden de la base
+            pares = sorted(
+                ((_mes(f), f) for f in filas),
+                key=lambda x: (x[0] is None, x[0] if x[0] is not None else 0)
+            )
+            self._por_prefijo[prefijo] = tuple(f for _, f in pares)
+            self._meses[prefijo] = tuple(m for m, _ in pares)
+            self._mejor[prefijo] = mejor
+
+        self.rofex = tuple(dict(r) for r in rofex)
+
+    def futuros(self, cereal):
+        """Posiciones del cereal ordenadas por mes de contrato (copias)."""
+        prefijo = PREFIJOS_MATBA.get(cereal)
+        if not prefijo:
+            return []
+        return [dict(f) for f in self._por_prefijo[prefijo]]
+
+    def mejor(self, cereal):
+        """Posición de mayor precio del cereal, o None."""
+        prefijo = PREFIJOS_MATBA.get(cereal)
+        mejor = self._mejor.get(prefijo)
+        return dict(mejor) if mejor else None
+
+    def mejor_neto(self, cereal, factor):
+        """Mejor posición ajustada por factor (mismo formato que mejor_matba)."""
+        mejor = self._mejor.get(PREFIJOS_MATBA.get(cereal))
+        if not mejor:
+            return None
+
+        neto = mejor["precio"] * factor
+        if not neto > 0:
+            return None
+
+        return {**mejor, "neto": round(neto, 2)}
+
+    def hasta(self, cereal, fecha):
+        """Posiciones cuyo mes de contrato no supera `fecha` (datetime64[D])."""
+        prefijo = PREFIJOS_MATBA.get(cereal)
+        if not prefijo:
+            return []
+        return [
+            dict(f)
+            for m, f in zip(self._meses[prefijo], self._por_prefijo[prefijo])
+            if m is not None and m <= fecha
+        ]
+
+
+def construir_indice(conn):
+    versiones = obtener_versiones(conn, CLAVES_VERSION)
+
+    matba = conn.execute("""
+        SELECT posicion, cereal, precio, fecha, mes
+        FROM matba
+        ORDER BY fecha
+    """).fetchall()
+
+    rofex = conn.execute("""
+        SELECT posicion, ajuste
+        FROM rofex
+    """).fetchall()
+
+    return IndiceFuturos(matba, rofex, versiones)
+
+
+_indice = None
+_lock = threading.Lock()
+
+
+def indice_futuros(conn=None):
+    """
+    Devuelve el índice vigente del proceso. Cada VERIFICAR_CADA
+    segundos compara versiones con la base y, si cambiaron,
+    lo reconstruye. Si se pasa `conn` se usa esa conexión.
+    """
+    global _indice
+
+    indice = _indice
+    if indice is not None and time.monotonic() - indice.verificado < VERIFICAR_CADA:
+        return indice
+
+    with _lock:
+        indice = _indice
+        if indice is not None and time.monotonic() - indice.verificado < VERIFICAR_CADA:
+            return indice
+
+        propia = conn is None
+        if propia:
+            conn = get_db()
+
+        try:
+            if indice is not None:
+                actuales = obtener_versiones(conn, CLAVES_VERSION)
+                if actuales == indice.versiones:
+                    indice.verificado = time.monotonic()
+                    return indice
+
+            _indice = construir_indice(conn)
+            return _indice
+        finally:
+            if propia:
+                conn.close()
+
+
+def invalidar_indice():
+    """Fuerza la reconstrucción en el próximo acceso de este proceso."""
+    global _indice
+    with _lock:
+        _indice = None
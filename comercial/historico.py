@@ -0,0 +1,54 @@
+from datetime import datetime
+
+# ======================================================
+# HISTÓRICO DE PRECIOS
+# ======================================================
+# matba/rofex/mercado guardan solo la última foto; acá se
+# acumula una fila por actualización para poder estimar
+# volatilidad y tendencia.
+
+
+def registrar_precio(conn, fuente, clave, cereal, precio):
+    """
+    Agrega un precio a la serie. Si el último registro de la
+    misma clave es del mismo día y con el mismo precio, no
+    duplica (varias empresas refrescan la misma pizarra).
+    No hace commit.
+    """
+    if precio is None:
+        return
+
+    ultimo = conn.execute("""
+        SELECT precio, fecha
+        FROM precios_historicos
+        WHERE fuente=? AND clave=?
+        ORDER BY fecha DESC
+        LIMIT 1
+    """, (fuente, clave)).fetchone()
+
+    hoy = datetime.now().strftime("%Y-%m-%d")
+
+    if ultimo and str(ultimo["fecha"])[:10] == hoy and float(ultimo["precio"]) == float(precio):
+        return
+
+    conn.execute("""
+        INSERT INTO precios_historicos (fuente, clave, cereal, precio, fecha)
+        VALUES (?, ?, ?, ?, ?)
+    """, (fuente, clave, cereal, float(precio), datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def serie_diaria(conn, fuente, clave):
+    """[(fecha 'YYYY-MM-DD', precio)] con el último precio de cada día."""
+    rows = conn.execute("""
+        SELECT fecha, precio
+        FROM precios_historicos
+        WHERE fuente=? AND clave=?
+        ORDER BY fecha
+    """, (fuente, clave)).fetchall()
+
+    por_dia = {}
+    for r in rows:
+        if r["precio"] is not None:
+            por_dia[str(r["fecha"])[:10]] = float(r["precio"])
+
+    return sorted(por_dia.items())
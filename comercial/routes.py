@@ -3,9 +3,21 @@ from flask_login import login_required, current_user
 from db import get_db
 from permissions import tiene_permiso, acceso_denegado
 from calculos import calcular_merma_humedad
-import requests
+from utils import http
 from datetime import datetime
-from panel.routes import empresa_actual
+import math
+from panel.routes import empresa_actual, KG_POR_METRO, KG_POR_METRO_DEFAULT
+from comercial.evaluacion import (
+    evaluar_contratos,
+    futuro_mas_cercano_tas,
+    vencimiento_tas,
+    GASTOS_FUTURO_DEFAULT,
+    GASTOS_PIZARRA_DEFAULT,
+)
+from comercial.futuros import indice_futuros, invalidar_indice
+from comercial.historico import registrar_precio
+from comercial.simulacion import simular_empresa, CAMINOS_DEFAULT, CAMINOS_MAX, HORIZONTE_MAX
+from utils.versiones import incrementar_version
 from bs4 import BeautifulSoup
 from zoneinfo import ZoneInfo
 from utils.fechas import normalizar_fecha
@@ -156,7 +168,7 @@ def comparador_redirect():
 
     return redirect("/comercial")
 
-def elegir_futuro(futuros, criterio):
+def elegir_futuro(futuros, criterio, vencimiento=None):
     if not futuros:
         return None
 
@@ -166,7 +178,9 @@ def elegir_futuro(futuros, criterio):
     if criterio == "mas_cercano_actual":
         return futuros[0]
 
-    # por ahora mas_cercano_tas lo implementamos después
+    if criterio == "mas_cercano_tas":
+        return futuro_mas_cercano_tas(futuros, vencimiento)
+
     return futuros[0]
 # ======================
 # COMPARADOR DETALLE
@@ -201,18 +215,35 @@ def comparador(cereal):
     precio_base = precio_row["precio_base"] if precio_row and precio_row["precio_base"] else 0
     dolar = precio_row["dolar"] if precio_row and precio_row["dolar"] else 0
 
-    # Obtener criterio configurado por empresa
+    # Obtener criterio y gastos configurados por empresa
     criterio_row = conn.execute("""
-        SELECT criterio_futuro
+        SELECT criterio_futuro, gastos_futuro, gastos_pizarra
         FROM empresas
         WHERE id=?
     """, (empresa_id,)).fetchone()
 
     criterio_futuro = criterio_row["criterio_futuro"] if criterio_row else "mas_cercano_actual"
 
+    gastos_futuro = GASTOS_FUTURO_DEFAULT
+    gastos_pizarra = GASTOS_PIZARRA_DEFAULT
+    if criterio_row:
+        if criterio_row["gastos_futuro"] is not None:
+            gastos_futuro = float(criterio_row["gastos_futuro"])
+        if criterio_row["gastos_pizarra"] is not None:
+            gastos_pizarra = float(criterio_row["gastos_pizarra"])
+
     rows = conn.execute("""
         SELECT
             s.numero_qr,
+            s.fecha_confeccion,
+            s.metros,
+
+            (
+                SELECT COALESCE(SUM(l.kg), 0)
+                FROM llenado l
+                WHERE l.numero_qr = s.numero_qr
+                  AND l.empresa_id = s.empresa_id
+            ) AS kg_llenado,
 
             -- FACTOR: gana el más reciente entre calado y llenado
             CASE
@@ -343,44 +374,24 @@ def comparador(cereal):
         ORDER BY s.numero_qr
     """, (cereal, empresa_id)).fetchall()
 
-    # Mapear cereal a prefijo MATBA
-    prefijos = {
-        "Maíz": "CR",
-        "Soja": "SR",
-        "Trigo": "WR"
-    }
-
-    prefijo = prefijos.get(cereal)
-
-    if prefijo:
-        futuros = conn.execute("""
-            SELECT posicion, cereal, precio, fecha, mes
-            FROM matba
-            WHERE posicion LIKE ?
-            ORDER BY fecha
-        """, (f"{prefijo}%",)).fetchall()
-    else:
-        futuros = []
-
-    futuro_sugerido = elegir_futuro(futuros, criterio_futuro)
+    # Futuros del cereal desde el índice en memoria
+    indice = indice_futuros(conn)
 
     futuros_lista = []
 
-    for f in futuros:
-
-            f = dict(f)
+    for f in indice.futuros(cereal):
 
             precio = float(f["precio"]) if f["precio"] else 0
 
-            gastos = 34
-
-            f["gastos"] = gastos
-            f["precio_neto"] = precio - gastos
+            f["gastos"] = gastos_futuro
+            f["precio_neto"] = precio - gastos_futuro
 
             futuros_lista.append(f)
 
     futuros = futuros_lista
 
+    rofex = [dict(r) for r in indice.rofex]
+
     mejor_precio = 0
 
     for f in futuros:
@@ -409,8 +420,33 @@ def comparador(cereal):
 
         silo_dict["tas_min"] = r["tas_min"]
 
+        silo_dict["kg"] = float(r["kg_llenado"] or 0) or (
+            (r["metros"] or 0) * KG_POR_METRO.get(cereal, KG_POR_METRO_DEFAULT)
+        )
+
         silos.append(silo_dict)
 
+    # ======================
+    # MEJOR CONTRATO POR SILO
+    # ======================
+    recomendaciones = evaluar_contratos(
+        cereal, silos, futuros, rofex, precio_base, dolar,
+        gastos_futuro=gastos_futuro,
+        gastos_pizarra=gastos_pizarra,
+    )
+
+    for silo_dict in silos:
+        silo_dict["recomendacion"] = recomendaciones.get(silo_dict["numero_qr"])
+
+    vencimientos = [
+        v for v in (
+            vencimiento_tas(s["fecha_confeccion"], s["tas_min"]) for s in silos
+        ) if v is not None
+    ]
+    vencimiento_min = min(vencimientos) if vencimientos else None
+
+    futuro_sugerido = elegir_futuro(futuros, criterio_futuro, vencimiento_min)
+
     return render_template(
         "comparador.html",
         cereal=cereal,
@@ -420,7 +456,8 @@ def comparador(cereal):
         dolar=dolar,
         futuro_sugerido=futuro_sugerido,
         futuros=futuros,
-        mejor_precio=mejor_precio
+        mejor_precio=mejor_precio,
+        gastos_futuro=gastos_futuro,
     )
 
 # ======================
@@ -463,8 +500,9 @@ def mercado_manual():
 # ======================
 def obtener_dolar_oficial():
     try:
-        r = requests.get(
+        r = http.get(
             "https://api.bluelytics.com.ar/v2/latest",
+            fuente="bluelytics",
             timeout=10
         )
         data = r.json()
@@ -506,8 +544,9 @@ def obtener_pizarra_auto(cereal):
     url = "https://www.cac.bcr.com.ar/es/precios-de-pizarra"
 
     try:
-        r = requests.get(url, timeout=10)
-        soup = BeautifulSoup(r.text, "html.parser")
+        # la misma página trae todos los cereales: se cachea un rato
+        r = http.get(url, fuente="bcr", timeout=10, ttl=60)
+        soup = BeautifulSoup(r.texto, "html.parser")
 
         mapa = {
             "Soja": "soja",
@@ -596,6 +635,8 @@ def actualizar_pizarra():
             current_user.empresa_id
         ))
 
+        registrar_precio(conn, "pizarra", cereal, cereal, data["precio"])
+
     conn.commit()
     conn.close()
 
@@ -617,10 +658,13 @@ def actualizar_rofex():
         "mrkt": "rofex"
     }
 
-    headers = {"User-Agent": "Mozilla/5.0"}
-
     try:
-        r = requests.get(url, params=params, headers=headers, timeout=15)
+        r = http.get(url, params=params, fuente="acacoop_rofex", timeout=15)
+
+        if r.obsoleto:
+            # la base ya tiene la última foto buena
+            return jsonify(ok=True, obsoleto=True)
+
         data = r.json()
 
         if data["result"]["resultCode"] != 600:
@@ -631,6 +675,7 @@ def actualizar_rofex():
 
         conn = get_db()
         conn.execute("DELETE FROM rofex")
+        incrementar_version(conn, "rofex")
 
         for item in valores:
             conn.execute("""
@@ -652,6 +697,8 @@ def actualizar_rofex():
         conn.commit()
         conn.close()
 
+        invalidar_indice()
+
         print("ROFEX actualizado correctamente")
         return jsonify(ok=True)
 
@@ -674,10 +721,13 @@ def actualizar_matba():
         "mrkt": "MATBAPISO"
     }
 
-    headers = {"User-Agent": "Mozilla/5.0"}
-
     try:
-        r = requests.get(url, params=params, headers=headers, timeout=15)
+        r = http.get(url, params=params, fuente="acacoop_matba", timeout=15)
+
+        if r.obsoleto:
+            # la base ya tiene la última foto buena
+            return jsonify(ok=True, obsoleto=True)
+
         data = r.json()
 
         if data["result"]["resultCode"] != 600:
@@ -689,6 +739,7 @@ def actualizar_matba():
 
         conn = get_db()
         conn.execute("DELETE FROM matba")
+        incrementar_version(conn, "matba")
 
         for item in valores:
 
@@ -719,12 +770,84 @@ def actualizar_matba():
                 mes_contrato
             ))
 
+            registrar_precio(
+                conn, "matba", item["CODIGO"], item["DESCRIPCION"],
+                _f(item.get("AJUSTE"))
+            )
+
         conn.commit()
         conn.close()
 
+        invalidar_indice()
+
         print("MATBA actualizado correctamente")
         return jsonify(ok=True)
 
     except Exception as e:
         print("Error actualizando MATBA:", e)
         return jsonify(ok=False)
+
+
+# ======================
+# SIMULACIÓN DE RIESGO
+# ======================
+@comercial_bp.route("/api/simulacion/<cereal>")
+@login_required
+def simulacion(cereal):
+
+    if not tiene_permiso("comercial"):
+        return acceso_denegado("comercial")
+
+    empresa_id = empresa_actual()
+
+    if not empresa_id:
+        return jsonify(ok=False, error="Sin empresa"), 400
+
+    # Parámetros opcionales; mal escritos o fuera de rango → 400
+    params = {}
+    for nombre, tipo, minimo, maximo in [
+        ("objetivo", float, 0.01, None),
+        ("horizonte", int, 1, HORIZONTE_MAX),
+        ("caminos", int, 1, CAMINOS_MAX),
+        ("semilla", int, 0, None),
+    ]:
+        v = request.args.get(nombre)
+        if v in (None, ""):
+            params[nombre] = None
+            continue
+        try:
+            v = tipo(v)
+        except ValueError:
+            return jsonify(ok=False, error=f"{nombre} inválido"), 400
+        if not math.isfinite(v):
+            return jsonify(ok=False, error=f"{nombre} inválido"), 400
+        if v < minimo or (maximo is not None and v > maximo):
+            rango = f"entre {minimo} y {maximo}" if maximo is not None else f"desde {minimo}"
+            return jsonify(ok=False, error=f"{nombre} fuera de rango ({rango})"), 400
+        params[nombre] = v
+
+    conn = get_db()
+    try:
+        resultado = simular_empresa(
+            conn, empresa_id, cereal,
+            objetivo=params["objetivo"],
+            horizonte=params["horizonte"],
+            caminos=params["caminos"] or CAMINOS_DEFAULT,
+            semilla=params["semilla"],
+        )
+    finally:
+        conn.close()
+
+    return jsonify(ok=True, **resultado)
+
+# ======================
+# ESTADO DE FUENTES EXTERNAS
+# ======================
+@comercial_bp.route("/api/fuentes")
+@login_required
+def estado_fuentes():
+
+    if not tiene_permiso("comercial"):
+        return acceso_denegado("comercial")
+
+    return jsonify(http.metricas())
@@ -0,0 +1,227 @@
+import numpy as np
+from datetime import datetime
+from comercial.evaluacion import vencimiento_tas, TAMANO_BLOQUE
+from comercial.historico import serie_diaria
+
+# ======================================================
+# SIMULADOR MONTE CARLO — RIESGO DE MANTENER STOCK
+# ======================================================
+# Caminos de precio de pizarra (movimiento browniano geométrico
+# con drift y volatilidad estimados del histórico). Estrategia
+# simulada por silo: vender el primer día en que el precio toca
+# el objetivo; si no lo toca antes del vencimiento de TAS, se
+# vende forzado ese día.
+
+CAMINOS_DEFAULT = 5000
+CAMINOS_MAX = 20000
+HORIZONTE_MAX = 365
+
+# Puntos mínimos de la serie para estimar; si no, se usa el default
+PUNTOS_MINIMOS = 10
+VOLATILIDAD_ANUAL_DEFAULT = 0.30
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Tope de celdas caminos × silos por bloque (las matrices de venta se
+# arman de a bloques de silos: la memoria no crece con el stock)
+CELDAS_BLOQUE = 4_000_000
+
+
+def estimar_parametros(serie):
+    """
+    Drift y volatilidad diarios de log-retornos. Los saltos de
+    varios días (fines de semana, días sin refresco) se
+    normalizan por la raíz del intervalo.
+    """
+    if len(serie) < PUNTOS_MINIMOS:
+        return 0.0, VOLATILIDAD_ANUAL_DEFAULT / np.sqrt(365), "default"
+
+    fechas = np.array([np.datetime64(f, "D") for f, _ in serie])
+    precios = np.array([p for _, p in serie], dtype=float)
+
+    validos = precios > 0
+    fechas, precios = fechas[validos], precios[validos]
+
+    # Un precio por día (el último): dos del mismo día dan un intervalo de 0
+    _, ultimos = np.unique(fechas[::-1], return_index=True)
+    indices = len(fechas) - 1 - ultimos
+    fechas, precios = fechas[indices], precios[indices]
+    if len(precios) < PUNTOS_MINIMOS:
+        return 0.0, VOLATILIDAD_ANUAL_DEFAULT / np.sqrt(365), "default"
+
+    dias = np.diff(fechas).astype(float)
+    retornos = np.diff(np.log(precios))
+
+    mu = retornos.sum() / dias.sum()
+    sigma = np.std((retornos - mu * dias) / np.sqrt(dias), ddof=1)
+
+    return float(mu), float(sigma), "historico"
+
+
+def simular_caminos(precio_hoy, mu, sigma, dias, caminos, semilla=None):
+    """
+    Matriz caminos × (dias + 1) de precios; la columna 0 es hoy.
+    mu y sigma diarios (log).
+    """
+    rng = np.random.default_rng(semilla)
+    choques = rng.standard_normal((caminos, dias), dtype=np.float32)
+
+    # mu ya es la media de log-retornos: no lleva corrección de Itô
+    # Todo en float32: el cast de float64 al `out` de cumsum avisaba NaN
+    log_inc = np.float32(mu) + np.float32(sigma) * choques
+    log_precio = np.empty((caminos, dias + 1), dtype=np.float32)
+    log_precio[:, 0] = 0.0
+    np.cumsum(log_inc, axis=1, out=log_precio[:, 1:])
+
+    return precio_hoy * np.exp(log_precio)
+
+
+def dias_hasta_vencimiento(silos, horizonte, hoy):
+    """
+    Días desde hoy hasta el vencimiento de TAS, acotados a
+    [0, horizonte + 1]: horizonte + 1 es que no vence dentro del
+    horizonte (o no tiene TAS).
+    """
+    hoy = np.datetime64(hoy, "D")
+    dias = []
+    for s in silos:
+        venc = vencimiento_tas(s.get("fecha_confeccion"), s.get("tas_min"))
+        if venc is None:
+            dias.append(horizonte + 1)
+        else:
+            dias.append(int(np.clip((venc - hoy).astype(int), 0, horizonte + 1)))
+    return np.array(dias, dtype=np.int64)
+
+
+def simular(silos, precio_hoy, objetivo, serie=None, dolar=None,
+            horizonte=None, caminos=CAMINOS_DEFAULT, semilla=None, hoy=None):
+    """
+    silos: dicts con numero_qr, kg, factor, tas_min, fecha_confeccion
+           (silos sin factor se ignoran)
+    precio_hoy / objetivo: ARS/TN de pizarra
+    serie: [(fecha, precio)] histórico diario
+    """
+    silos = [s for s in silos if s.get("factor") is not None and (s.get("kg") or 0) > 0]
+    caminos = int(min(max(caminos, 100), CAMINOS_MAX))
+    if horizonte is not None:
+        horizonte = int(min(max(horizonte, 1), HORIZONTE_MAX))
+    hoy = hoy or datetime.now().date()
+
+    mu, sigma, origen = estimar_parametros(serie or [])
+
+    base = {
+        "precio_hoy": precio_hoy,
+        "objetivo": objetivo,
+        "caminos": caminos,
+        "parametros": {
+            "origen": origen,
+            "drift_diario": round(mu, 6),
+            "volatilidad_diaria": round(sigma, 6),
+            "volatilidad_anual": round(sigma * np.sqrt(365), 4),
+            "puntos_serie": len(serie or []),
+        },
+    }
+
+    if not silos or not precio_hoy:
+        return {**base, "silos": [], "valor": None, "horizonte": 0}
+
+    venc_dias = dias_hasta_vencimiento(silos, horizonte or HORIZONTE_MAX, hoy)
+    T = int(min(horizonte or venc_dias.max(), HORIZONTE_MAX))
+    T = max(T, 1)
+
+    # Solo vence (venta forzada) el que tiene la TAS dentro del
+    # horizonte; el resto, si no tocó el objetivo, se valúa al día T
+    vence = venc_dias <= T
+    venc_dias = np.minimum(venc_dias, T)
+
+    precios = simular_caminos(precio_hoy, mu, sigma, T, caminos, semilla)
+
+    # Primer día en que se toca el objetivo (T + 1 si nunca)
+    toca = precios >= objetivo
+    primer_toque = np.where(toca.any(axis=1), toca.argmax(axis=1), T + 1)
+
+    tn = np.array([float(s["kg"]) for s in silos]) / 1000
+    factor = np.array([float(s["factor"]) for s in silos])
+    tn_factor = tn * factor
+
+    # Por bloques de silos: día y precio de venta de cada camino
+    total = np.zeros(caminos)
+    prob_vence = np.empty(len(silos))
+    valor_esperado = np.empty(len(silos))
+    dias_venta = np.empty(len(silos))
+
+    bloque = max(1, min(TAMANO_BLOQUE, CELDAS_BLOQUE // caminos))
+    for ini in range(0, len(silos), bloque):
+        fin = min(ini + bloque, len(silos))
+        venc = venc_dias[ini:fin]
+
+        dia_venta = np.minimum(primer_toque[:, None], venc[None, :])
+        precio_venta = np.take_along_axis(precios, dia_venta, axis=1)
+        valor = precio_venta * tn_factor[None, ini:fin]
+
+        total += valor.sum(axis=1)
+        prob_vence[ini:fin] = (primer_toque[:, None] > venc[None, :]).mean(axis=0) * vence[ini:fin]
+        valor_esperado[ini:fin] = valor.mean(axis=0)
+        dias_venta[ini:fin] = dia_venta.mean(axis=0)
+
+    valor_hoy = float(tn_factor.sum() * precio_hoy)
+    pct = np.percentile(total, PERCENTILES)
+
+    detalle = []
+    for i, s in enumerate(silos):
+        detalle.append({
+            "numero_qr": s["numero_qr"],
+            "kg": float(s["kg"]),
+            "factor": float(s["factor"]),
+            "dias_tas": int(venc_dias[i]),
+            "prob_vence_antes_objetivo": round(float(prob_vence[i]), 4),
+            "valor_hoy": round(float(tn_factor[i] * precio_hoy), 2),
+            "valor_esperado": round(float(valor_esperado[i]), 2),
+            "dias_venta_esperado": round(float(dias_venta[i]), 1),
+        })
+
+    peso = tn / tn.sum()
+
+    return {
+        **base,
+        "horizonte": T,
+        "dolar": dolar,
+        "silos": detalle,
+        "valor": {
+            "hoy_ars": round(valor_hoy, 2),
+            "esperado_ars": round(float(total.mean()), 2),
+            "desvio_ars": round(float(total.std()), 2),
+            "percentiles_ars": {
+                f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, pct)
+            },
+            "esperado_usd": round(float(total.mean()) / dolar, 2) if dolar else None,
+            "prob_pierde_vs_hoy": round(float((total < valor_hoy).mean()), 4),
+        },
+        "prob_vence_antes_objetivo": round(float((prob_vence * peso).sum()), 4),
+        "prob_toca_objetivo": round(float((primer_toque <= T).mean()), 4),
+    }
+
+
+def simular_empresa(conn, empresa_id, cereal, objetivo=None, horizonte=None,
+                    caminos=CAMINOS_DEFAULT, semilla=None):
+    """Arma los insumos desde la base y corre la simulación de un cereal."""
+    from comercial.valuacion import cargar_stock, foto_mercado
+
+    stock = [s for s in cargar_stock(conn, empresa_id) if s["cereal"] == cereal]
+    foto = foto_mercado(conn, empresa_id, "pizarra")
+
+    precio = foto["precios"].get(cereal)
+    precio_hoy = precio["precio"] if precio else None
+
+    if objetivo is None and precio_hoy:
+        objetivo = round(precio_hoy * 1.10, 2)
+
+    serie = serie_diaria(conn, "pizarra", cereal)
+
+    resultado = simular(
+        stock, precio_hoy, objetivo, serie,
+        dolar=foto["dolar"], horizonte=horizonte,
+        caminos=caminos, semilla=semilla
+    )
+
+    return {"cereal": cereal, **resultado}
@@ -0,0 +1,336 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from utils.versiones import obtener_versiones, clave_empresa
+from comercial.futuros import indice_futuros, PREFIJOS_MATBA
+from panel.routes import KG_POR_METRO, KG_POR_METRO_DEFAULT
+
+# ======================================================
+# VALUACIÓN DEL STOCK
+# ======================================================
+# kg × factor × precio por silo, agregado por cereal,
+# sucursal y empresa, en ARS y USD.
+#
+# El resultado se cachea por (empresa, versión de datos de la
+# empresa, id de la foto de mercado): mientras nadie cargue
+# datos ni cambie el mercado, los pedidos repetidos no
+# recalculan nada.
+
+# Cantidad de valuaciones guardadas por proceso
+CACHE_MAXIMO = 64
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+# ======================================================
+# FOTO DE MERCADO
+# ======================================================
+
+def _mercado(conn, empresa_id):
+    rows = conn.execute("""
+        SELECT cereal,
+            CASE WHEN usar_manual = 1 AND pizarra_manual IS NOT NULL
+                 THEN pizarra_manual
+                 ELSE pizarra_auto
+            END AS pizarra,
+            dolar,
+            fecha
+        FROM mercado
+        WHERE empresa_id=?
+        ORDER BY cereal
+    """, (empresa_id,)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def foto_mercado(conn, empresa_id, fuente="pizarra", posiciones=None):
+    """
+    Precios a usar por cereal + id estable de la foto.
+
+    fuente='pizarra': pizarra (manual o auto) en ARS/TN.
+    fuente='matba':   posición MATBA en USD/TN; por cereal se usa
+                      la posición pedida que le corresponda o, si
+                      no hay, la de mejor precio.
+    """
+    mercado = _mercado(conn, empresa_id)
+    dolares = [m["dolar"] for m in mercado if m["dolar"]]
+    dolar = dolares[0] if dolares else None
+
+    base = json.dumps(
+        [[m["cereal"], m["pizarra"], m["dolar"], m["fecha"]] for m in mercado],
+        default=str
+    )
+
+    precios = {}
+
+    if fuente == "matba":
+        indice = indice_futuros(conn)
+        posiciones = list(posiciones or [])
+
+        for cereal, prefijo in PREFIJOS_MATBA.items():
+            elegida = None
+            for p in posiciones:
+                if p.startswith(prefijo):
+                    elegida = next(
+                        (f for f in indice.futuros(cereal) if f["posicion"] == p),
+                        None
+                    )
+                    break
+            if elegida is None:
+                elegida = indice.mejor(cereal)
+            if elegida and elegida.get("precio"):
+                precios[cereal] = {
+                    "moneda": "USD",
+                    "precio": float(elegida["precio"]),
+                    "posicion": elegida["posicion"],
+                }
+
+        base += json.dumps([indice.versiones, sorted(posiciones)], sort_keys=True)
+    else:
+        fuente = "pizarra"
+        for m in mercado:
+            if m["pizarra"]:
+                precios[m["cereal"]] = {
+                    "moneda": "ARS",
+                    "precio": float(m["pizarra"]),
+                    "posicion": None,
+                }
+
+    snapshot = fuente + ":" + hashlib.sha1(base.encode()).hexdigest()[:16]
+
+    return {
+        "id": snapshot,
+        "fuente": fuente,
+        "dolar": float(dolar) if dolar else None,
+        "precios": precios,
+    }
+
+
+# ======================================================
+# STOCK
+# ======================================================
+
+def cargar_stock(conn, empresa_id):
+    """
+    Silos con grano (no extraídos): kg en bolsa y factor.
+    kg = llenado (o metros estimados) menos lo ya vaciado.
+    factor = promedio del último calado; si no hay, llenado
+    ponderado por kg. TAS = mínimo del último calado o del llenado.
+    """
+    silos = conn.execute("""
+        SELECT s.numero_qr, s.cereal, s.estado_silo, s.metros,
+               s.fecha_confeccion, s.sucursal_id, su.nombre AS sucursal
+        FROM silos s
+        LEFT JOIN sucursales su ON su.id = s.sucursal_id
+        WHERE s.empresa_id=?
+          AND COALESCE(s.estado_silo, '') != 'Extraído'
+        ORDER BY s.numero_qr
+    """, (empresa_id,)).fetchall()
+
+    ultimo = {}
+    for m in conn.execute("""
+        SELECT numero_qr, id, fecha_muestreo
+        FROM muestreos
+        WHERE empresa_id=?
+        ORDER BY fecha_muestreo
+    """, (empresa_id,)).fetchall():
+        ultimo[m["numero_qr"]] = m["id"]
+
+    factores_calado = {}
+    tas_calado = {}
+    for a in conn.execute("""
+        SELECT id_muestreo, factor, tas
+        FROM analisis
+        WHERE empresa_id=?
+          AND (factor IS NOT NULL OR tas IS NOT NULL)
+    """, (empresa_id,)).fetchall():
+        if a["factor"] is not None:
+            factores_calado.setdefault(a["id_muestreo"], []).append(float(a["factor"]))
+        if a["tas"] is not None:
+            tas_calado.setdefault(a["id_muestreo"], []).append(int(a["tas"]))
+
+    llenado = {}
+    for l in conn.execute("""
+        SELECT numero_qr, kg, factor, tas
+        FROM llenado
+        WHERE empresa_id=?
+    """, (empresa_id,)).fetchall():
+        llenado.setdefault(l["numero_qr"], []).append(l)
+
+    vaciado = {}
+    for v in conn.execute("""
+        SELECT numero_qr, COALESCE(SUM(kg), 0) AS kg
+        FROM vaciado
+        WHERE empresa_id=?
+        GROUP BY numero_qr
+    """, (empresa_id,)).fetchall():
+        vaciado[v["numero_qr"]] = float(v["kg"] or 0)
+
+    stock = []
+
+    for s in silos:
+        qr = s["numero_qr"]
+        cargas = llenado.get(qr, [])
+
+        kg = sum(float(c["kg"] or 0) for c in cargas)
+        if kg == 0:
+            kg = (s["metros"] or 0) * KG_POR_METRO.get(s["cereal"], KG_POR_METRO_DEFAULT)
+        kg = max(0.0, kg - vaciado.get(qr, 0.0))
+
+        factor = None
+        calado = factores_calado.get(ultimo.get(qr))
+        if calado:
+            factor = round(sum(calado) / len(calado), 4)
+        else:
+            con_factor = [c for c in cargas if c["factor"] is not None]
+            kg_pond = sum(float(c["kg"] or 0) for c in con_factor)
+            if con_factor and kg_pond > 0:
+                factor = round(sum(
+                    float(c["factor"]) * float(c["kg"] or 0) for c in con_factor
+                ) / kg_pond, 4)
+            elif con_factor:
+                factor = round(
+                    sum(float(c["factor"]) for c in con_factor) / len(con_factor), 4
+                )
+
+        tas = tas_calado.get(ultimo.get(qr)) or [
+            int(c["tas"]) for c in cargas if c["tas"] is not None
+        ]
+
+        stock.append({
+            "numero_qr": qr,
+            "cereal": s["cereal"],
+            "estado_silo": s["estado_silo"],
+            "sucursal_id": s["sucursal_id"],
+            "sucursal": s["sucursal"],
+            "kg": round(kg, 0),
+            "factor": factor,
+            "tas_min": min(tas) if tas else None,
+            "fecha_confeccion": s["fecha_confeccion"],
+        })
+
+    return stock
+
+
+# ======================================================
+# CÁLCULO
+# ======================================================
+
+def _acumular(grupos, clave, nombre, kg, ars, usd):
+    g = grupos.setdefault(clave, {
+        "nombre": nombre, "silos": 0, "sin_precio": 0,
+        "kg": 0.0, "valor_ars": 0.0, "valor_usd": 0.0,
+    })
+    g["silos"] += 1
+    g["kg"] += kg
+    if ars is None and usd is None:
+        g["sin_precio"] += 1
+    g["valor_ars"] += ars or 0.0
+    g["valor_usd"] += usd or 0.0
+
+
+def _redondear(g):
+    return {
+        **g,
+        "kg": round(g["kg"], 0),
+        "valor_ars": round(g["valor_ars"], 2),
+        "valor_usd": round(g["valor_usd"], 2),
+    }
+
+
+def valuar(stock, foto):
+    dolar = foto["dolar"]
+    precios = foto["precios"]
+
+    silos = []
+    por_cereal = {}
+    por_sucursal = {}
+    total = {}
+
+    for s in stock:
+        precio = precios.get(s["cereal"])
+        ars = usd = None
+
+        if precio and s["factor"] is not None:
+            tn = s["kg"] / 1000
+            if precio["moneda"] == "USD":
+                usd = tn * precio["precio"] * s["factor"]
+                ars = usd * dolar if dolar else None
+            else:
+                ars = tn * precio["precio"] * s["factor"]
+                usd = ars / dolar if dolar else None
+
+        silos.append({
+            **s,
+            "posicion": precio["posicion"] if precio else None,
+            "valor_ars": round(ars, 2) if ars is not None else None,
+            "valor_usd": round(usd, 2) if usd is not None else None,
+        })
+
+        _acumular(por_cereal, s["cereal"], s["cereal"], s["kg"], ars, usd)
+        _acumular(por_sucursal, s["sucursal_id"], s["sucursal"], s["kg"], ars, usd)
+        _acumular(total, "empresa", None, s["kg"], ars, usd)
+
+    return {
+        "silos": silos,
+        "por_cereal": {k: _redondear(v) for k, v in por_cereal.items()},
+        "por_sucursal": [_redondear({**v, "sucursal_id": k}) for k, v in por_sucursal.items()],
+        "empresa": _redondear(total.get("empresa") or {
+            "nombre": None, "silos": 0, "sin_precio": 0,
+            "kg": 0.0, "valor_ars": 0.0, "valor_usd": 0.0,
+        }),
+    }
+
+
+# ======================================================
+# CACHE
+# ======================================================
+
+def valuacion(conn, empresa_id, fuente="pizarra", posiciones=None):
+    """
+    Devuelve (clave, resultado). `clave` identifica datos + mercado
+    y sirve como ETag: si no cambió, el resultado sale del cache.
+    """
+    version = obtener_versiones(conn, [clave_empresa(empresa_id)])[clave_empresa(empresa_id)]
+    foto = foto_mercado(conn, empresa_id, fuente, posiciones)
+    clave = f"{empresa_id}:{version}:{foto['id']}"
+
+    with _lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return clave, _cache[clave]
+
+    resultado = {
+        "empresa_id": empresa_id,
+        "version_datos": version,
+        "snapshot": foto["id"],
+        "fuente": foto["fuente"],
+        "dolar": foto["dolar"],
+        "precios": foto["precios"],
+        **valuar(cargar_stock(conn, empresa_id), foto),
+    }
+
+    with _lock:
+        _cache[clave] = resultado
+        while len(_cache) > CACHE_MAXIMO:
+            _cache.popitem(last=False)
+
+    return clave, resultado
+
+
+def json_en_partes(resultado):
+    """
+    Serializa el resultado silo por silo (para respuestas streaming).
+    El resultado ya está calculado entero (y cacheado): el streaming
+    ahorra armar el JSON completo en memoria, no el cálculo.
+    """
+    cabecera = {k: v for k, v in resultado.items() if k != "silos"}
+
+    yield json.dumps(cabecera, default=str)[:-1]
+    yield ', "silos": ['
+
+    for i, s in enumerate(resultado["silos"]):
+        yield ("," if i else "") + json.dumps(s, default=str)
+
+    yield "]}"
@@ -5,6 +5,11 @@ import psycopg2.extras
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Archivo SQLite cuando no hay DATABASE_URL. Acepta URIs, p.ej.
+# "file:pruebas?mode=memory&cache=shared" para una base en memoria
+# compartida entre conexiones (tests).
+SQLITE_PATH = os.getenv("SQLITE_PATH", "silobolsas.db")
+
 class DBWrapper:
 
     def __init__(self, conn, es_postgres=False):
@@ -26,6 +31,50 @@ class DBWrapper:
 
         return self
 
+    def executemany(self, query, params_seq):
+        """Mismo query con muchas filas de parámetros (updates en lote)."""
+
+        if self.es_postgres:
+            query = query.replace("?", "%s")
+            psycopg2.extras.execute_batch(self.cursor, query, params_seq, page_size=500)
+        else:
+            query = query.replace("%s", "?")
+            self.cursor.executemany(query, params_seq)
+
+        return self
+
+    def lotes(self, query, params=None, tamano=5000):
+        """
+        Recorre un SELECT grande de a `tamano` filas: (columnas, filas).
+        En PostgreSQL usa un cursor con nombre (del lado del servidor),
+        así no se trae el resultado entero a memoria. Un resultado vacío
+        da igual un lote, (columnas, []), para no perder el esquema.
+        """
+
+        if self.es_postgres:
+            cur = self.conn.cursor(name="lotes", cursor_factory=psycopg2.extensions.cursor)
+            cur.itersize = tamano
+            query = query.replace("?", "%s")
+        else:
+            cur = self.conn.cursor()
+            query = query.replace("%s", "?")
+
+        try:
+            cur.execute(query, params or ())
+            columnas = None
+            while True:
+                filas = cur.fetchmany(tamano)
+                if columnas is None:
+                    columnas = [d[0] for d in cur.description]
+                    if not filas:
+                        yield columnas, []
+                        return
+                if not filas:
+                    return
+                yield columnas, [tuple(f) for f in filas]
+        finally:
+            cur.close()
+
     def fetchone(self):
         return self.cursor.fetchone()
 
@@ -66,6 +115,6 @@ def get_db():
         conn.autocommit = False
         return DBWrapper(conn, es_postgres=True)
 
-    conn = sqlite3.connect("silobolsas.db")
+    conn = sqlite3.connect(SQLITE_PATH, uri=SQLITE_PATH.startswith("file:"))
     conn.row_factory = sqlite3.Row
     return DBWrapper(conn)
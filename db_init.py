@@ -29,7 +29,9 @@ def init_db():
             tipo_contrato TEXT,
             fecha_vencimiento TEXT,
             activa INTEGER DEFAULT 1,
-            criterio_futuro TEXT
+            criterio_futuro TEXT,
+            gastos_futuro REAL DEFAULT 34,
+            gastos_pizarra REAL DEFAULT 0
         )
     """)
     
@@ -58,11 +60,17 @@ def init_db():
             sucursal_id INTEGER,
             es_superadmin INTEGER DEFAULT 0,
             forzar_cambio_password INTEGER DEFAULT 0,
+            version INTEGER DEFAULT 0,
             FOREIGN KEY (empresa_id) REFERENCES empresas(id),
             FOREIGN KEY (sucursal_id) REFERENCES sucursales(id)
         )
     """)
 
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_usuarios_empresa
+        ON usuarios (empresa_id, id)
+    """)
+
     # =====================
     # PERMISOS
     # =====================
@@ -73,6 +81,10 @@ def init_db():
             pantalla TEXT
         )
     """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_permisos_usuario
+        ON permisos (user_id, pantalla)
+    """)
     # =====================
     # SOLICITUDES
     # =====================
@@ -85,6 +97,10 @@ def init_db():
             estado TEXT DEFAULT 'pendiente'
         )
     """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_solicitudes_usuario
+        ON solicitudes (user_id, estado)
+    """)
 
     # =====================
     # SILOS
@@ -101,6 +117,7 @@ def init_db():
             lat REAL,
             lon REAL,
             fecha_confeccion TEXT,
+            fecha_inicio_extraccion TEXT,
             fecha_extraccion TEXT,
             PRIMARY KEY (numero_qr, empresa_id)
         )
@@ -150,6 +167,7 @@ def init_db():
             grado INTEGER,
             factor REAL,
             tas INTEGER,
+            reglas_version TEXT,
             FOREIGN KEY (empresa_id) REFERENCES empresas(id)
         )
         """)
@@ -226,6 +244,7 @@ def init_db():
         precio REAL,
         precio_anterior REAL,
         variacion REAL,
+        mes TEXT,
         fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     """)
@@ -251,6 +270,7 @@ def init_db():
         grado TEXT,
         factor REAL,
         tas INTEGER,
+        reglas_version TEXT,
         FOREIGN KEY (empresa_id) REFERENCES empresas(id)
 )
 """)
@@ -271,6 +291,90 @@ def init_db():
     )
     """)
     # =====================
+    # PRECIOS HISTÓRICOS (una fila por actualización de mercado)
+    # =====================
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS precios_historicos (
+        id SERIAL PRIMARY KEY,
+        fuente TEXT NOT NULL,
+        clave TEXT NOT NULL,
+        cereal TEXT,
+        precio REAL NOT NULL,
+        fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_precios_historicos_clave
+    ON precios_historicos (fuente, clave, fecha)
+    """)
+    # =====================
+    # VERSIONES (invalidación de caches entre workers)
+    # =====================
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS versiones (
+        clave TEXT PRIMARY KEY,
+        valor INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    # =====================
+    # RECÁLCULOS (progreso de recalcular.py)
+    # =====================
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS recalculos (
+        trabajo TEXT NOT NULL,
+        tabla TEXT NOT NULL,
+        ultima_clave INTEGER NOT NULL DEFAULT 0,
+        leidos INTEGER NOT NULL DEFAULT 0,
+        actualizados INTEGER NOT NULL DEFAULT 0,
+        terminado INTEGER NOT NULL DEFAULT 0,
+        actualizado TEXT,
+        PRIMARY KEY (trabajo, tabla)
+    )
+    """)
+    # =====================
+    # EXPORTACIONES (cola de Excel en segundo plano)
+    # =====================
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS exportaciones (
+        id SERIAL PRIMARY KEY,
+        empresa_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        nivel TEXT NOT NULL,
+        estado TEXT NOT NULL DEFAULT 'pendiente',
+        progreso INTEGER NOT NULL DEFAULT 0,
+        archivo TEXT,
+        tamano INTEGER,
+        error TEXT,
+        dueno TEXT,
+        creada TEXT NOT NULL,
+        actualizada TEXT,
+        terminada TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_exportaciones_estado
+    ON exportaciones (estado, id)
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_exportaciones_usuario
+    ON exportaciones (user_id, id)
+    """)
+    # =====================
+    # SYNC (claves de idempotencia de /api/sync)
+    # =====================
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_operaciones (
+        user_id INTEGER NOT NULL,
+        clave TEXT NOT NULL,
+        empresa_id INTEGER,
+        tipo TEXT NOT NULL,
+        resultado TEXT,
+        fecha_cliente TEXT,
+        aplicada TEXT NOT NULL,
+        PRIMARY KEY (user_id, clave)
+    )
+    """)
+    # =====================
     # SUPERADMIN
     # =====================
 
@@ -0,0 +1,265 @@
+"""
+Exporta los datos de una empresa en formato plano para BI
+(Power BI, Excel con Power Query, pandas...), sin los estilos
+ni fórmulas de la exportación a Excel.
+
+    python exportar_datos.py --empresa 3
+    python exportar_datos.py --empresa 3 --datasets silos,analisis --salida bi/
+    python exportar_datos.py --empresa 3 --formato parquet
+
+Datasets: silos (con la calidad del último calado), analisis
+(con QR, fecha y cereal), llenado, vaciado, monitoreos, mercado
+y mercado_historico (precios_historicos, comunes a todas las
+empresas).
+
+Las filas se leen de a --lote con un cursor del lado del
+servidor (DBWrapper.lotes) y cada lote pasa por un DataFrame de
+pandas que se escribe y se descarta: la memoria no crece con la
+cantidad de filas. CSV sale comprimido con gzip; Parquet usa
+pyarrow (un row group por lote).
+
+El panel expone lo mismo en /exportar_datos/<dataset>.
+"""
+
+import argparse
+import os
+import zlib
+
+import pandas as pd
+
+from db import get_db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+PARQUET_DISPONIBLE = pa is not None
+
+LOTE_DEFAULT = 10000
+
+# =====================================================
+# DATASETS (todos filtran por empresa con ?)
+# =====================================================
+DATASETS = {
+    "silos": """
+        SELECT s.*,
+               m.fecha_muestreo    AS fecha_ultimo_calado,
+               a.grado, a.factor_prom, a.tas_min,
+               a.humedad_prom, a.temperatura_max, a.insectos
+        FROM silos s
+        LEFT JOIN (
+            SELECT numero_qr, MAX(id) id FROM muestreos WHERE empresa_id=? GROUP BY numero_qr
+        ) um ON um.numero_qr = s.numero_qr
+        LEFT JOIN muestreos m ON m.id = um.id
+        LEFT JOIN (
+            SELECT id_muestreo,
+                   MAX(grado) grado, AVG(factor) factor_prom, MIN(tas) tas_min,
+                   AVG(humedad) humedad_prom, MAX(temperatura) temperatura_max,
+                   MAX(insectos) insectos
+            FROM analisis WHERE empresa_id=? GROUP BY id_muestreo
+        ) a ON a.id_muestreo = um.id
+        WHERE s.empresa_id=?
+        ORDER BY s.numero_qr
+    """,
+    "analisis": """
+        SELECT m.numero_qr, s.cereal, m.fecha_muestreo, a.*
+        FROM analisis a
+        JOIN muestreos m ON m.id = a.id_muestreo
+        LEFT JOIN silos s ON s.numero_qr = m.numero_qr AND s.empresa_id = a.empresa_id
+        WHERE a.empresa_id=?
+        ORDER BY a.id
+    """,
+    "llenado": """
+        SELECT s.cereal, l.*
+        FROM llenado l
+        LEFT JOIN silos s ON s.numero_qr = l.numero_qr AND s.empresa_id = l.empresa_id
+        WHERE l.empresa_id=?
+        ORDER BY l.id
+    """,
+    "vaciado": """
+        SELECT s.cereal, v.*
+        FROM vaciado v
+        LEFT JOIN silos s ON s.numero_qr = v.numero_qr AND s.empresa_id = v.empresa_id
+        WHERE v.empresa_id=?
+        ORDER BY v.id
+    """,
+    "monitoreos": """
+        SELECT s.cereal, mo.*
+        FROM monitoreos mo
+        LEFT JOIN silos s ON s.numero_qr = mo.numero_qr AND s.empresa_id = mo.empresa_id
+        WHERE mo.empresa_id=?
+        ORDER BY mo.id
+    """,
+    "mercado": """
+        SELECT * FROM mercado WHERE empresa_id=? ORDER BY cereal
+    """,
+    "mercado_historico": """
+        SELECT fuente, clave, cereal, precio, fecha
+        FROM precios_historicos
+        ORDER BY id
+    """,
+}
+
+# Nivel que hace falta en el panel (mismos criterios que el Excel:
+# grado, factor y TAS solo con calidad; precios solo con comercial)
+ACCESO = {
+    "silos": "calidad",
+    "analisis": "calidad",
+    "llenado": "calidad",
+    "vaciado": "calidad",
+    "monitoreos": "form",
+    "mercado": "comercial",
+    "mercado_historico": "comercial",
+}
+
+FORMATOS = {
+    "csv": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def marcos(conn, empresa_id, dataset, lote=LOTE_DEFAULT):
+    """DataFrames de a `lote` filas del dataset."""
+    sql = DATASETS[dataset]
+    params = (empresa_id,) * sql.count("?")
+    for columnas, filas in conn.lotes(sql, params, lote):
+        yield pd.DataFrame.from_records(filas, columns=columnas)
+
+
+def csv_gz(conn, empresa_id, dataset, lote=LOTE_DEFAULT):
+    """Bytes de un CSV gzip, un bloque por lote (para respuestas en streaming)."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)
+    encabezado = True
+    for df in marcos(conn, empresa_id, dataset, lote):
+        bloque = gz.compress(df.to_csv(index=False, header=encabezado).encode("utf-8"))
+        encabezado = False
+        if bloque:
+            yield bloque
+    yield gz.flush()
+
+
+class _CambioDeTipo(Exception):
+    """Una columna trae en un lote valores que no entran en el tipo elegido."""
+
+    def __init__(self, columna, tipo):
+        super().__init__(columna)
+        self.columna = columna
+        self.tipo = tipo
+
+
+def _como_texto(serie):
+    return pa.array([None if pd.isna(v) else str(v) for v in serie], type=pa.string())
+
+
+def _tabla(df, esquema, forzados):
+    """
+    Lote → tabla Arrow. Sin esquema (primer lote) se infiere columna por
+    columna: vacías y mezcladas (SQLite admite 'F/E' en un INTEGER) van
+    como texto. Con esquema, cada columna se convierte a su tipo.
+    """
+    columnas = []
+    for c in df.columns:
+        tipo = forzados.get(c) if esquema is None else esquema.field(c).type
+        if tipo is not None and pa.types.is_string(tipo):
+            columnas.append(_como_texto(df[c]))
+            continue
+        try:
+            arr = pa.array(df[c], type=tipo, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if esquema is None:
+                arr = _como_texto(df[c])
+            else:
+                # No entra en lo que ya se escribió: volver a empezar con otro tipo
+                numerica = pd.api.types.is_numeric_dtype(df[c])
+                raise _CambioDeTipo(c, pa.float64() if numerica else pa.string())
+        if pa.types.is_null(arr.type):
+            arr = _como_texto(df[c])
+        columnas.append(arr)
+    return pa.Table.from_arrays(columnas, names=list(df.columns))
+
+
+def escribir_parquet(conn, empresa_id, dataset, destino, lote=LOTE_DEFAULT):
+    """Escribe el dataset en Parquet (archivo o file-object). Devuelve las filas."""
+    if not PARQUET_DISPONIBLE:
+        raise RuntimeError("Parquet necesita pyarrow instalado")
+
+    # El tipo de cada columna sale del primer lote; si uno posterior no
+    # entra, se rearma el archivo con esa columna más amplia (a lo sumo
+    # una vez por columna)
+    forzados = {}
+    while True:
+        if hasattr(destino, "seek"):
+            destino.seek(0)
+            destino.truncate()
+        try:
+            return _escribir_parquet(conn, empresa_id, dataset, destino, lote, forzados)
+        except _CambioDeTipo as e:
+            forzados[e.columna] = e.tipo
+
+
+def _escribir_parquet(conn, empresa_id, dataset, destino, lote, forzados):
+    escritor = None
+    esquema = None
+    filas = 0
+    try:
+        for df in marcos(conn, empresa_id, dataset, lote):
+            tabla = _tabla(df, esquema, forzados)
+            if escritor is None:
+                esquema = tabla.schema
+                escritor = pq.ParquetWriter(destino, esquema)
+            escritor.write_table(tabla)
+            filas += len(df)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return filas
+
+
+def exportar(empresa_id, datasets=None, formato="csv", salida=".", lote=LOTE_DEFAULT):
+    """Un archivo por dataset en `salida`. Devuelve {dataset: ruta}."""
+    datasets = datasets or list(DATASETS)
+    for d in datasets:
+        if d not in DATASETS:
+            raise ValueError(f"Dataset desconocido: {d}")
+
+    extension = FORMATOS[formato][0]
+    os.makedirs(salida, exist_ok=True)
+    rutas = {}
+
+    conn = get_db()
+    try:
+        for d in datasets:
+            ruta = os.path.join(salida, f"{d}.{extension}")
+            if formato == "parquet":
+                escribir_parquet(conn, empresa_id, d, ruta, lote)
+            else:
+                with open(ruta, "wb") as f:
+                    for bloque in csv_gz(conn, empresa_id, d, lote):
+                        f.write(bloque)
+            rutas[d] = ruta
+    finally:
+        conn.close()
+    return rutas
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Exporta datos de una empresa para BI")
+    p.add_argument("--empresa", type=int, required=True)
+    p.add_argument("--datasets", default=",".join(DATASETS),
+                   help=",".join(DATASETS))
+    p.add_argument("--formato", choices=list(FORMATOS), default="csv")
+    p.add_argument("--salida", default=".")
+    p.add_argument("--lote", type=int, default=LOTE_DEFAULT)
+    a = p.parse_args()
+
+    rutas = exportar(
+        a.empresa,
+        datasets=[d.strip() for d in a.datasets.split(",") if d.strip()],
+        formato=a.formato,
+        salida=a.salida,
+        lote=a.lote,
+    )
+    for d, ruta in rutas.items():
+        print(f"  {d}: {ruta} ({os.path.getsize(ruta)} bytes)")
@@ -0,0 +1,480 @@
+"""
+Genera datos sintéticos para pruebas de carga y de escala:
+empresas con sucursal y usuarios, silos con su historia de
+llenado, calados (punta / medio / final), camionadas de
+vaciado, monitoreos, auditoría y filas de mercado.
+
+    python generar_datos.py --empresas 5 --silos 200
+    python generar_datos.py --empresas 20 --silos 5000 --semilla 7
+    SQLITE_PATH=carga.db python generar_datos.py --empresas 50 --silos 2000
+    DATABASE_URL=postgres://... python generar_datos.py ...
+
+Los valores de calidad siguen distribuciones por cereal
+(humedad alrededor de la base de recibo, daño que crece con
+los meses en la bolsa) y grado / factor / TAS se calculan con
+calcular_comercial, así los grados salen como en producción.
+
+Las filas se insertan con executemany en lotes de --lote y se
+confirma una transacción por empresa. Los ids de muestreos se
+asignan acá (para colgarles los análisis sin releer), así que
+no correrlo contra una base con la app escribiendo.
+
+Usuarios: <prefijo><n>_admin y <prefijo><n>_oper, clave
+Clave123! (la de los superadmin no se toca).
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from calculos import calcular_comercial
+from db import get_db
+from db_init import init_db
+from migraciones import ejecutar_migraciones
+
+LOTE_DEFAULT = 5000
+CLAVE = "Clave123!"
+
+# ======================================================
+# DISTRIBUCIONES
+# ======================================================
+
+# Proporción de silos por cereal
+CEREALES = {"Soja": 40, "Maíz": 30, "Trigo": 15, "Girasol": 10, "Sorgo": 5}
+
+# Meses de cosecha (confección de la bolsa)
+COSECHA = {
+    "Soja": [4, 5],
+    "Maíz": [3, 4, 5, 6, 7],
+    "Trigo": [12, 1],
+    "Girasol": [2, 3],
+    "Sorgo": [5, 6],
+}
+
+KG_POR_METRO = {"Soja": 3100, "Maíz": 3300, "Trigo": 3300, "Girasol": 2000, "Sorgo": 3200}
+
+# Temperatura media del grano en la bolsa por mes
+TEMPERATURA_MES = {1: 27, 2: 26, 3: 23, 4: 19, 5: 15, 6: 12,
+                   7: 11, 8: 13, 9: 16, 10: 19, 11: 23, 12: 26}
+
+# campo → (media, desvío) al confeccionar. Los que no están
+# quedan en NULL, como cuando el laboratorio no los mide.
+CALIDAD = {
+    "Soja": {
+        "humedad": (13.2, 1.1), "danados": (1.5, 1.2), "quebrados": (3.0, 2.0),
+        "materia_extrana": (0.8, 0.5), "granos_picados": (0.3, 0.3),
+    },
+    "Maíz": {
+        "humedad": (14.3, 1.3), "ph": (75, 2.5), "danados": (2.5, 1.8),
+        "quebrados": (2.0, 1.2), "materia_extrana": (0.8, 0.5), "granos_picados": (0.5, 0.4),
+    },
+    "Trigo": {
+        "humedad": (13.5, 0.9), "ph": (77, 2.5), "danados": (0.6, 0.5),
+        "quebrados": (0.4, 0.3), "materia_extrana": (0.5, 0.3), "granos_carbon": (0.05, 0.05),
+        "panza_blanca": (12, 8), "granos_picados": (0.3, 0.3), "punta_sombreada": (0.3, 0.3),
+        "revolcado_tierra": (0.05, 0.05), "punta_negra": (0.2, 0.2), "proteinas": (10.5, 0.9),
+    },
+    "Girasol": {
+        "humedad": (10.8, 0.9), "materia_extrana": (1.8, 0.8), "acidez": (1.2, 0.5),
+        "materia_grasa": (43, 2.5),
+    },
+    "Sorgo": {
+        "humedad": (14.8, 1.3), "ph": (72, 3), "danados": (2.0, 1.5),
+        "quebrados": (3.0, 1.5), "materia_extrana": (1.0, 0.6), "granos_picados": (0.5, 0.4),
+    },
+}
+
+# Aumento por cada 30 días en la bolsa, escalado por cereal
+# (trigo tiene tolerancias de grado mucho más chicas)
+DETERIORO = {"danados": 0.35, "quebrados": 0.1, "granos_picados": 0.08, "acidez": 0.1}
+DETERIORO_CEREAL = {"Soja": 1, "Maíz": 1, "Trigo": 0.25, "Girasol": 1, "Sorgo": 0.8}
+
+TIPOS_MONITOREO = ["Rotura", "Malezas", "Encharcado", "Animales", "Otros"]
+
+# Pizarra ($/tn), futuro (USD/tn) de referencia
+PRECIOS = {
+    "Soja": (450000, 320), "Maíz": (250000, 180), "Trigo": (260000, 200),
+    "Girasol": (500000, 340), "Sorgo": (200000, 160),
+}
+
+COLUMNAS = {
+    "silos": ("numero_qr", "empresa_id", "sucursal_id", "cereal", "estado_grano", "estado_silo",
+              "metros", "lat", "lon", "fecha_confeccion", "fecha_inicio_extraccion",
+              "fecha_extraccion"),
+    "muestreos": ("id", "numero_qr", "empresa_id", "fecha_muestreo"),
+    "analisis": ("id_muestreo", "empresa_id", "seccion", "temperatura", "humedad", "ph",
+                 "danados", "quebrados", "materia_extrana", "olor", "moho", "insectos", "chamico",
+                 "granos_carbon", "panza_blanca", "granos_picados", "punta_sombreada",
+                 "revolcado_tierra", "punta_negra", "proteinas", "materia_grasa", "acidez",
+                 "grado", "factor", "tas", "reglas_version"),
+    "llenado": ("numero_qr", "empresa_id", "fecha", "kg", "temperatura", "humedad", "danados",
+                "quebrados", "materia_extrana", "olor", "moho", "insectos", "chamico",
+                "grado", "factor", "tas", "reglas_version"),
+    "vaciado": ("numero_qr", "empresa_id", "fecha", "nro_camion", "patente", "kg", "temperatura",
+                "humedad", "danados", "quebrados", "materia_extrana", "ph", "chamico",
+                "materia_grasa", "acidez", "proteinas", "granos_picados", "olor", "moho",
+                "insectos", "factor", "tas", "reglas_version", "destino", "completado"),
+    "monitoreos": ("numero_qr", "empresa_id", "fecha_evento", "tipo", "detalle", "resuelto",
+                   "fecha_resolucion"),
+    "auditoria": ("user_id", "empresa_id", "accion", "detalle", "numero_qr", "fecha"),
+    "precios_historicos": ("fuente", "clave", "cereal", "precio", "fecha"),
+}
+
+CAMPOS_CALIDAD = set(COLUMNAS["analisis"][3:22])
+
+
+# ======================================================
+# INSERCIÓN EN LOTES
+# ======================================================
+
+class Volcador:
+    """Acumula filas por tabla y las inserta con executemany cada `lote` filas."""
+
+    def __init__(self, conn, lote):
+        self.conn = conn
+        self.lote = lote
+        self.pendientes = {t: [] for t in COLUMNAS}
+        self.totales = {t: 0 for t in COLUMNAS}
+
+    def agregar(self, tabla, fila):
+        filas = self.pendientes[tabla]
+        filas.append(fila)
+        if len(filas) >= self.lote:
+            self.volcar(tabla)
+
+    def volcar(self, tabla):
+        filas = self.pendientes[tabla]
+        if not filas:
+            return
+        columnas = COLUMNAS[tabla]
+        self.conn.executemany(
+            f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+            filas
+        )
+        self.totales[tabla] += len(filas)
+        filas.clear()
+
+    def confirmar(self):
+        for tabla in COLUMNAS:
+            self.volcar(tabla)
+        self.conn.commit()
+
+
+# ======================================================
+# GENERACIÓN
+# ======================================================
+
+def _fecha(dt):
+    return dt.strftime("%Y-%m-%d %H:%M")
+
+
+def _positivo(rnd, media, desvio):
+    return round(max(rnd.gauss(media, desvio), 0), 2)
+
+
+def _confeccion(rnd, cereal, hasta):
+    """Fecha de confección en la última cosecha del cereal anterior a `hasta`."""
+    mes = rnd.choice(COSECHA[cereal])
+    anio = hasta.year
+    while True:
+        dt = datetime(anio, mes, rnd.randint(1, 28), rnd.randint(7, 19), rnd.randint(0, 59))
+        if dt <= hasta - timedelta(days=20):
+            return dt
+        anio -= 1
+
+
+def _calidad(rnd, cereal, dt, dias_en_bolsa, base=None):
+    """Valores de un análisis; `base` es la calidad del silo al confeccionar."""
+    d = dict(base) if base else {
+        campo: _positivo(rnd, media, desvio) for campo, (media, desvio) in CALIDAD[cereal].items()
+    }
+
+    # Variación entre secciones / muestras y deterioro en el tiempo
+    meses = dias_en_bolsa / 30
+    deterioro = DETERIORO_CEREAL[cereal] * meses
+    for campo in list(d):
+        d[campo] = _positivo(rnd, d[campo] + DETERIORO.get(campo, 0) * deterioro, 0.05 * d[campo] + 0.05)
+
+    d["temperatura"] = round(rnd.gauss(TEMPERATURA_MES[dt.month], 3) + 0.4 * meses, 1)
+    d["olor"] = 1 if rnd.random() < 0.02 + 0.01 * meses else 0
+    d["moho"] = 1 if rnd.random() < 0.01 + 0.01 * meses else 0
+    d["insectos"] = 1 if rnd.random() < 0.03 else 0
+    d["chamico"] = float(rnd.randint(1, 30)) if cereal in ("Sorgo", "Girasol") and rnd.random() < 0.05 else 0
+    return d
+
+
+def _medidos(d, tabla):
+    """Solo los campos de calidad que guarda `tabla`: con eso calcula la ruta."""
+    return {k: d.get(k) for k in COLUMNAS[tabla] if k in CAMPOS_CALIDAD}
+
+
+def _grado(res):
+    return res["grado"] or "F/E"
+
+
+def generar_empresa(conn, volcador, rnd, n, prefijo, silos, hasta, muestreo_id, clave_hash):
+    """Una empresa completa; devuelve el próximo id de muestreo libre."""
+
+    nombre = f"{prefijo} {n:04d}"
+    conn.execute("""
+        INSERT INTO empresas (nombre, fecha_alta, tipo_contrato, fecha_vencimiento, activa)
+        VALUES (?,?, 'Silos', ?, 1)
+    """, (nombre, (hasta - timedelta(days=400)).strftime("%Y-%m-%d"),
+          (hasta + timedelta(days=365)).strftime("%Y-%m-%d")))
+    eid = conn.execute("SELECT id FROM empresas WHERE nombre=?", (nombre,)).fetchone()["id"]
+
+    sucursales = []
+    for s in range(rnd.randint(1, 3)):
+        conn.execute("INSERT INTO sucursales (empresa_id, nombre) VALUES (?,?)", (eid, f"Sucursal {s + 1}"))
+    for fila in conn.execute("SELECT id FROM sucursales WHERE empresa_id=?", (eid,)).fetchall():
+        sucursales.append(fila["id"])
+
+    usuario = f"{prefijo.lower().replace(' ', '_')}{n:04d}"
+    for sufijo, rol in [("_admin", "admin_empresa"), ("_oper", "operario")]:
+        conn.execute("""
+            INSERT INTO usuarios (username, password, rol, empresa_id, sucursal_id)
+            VALUES (?,?,?,?,?)
+        """, (usuario + sufijo, clave_hash, rol, eid, sucursales[0]))
+    oper = conn.execute("SELECT id FROM usuarios WHERE username=?", (usuario + "_oper",)).fetchone()["id"]
+    for pantalla in ["panel", "form", "calado", "laboratorio", "comercial", "comparador"]:
+        conn.execute("INSERT INTO permisos (user_id, pantalla) VALUES (?,?)", (oper, pantalla))
+
+    for cereal, (pizarra, _) in PRECIOS.items():
+        conn.execute("""
+            INSERT INTO mercado (empresa_id, cereal, pizarra_auto, fuente, fecha_fuente, dolar, fecha)
+            VALUES (?,?,?, 'CAC BCR', ?, ?, ?)
+        """, (eid, cereal, round(pizarra * rnd.uniform(0.97, 1.03)), hasta.strftime("%Y-%m-%d"),
+              round(rnd.uniform(1350, 1450), 2), hasta.strftime("%Y-%m-%d %H:%M:%S")))
+
+    lat0, lon0 = rnd.uniform(-38, -30), rnd.uniform(-64, -58)
+    cereales = list(CEREALES)
+    pesos = list(CEREALES.values())
+
+    for i in range(silos):
+        qr = f"SYN{n:04d}-{i:06d}"
+        cereal = rnd.choices(cereales, pesos)[0]
+        metros = rnd.choice([60, 60, 60, 75, 90])
+        confeccion = _confeccion(rnd, cereal, hasta)
+        humedo = rnd.random() < 0.15
+        base = _calidad(rnd, cereal, confeccion, 0)
+        if humedo:
+            base["humedad"] = round(base["humedad"] + rnd.uniform(1.5, 4), 2)
+        base = {k: v for k, v in base.items() if k in CALIDAD[cereal]}
+
+        # Extraídos / en extracción: los más viejos
+        dias = (hasta - confeccion).days
+        inicio_extraccion = fin_extraccion = None
+        estado = "Activo"
+        if dias > 90 and rnd.random() < 0.35:
+            inicio_extraccion = confeccion + timedelta(days=rnd.randint(90, min(dias, 300)))
+            if rnd.random() < 0.8 and inicio_extraccion + timedelta(days=5) < hasta:
+                fin_extraccion = inicio_extraccion + timedelta(days=rnd.randint(1, 5))
+                estado = "Extraído"
+            else:
+                estado = "En extracción"
+        ultimo_dia = inicio_extraccion or hasta
+
+        volcador.agregar("silos", (
+            qr, eid, rnd.choice(sucursales), cereal, "Humedo" if humedo else "Seco", estado, metros,
+            round(lat0 + rnd.uniform(-0.3, 0.3), 6), round(lon0 + rnd.uniform(-0.3, 0.3), 6),
+            _fecha(confeccion), inicio_extraccion and _fecha(inicio_extraccion),
+            fin_extraccion and _fecha(fin_extraccion),
+        ))
+        volcador.agregar("auditoria", (oper, eid, "registro_silo", f"Silo {qr} — {cereal}", qr, _fecha(confeccion)))
+
+        # Llenado: varias cargas los primeros días
+        kg_total = metros * KG_POR_METRO[cereal] * rnd.uniform(0.9, 1.05)
+        cargas = rnd.randint(3, 10)
+        for c in range(cargas):
+            dt = confeccion + timedelta(hours=c * rnd.uniform(2, 12))
+            d = _calidad(rnd, cereal, dt, 0, base)
+            res = calcular_comercial(cereal, _medidos(d, "llenado"), fecha=_fecha(dt))
+            volcador.agregar("llenado", (
+                qr, eid, _fecha(dt), round(kg_total / cargas), d["temperatura"], d.get("humedad"),
+                d.get("danados"), d.get("quebrados"), d.get("materia_extrana"), d["olor"], d["moho"],
+                d["insectos"], d["chamico"], str(_grado(res)), res["factor"], res["tas"],
+                res["reglas_version"],
+            ))
+
+        # Calados cada 20-45 días mientras la bolsa está armada
+        dt = confeccion + timedelta(days=rnd.randint(5, 15))
+        while dt < ultimo_dia:
+            volcador.agregar("muestreos", (muestreo_id, qr, eid, _fecha(dt)))
+            en_bolsa = (dt - confeccion).days
+            for seccion in ("punta", "medio", "final"):
+                d = _calidad(rnd, cereal, dt, en_bolsa, base)
+                res = calcular_comercial(cereal, d, fecha=_fecha(dt))
+                volcador.agregar("analisis", (
+                    muestreo_id, eid, seccion, d["temperatura"], d.get("humedad"), d.get("ph"),
+                    d.get("danados"), d.get("quebrados"), d.get("materia_extrana"), d["olor"],
+                    d["moho"], d["insectos"], d["chamico"], d.get("granos_carbon"),
+                    d.get("panza_blanca"), d.get("granos_picados"), d.get("punta_sombreada"),
+                    d.get("revolcado_tierra"), d.get("punta_negra"), d.get("proteinas"),
+                    d.get("materia_grasa"), d.get("acidez"), _grado(res), res["factor"], res["tas"],
+                    res["reglas_version"],
+                ))
+            volcador.agregar("auditoria", (oper, eid, "calado", f"Silo {qr}", qr, _fecha(dt)))
+            muestreo_id += 1
+            dt += timedelta(days=rnd.randint(20, 45))
+
+        # Monitoreos: eventos de campo, la mayoría resueltos
+        for _ in range(rnd.choices([0, 1, 2, 3], [55, 30, 10, 5])[0]):
+            dt = confeccion + timedelta(days=rnd.randint(1, max((ultimo_dia - confeccion).days, 1)))
+            resolucion = min(dt + timedelta(days=rnd.randint(1, 10)), hasta)
+            resuelto = rnd.random() < 0.7
+            volcador.agregar("monitoreos", (
+                qr, eid, _fecha(dt), rnd.choice(TIPOS_MONITOREO), None, 1 if resuelto else 0,
+                _fecha(resolucion) if resuelto else None,
+            ))
+            volcador.agregar("auditoria", (oper, eid, "evento_monitoreo", f"Silo {qr}", qr, _fecha(dt)))
+
+        # Vaciado: camionadas de ~30 tn, la última puede quedar sin completar
+        if inicio_extraccion:
+            restante = round(kg_total)
+            nro = 1
+            dt = inicio_extraccion
+            while restante > 0 and dt < hasta:
+                kg = round(restante) if restante <= 32000 else round(rnd.uniform(28000, 32000))
+                completado = bool(fin_extraccion) or restante > kg
+                d = _calidad(rnd, cereal, dt, (dt - confeccion).days, base)
+                # Como /api/vaciado: lo no medido cuenta como 0
+                d_calc = {k: (v if v is not None else 0) for k, v in _medidos(d, "vaciado").items()}
+                res = calcular_comercial(cereal, d_calc, fecha=_fecha(dt))
+                patente = "".join(rnd.choices("ABCDEFGHJKLMNPRSTUVWXYZ", k=2)) + \
+                    f"{rnd.randint(100, 999)}" + "".join(rnd.choices("ABCDEFGHJKLMNPRSTUVWXYZ", k=2))
+                volcador.agregar("vaciado", (
+                    qr, eid, _fecha(dt), nro, patente,
+                    kg if completado else None, d["temperatura"], d.get("humedad"), d.get("danados"),
+                    d.get("quebrados"), d.get("materia_extrana"), d.get("ph"), d["chamico"],
+                    d.get("materia_grasa"), d.get("acidez"), d.get("proteinas"), d.get("granos_picados"),
+                    d["olor"], d["moho"], d["insectos"], res["factor"], res["tas"], res["reglas_version"],
+                    rnd.choice(["puerto", "planta"]), 1 if completado else 0,
+                ))
+                volcador.agregar("auditoria", (oper, eid, "camionada_vaciado",
+                                               f"Silo {qr} — camionada #{nro}", qr, _fecha(dt)))
+                restante -= kg
+                nro += 1
+                dt += timedelta(minutes=rnd.randint(30, 180))
+
+    volcador.confirmar()
+    return muestreo_id
+
+
+def generar_mercado(conn, volcador, rnd, hasta, dias):
+    """Posiciones MATBA / ROFEX actuales y serie diaria de precios."""
+
+    posiciones = []
+    for meses in range(0, 12, 2):
+        venc = hasta + timedelta(days=30 * meses)
+        sufijo = venc.strftime("%b").upper()[:3] + venc.strftime("%y")
+        for cereal, (_, futuro) in PRECIOS.items():
+            posiciones.append((f"{cereal[:3].upper()}.ROS/{sufijo}", f"{cereal} Rosario",
+                               round(futuro * (1 + 0.01 * meses) * rnd.uniform(0.97, 1.03), 1), sufijo))
+
+    ahora = hasta.strftime("%Y-%m-%d %H:%M:%S")
+    for posicion, cereal, precio, mes in posiciones:
+        conn.execute("""
+            INSERT INTO matba (posicion, cereal, precio, precio_anterior, variacion, mes, fecha)
+            VALUES (?,?,?,?,?,?,?)
+        """, (posicion, cereal, precio, round(precio * 0.99, 1), 1.0, mes, ahora))
+
+    for meses in range(0, 12):
+        venc = hasta + timedelta(days=30 * meses)
+        ajuste = round(1400 * (1 + 0.025 * meses), 2)
+        conn.execute("""
+            INSERT INTO rofex (posicion, ajuste, ajuste_anterior, variacion, fecha)
+            VALUES (?,?,?,?,?)
+        """, (f"DLR{venc.strftime('%m%Y')}", ajuste, round(ajuste * 0.998, 2), 0.2, ahora))
+
+    # Paseo aleatorio por clave, un precio por día
+    series = [("pizarra", c, c, p) for c, (p, _) in PRECIOS.items()]
+    series += [("matba", pos, cer, pr) for pos, cer, pr, _ in posiciones]
+    for fuente, clave, cereal, precio in series:
+        for k in range(dias, 0, -1):
+            precio *= 1 + rnd.gauss(0, 0.012)
+            dt = (hasta - timedelta(days=k)).strftime("%Y-%m-%d 18:00:00")
+            volcador.agregar("precios_historicos", (fuente, clave, cereal, round(precio, 2), dt))
+
+    volcador.confirmar()
+
+
+def generar(empresas, silos, semilla=1, prefijo="Sintética", lote=LOTE_DEFAULT, hasta=None,
+            dias_mercado=365, informar=print):
+    """Puebla la base; devuelve {tabla: filas insertadas}."""
+
+    rnd = random.Random(semilla)
+    hasta = hasta or datetime.now().replace(second=0, microsecond=0)
+
+    conn = get_db()
+
+    if conn.execute("SELECT 1 FROM empresas WHERE nombre LIKE ?", (prefijo + " %",)).fetchone():
+        conn.close()
+        raise ValueError(f"Ya hay empresas '{prefijo} ...': usar otro --prefijo")
+
+    volcador = Volcador(conn, lote)
+    clave_hash = generate_password_hash(CLAVE)
+    muestreo_id = (conn.execute("SELECT MAX(id) AS m FROM muestreos").fetchone()["m"] or 0) + 1
+    inicio = time.time()
+
+    try:
+        generar_mercado(conn, volcador, rnd, hasta, dias_mercado)
+
+        for n in range(1, empresas + 1):
+            muestreo_id = generar_empresa(conn, volcador, rnd, n, prefijo, silos, hasta,
+                                          muestreo_id, clave_hash)
+            filas = sum(volcador.totales.values())
+            informar(f"empresa {n}/{empresas}: {filas} filas, {filas / (time.time() - inicio):.0f} filas/s")
+
+        # Los ids de muestreos se pusieron a mano: avanzar la secuencia
+        if conn.es_postgres:
+            conn.execute("""
+                SELECT setval(pg_get_serial_sequence('muestreos', 'id'),
+                              (SELECT MAX(id) FROM muestreos))
+            """)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return dict(volcador.totales)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Genera datos sintéticos para pruebas de carga")
+    p.add_argument("--empresas", type=int, default=5)
+    p.add_argument("--silos", type=int, default=200, help="silos por empresa")
+    p.add_argument("--semilla", type=int, default=1)
+    p.add_argument("--prefijo", default="Sintética", help="nombre de las empresas generadas")
+    p.add_argument("--lote", type=int, default=LOTE_DEFAULT, help="filas por INSERT en lote")
+    p.add_argument("--hasta", help="fecha de referencia YYYY-MM-DD (default: hoy)")
+    p.add_argument("--dias-mercado", type=int, default=365, help="días de histórico de precios")
+    a = p.parse_args()
+
+    # Base nueva: tablas y después las columnas que agregan las migraciones
+    init_db()
+    ejecutar_migraciones()
+
+    inicio = time.time()
+    try:
+        totales = generar(
+            empresas=a.empresas,
+            silos=a.silos,
+            semilla=a.semilla,
+            prefijo=a.prefijo,
+            lote=a.lote,
+            hasta=datetime.strptime(a.hasta, "%Y-%m-%d") if a.hasta else None,
+            dias_mercado=a.dias_mercado,
+        )
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    for tabla, n in totales.items():
+        print(f"  {tabla:<20} {n:>10}")
+    print(f"  {'total':<20} {sum(totales.values()):>10}  ({time.time() - inicio:.1f} s)")
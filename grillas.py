@@ -0,0 +1,276 @@
+import math
+import numpy as np
+
+# ======================================================
+# GRILLAS PRECOMPILADAS (TAS / MERMA)
+# ======================================================
+# Las tablas de calculos.py se compilan una vez en arrays
+# densos indexados por el valor cuantizado, así cada consulta
+# es un acceso por índice en vez de un min() sobre las claves.
+#
+# Modos:
+#   "cercano":    idéntico a la búsqueda por clave más cercana
+#                 de calculos.py (empate → primera clave de la
+#                 tabla, como min())
+#   "interpolado": lineal (merma) / bilineal (TAS) entre claves
+
+CERCANO = "cercano"
+INTERPOLADO = "interpolado"
+
+# Ancho de celda de las grillas de TAS (°C y % de humedad)
+PASO_TAS = 0.01
+
+# Valores de borde (puntos medios entre claves) resueltos con
+# la búsqueda exacta que se recuerdan por eje
+MEMO_EXACTOS = 4096
+
+
+def _cercano_exacto(claves, x):
+    """Índice de la clave más cercana con la regla de min()."""
+    return min(range(len(claves)), key=lambda i: abs(claves[i] - x))
+
+
+# ======================================================
+# EJE 1D
+# ======================================================
+
+class Eje:
+    """
+    Mapa valor → índice de la clave más cercana.
+
+    Cada celda [ini, ini + paso) guarda el índice si la clave
+    más cercana es la misma en toda la celda (con un margen
+    para errores de redondeo al calcular la celda). Las pocas
+    celdas que contienen un punto medio entre dos claves quedan
+    en -1 y se resuelven con la búsqueda exacta.
+    """
+
+    def __init__(self, claves, paso=PASO_TAS):
+        self.claves = list(claves)
+        self.paso = paso
+        self.claves_arr = np.array(self.claves, dtype=float)
+
+        self.inicio = min(self.claves) - paso
+        fin = max(self.claves) + paso
+        n = int(math.ceil((fin - self.inicio) / paso)) + 1
+        margen = paso * 1e-6
+
+        i = np.arange(n)
+        a = self.inicio + i * paso - margen
+        b = self.inicio + (i + 1) * paso + margen
+        a[0], b[-1] = -1e12, 1e12
+
+        ia = self._cercanos(a)
+        ib = self._cercanos(b)
+        self.celdas = np.where(ia == ib, ia, -1).astype(np.int64)
+
+        # Listas para la consulta escalar (más rápidas que indexar numpy)
+        self._celdas = self.celdas.tolist()
+        self._exactos = {}
+
+    def _cercanos(self, xs):
+        # argmin devuelve el primer mínimo: misma regla que min()
+        return np.abs(self.claves_arr[None, :] - xs[:, None]).argmin(axis=1)
+
+    def indice(self, x):
+        if x != x:
+            return _cercano_exacto(self.claves, x)
+        i = int((x - self.inicio) // self.paso)
+        i = 0 if i < 0 else (len(self._celdas) - 1 if i >= len(self._celdas) else i)
+        j = self._celdas[i]
+        if j >= 0:
+            return j
+
+        # Humedades enteras caen justo entre claves pares: se repiten mucho
+        j = self._exactos.get(x)
+        if j is None:
+            j = _cercano_exacto(self.claves, x)
+            if len(self._exactos) < MEMO_EXACTOS:
+                self._exactos[x] = j
+        return j
+
+    def indices(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        i = np.floor((xs - self.inicio) / self.paso)
+        i = np.clip(i, 0, len(self.celdas) - 1).astype(np.int64)
+        j = self.celdas[i]
+
+        dudosos = j < 0
+        if dudosos.any():
+            j[dudosos] = self._cercanos(xs[dudosos])
+        return j
+
+
+# ======================================================
+# TAS
+# ======================================================
+
+class GrillaTAS:
+    """
+    tabla[externo][interno] de calculos.py.
+    orden="hum_temp" → externo = humedad (Maíz, Soja, Girasol)
+    orden="temp_hum" → externo = temperatura (Trigo)
+    """
+
+    def __init__(self, tabla, orden="hum_temp"):
+        self.orden = orden
+        self.externo = Eje(tabla.keys())
+        claves_ext = list(tabla.keys())
+
+        internas = [tuple(tabla[k].keys()) for k in claves_ext]
+        self.interno_comun = len(set(internas)) == 1
+
+        if self.interno_comun:
+            self.interno = Eje(internas[0])
+            self.valores = np.array(
+                [[tabla[k][i] for i in internas[0]] for k in claves_ext],
+                dtype=float
+            )
+        else:
+            self.internos = [Eje(ks) for ks in internas]
+            self.filas = [np.array(list(tabla[k].values()), dtype=float) for k in claves_ext]
+
+        # Valores originales (int) para la consulta escalar
+        self._filas = [list(tabla[k].values()) for k in claves_ext]
+        self._internos = (
+            [self.interno] * len(claves_ext) if self.interno_comun else self.internos
+        )
+
+        # Para interpolar: claves ordenadas y valores reordenados
+        self._ext_ord = np.array(sorted(claves_ext), dtype=float)
+        if self.interno_comun:
+            orden_e = np.argsort(np.array(claves_ext, dtype=float))
+            orden_i = np.argsort(np.array(internas[0], dtype=float))
+            self._int_ord = np.array(internas[0], dtype=float)[orden_i]
+            self._val_ord = self.valores[orden_e][:, orden_i]
+
+    def _ejes(self, temp, hum):
+        return (hum, temp) if self.orden == "hum_temp" else (temp, hum)
+
+    def valor(self, temp, hum, modo=CERCANO):
+        if temp is None or hum is None:
+            return None
+        if modo == INTERPOLADO:
+            v = self.valores_lote([temp], [hum], modo)[0]
+            return None if np.isnan(v) else int(v)
+
+        ext, inte = self._ejes(temp, hum)
+        i = self.externo.indice(ext)
+        return int(self._filas[i][self._internos[i].indice(inte)])
+
+    def valores_lote(self, temps, hums, modo=CERCANO):
+        """Arrays de temperatura y humedad → TAS (float, NaN si falta dato)."""
+        ext, inte = self._ejes(
+            np.asarray(temps, dtype=float), np.asarray(hums, dtype=float)
+        )
+        out = np.full(len(ext), np.nan)
+        ok = ~(np.isnan(ext) | np.isnan(inte))
+        if not ok.any():
+            return out
+
+        if modo == INTERPOLADO:
+            out[ok] = self._bilineal(ext[ok], inte[ok])
+            return out
+
+        i = self.externo.indices(ext[ok])
+        if self.interno_comun:
+            out[ok] = self.valores[i, self.interno.indices(inte[ok])]
+        else:
+            pos = np.flatnonzero(ok)
+            for k in np.unique(i):
+                sel = i == k
+                out[pos[sel]] = self.filas[k][self.internos[k].indices(inte[pos[sel]])]
+        return out
+
+    def _bilineal(self, ext, inte):
+        """Interpolación bilineal, acotada a los bordes, en días enteros hacia abajo."""
+        if not self.interno_comun:
+            raise ValueError("Interpolación requiere claves internas comunes")
+
+        e = np.clip(ext, self._ext_ord[0], self._ext_ord[-1])
+        t = np.clip(inte, self._int_ord[0], self._int_ord[-1])
+
+        ie = np.clip(np.searchsorted(self._ext_ord, e, side="right") - 1, 0, len(self._ext_ord) - 2)
+        it = np.clip(np.searchsorted(self._int_ord, t, side="right") - 1, 0, len(self._int_ord) - 2)
+
+        e0, e1 = self._ext_ord[ie], self._ext_ord[ie + 1]
+        t0, t1 = self._int_ord[it], self._int_ord[it + 1]
+        we = (e - e0) / (e1 - e0)
+        wt = (t - t0) / (t1 - t0)
+
+        v = self._val_ord
+        r = (
+            v[ie, it] * (1 - we) * (1 - wt)
+            + v[ie + 1, it] * we * (1 - wt)
+            + v[ie, it + 1] * (1 - we) * wt
+            + v[ie + 1, it + 1] * we * wt
+        )
+        # TAS conservador: días enteros hacia abajo
+        return np.floor(r + 1e-9)
+
+
+# ======================================================
+# MERMA
+# ======================================================
+
+class GrillaMerma:
+    """
+    Tabla oficial humedad (1 decimal) → merma, más manipuleo.
+    En modo cercano replica merma_*: por debajo del umbral 0;
+    si no, humedad redondeada a 0.1 y clave más cercana.
+    """
+
+    def __init__(self, tabla, umbral, manipuleo):
+        self.umbral = umbral
+        self.manipuleo = manipuleo
+
+        claves = sorted(tabla)
+        self.base = int(round(claves[0] * 10))
+        tope = int(round(claves[-1] * 10))
+
+        # Índice = décimas de humedad; huecos → clave más cercana
+        valores = []
+        for d in range(self.base, tope + 1):
+            h = d / 10
+            if h not in tabla:
+                h = min(tabla.keys(), key=lambda x: abs(x - h))
+            valores.append(round(tabla[h] + manipuleo, 2))
+
+        self.valores = np.array(valores, dtype=float)
+        self._claves = np.array(claves, dtype=float)
+        self._tabla = np.array([tabla[k] for k in claves], dtype=float)
+
+    def valor(self, humedad, modo=CERCANO):
+        if humedad is None:
+            return 0
+
+        humedad = float(humedad)
+
+        if humedad <= self.umbral:
+            return 0
+
+        if modo == INTERPOLADO:
+            v = float(np.interp(humedad, self._claves, self._tabla))
+            return round(v + self.manipuleo, 2)
+
+        d = int(round(round(humedad, 1) * 10)) - self.base
+        d = 0 if d < 0 else (len(self.valores) - 1 if d >= len(self.valores) else d)
+        return float(self.valores[d])
+
+    def valores_lote(self, humedades, modo=CERCANO):
+        """Array de humedades → merma (NaN se toma como sin dato: 0)."""
+        h = np.asarray(humedades, dtype=float)
+        out = np.zeros(len(h))
+        ok = ~np.isnan(h) & (h > self.umbral)
+        if not ok.any():
+            return out
+
+        if modo == INTERPOLADO:
+            v = np.interp(h[ok], self._claves, self._tabla) + self.manipuleo
+            out[ok] = [round(x, 2) for x in v.tolist()]
+            return out
+
+        # round(h, 1) de Python: mismo redondeo que la versión escalar
+        d = np.array([int(round(round(x, 1) * 10)) for x in h[ok].tolist()]) - self.base
+        out[ok] = self.valores[np.clip(d, 0, len(self.valores) - 1)]
+        return out
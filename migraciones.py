@@ -229,5 +229,60 @@ def ejecutar_migraciones():
             except:
                 pass
 
+    # ==========================
+    # VERSIÓN DE REGLAS DE CALIDAD
+    # (con qué campaña se calculó grado/factor/TAS)
+    # ==========================
+    for tabla_r in ["analisis", "llenado", "vaciado"]:
+        try:
+            conn.execute(f"ALTER TABLE {tabla_r} ADD COLUMN reglas_version TEXT")
+            conn.commit()
+            print(f"Migración aplicada: {tabla_r}.reglas_version")
+        except:
+            try:
+                conn.rollback()
+            except:
+                pass
+
+    # ==========================
+    # EMPRESAS — gastos comerciales (USD/TN)
+    # ==========================
+    for col_e, def_e in [("gastos_futuro", "REAL DEFAULT 34"), ("gastos_pizarra", "REAL DEFAULT 0")]:
+        try:
+            conn.execute(f"ALTER TABLE empresas ADD COLUMN {col_e} {def_e}")
+            conn.commit()
+            print(f"Migración aplicada: empresas.{col_e}")
+        except:
+            try:
+                conn.rollback()
+            except:
+                pass
+
+    # ==========================
+    # USUARIOS — versión (invalida la copia del usuario en la sesión)
+    # ==========================
+    try:
+        conn.execute("ALTER TABLE usuarios ADD COLUMN version INTEGER DEFAULT 0")
+        conn.commit()
+        print("Migración aplicada: usuarios.version")
+    except:
+        try:
+            conn.rollback()
+        except:
+            pass
+
+    # ==========================
+    # EXPORTACIONES — proceso dueño del trabajo (host:pid)
+    # ==========================
+    try:
+        conn.execute("ALTER TABLE exportaciones ADD COLUMN dueno TEXT")
+        conn.commit()
+        print("Migración aplicada: exportaciones.dueno")
+    except:
+        try:
+            conn.rollback()
+        except:
+            pass
+
     conn.commit()
     conn.close()
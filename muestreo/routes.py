@@ -1,8 +1,9 @@
 from flask import Blueprint, jsonify, render_template, request
-from flask_login import login_required
+from flask_login import login_required, current_user
 from db import get_db
 from permissions import tiene_permiso, acceso_denegado
 from datetime import datetime
+from utils.versiones import confirmar_cambio_empresa
 
 muestreo_bp = Blueprint("muestreo", __name__, url_prefix="/muestreo")
 
@@ -94,7 +95,7 @@ def api_nuevo_muestreo():
         ahora().strftime("%Y-%m-%d %H:%M")
     ))
 
-    conn.commit()
+    confirmar_cambio_empresa(conn, current_user.empresa_id)
 
     id_row = conn.execute("""
         SELECT id FROM muestreos
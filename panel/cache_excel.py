@@ -0,0 +1,135 @@
+"""
+Cache en disco de las exportaciones a Excel.
+
+La clave es (empresa, nivel de permiso, tipo, versión de datos):
+- versión de datos = contador empresa:<id> (lo incrementan los
+  endpoints que escriben silos, calados, cargas), más las versiones
+  de rofex / matba y un hash de la pizarra de la empresa, que se
+  edita desde comercial sin contador propio.
+- VERSION_FORMATO se sube cuando cambia el armado del libro.
+
+Si la clave no cambió se devuelve el archivo guardado, con ETag (la
+clave) y Last-Modified (cuando se generó), así el navegador puede
+revalidar con 304. Al guardar se borran las versiones anteriores de
+la misma entrada, lo que supere EXPORT_CACHE_HORAS y, si el total
+pasa de EXPORT_CACHE_MB, las más viejas.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+from flask import send_file
+
+from utils.versiones import obtener_versiones, clave_empresa
+
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "cache_exportaciones")
+EXPORT_CACHE_MB = int(os.getenv("EXPORT_CACHE_MB", "500"))
+EXPORT_CACHE_HORAS = int(os.getenv("EXPORT_CACHE_HORAS", "24"))
+
+VERSION_FORMATO = 1
+
+
+def clave(conn, empresa_id, nivel, tipo="xlsx"):
+    """Clave de cache de la exportación con los datos actuales."""
+    claves = [clave_empresa(empresa_id)]
+    if nivel != "basico":
+        claves += ["rofex", "matba"]
+    versiones = obtener_versiones(conn, claves)
+
+    partes = [VERSION_FORMATO, [versiones[c] for c in claves]]
+    if nivel != "basico":
+        partes.append([
+            [r["cereal"], r["pizarra_auto"], r["pizarra_manual"], r["usar_manual"], r["dolar"]]
+            for r in conn.execute("""
+                SELECT cereal, pizarra_auto, pizarra_manual, usar_manual, dolar
+                FROM mercado WHERE empresa_id=? ORDER BY cereal
+            """, (empresa_id,)).fetchall()
+        ])
+
+    firma = hashlib.sha1(json.dumps(partes, default=str).encode()).hexdigest()[:20]
+    return f"{empresa_id}_{nivel}_{tipo}_{firma}"
+
+
+def ruta(clave_cache):
+    return os.path.abspath(os.path.join(EXPORT_CACHE_DIR, clave_cache + ".xlsx"))
+
+
+def vigente(clave_cache):
+    """True si la entrada está en disco y dentro de EXPORT_CACHE_HORAS."""
+    try:
+        edad = time.time() - os.path.getmtime(ruta(clave_cache))
+    except OSError:
+        return False
+    return edad < EXPORT_CACHE_HORAS * 3600
+
+
+def guardar(archivo, clave_cache):
+    """Copia el libro generado (file-object) al cache y libera espacio."""
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    destino = ruta(clave_cache)
+    archivo.seek(0)
+    with open(destino + ".tmp", "wb") as f:
+        shutil.copyfileobj(archivo, f)
+    os.replace(destino + ".tmp", destino)
+    archivo.seek(0)
+    limpiar(conservar=clave_cache)
+    return destino
+
+
+def limpiar(conservar=None):
+    """Borra versiones reemplazadas, entradas vencidas y, si sobra, las más viejas."""
+    try:
+        nombres = [n for n in os.listdir(EXPORT_CACHE_DIR) if n.endswith(".xlsx")]
+    except OSError:
+        return
+
+    prefijo = conservar.rsplit("_", 1)[0] + "_" if conservar else None
+    limite = time.time() - EXPORT_CACHE_HORAS * 3600
+    entradas = []
+
+    for n in nombres:
+        p = os.path.join(EXPORT_CACHE_DIR, n)
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        reemplazada = prefijo and n.startswith(prefijo) and n != conservar + ".xlsx"
+        if reemplazada or st.st_mtime < limite:
+            _borrar(p)
+        else:
+            entradas.append((st.st_mtime, st.st_size, p))
+
+    total = sum(e[1] for e in entradas)
+    for _, tamano, p in sorted(entradas):
+        if total <= EXPORT_CACHE_MB * 1024 * 1024:
+            break
+        if conservar and os.path.basename(p) == conservar + ".xlsx":
+            continue
+        _borrar(p)
+        total -= tamano
+
+
+def _borrar(p):
+    try:
+        os.remove(p)
+    except OSError:
+        pass
+
+
+def respuesta(clave_cache, mimetype):
+    """send_file condicional: 304 si el cliente ya tiene esta versión."""
+    p = ruta(clave_cache)
+    return send_file(
+        p,
+        as_attachment=True,
+        download_name=f"silos_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+        mimetype=mimetype,
+        etag=clave_cache,
+        last_modified=os.path.getmtime(p),
+        conditional=True,
+        max_age=0,
+    )
@@ -0,0 +1,271 @@
+"""
+Cola de exportaciones a Excel en segundo plano.
+
+Las empresas grandes no exportan dentro del request: se inserta una fila
+en `exportaciones` y un hilo del proceso la toma, arma el libro y lo deja
+en disco. El usuario ve el avance y descarga desde /exportaciones.
+
+- Varios workers (gunicorn) comparten la cola: un trabajo se toma con un
+  UPDATE condicional y solo el que lo cambió de estado lo procesa.
+- El hilo arranca al encolar (o al mirar /exportaciones si quedó cola de
+  un proceso anterior) y termina cuando la cola queda vacía.
+- Los archivos se borran pasados EXPORTACIONES_DIAS (estado 'vencida').
+- Un trabajo 'procesando' sin avance en TRABAJO_COLGADO minutos vuelve a
+  'pendiente' (el proceso que lo tenía se cayó), salvo que su dueño (host
+  y pid del proceso que lo tomó) siga corriendo: en SQLite el avance no
+  se escribe en la base mientras se arma el libro.
+"""
+
+import os
+import shutil
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from db import get_db
+from utils.fechas import ahora_completo
+
+EXPORTACIONES_DIR = os.getenv("EXPORTACIONES_DIR", "exportaciones")
+EXPORTACIONES_DIAS = int(os.getenv("EXPORTACIONES_DIAS", "7"))
+
+# Hasta esta cantidad de silos la exportación se arma en el request
+EXPORTAR_SINCRONO_HASTA = int(os.getenv("EXPORTAR_SINCRONO_HASTA", "2000"))
+
+TRABAJO_COLGADO = 15  # minutos
+
+# Niveles de permiso → (ve_comercial, ve_calidad, ve_form)
+NIVELES = {
+    "basico":    (False, False, False),
+    "form":      (False, False, True),
+    "calidad":   (False, True,  True),
+    "comercial": (True,  True,  True),
+    "admin":     (True,  True,  True),
+}
+
+FORMATO = "%Y-%m-%d %H:%M:%S"
+
+
+def encolar(conn, empresa_id, user_id, nivel):
+    """Inserta el trabajo y devuelve su id. No hace commit."""
+    conn.execute("""
+        INSERT INTO exportaciones (empresa_id, user_id, nivel, estado, progreso, creada, actualizada)
+        VALUES (?,?,?,'pendiente',0,?,?)
+    """ + (" RETURNING id" if conn.es_postgres else ""),
+        (empresa_id, user_id, nivel, ahora_completo(), ahora_completo()))
+    return conn.lastrowid()
+
+
+def trabajos_usuario(conn, user_id, empresa_id, limite=20):
+    trabajos = conn.execute("""
+        SELECT id, nivel, estado, progreso, tamano, error, creada, terminada
+        FROM exportaciones
+        WHERE user_id=? AND empresa_id=?
+        ORDER BY id DESC
+        LIMIT ?
+    """, (user_id, empresa_id, limite)).fetchall()
+    trabajos = [dict(t) for t in trabajos]
+    for t in trabajos:
+        if t["estado"] == "procesando":
+            t["progreso"] = max(t["progreso"] or 0, _avance.get(t["id"], 0))
+    return trabajos
+
+
+def ruta_archivo(trabajo_id):
+    return os.path.abspath(os.path.join(EXPORTACIONES_DIR, f"exportacion_{trabajo_id}.xlsx"))
+
+
+# =====================================================
+# HILO DE TRABAJO
+# =====================================================
+_hilo = None
+_hay_trabajo = False
+_lock = threading.Lock()
+_avance = {}  # trabajo_id → % de los que corren en este proceso
+_en_curso = set()  # trabajo_id de los que corren en este proceso
+
+
+def _dueno():
+    """host:pid de este proceso (se calcula en cada toma: gunicorn forkea)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _dueno_vivo(trabajo_id, dueno):
+    """
+    Si el proceso que tomó el trabajo lo sigue procesando. Solo se puede
+    saber en el mismo host; de otro host decide la falta de avance.
+    """
+    host, _, pid = (dueno or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit() or os.name != "posix":
+        return False
+    pid = int(pid)
+    if pid == os.getpid():
+        return trabajo_id in _en_curso
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def asegurar_trabajador():
+    """Arranca el hilo del proceso si no está corriendo."""
+    global _hilo, _hay_trabajo
+    with _lock:
+        _hay_trabajo = True
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_trabajar, name="exportaciones", daemon=True)
+            _hilo.start()
+
+
+def reanudar_pendientes(conn):
+    """
+    Arranca el hilo si quedó trabajo en la cola sin nadie que lo tome
+    (reinicio o deploy con trabajos pendientes o a medio hacer).
+    """
+    hay = conn.execute("""
+        SELECT 1 FROM exportaciones
+        WHERE estado IN ('pendiente', 'procesando')
+        LIMIT 1
+    """).fetchone()
+    if hay:
+        asegurar_trabajador()
+
+
+def _trabajar():
+    global _hilo, _hay_trabajo
+    while True:
+        with _lock:
+            _hay_trabajo = False
+        try:
+            limpiar()
+            while procesar_siguiente():
+                pass
+        except Exception as e:
+            print("Error en cola de exportaciones:", e)
+        with _lock:
+            # Si alguien encoló mientras se vaciaba la cola, otra vuelta
+            if not _hay_trabajo:
+                _hilo = None
+                return
+
+
+def procesar_siguiente():
+    """Toma y procesa un trabajo pendiente. False si no había ninguno."""
+    conn = get_db()
+    try:
+        fila = conn.execute("""
+            SELECT * FROM exportaciones WHERE estado='pendiente' ORDER BY id LIMIT 1
+        """).fetchone()
+        if not fila:
+            return False
+
+        conn.execute("""
+            UPDATE exportaciones SET estado='procesando', dueno=?, actualizada=?
+            WHERE id=? AND estado='pendiente'
+        """, (_dueno(), ahora_completo(), fila["id"]))
+        tomado = conn.cursor.rowcount == 1
+        conn.commit()
+        if tomado:
+            _ejecutar(conn, dict(fila))
+        return True
+    finally:
+        conn.close()
+
+
+def _ejecutar(conn, trabajo):
+    from panel import cache_excel
+    from panel.exportar import exportar_basico, exportar_completo, instantanea
+
+    ve_comercial, ve_calidad, ve_form = NIVELES[trabajo["nivel"]]
+
+    # El avance se guarda con otra conexión: la del libro está en una
+    # transacción de solo lectura hasta terminar. En SQLite esa lectura
+    # bloquea a cualquier escritor, así que ahí queda solo en memoria
+    # (SQLite = un solo proceso).
+    def progreso(fraccion):
+        pct = min(int(fraccion * 95), 95)
+        if pct - _avance.get(trabajo["id"], 0) < 5:
+            return
+        _avance[trabajo["id"]] = pct
+        if not conn.es_postgres:
+            return
+        c = get_db()
+        try:
+            c.execute("UPDATE exportaciones SET progreso=?, actualizada=? WHERE id=?",
+                      (pct, ahora_completo(), trabajo["id"]))
+            c.commit()
+        finally:
+            c.close()
+
+    _en_curso.add(trabajo["id"])
+    try:
+        with instantanea(conn):
+            clave = cache_excel.clave(conn, trabajo["empresa_id"], trabajo["nivel"])
+            if not ve_form:
+                libro = exportar_basico(conn, trabajo["empresa_id"])
+            else:
+                libro = exportar_completo(conn, trabajo["empresa_id"], ve_comercial, ve_calidad,
+                                          progreso=progreso)
+
+        # También al cache: el próximo pedido con los mismos datos no se encola
+        cache_excel.guardar(libro, clave)
+
+        os.makedirs(EXPORTACIONES_DIR, exist_ok=True)
+        destino = ruta_archivo(trabajo["id"])
+        with open(destino + ".tmp", "wb") as f:
+            shutil.copyfileobj(libro, f)
+        os.replace(destino + ".tmp", destino)
+
+        conn.execute("""
+            UPDATE exportaciones
+            SET estado='lista', progreso=100, archivo=?, tamano=?, actualizada=?, terminada=?
+            WHERE id=?
+        """, (destino, os.path.getsize(destino), ahora_completo(), ahora_completo(), trabajo["id"]))
+        conn.commit()
+    except Exception as e:
+        print(f"Error exportación {trabajo['id']}:", e)
+        conn.rollback()
+        conn.execute("""
+            UPDATE exportaciones SET estado='error', error=?, actualizada=?, terminada=? WHERE id=?
+        """, (str(e)[:500], ahora_completo(), ahora_completo(), trabajo["id"]))
+        conn.commit()
+    finally:
+        _avance.pop(trabajo["id"], None)
+        _en_curso.discard(trabajo["id"])
+
+
+def limpiar(ahora=None):
+    """Borra archivos vencidos y devuelve a la cola los trabajos colgados."""
+    ahora = ahora or datetime.strptime(ahora_completo(), FORMATO)
+    vence = (ahora - timedelta(days=EXPORTACIONES_DIAS)).strftime(FORMATO)
+    colgado = (ahora - timedelta(minutes=TRABAJO_COLGADO)).strftime(FORMATO)
+
+    conn = get_db()
+    try:
+        vencidas = conn.execute("""
+            SELECT id, archivo FROM exportaciones
+            WHERE estado='lista' AND terminada < ?
+        """, (vence,)).fetchall()
+        for v in vencidas:
+            try:
+                os.remove(v["archivo"])
+            except OSError:
+                pass
+            conn.execute("UPDATE exportaciones SET estado='vencida', archivo=NULL WHERE id=?", (v["id"],))
+
+        colgados = conn.execute("""
+            SELECT id, dueno FROM exportaciones
+            WHERE estado='procesando' AND actualizada < ?
+        """, (colgado,)).fetchall()
+        for t in colgados:
+            if _dueno_vivo(t["id"], t["dueno"]):
+                continue
+            conn.execute("""
+                UPDATE exportaciones SET estado='pendiente', progreso=0, dueno=NULL
+                WHERE id=? AND estado='procesando'
+            """, (t["id"],))
+        conn.commit()
+    finally:
+        conn.close()
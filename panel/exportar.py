@@ -0,0 +1,913 @@
+"""
+Exportación a Excel del panel.
+
+El libro se arma con openpyxl en modo write-only: cada hoja se escribe
+fila por fila a un archivo temporal a medida que se calculan los datos,
+y los estilos son NamedStyle registrados una sola vez por libro (las
+celdas sólo guardan la referencia). El resultado se vuelca a un
+SpooledTemporaryFile, que queda en memoria si es chico y pasa a disco
+si crece, así la exportación no depende de tener todo el libro en RAM.
+
+Restricción del modo write-only: las filas de cada hoja van en orden y
+los anchos de columna, el alto de fila y el panel congelado se definen
+antes de escribir la fila correspondiente.
+"""
+
+from contextlib import contextmanager
+from copy import copy
+from datetime import datetime, timedelta
+from tempfile import SpooledTemporaryFile
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from panel.routes import KG_POR_METRO, KG_POR_METRO_DEFAULT, db_execute
+
+MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Hasta este tamaño el archivo generado queda en memoria; después va a disco
+MAX_EN_MEMORIA = 8 * 1024 * 1024
+
+CEREALES = ["Soja", "Maíz", "Trigo", "Girasol", "Sorgo"]
+
+# =====================================================
+# PALETA DE COLORES
+# =====================================================
+C_VERDE_OSC  = "1B5E20"
+C_VERDE_MED  = "2E7D32"
+C_VERDE_CLR  = "E8F5E9"
+C_AZUL_OSC   = "0D47A1"
+C_AZUL_MED   = "1565C0"
+C_AZUL_CLR   = "E3F2FD"
+C_ROJO       = "C62828"
+C_ROJO_CLR   = "FFEBEE"
+C_NARANJA    = "FFF3E0"
+C_AMARILLO   = "FFF8E1"
+C_GRIS       = "F5F5F5"
+C_GRIS2      = "E0E0E0"
+C_BLANCO     = "FFFFFF"
+C_MORADO     = "4A148C"
+C_MORADO_CLR = "F3E5F5"
+
+
+# =====================================================
+# ESTILOS CON NOMBRE
+# =====================================================
+class Estilos:
+    """Registra un NamedStyle por combinación de formato y lo reutiliza."""
+
+    def __init__(self, wb):
+        self.wb = wb
+        self.nombres = {}
+        self.arreglos = {}
+
+    def nombre(self, tamano=10, negrita=False, italica=False, color=None, fondo=None,
+               borde=None, marco=None, centrado=True, formato=None):
+        clave = (tamano, negrita, italica, color, fondo, borde, marco, centrado, formato)
+        nombre = self.nombres.get(clave)
+        if nombre:
+            return nombre
+
+        nombre = "exp_%d" % len(self.nombres)
+        estilo = NamedStyle(name=nombre)
+        estilo.font = Font(name="Calibri", size=tamano, bold=negrita, italic=italica, color=color)
+        if fondo:
+            estilo.fill = PatternFill("solid", fgColor=fondo)
+        if marco:
+            lado = Side(style="medium", color=marco)
+            estilo.border = Border(left=lado, right=lado, top=lado, bottom=lado)
+        elif borde:
+            fino = Side(style="thin", color="BDBDBD")
+            abajo = Side(style="medium", color="757575") if borde == "grueso" else fino
+            estilo.border = Border(left=fino, right=fino, top=fino, bottom=abajo)
+        if centrado:
+            estilo.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+        if formato:
+            estilo.number_format = formato
+
+        self.wb.add_named_style(estilo)
+        self.nombres[clave] = nombre
+        return nombre
+
+
+class Hoja:
+    """Hoja write-only que lleva la cuenta de la próxima fila."""
+
+    def __init__(self, wb, estilos, titulo, anchos=None, congelar=None):
+        self.ws = wb.create_sheet(titulo)
+        self.estilos = estilos
+        self.fila = 1
+        for i, ancho in enumerate(anchos or [], 1):
+            self.ws.column_dimensions[get_column_letter(i)].width = ancho
+        if congelar:
+            self.ws.freeze_panes = congelar
+
+    def celda(self, valor=None, **estilo):
+        c = WriteOnlyCell(self.ws, value=valor)
+        # Asignar por nombre busca el estilo en la lista del libro; la primera
+        # celda de cada estilo lo resuelve y las demás copian esos índices.
+        clave = tuple(sorted(estilo.items()))
+        arreglo = self.estilos.arreglos.get(clave)
+        if arreglo is None:
+            c.style = self.estilos.nombre(**estilo)
+            self.estilos.arreglos[clave] = copy(c._style)
+        else:
+            c._style = copy(arreglo)
+        return c
+
+    def agregar(self, celdas=(), alto=None):
+        if alto:
+            self.ws.row_dimensions[self.fila].height = alto
+        self.ws.append(list(celdas))
+        self.fila += 1
+
+    def combinar(self, ncols):
+        """Combina la fila recién escrita de la columna A a ncols."""
+        f = self.fila - 1
+        self.ws.merged_cells.add(f"A{f}:{get_column_letter(ncols)}{f}")
+
+    def titulo(self, texto, ncols, color=C_VERDE_OSC, alto=30):
+        self.agregar([self.celda(texto, tamano=14, negrita=True, color=C_BLANCO, fondo=color)], alto=alto)
+        self.combinar(ncols)
+
+    def nota(self, texto, ncols, color="757575"):
+        self.agregar([self.celda(texto, tamano=9, italica=True, color=color)])
+        self.combinar(ncols)
+
+    def subtitulo(self, texto, ncols, color=C_VERDE_MED):
+        self.agregar([self.celda(texto, tamano=11, negrita=True, color=C_BLANCO, fondo=color, borde="fino")])
+        self.combinar(ncols)
+
+    def encabezados(self, headers, color=C_VERDE_MED):
+        self.agregar([self.celda(h, negrita=True, color=C_BLANCO, fondo=color, borde="grueso") for h in headers])
+
+    def cuerpo(self, vals, fondo=None, formatos=None, fuentes=None):
+        """Fila de datos; fuentes = {columna: {negrita, color, tamano}} para resaltar celdas."""
+        celdas = []
+        for c, v in enumerate(vals, 1):
+            fuente = (fuentes or {}).get(c, {})
+            celdas.append(self.celda(v, fondo=fondo, borde="fino", formato=_fmt(formatos, c), **fuente))
+        self.agregar(celdas)
+
+    def total(self, vals, formatos=None, fuentes=None):
+        celdas = []
+        for c, v in enumerate(vals, 1):
+            fuente = {"negrita": True, "color": C_VERDE_OSC}
+            fuente.update((fuentes or {}).get(c, {}))
+            celdas.append(self.celda(v, fondo=C_GRIS2, borde="grueso", formato=_fmt(formatos, c), **fuente))
+        self.agregar(celdas)
+
+    def fondo_alternado(self):
+        return C_GRIS if self.fila % 2 == 0 else None
+
+    def filtro(self, ultima_col, ultima_fila, primera_fila=3):
+        self.ws.auto_filter.ref = f"A{primera_fila}:{ultima_col}{ultima_fila}"
+
+
+def _fmt(formatos, c):
+    return formatos[c - 1] if formatos and c - 1 < len(formatos) else None
+
+
+def _signo(valor):
+    """Verde si no es negativo, rojo si lo es."""
+    return {"negrita": True, "color": C_VERDE_MED if valor >= 0 else C_ROJO}
+
+
+def _generado():
+    return f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+
+
+def _mapear_cereal(nombre):
+    n = nombre.lower()
+    if "soja" in n: return "Soja"
+    if "maiz" in n or "maíz" in n: return "Maíz"
+    if "trigo" in n: return "Trigo"
+    if "girasol" in n: return "Girasol"
+    if "sorgo" in n: return "Sorgo"
+    return None
+
+
+def _etiqueta_matba(m):
+    return f"{m['posicion']} ({m['mes']})" if m.get('mes') else m['posicion']
+
+
+def _guardar(wb):
+    archivo = SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+    wb.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+@contextmanager
+def instantanea(conn):
+    """
+    Lecturas dentro de una transacción de solo lectura: resumen, detalle y
+    vaciado salen de la misma foto de la base aunque haya cargas en curso.
+    """
+    conn.commit()
+    if conn.es_postgres:
+        conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    else:
+        conn.execute("BEGIN")
+    try:
+        yield
+    finally:
+        conn.rollback()
+
+
+# =====================================================
+# EXCEL BÁSICO — solo panel sin permiso form
+# =====================================================
+def exportar_basico(conn, empresa_id):
+    """Una hoja por cereal con los datos de planilla del silo."""
+    conteos = {}
+    for r in db_execute(conn, """
+        SELECT cereal, COUNT(*) n FROM silos WHERE empresa_id=? GROUP BY cereal
+    """, (empresa_id,)).fetchall():
+        cer = r["cereal"] or "Otro"
+        conteos[cer] = conteos.get(cer, 0) + r["n"]
+
+    wb = Workbook(write_only=True)
+    estilos = Estilos(wb)
+
+    # Primero los cereales en orden conocido, después el resto
+    orden = [c for c in CEREALES if c in conteos] + [c for c in conteos if c not in CEREALES]
+    hojas = {}
+    for cereal in orden:
+        h = Hoja(wb, estilos, cereal, anchos=[16, 20, 16, 16, 12], congelar="A4")
+        h.titulo(f"{cereal.upper()} — SILO BOLSAS", 5, alto=32)
+        h.nota(f"{_generado()}  |  Silos: {conteos[cereal]}", 5)
+        h.encabezados(["QR", "Fecha Confección", "Estado Silo", "Estado Grano", "Metros"])
+        hojas[cereal] = h
+
+    silos = db_execute(conn, """
+        SELECT numero_qr, cereal, fecha_confeccion, estado_silo,
+               estado_grano, metros
+        FROM silos
+        WHERE empresa_id=?
+        ORDER BY cereal, numero_qr
+    """, (empresa_id,)).fetchall()
+    for s in silos:
+        h = hojas[s["cereal"] or "Otro"]
+        h.cuerpo([s["numero_qr"], s["fecha_confeccion"], s["estado_silo"], s["estado_grano"], s["metros"]],
+                 fondo=h.fondo_alternado())
+
+    for h in hojas.values():
+        h.filtro("E", h.fila - 1)
+
+    if not hojas:
+        ws = wb.create_sheet("Sin datos")
+        ws.append(["No hay silos registrados"])
+
+    return _guardar(wb)
+
+
+# =====================================================
+# EXCEL COMPLETO — según nivel de permiso
+# =====================================================
+def _leer_hijos(conn, empresa_id):
+    """
+    Llenado, análisis del último muestreo y vaciado de toda la empresa,
+    indexados por numero_qr (o id de muestreo): una consulta por tabla en
+    lugar de varias por silo.
+    """
+    llenado = {}
+    for r in db_execute(conn, """
+        SELECT numero_qr, kg, factor, tas, fecha FROM llenado
+        WHERE empresa_id=?
+        ORDER BY numero_qr, fecha DESC
+    """, (empresa_id,)).fetchall():
+        llenado.setdefault(r["numero_qr"], []).append(r)
+
+    ultimos = "SELECT MAX(id) FROM muestreos WHERE empresa_id=? GROUP BY numero_qr"
+    analisis = {}
+    for r in db_execute(conn, f"""
+        SELECT id_muestreo, grado, factor, tas FROM analisis
+        WHERE empresa_id=? AND id_muestreo IN ({ultimos})
+    """, (empresa_id, empresa_id)).fetchall():
+        analisis.setdefault(r["id_muestreo"], []).append(r)
+
+    fechas = {r["id"]: r["fecha_muestreo"] for r in db_execute(conn, f"""
+        SELECT id, fecha_muestreo FROM muestreos
+        WHERE empresa_id=? AND id IN ({ultimos})
+    """, (empresa_id, empresa_id)).fetchall()}
+
+    # Solo las camionadas de silos en extracción o extraídos
+    vaciado = {}
+    for r in db_execute(conn, """
+        SELECT v.* FROM vaciado v
+        JOIN silos s ON s.numero_qr = v.numero_qr AND s.empresa_id = v.empresa_id
+        WHERE v.empresa_id=? AND s.estado_silo IN ('Extraído', 'En extracción')
+        ORDER BY v.numero_qr, v.nro_camion ASC
+    """, (empresa_id,)).fetchall():
+        vaciado.setdefault(r["numero_qr"], []).append(r)
+
+    return {"llenado": llenado, "analisis": analisis, "fechas": fechas, "vaciado": vaciado}
+
+
+def _datos_silo(s, hijos, mercado, ve_comercial):
+    """Kg, calidad, precio y vaciado de un silo, como en el panel."""
+    grado = None; factor = None; tas = None; fecha_est = None; fuente = "—"
+
+    # Lo ya usado se saca de los índices para liberar memoria
+    cargas = hijos["llenado"].pop(s["numero_qr"], [])
+    kg = sum(c["kg"] or 0 for c in cargas)
+    if not kg:
+        kg = (s["metros"] or 0) * KG_POR_METRO.get(s["cereal"], KG_POR_METRO_DEFAULT)
+
+    if s["ultimo_muestreo"]:
+        grados_l = []; factores_l = []; tass_l = []
+        for a in hijos["analisis"].pop(s["ultimo_muestreo"], []):
+            if a["grado"] is not None:
+                try: grados_l.append(int(a["grado"]))
+                except: pass
+            if a["factor"] is not None: factores_l.append(float(a["factor"]))
+            if a["tas"] is not None: tass_l.append(int(a["tas"]))
+        if grados_l: grado = max(grados_l)
+        if factores_l:
+            factor = round(sum(factores_l) / len(factores_l), 4); fuente = "Calado"
+        if tass_l:
+            tas = min(tass_l)
+            fecha = hijos["fechas"].get(s["ultimo_muestreo"])
+            if fecha:
+                fecha_est = _fecha_estimada(fecha, tas)
+
+    if factor is None and cargas:
+        cargas_cf = [c for c in cargas if c["factor"] is not None]
+        if cargas_cf:
+            kg_pond = sum(float(c["kg"] or 0) for c in cargas_cf)
+            if kg_pond > 0:
+                factor = round(sum(float(c["factor"]) * float(c["kg"] or 0) for c in cargas_cf) / kg_pond, 4)
+            else:
+                fl = [float(c["factor"]) for c in cargas_cf]
+                factor = round(sum(fl) / len(fl), 4)
+            fuente = "Llenado"
+        tas_vals = [int(c["tas"]) for c in cargas if c["tas"] is not None]
+        if tas_vals:
+            tas = min(tas_vals)
+            if cargas[0]["fecha"]:
+                fecha_est = _fecha_estimada(cargas[0]["fecha"], tas)
+
+    cereal = s["cereal"]; merc = mercado.get(cereal)
+    precio_ars = None; precio_usd = None
+    if ve_comercial and factor and merc and merc["pizarra"]:
+        precio_ars = round(merc["pizarra"] * factor, 2)
+        if merc["dolar"]: precio_usd = round(precio_ars / merc["dolar"], 2)
+
+    # ── datos de vaciado ──
+    kg_vaciado = 0; factor_vaciado = None; dif_kg = None; dif_factor = None
+    camionadas = [dict(c) for c in hijos["vaciado"].pop(s["numero_qr"], [])]
+    if camionadas:
+        kg_vaciado = int(sum(float(c["kg"] or 0) for c in camionadas if c.get("kg")))
+        kg_sum_vac = sum(float(c["kg"] or 0) for c in camionadas if c.get("factor") and c.get("kg"))
+        if kg_sum_vac > 0:
+            factor_vaciado = round(
+                sum(float(c["factor"]) * float(c["kg"] or 0) for c in camionadas if c.get("factor") and c.get("kg"))
+                / kg_sum_vac, 4
+            )
+    if s["estado_silo"] == "Extraído" and kg > 0:
+        dif_kg = kg_vaciado - int(kg)
+    if factor and factor_vaciado:
+        dif_factor = round((factor_vaciado - factor) * 100, 3)
+
+    return {
+        "numero_qr": s["numero_qr"], "cereal": cereal,
+        "fecha_confeccion": s["fecha_confeccion"], "estado_silo": s["estado_silo"],
+        "fecha_extraccion": s["fecha_extraccion"] if "fecha_extraccion" in s.keys() else None,
+        "estado_grano": s["estado_grano"], "metros": s["metros"],
+        "kg": int(kg), "grado": grado, "factor": factor, "tas": tas,
+        "fecha_est": fecha_est, "fuente": fuente,
+        "precio_ars": precio_ars, "precio_usd": precio_usd,
+        "kg_vaciado": kg_vaciado, "factor_vaciado": factor_vaciado,
+        "dif_kg": dif_kg, "dif_factor": dif_factor,
+        "camionadas": camionadas,
+    }
+
+
+def _fecha_estimada(fecha, tas):
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return (datetime.strptime(fecha, fmt) + timedelta(days=tas)).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def _leer_mercado(conn, empresa_id):
+    """Pizarra de la empresa, futuros MATBA y dólar ROFEX."""
+    mercado_rows = db_execute(conn, """
+        SELECT cereal,
+        CASE WHEN usar_manual=1 THEN pizarra_manual ELSE pizarra_auto END pizarra,
+        dolar
+        FROM mercado
+        WHERE empresa_id=?
+    """, (empresa_id,)).fetchall()
+    mercado = {r["cereal"]: dict(r) for r in mercado_rows}
+
+    try:
+        matba_rows = db_execute(conn, """
+            SELECT cereal, posicion, mes, precio, variacion
+            FROM matba ORDER BY cereal, posicion
+        """).fetchall()
+    except Exception:
+        try:
+            matba_rows = db_execute(conn, """
+                SELECT cereal, posicion, mes, precio
+                FROM matba ORDER BY cereal, posicion
+            """).fetchall()
+        except: matba_rows = []
+
+    try:
+        rofex_rows = db_execute(conn, """
+            SELECT posicion, ajuste, variacion
+            FROM rofex ORDER BY posicion
+        """).fetchall()
+    except Exception:
+        rofex_rows = []
+
+    return mercado, matba_rows, rofex_rows
+
+
+def exportar_completo(conn, empresa_id, ve_comercial, ve_calidad, progreso=None):
+    """
+    Resumen, detalle por cereal, vaciado y mercado según el nivel de permiso.
+    progreso(fraccion) se llama después de cada cereal escrito.
+    """
+    silos = db_execute(conn, """
+        SELECT s.*, um.ultimo_muestreo
+        FROM silos s
+        LEFT JOIN (
+            SELECT numero_qr, MAX(id) ultimo_muestreo
+            FROM muestreos
+            WHERE empresa_id=?
+            GROUP BY numero_qr
+        ) um ON um.numero_qr = s.numero_qr
+        WHERE s.empresa_id=?
+        ORDER BY s.cereal, s.numero_qr
+    """, (empresa_id, empresa_id)).fetchall()
+
+    hijos = _leer_hijos(conn, empresa_id)
+    total_camionadas = sum(len(v) for v in hijos["vaciado"].values())
+
+    mercado, matba_rows, rofex_rows = _leer_mercado(conn, empresa_id)
+
+    matba_por_cereal = {}
+    for m in (matba_rows or []):
+        cer_simple = _mapear_cereal(m["cereal"])
+        if not cer_simple: continue
+        try: contrato = m["mes"]
+        except: contrato = None
+        matba_por_cereal.setdefault(cer_simple, []).append({
+            "posicion": m["posicion"], "mes": contrato, "precio": m["precio"],
+        })
+    rofex_dict = {r["posicion"]: r["ajuste"] for r in rofex_rows} if rofex_rows else {}
+
+    # Agrupar por cereal (vienen ordenados): el detalle de cada cereal se escribe junto
+    por_cereal = {}
+    for s in silos:
+        por_cereal.setdefault(s["cereal"], []).append(s)
+    presentes = [c for c in CEREALES if c in por_cereal]
+
+    # Las hojas se crean en el orden final; cada una se llena cuando están sus datos
+    wb = Workbook(write_only=True)
+    estilos = Estilos(wb)
+    anchos_res = [14, 10, 13, 11, 14, 14, 14, 13, 13] + ([14, 14, 16, 16] if ve_comercial else [])
+    resumen = Hoja(wb, estilos, "Resumen",
+                   anchos=anchos_res if ve_comercial else None,
+                   congelar="A6" if ve_comercial else None)
+    aux = _hoja_aux(wb, matba_por_cereal, rofex_dict) if ve_comercial else None
+
+    anchos_det = ([14, 16, 14, 14, 9, 13, 16, 13]
+                  + ([9, 12, 9, 16, 13, 13, 13] if ve_calidad else [])
+                  + ([14, 14, 10] if ve_comercial else []))
+    detalle = {c: Hoja(wb, estilos, c, anchos=anchos_det, congelar="A4") for c in presentes}
+    vaciado = None
+    if total_camionadas:
+        vaciado = Hoja(wb, estilos, "Vaciado",
+                       anchos=[14, 10, 10, 12, 18, 12, 11, 10, 9, 12, 10, 10, 20, 14, 18], congelar="A4")
+        _inicio_vaciado(vaciado, total_camionadas)
+
+    # Una pasada por los silos: detalle por cereal y camionadas salen a medida que se calculan
+    totales = {}
+    kg_extraidos = 0; tot_kg_cam = 0; hechos = 0
+    for cereal in por_cereal:
+        datos = [_datos_silo(s, hijos, mercado, ve_comercial) for s in por_cereal[cereal]]
+        for d in datos:
+            if d["estado_silo"] == "Extraído":
+                kg_extraidos += d["kg"]
+            for c in d["camionadas"]:
+                tot_kg_cam += float(c.get("kg") or 0)
+                _fila_vaciado(vaciado, c, d)
+        if cereal in detalle:
+            _hoja_cereal(detalle[cereal], cereal, datos, ve_calidad, ve_comercial)
+            totales[cereal] = _totales_cereal(datos)
+        hechos += len(datos)
+        if progreso:
+            progreso(hechos / len(silos))
+
+    if vaciado:
+        vac_fmts = [None, None, "#,##0", None, None, "#,##0", "0.0", "0.00", "#,##0", "0.0"]
+        vaciado.total(["TOTAL", None, None, None, None, int(tot_kg_cam)] + [None] * 9, formatos=vac_fmts)
+        vaciado.filtro("O", vaciado.fila - 1)
+
+    _hoja_resumen(resumen, totales, kg_extraidos, mercado, ve_comercial,
+                  matba_por_cereal, aux, rofex_dict)
+
+    if ve_comercial and matba_rows and rofex_rows:
+        _hoja_combo(Hoja(wb, estilos, "Mejor Combo", anchos=[14, 22, 18, 16, 16, 18, 15, 16], congelar="A4"),
+                    mercado, matba_por_cereal, rofex_dict)
+    if rofex_rows:
+        _hoja_rofex(Hoja(wb, estilos, "ROFEX", anchos=[18, 16, 14], congelar="A4"), rofex_rows)
+    if matba_rows:
+        _hoja_matba(Hoja(wb, estilos, "Futuros MATBA", anchos=[14, 22, 14, 14, 12, 16, 14, 14, 16], congelar="A4"),
+                    matba_rows, mercado)
+
+    return _guardar(wb)
+
+
+def _hoja_aux(wb, matba_por_cereal, rofex_dict):
+    """
+    Hoja oculta con las listas de los desplegables y los precios que buscan
+    las fórmulas: A = posiciones ROFEX, después una columna de contratos por
+    cereal, una de precios por cereal y al final los ajustes ROFEX.
+    """
+    ws = wb.create_sheet("_AuxDropdowns")
+    ws.sheet_state = "hidden"
+
+    rofex_opts = list(rofex_dict.keys())
+    con_matba = [c for c in CEREALES if matba_por_cereal.get(c)]
+    columnas = [["ROFEX"] + rofex_opts]
+    columnas += [[f"MATBA_{c}"] + [_etiqueta_matba(m) for m in matba_por_cereal[c]] for c in con_matba]
+    columnas += [[f"PRECIO_{c}"] + [m["precio"] for m in matba_por_cereal[c]] for c in con_matba]
+    if rofex_opts:
+        columnas.append(["ROFEX_AJUSTE"] + list(rofex_dict.values()))
+
+    for i in range(max(len(col) for col in columnas)):
+        ws.append([col[i] if i < len(col) else None for col in columnas])
+
+    letra = lambda i: get_column_letter(i + 1)
+    return {
+        "rofex_opts": rofex_opts,
+        "matba": {c: (letra(1 + i), letra(1 + len(con_matba) + i), len(matba_por_cereal[c]))
+                  for i, c in enumerate(con_matba)},
+        "ajuste": letra(len(columnas) - 1) if rofex_opts else None,
+    }
+
+
+def _hoja_resumen(h, totales, kg_extraidos, mercado, ve_comercial, matba_por_cereal, aux, rofex_dict):
+    h.titulo("INFORME SILO BOLSAS", 13, alto=32)
+    h.nota(_generado(), 13)
+    h.agregar()
+    h.subtitulo("RESUMEN POR CEREAL", 13)
+
+    # Columnas del resumen según permiso
+    res_headers = ["Cereal", "Activos", "En Extracción", "Extraídos", "KG Llenado", "KG Vaciado", "Dif. KG", "Factor Pond. %", "Silos c/Factor"]
+    res_fmts    = [None, "#,##0", "#,##0", "#,##0", "#,##0", "#,##0", "+#,##0;-#,##0", "0.00", None]
+    if ve_comercial:
+        res_headers += ["Pizarra ARS/TN", "Pizarra USD/TN", "Valor Stock ARS", "Valor Stock USD"]
+        res_fmts    += ["#,##0.00", "#,##0.00", "#,##0", "#,##0"]
+    ncols = len(res_headers)
+    h.encabezados(res_headers)
+
+    tot_activos = tot_en_extr = tot_extraidos = tot_kg = tot_kg_vac = tot_ars = tot_usd = tot_con_factor = tot_silos_activos = 0
+    for cereal in CEREALES:
+        t = totales.get(cereal)
+        if not t: continue
+        kg_total = t["kg_activos"]
+        factor_pond = t["factor_pond"]
+        merc = mercado.get(cereal)
+        piz_ars = merc["pizarra"] if merc else None; dolar = merc["dolar"] if merc else None
+        piz_usd = round(piz_ars / dolar, 2) if piz_ars and dolar else None
+        val_ars = val_usd = None
+        if factor_pond and piz_ars and kg_total > 0:
+            val_ars = round(piz_ars * factor_pond * kg_total / 1000, 2)
+            if dolar: val_usd = round(val_ars / dolar, 2)
+        dif_kg_cer = (t["kg_vaciado"] - t["kg_extraidos"]) if t["extraidos"] else None
+        vals = [cereal, t["activos"], t["en_extr"], t["extraidos"], kg_total,
+                t["kg_vaciado"] if t["extraidos"] else None, dif_kg_cer,
+                round(factor_pond * 100, 2) if factor_pond else None,
+                f"{t['con_factor']}/{t['activos'] + t['en_extr']}"]
+        if ve_comercial:
+            vals += [piz_ars, piz_usd, val_ars, val_usd]
+        h.cuerpo(vals, fondo=h.fondo_alternado(), formatos=res_fmts,
+                 fuentes={7: _signo(dif_kg_cer)} if dif_kg_cer is not None else None)
+        tot_activos += t["activos"]; tot_en_extr += t["en_extr"]; tot_extraidos += t["extraidos"]
+        tot_kg += kg_total; tot_kg_vac += t["kg_vaciado"]
+        tot_ars += (val_ars or 0); tot_usd += (val_usd or 0)
+        tot_con_factor += t["con_factor"]; tot_silos_activos += t["activos"] + t["en_extr"]
+
+    tot_dif = (tot_kg_vac - kg_extraidos) if tot_extraidos else None
+    total_vals = ["TOTAL", tot_activos, tot_en_extr, tot_extraidos, tot_kg,
+                  tot_kg_vac if tot_extraidos else None, tot_dif,
+                  None, f"{tot_con_factor}/{tot_silos_activos}"]
+    if ve_comercial:
+        total_vals += [None, None, tot_ars if tot_ars else None, tot_usd if tot_usd else None]
+    h.total(total_vals, formatos=res_fmts, fuentes={7: _signo(tot_dif)} if tot_dif is not None else None)
+
+    if not ve_comercial:
+        return
+
+    # ── Sección: Análisis de Precios con Futuros ───────────
+    h.agregar()
+    h.agregar()
+    h.subtitulo("ANÁLISIS DE PRECIOS — FUTUROS vs PIZARRA", ncols, C_AZUL_OSC)
+
+    rofex_opts = aux["rofex_opts"]
+    n_rofex = len(rofex_opts)
+    sel_rofex_ref = None
+
+    # Fila de selección global de dólar ROFEX
+    if rofex_opts:
+        sel_rofex_ref = f"B{h.fila}"
+        dv_rofex = DataValidation(type="list", formula1=f"_AuxDropdowns!$A$2:$A${n_rofex+1}", allow_blank=False, showDropDown=False)
+        dv_rofex.sqref = sel_rofex_ref
+        h.ws.data_validations.append(dv_rofex)
+        h.agregar([
+            h.celda("Dólar ROFEX a usar:", negrita=True, color=C_MORADO, centrado=False),
+            h.celda(rofex_opts[0], negrita=True, color=C_MORADO, fondo="EDE7F6", marco=C_MORADO),
+            h.celda("← Seleccioná la posición de dólar futuro", tamano=9, italica=True, color="9E9E9E", centrado=False),
+        ])
+
+    h.agregar()
+    anl_headers = ["Cereal", "KG Stock", "Pizarra ARS", "Dólar Hoy", "Precio Pizarra USD/TN",
+                   "Contrato MATBA", "Precio Futuro USD/TN", "Dif. vs Pizarra %",
+                   "Dólar ROFEX sel.", "Precio Futuro ARS/TN", "Valor Stock Futuro ARS", "Mejor Precio"]
+    h.encabezados(anl_headers, C_AZUL_MED)
+
+    for cer in CEREALES:
+        merc = mercado.get(cer)
+        opts = matba_por_cereal.get(cer, [])
+        if not merc and not opts: continue
+
+        row = h.fila
+        piz_ars  = merc["pizarra"] if merc else None
+        dol_hoy  = merc["dolar"]   if merc else None
+        piz_usd  = round(piz_ars / dol_hoy, 2) if piz_ars and dol_hoy else None
+        kg_stock = totales[cer]["kg_stock"] if cer in totales else 0
+
+        bg = h.fondo_alternado()
+        fixed_fmts = [None, "#,##0", "#,##0.00", "#,##0.00", "#,##0.00"]
+        celdas = [h.celda(v, fondo=bg, borde="fino", formato=f)
+                  for v, f in zip([cer, kg_stock, piz_ars, dol_hoy, piz_usd], fixed_fmts)]
+
+        # Contrato MATBA seleccionable y precio futuro buscado en la hoja aux
+        col_info = aux["matba"].get(cer)
+        if col_info:
+            col_letter, price_col_letter, n_opts = col_info
+            dv_matba = DataValidation(
+                type="list",
+                formula1=f"_AuxDropdowns!${col_letter}$2:${col_letter}${n_opts+1}",
+                allow_blank=True, showDropDown=False
+            )
+            dv_matba.sqref = f"F{row}"
+            h.ws.data_validations.append(dv_matba)
+
+            lookup_range = f"_AuxDropdowns!${col_letter}$2:${col_letter}${n_opts+1}"
+            price_range  = f"_AuxDropdowns!${price_col_letter}$2:${price_col_letter}${n_opts+1}"
+            celdas.append(h.celda(_etiqueta_matba(opts[0]), negrita=True, color=C_AZUL_OSC,
+                                  fondo=C_AZUL_CLR, marco=C_AZUL_MED))
+            celdas.append(h.celda(f"=IFERROR(INDEX({price_range},MATCH(F{row},{lookup_range},0)),)",
+                                  borde="fino", formato="#,##0.00"))
+            if piz_usd:
+                celdas.append(h.celda(f'=IFERROR((G{row}-{piz_usd})/{piz_usd},"")',
+                                      fondo=C_GRIS, borde="fino", formato="+0.00%;-0.00%"))
+            else:
+                celdas.append(WriteOnlyCell(h.ws))
+        else:
+            celdas.append(h.celda("Sin datos MATBA", borde="fino"))
+            celdas += [h.celda(borde="fino"), h.celda(borde="fino")]
+
+        # Dólar ROFEX seleccionado → ajuste; precio y valor del stock a futuro
+        if sel_rofex_ref:
+            rofex_lookup = f"_AuxDropdowns!$A$2:$A${n_rofex+1}"
+            rofex_price_lookup = f"_AuxDropdowns!${aux['ajuste']}$2:${aux['ajuste']}${n_rofex+1}"
+            celdas += [
+                h.celda(f"=IFERROR(INDEX({rofex_price_lookup},MATCH({sel_rofex_ref},{rofex_lookup},0)),{dol_hoy or 'NA()'})",
+                        borde="fino", formato="#,##0.00"),
+                h.celda(f"=IFERROR(G{row}*I{row},)", borde="fino", formato="#,##0.00"),
+                h.celda(f"=IFERROR(J{row}*{kg_stock}/1000,)", borde="fino", formato="#,##0"),
+            ]
+        else:
+            celdas += [h.celda(borde="fino") for _ in range(3)]
+
+        # Mejor precio: comparar pizarra USD vs futuro USD
+        if piz_usd:
+            celdas.append(h.celda(
+                f'=IFERROR(IF(G{row}="","Pizarra",'
+                f'IF(G{row}>{piz_usd},"▲ Futuro (" & TEXT(G{row},"0.00") & " USD)","▼ Pizarra (" & TEXT({piz_usd},"0.00") & " USD)")),"Pizarra")',
+                negrita=True, borde="fino"))
+        else:
+            celdas.append(h.celda(borde="fino"))
+        h.agregar(celdas)
+
+    h.agregar()
+    h.agregar([h.celda("💡 Seleccioná el contrato MATBA en columna F y el dólar ROFEX en la celda de selección para ver el análisis actualizado.",
+                       tamano=9, italica=True, color="616161", centrado=False)])
+    h.combinar(ncols)
+    h.filtro(get_column_letter(ncols), h.fila - 3, primera_fila=5)
+
+
+def _totales_cereal(datos):
+    """Acumulados de un cereal para el resumen y el análisis de precios."""
+    activos   = [d for d in datos if d["estado_silo"] not in ("Extraído", "En extracción")]
+    en_extr   = [d for d in datos if d["estado_silo"] == "En extracción"]
+    extraidos = [d for d in datos if d["estado_silo"] == "Extraído"]
+    con_factor = [d for d in activos + en_extr if d["factor"] is not None]
+    factor_pond = None
+    if con_factor:
+        kg_f = sum(d["kg"] for d in con_factor)
+        factor_pond = sum(d["factor"] * d["kg"] for d in con_factor) / kg_f if kg_f > 0 else sum(d["factor"] for d in con_factor) / len(con_factor)
+    return {
+        "activos": len(activos), "en_extr": len(en_extr), "extraidos": len(extraidos),
+        "kg_activos": sum(d["kg"] for d in activos + en_extr),
+        "kg_stock": sum(d["kg"] for d in datos if d["estado_silo"] != "Extraído"),
+        "kg_extraidos": sum(d["kg"] for d in extraidos),
+        "kg_vaciado": sum(d["kg_vaciado"] for d in extraidos),
+        "con_factor": len(con_factor), "factor_pond": factor_pond,
+    }
+
+
+def _hoja_cereal(h, cereal, datos, ve_calidad, ve_comercial):
+    # Columnas según nivel de permiso
+    # Base (ve_form): QR, Fecha Conf, Estado, Estado Grano, Metros, KG Ll, Fecha Cierre, KG Vaciado
+    # + ve_calidad:   Grado, Factor Ll%, TAS, Fecha Est, Factor Vac%, Dif KG, Dif Factor
+    # + ve_comercial: Precio ARS, Precio USD, Fuente
+    headers  = ["QR", "Fecha Conf.", "Estado", "Estado Grano", "Metros", "KG Llenado", "Fecha Cierre", "KG Vaciado"]
+    hdr_fmts = [None, None, None, None, "0.0", "#,##0", None, "#,##0"]
+    if ve_calidad:
+        headers  += ["Grado", "Factor Ll. %", "TAS", "Fecha Est.", "Factor Vac. %", "Dif. KG", "Dif. Factor %"]
+        hdr_fmts += [None, "0.00", "#,##0", None, "0.00", "+#,##0;-#,##0", "+0.000;-0.000"]
+    if ve_comercial:
+        headers  += ["Precio ARS/TN", "Precio USD/TN", "Fuente"]
+        hdr_fmts += ["#,##0.00", "#,##0.00", None]
+    ncols = len(headers)
+
+    activos = [d for d in datos if d["estado_silo"] != "Extraído"]
+    con_factor = [d for d in activos if d["factor"] is not None]
+    h.titulo(f"{cereal.upper()} — DETALLE SILOS", ncols)
+    h.nota(f"Activos: {len(activos)}  |  Extraídos: {len(datos) - len(activos)}  |  Con factor: {len(con_factor)}/{len(activos)}",
+           ncols, color="616161")
+    h.encabezados(headers)
+
+    sum_kg_ll = 0; sum_kg_vac = 0; sum_factores_ll = []; sum_factores_vac = []
+    for d in datos:
+        fac_ll_pct  = round(d["factor"] * 100, 2) if d["factor"] else None
+        fac_vac_pct = round(d["factor_vaciado"] * 100, 2) if d.get("factor_vaciado") else None
+
+        vals = [d["numero_qr"], d["fecha_confeccion"], d["estado_silo"], d["estado_grano"], d["metros"],
+                d["kg"], d.get("fecha_extraccion"), d.get("kg_vaciado") or None]
+        fuentes = {}
+        if ve_calidad:
+            vals += [d["grado"], fac_ll_pct, d["tas"], d["fecha_est"], fac_vac_pct,
+                     d.get("dif_kg"), d.get("dif_factor")]
+            # color dif_kg y dif_factor
+            for col_idx, val in [(14, d.get("dif_kg")), (15, d.get("dif_factor"))]:
+                if val is not None:
+                    fuentes[col_idx] = _signo(val)
+        if ve_comercial:
+            vals += [d["precio_ars"], d["precio_usd"], d["fuente"]]
+
+        if d["estado_silo"] == "Extraído":                           bg = C_ROJO_CLR
+        elif d["estado_silo"] == "En extracción":                    bg = C_AMARILLO
+        elif d["tas"] is not None and d["tas"] <= 30 and ve_calidad: bg = C_NARANJA
+        elif d["tas"] is not None and d["tas"] > 60  and ve_calidad: bg = C_VERDE_CLR
+        else:                                                         bg = h.fondo_alternado()
+        h.cuerpo(vals, fondo=bg, formatos=hdr_fmts, fuentes=fuentes)
+
+        if d["estado_silo"] != "Extraído":
+            sum_kg_ll += d["kg"]
+            if d["factor"] and ve_calidad: sum_factores_ll.append(d["factor"])
+        else:
+            sum_kg_vac += (d.get("kg_vaciado") or 0)
+            if d.get("factor_vaciado") and ve_calidad: sum_factores_vac.append(d["factor_vaciado"])
+
+    avg_factor_ll  = round(sum(sum_factores_ll)  / len(sum_factores_ll)  * 100, 2) if sum_factores_ll  else None
+    avg_factor_vac = round(sum(sum_factores_vac) / len(sum_factores_vac) * 100, 2) if sum_factores_vac else None
+    tot_vals = ["TOTALES", None, None, None, None, sum_kg_ll, None, sum_kg_vac if sum_kg_vac else None]
+    if ve_calidad: tot_vals += [None, avg_factor_ll, None, None, avg_factor_vac, None, None]
+    if ve_comercial: tot_vals += [None, None, None]
+    h.total(tot_vals, formatos=hdr_fmts)
+    h.filtro(get_column_letter(ncols), h.fila - 1)
+
+
+def _inicio_vaciado(h, total_camionadas):
+    h.titulo("DETALLE DE VACIADO — CAMIONADAS", 15, C_AZUL_OSC)
+    h.nota(f"{_generado()}  |  Total camionadas: {total_camionadas}", 15)
+    h.encabezados(["QR Silo", "Cereal", "Nº Camión", "Patente", "Fecha",
+                   "KG", "Humedad %", "Factor %", "TAS", "Temperatura",
+                   "Insectos", "Destino", "Obs.", "Estado", "Fecha Cierre Silo"], C_AZUL_MED)
+
+
+def _fila_vaciado(h, c, silo):
+    completado = c.get("completado", 0)
+    destino    = (c.get("destino") or "").upper()
+    bg = C_ROJO_CLR if not completado else (C_AZUL_CLR if destino == "PUERTO" else C_MORADO_CLR if destino == "PLANTA" else h.fondo_alternado())
+    vals = [
+        c.get("numero_qr"), silo["cereal"], c.get("nro_camion"), c.get("patente"),
+        c.get("fecha"),
+        c.get("kg"), c.get("humedad"),
+        round(float(c["factor"]) * 100, 2) if c.get("factor") else None,
+        c.get("tas"), c.get("temperatura"),
+        "Sí" if c.get("insectos") else "No",
+        destino or "—", c.get("obs") or "—",
+        "Completa" if completado else "Pendiente lab.", silo.get("fecha_extraccion"),
+    ]
+    vac_fmts = [None, None, "#,##0", None, None, "#,##0", "0.0", "0.00", "#,##0", "0.0"]
+    # negrita en destino
+    h.cuerpo(vals, fondo=bg, formatos=vac_fmts, fuentes={12: {"negrita": True}})
+
+
+def _hoja_combo(h, mercado, matba_por_cereal, rofex_dict):
+    """Todas las combinaciones MATBA + ROFEX por cereal, la mejor resaltada."""
+    h.titulo("MEJOR COMBINACIÓN MATBA + ROFEX POR CEREAL", 8, C_AZUL_OSC)
+    h.nota(f"{_generado()}  |  Muestra todas las combinaciones posibles y resalta la que da mayor precio ARS/TN", 8)
+    h.encabezados(["Cereal", "Contrato MATBA", "Precio Futuro USD/TN",
+                   "Posición ROFEX", "Dólar Futuro ARS", "Precio Final ARS/TN",
+                   "vs Pizarra Hoy", "¿Mejor opción?"], C_AZUL_OSC)
+    combo_fmts = [None, None, "#,##0.00", None, "#,##0.00", "#,##0.00", "+0.00%;-0.00%", None]
+
+    for cer in CEREALES:
+        merc = mercado.get(cer)
+        if not merc or not merc.get("pizarra") or not merc.get("dolar"):
+            continue
+        piz_ars = merc["pizarra"]; piz_usd = piz_ars / merc["dolar"]
+        opts = matba_por_cereal.get(cer, [])
+        if not opts:
+            continue
+
+        combos = []
+        for m in opts:
+            if not m.get("precio"): continue
+            for pos, ajuste in rofex_dict.items():
+                if not ajuste: continue
+                precio_ars_combo = round(m["precio"] * ajuste, 2)
+                combos.append({
+                    "label_m": _etiqueta_matba(m), "precio_usd": m["precio"],
+                    "pos_rofex": pos, "ajuste": ajuste,
+                    "precio_ars": precio_ars_combo, "vs_piz": (precio_ars_combo - piz_ars) / piz_ars,
+                })
+        if not combos: continue
+        mejor = max(combos, key=lambda x: x["precio_ars"])
+
+        # Fila de pizarra actual como referencia
+        h.agregar([h.celda(f"── {cer.upper()} — Pizarra hoy: {piz_ars:,.2f} ARS/TN  ({piz_usd:.2f} USD/TN) ──",
+                           negrita=True, color=C_AZUL_OSC, fondo=C_AZUL_CLR)])
+        h.combinar(8)
+
+        for c in sorted(combos, key=lambda x: x["precio_ars"], reverse=True):
+            es_mejor = c is mejor
+            bg = "FFF9C4" if es_mejor else h.fondo_alternado()
+            color_vs = C_VERDE_MED if c["vs_piz"] >= 0 else C_ROJO
+            if es_mejor:
+                fuentes = {6: {"negrita": True, "tamano": 11, "color": C_VERDE_OSC},
+                           7: {"negrita": True, "color": color_vs},
+                           8: {"negrita": True, "color": C_VERDE_OSC}}
+            else:
+                fuentes = {7: {"color": color_vs}}
+            h.cuerpo([cer, c["label_m"], c["precio_usd"], c["pos_rofex"],
+                      c["ajuste"], c["precio_ars"], c["vs_piz"],
+                      "⭐ MEJOR COMBO" if es_mejor else ""],
+                     fondo=bg, formatos=combo_fmts, fuentes=fuentes)
+        h.agregar()  # separador entre cereales
+
+    h.filtro("H", h.fila - 1)
+
+
+def _hoja_rofex(h, rofex_rows):
+    h.titulo("DÓLAR FUTURO — ROFEX", 3, C_MORADO)
+    h.nota(_generado(), 3)
+    h.encabezados(["Posición", "Ajuste", "Variación"], C_MORADO)
+    for r in rofex_rows:
+        variacion = r["variacion"] if r["variacion"] is not None else 0
+        bg = C_VERDE_CLR if variacion > 0 else (C_ROJO_CLR if variacion < 0 else h.fondo_alternado())
+        h.cuerpo([r["posicion"], r["ajuste"], variacion], fondo=bg, formatos=[None, "#,##0.00", "0.00"])
+    h.filtro("C", h.fila)
+
+
+def _hoja_matba(h, matba_rows, mercado):
+    h.titulo("PIZARRA vs FUTUROS MATBA", 9, C_AZUL_OSC)
+    h.nota(_generado(), 9)
+    h.encabezados(["Posición", "Cereal", "Contrato", "Precio USD", "Variación", "Pizarra USD Hoy", "Diferencia %", "Señal", "Pizarra ARS"], C_AZUL_MED)
+    for m in matba_rows:
+        cer_matba = m["cereal"]; cer_simple = _mapear_cereal(cer_matba); merc = mercado.get(cer_simple) if cer_simple else None
+        variacion = None
+        try: variacion = m["variacion"]
+        except: pass
+        hoy_usd = None; dif = None; signal = "Sin dato"; piz_ars = None
+        if merc and merc["pizarra"] and merc["dolar"]:
+            piz_ars = merc["pizarra"]; hoy_usd = round(piz_ars / merc["dolar"], 2)
+            if hoy_usd > 0 and m["precio"]:
+                dif = round(((m["precio"] - hoy_usd) / hoy_usd) * 100, 2)
+                signal = "Esperar" if dif > 5 else ("Vender Hoy" if dif < -2 else "Neutral")
+        contrato = None
+        try: contrato = m["mes"]
+        except: pass
+        bg = None
+        if dif is not None: bg = C_VERDE_CLR if dif > 5 else (C_ROJO_CLR if dif < 0 else None)
+        if bg is None: bg = h.fondo_alternado()
+        h.cuerpo([m["posicion"], cer_matba, contrato, m["precio"], variacion, hoy_usd, dif, signal, piz_ars],
+                 fondo=bg, formatos=[None, None, None, "#,##0.00", "0.00", "#,##0.00", "0.00", None, "#,##0.00"])
+    h.filtro("I", h.fila)
@@ -1,11 +1,45 @@
 from flask_login import current_user, login_required
 from db import get_db
+from utils.empresas import datos_empresa
 from flask import Blueprint
 from datetime import datetime
-from flask import render_template, request
+from flask import render_template, request, g
 
 permissions_bp = Blueprint("permissions", __name__)
 
+# Pantallas que se habilitan por usuario desde admin
+PANTALLAS = ["panel", "form", "calado", "laboratorio", "comercial", "comparador", "admin"]
+
+def _permisos_usuario():
+    """
+    Estado de la empresa (cache de utils.empresas) y pantallas
+    habilitadas del usuario actual. Se leen una vez por request (en g):
+    los templates llaman a tiene_permiso muchas veces por render.
+    """
+    if "permisos_usuario" in g:
+        return g.permisos_usuario
+
+    conn = get_db()
+    try:
+        pantallas = conn.execute("""
+            SELECT pantalla FROM permisos
+            WHERE user_id=?
+        """, (current_user.id,)).fetchall()
+    finally:
+        conn.close()
+
+    g.permisos_usuario = {
+        "empresa": datos_empresa(current_user.empresa_id),
+        "pantallas": {p["pantalla"] for p in pantallas},
+    }
+    return g.permisos_usuario
+
+
+def invalidar_permisos():
+    """Descarta lo leído en este request (después de cambiar permisos o empresas)."""
+    g.pop("permisos_usuario", None)
+
+
 def tiene_permiso(pantalla):
 
     if not current_user.is_authenticated:
@@ -19,13 +53,8 @@ def tiene_permiso(pantalla):
     if current_user.rol == "admin_empresa":
         return True
 
-    conn = get_db()
-
-    empresa = conn.execute("""
-        SELECT fecha_vencimiento, activa
-        FROM empresas
-        WHERE id=?
-    """, (current_user.empresa_id,)).fetchone()
+    datos = _permisos_usuario()
+    empresa = datos["empresa"]
 
     # 🔴 EMPRESA PAUSADA MANUALMENTE
     if empresa and empresa["activa"] == 0:
@@ -47,14 +76,7 @@ def tiene_permiso(pantalla):
                 return False
 
     # permiso normal
-    row = conn.execute("""
-        SELECT 1 FROM permisos
-        WHERE user_id=? AND pantalla=?
-    """, (current_user.id, pantalla)).fetchone()
-
-    conn.close()
-
-    return row is not None
+    return pantalla in datos["pantallas"]
 
 def acceso_denegado(pantalla):
 
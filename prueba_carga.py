@@ -0,0 +1,292 @@
+"""
+Prueba de carga contra una instancia corriendo (gunicorn o el
+servidor de desarrollo), con tráfico de campo, laboratorio y
+oficina mezclado como en cosecha.
+
+    SQLITE_PATH=carga.db python generar_datos.py --empresas 4 --silos 500
+    SQLITE_PATH=carga.db gunicorn -w 4 --threads 4 app:app
+    python prueba_carga.py --url http://127.0.0.1:8000 --empresas 4 --silos 500 \\
+        --usuarios 40 --duracion 120
+
+Cada usuario virtual es un hilo con su propia sesión, entra con
+un usuario de generar_datos.py (misma --empresas / --silos /
+--prefijo) y repite el recorrido de su perfil:
+
+  campo        escanea un QR (/api/silo/<qr>) y según el estado
+               informa calado, carga llenado o registra camionada
+  laboratorio  carga punta / medio / final en /api/analisis_seccion
+               sobre un calado informado por campo
+  oficina      panel, comparador, vista de silo y, cada tanto,
+               la exportación a Excel
+
+Al final informa por endpoint cantidad, errores, pedidos/s y
+latencia p50 / p95 / p99 (ms). --json guarda el mismo reporte.
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+
+import requests
+
+import generar_datos
+
+# Perfil → peso en la mezcla de usuarios virtuales
+MEZCLA = {"campo": 60, "laboratorio": 25, "oficina": 15}
+
+# Oficina: página → peso
+OFICINA = {"panel": 6, "comparador": 3, "silo": 3, "exportar_excel": 1}
+
+CEREALES = ["Soja", "Maíz", "Trigo", "Girasol", "Sorgo"]
+
+
+# ======================================================
+# MÉTRICAS
+# ======================================================
+
+class Metricas:
+    """Latencias y resultados por endpoint, compartidas entre hilos."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = {}
+        self.estados = {}
+        self.inicio = time.time()
+        self.fin = None
+
+    def registrar(self, endpoint, ms, estado):
+        with self.lock:
+            self.latencias.setdefault(endpoint, []).append(ms)
+            conteo = self.estados.setdefault(endpoint, {})
+            conteo[estado] = conteo.get(estado, 0) + 1
+
+    def reporte(self):
+        duracion = (self.fin or time.time()) - self.inicio
+        filas = {}
+        with self.lock:
+            for endpoint, lat in sorted(self.latencias.items()):
+                filas[endpoint] = _resumen(lat, self.estados[endpoint], duracion)
+            todas = [ms for lat in self.latencias.values() for ms in lat]
+            estados = {}
+            for conteo in self.estados.values():
+                for estado, n in conteo.items():
+                    estados[estado] = estados.get(estado, 0) + n
+        if todas:
+            filas["TOTAL"] = _resumen(todas, estados, duracion)
+        return {"duracion_s": round(duracion, 1), "endpoints": filas}
+
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    if not ordenados:
+        return None
+    k = max(math.ceil(p / 100 * len(ordenados)) - 1, 0)
+    return ordenados[k]
+
+
+def _resumen(latencias, estados, duracion):
+    lat = sorted(latencias)
+    return {
+        "pedidos": len(lat),
+        "errores": sum(n for e, n in estados.items() if e == "error" or e >= 500),
+        "rechazos": sum(n for e, n in estados.items() if e != "error" and 400 <= e < 500),
+        "por_segundo": round(len(lat) / duracion, 2) if duracion else None,
+        "p50": round(percentil(lat, 50), 1),
+        "p95": round(percentil(lat, 95), 1),
+        "p99": round(percentil(lat, 99), 1),
+        "max": round(lat[-1], 1),
+    }
+
+
+def imprimir(reporte):
+    print(f"\nDuración: {reporte['duracion_s']} s")
+    print(f"{'endpoint':<28}{'pedidos':>9}{'err':>6}{'4xx':>6}{'req/s':>9}"
+          f"{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for endpoint, r in reporte["endpoints"].items():
+        print(f"{endpoint:<28}{r['pedidos']:>9}{r['errores']:>6}{r['rechazos']:>6}"
+              f"{r['por_segundo']:>9}{r['p50']:>9}{r['p95']:>9}{r['p99']:>9}{r['max']:>9}")
+
+
+# ======================================================
+# USUARIO VIRTUAL
+# ======================================================
+
+class UsuarioVirtual(threading.Thread):
+
+    def __init__(self, url, perfil, usuario, qrs, metricas, calados, hasta, pausa, semilla):
+        super().__init__(daemon=True)
+        self.url = url.rstrip("/")
+        self.perfil = perfil
+        self.usuario = usuario
+        self.qrs = qrs
+        self.metricas = metricas
+        self.calados = calados      # ids de muestreo compartidos campo → laboratorio
+        self.hasta = hasta
+        self.pausa = pausa
+        self.rnd = random.Random(semilla)
+        self.sesion = requests.Session()
+
+    def pedir(self, endpoint, metodo, ruta, **kw):
+        inicio = time.perf_counter()
+        try:
+            resp = self.sesion.request(metodo, self.url + ruta, timeout=60, allow_redirects=False, **kw)
+            estado = resp.status_code
+            # Consumir el cuerpo entero (Excel) dentro de la medición
+            resp.content
+        except requests.RequestException:
+            resp, estado = None, "error"
+        self.metricas.registrar(endpoint, (time.perf_counter() - inicio) * 1000, estado)
+        return resp
+
+    def entrar(self):
+        resp = self.pedir("login", "POST", "/login",
+                          data={"username": self.usuario, "password": generar_datos.CLAVE})
+        return resp is not None and resp.status_code in (301, 302, 303)
+
+    def run(self):
+        if not self.entrar():
+            return
+        paso = getattr(self, self.perfil)
+        while time.time() < self.hasta:
+            paso()
+            if self.pausa:
+                time.sleep(self.rnd.expovariate(1 / self.pausa))
+
+    # ---------- perfiles ----------
+
+    def campo(self):
+        qr = self.rnd.choice(self.qrs)
+        resp = self.pedir("api/silo", "GET", f"/api/silo/{qr}")
+        if resp is None or resp.status_code != 200:
+            return
+        estado = resp.json().get("estado_silo")
+
+        if estado == "Activo":
+            if self.rnd.random() < 0.5:
+                temps = {f"temp_{s}": round(self.rnd.uniform(10, 30), 1) for s in ("punta", "medio", "final")}
+                resp = self.pedir("calado/informar_calado", "POST", "/calado/api/informar_calado",
+                                  json=dict(numero_qr=qr, informar_temperatura=True, **temps))
+                if resp is not None and resp.status_code == 200:
+                    with self.metricas.lock:
+                        self.calados.append(resp.json().get("id_muestreo"))
+            else:
+                self.pedir("api/llenado", "POST", "/api/llenado", json={
+                    "numero_qr": qr, "kg": self.rnd.randint(25000, 32000),
+                    "temperatura": round(self.rnd.uniform(10, 30), 1),
+                    "humedad": round(self.rnd.uniform(12, 17), 1),
+                    "danados": round(self.rnd.uniform(0, 4), 1),
+                    "quebrados": round(self.rnd.uniform(0, 3), 1),
+                    "materia_extrana": round(self.rnd.uniform(0, 1.5), 1),
+                })
+        elif estado == "En extracción":
+            patente = "".join(self.rnd.choices("ABCDEFGHJKLMNPRSTUVWXYZ", k=2)) + \
+                f"{self.rnd.randint(100, 999)}" + "".join(self.rnd.choices("ABCDEFGHJKLMNPRSTUVWXYZ", k=2))
+            self.pedir("api/vaciado", "POST", "/api/vaciado", json={"numero_qr": qr, "patente": patente})
+
+    def laboratorio(self):
+        with self.metricas.lock:
+            id_muestreo = self.calados.pop() if self.calados else None
+        if id_muestreo is None:
+            # Sin calados pendientes: el laboratorio mira un silo
+            self.pedir("api/silo", "GET", f"/api/silo/{self.rnd.choice(self.qrs)}")
+            return
+        for seccion in ("punta", "medio", "final"):
+            self.pedir("api/analisis_seccion", "POST", "/api/analisis_seccion", json={
+                "id_muestreo": id_muestreo, "seccion": seccion,
+                "temperatura": round(self.rnd.uniform(10, 30), 1),
+                "humedad": round(self.rnd.uniform(12, 17), 1), "ph": round(self.rnd.uniform(70, 80), 1),
+                "danados": round(self.rnd.uniform(0, 5), 2), "quebrados": round(self.rnd.uniform(0, 3), 2),
+                "materia_extrana": round(self.rnd.uniform(0, 1.5), 2),
+            })
+
+    def oficina(self):
+        pagina = self.rnd.choices(list(OFICINA), list(OFICINA.values()))[0]
+        if pagina == "panel":
+            self.pedir("panel", "GET", "/panel")
+        elif pagina == "comparador":
+            self.pedir("comercial/<cereal>", "GET", f"/comercial/{self.rnd.choice(CEREALES)}")
+        elif pagina == "silo":
+            self.pedir("silo/<qr>", "GET", f"/silo/{self.rnd.choice(self.qrs)}")
+        else:
+            self.pedir("exportar_excel", "GET", "/exportar_excel")
+
+
+# ======================================================
+# CORRIDA
+# ======================================================
+
+def correr(url, empresas, silos, usuarios=20, duracion=60, rampa=5, pausa=0.5,
+           prefijo="Sintética", mezcla=None, semilla=1):
+    """Lanza los usuarios virtuales y devuelve el reporte."""
+
+    rnd = random.Random(semilla)
+    mezcla = mezcla or MEZCLA
+    desconocidos = set(mezcla) - set(MEZCLA)
+    if desconocidos:
+        raise ValueError(f"Perfiles desconocidos: {', '.join(sorted(desconocidos))}")
+    metricas = Metricas()
+    usuario_base = prefijo.lower().replace(" ", "_")
+    hasta = time.time() + rampa + duracion
+
+    # Calados pendientes por empresa (laboratorio solo ve los suyos)
+    calados = {n: [] for n in range(1, empresas + 1)}
+
+    # Perfiles en la proporción de la mezcla (el más atrasado primero)
+    total = sum(mezcla.values())
+    asignados = {perfil: 0 for perfil in mezcla}
+    perfiles = []
+    for k in range(usuarios):
+        perfil = max(mezcla, key=lambda p: mezcla[p] / total * (k + 1) - asignados[p])
+        asignados[perfil] += 1
+        perfiles.append(perfil)
+    rnd.shuffle(perfiles)
+
+    hilos = []
+    for k, perfil in enumerate(perfiles):
+        n = k % empresas + 1
+        usuario = f"{usuario_base}{n:04d}_" + ("admin" if perfil == "oficina" else "oper")
+        qrs = [f"SYN{n:04d}-{i:06d}" for i in range(silos)]
+        hilos.append(UsuarioVirtual(url, perfil, usuario, qrs, metricas, calados[n], hasta, pausa,
+                                    semilla * 1000 + k))
+
+    for hilo in hilos:
+        hilo.start()
+        if rampa and usuarios > 1:
+            time.sleep(rampa / usuarios)
+
+    for hilo in hilos:
+        hilo.join()
+
+    metricas.fin = time.time()
+    return metricas.reporte()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Prueba de carga con tráfico de campo, laboratorio y oficina")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--empresas", type=int, default=5, help="como en generar_datos.py")
+    p.add_argument("--silos", type=int, default=200, help="silos por empresa, como en generar_datos.py")
+    p.add_argument("--prefijo", default="Sintética")
+    p.add_argument("--usuarios", type=int, default=20, help="usuarios virtuales (hilos)")
+    p.add_argument("--duracion", type=float, default=60, help="segundos a carga plena")
+    p.add_argument("--rampa", type=float, default=5, help="segundos para arrancar todos los usuarios")
+    p.add_argument("--pausa", type=float, default=0.5, help="pausa media entre acciones (s), 0 = sin pausa")
+    p.add_argument("--mezcla", help="p.ej. campo=60,laboratorio=25,oficina=15")
+    p.add_argument("--semilla", type=int, default=1)
+    p.add_argument("--json", help="guardar el reporte en este archivo")
+    a = p.parse_args()
+
+    mezcla = None
+    if a.mezcla:
+        mezcla = {k.strip(): float(v) for k, v in (par.split("=") for par in a.mezcla.split(","))}
+
+    reporte = correr(a.url, a.empresas, a.silos, usuarios=a.usuarios, duracion=a.duracion,
+                     rampa=a.rampa, pausa=a.pausa, prefijo=a.prefijo, mezcla=mezcla, semilla=a.semilla)
+    imprimir(reporte)
+
+    if a.json:
+        with open(a.json, "w", encoding="utf-8") as fh:
+            json.dump(reporte, fh, ensure_ascii=False, indent=1)
@@ -0,0 +1,384 @@
+"""
+Recalcula grado / factor / TAS guardados en analisis, llenado
+y vaciado con las reglas de calidad vigentes (reglas/).
+
+    python recalcular.py --dry-run
+    python recalcular.py
+    python recalcular.py --tablas analisis --empresa 3 --lote 5000
+
+Lee las filas por clave ascendente en lotes (keyset), calcula
+cada lote con calcular_comercial_lote y escribe solo las filas
+que cambian, con un UPDATE por lote. El avance se guarda en la
+tabla recalculos en la misma transacción que el lote: si el
+proceso se corta, al volver a correrlo sigue desde ahí.
+
+Cada fila se calcula con la campaña vigente en su fecha (la
+del muestreo, llenado o vaciado), salvo que se pase --fecha.
+"""
+
+import argparse
+import math
+import time
+from datetime import datetime
+
+import reglas
+from calculos_lote import calcular_comercial_lote
+from db import get_db
+from db_init import init_db
+from migraciones import ejecutar_migraciones
+from utils.versiones import incrementar_version, clave_empresa
+
+LOTE_DEFAULT = 2000
+
+# Diferencias de factor menores a esto no cuentan como cambio
+# (PostgreSQL guarda REAL con precisión simple)
+TOLERANCIA_FACTOR = 1e-6
+
+CAMPOS_LLENADO = [
+    "temperatura", "humedad", "danados", "quebrados", "materia_extrana",
+    "olor", "moho", "chamico",
+]
+
+CAMPOS_VACIADO = CAMPOS_LLENADO + [
+    "ph", "materia_grasa", "acidez", "proteinas", "granos_picados",
+]
+
+CAMPOS_ANALISIS = CAMPOS_LLENADO + [
+    "ph", "granos_carbon", "panza_blanca", "granos_picados",
+    "punta_sombreada", "revolcado_tierra", "punta_negra",
+    "proteinas", "materia_grasa", "acidez",
+]
+
+# grado: cómo lo guarda la ruta que escribe cada tabla
+#   "valor": res["grado"] o 'F/E'       (analisis_seccion)
+#   "texto": str(res["grado"] or 'F/E') (llenado)
+#   None:    no se guarda               (vaciado)
+# faltante_cero: vaciado reemplaza None por 0 antes de calcular
+TABLAS = {
+    "analisis": {
+        "campos": CAMPOS_ANALISIS,
+        "fecha": "m.fecha_muestreo",
+        "join": """
+            JOIN muestreos m ON m.id = t.id_muestreo AND m.empresa_id = t.empresa_id
+            JOIN silos s ON s.numero_qr = m.numero_qr AND s.empresa_id = m.empresa_id
+        """,
+        "grado": "valor",
+        "faltante_cero": False,
+    },
+    "llenado": {
+        "campos": CAMPOS_LLENADO,
+        "fecha": "t.fecha",
+        "join": "JOIN silos s ON s.numero_qr = t.numero_qr AND s.empresa_id = t.empresa_id",
+        "grado": "texto",
+        "faltante_cero": False,
+    },
+    "vaciado": {
+        "campos": CAMPOS_VACIADO,
+        "fecha": "t.fecha",
+        "join": "JOIN silos s ON s.numero_qr = t.numero_qr AND s.empresa_id = t.empresa_id",
+        "grado": None,
+        "faltante_cero": True,
+    },
+}
+
+
+def _clave(conn):
+    # En SQLite rowid existe siempre (id puede no ser alias de rowid)
+    return "id" if conn.es_postgres else "rowid"
+
+
+# ======================================================
+# PROGRESO
+# ======================================================
+
+def leer_progreso(conn, trabajo, tabla):
+    fila = conn.execute("""
+        SELECT ultima_clave, leidos, actualizados, terminado
+        FROM recalculos
+        WHERE trabajo=? AND tabla=?
+    """, (trabajo, tabla)).fetchone()
+    if not fila:
+        return {"ultima_clave": 0, "leidos": 0, "actualizados": 0, "terminado": 0}
+    return dict(fila)
+
+
+def guardar_progreso(conn, trabajo, tabla, progreso):
+    conn.execute("""
+        INSERT INTO recalculos
+            (trabajo, tabla, ultima_clave, leidos, actualizados, terminado, actualizado)
+        VALUES (?,?,?,?,?,?,?)
+        ON CONFLICT (trabajo, tabla) DO UPDATE SET
+            ultima_clave = excluded.ultima_clave,
+            leidos = excluded.leidos,
+            actualizados = excluded.actualizados,
+            terminado = excluded.terminado,
+            actualizado = excluded.actualizado
+    """, (
+        trabajo, tabla,
+        progreso["ultima_clave"], progreso["leidos"],
+        progreso["actualizados"], progreso["terminado"],
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    ))
+
+
+def reiniciar_progreso(conn, trabajo):
+    conn.execute("DELETE FROM recalculos WHERE trabajo=?", (trabajo,))
+    conn.commit()
+
+
+# ======================================================
+# LECTURA POR LOTES
+# ======================================================
+
+def leer_lote(conn, tabla, desde, lote, empresa_id=None):
+    cfg = TABLAS[tabla]
+    clave = _clave(conn)
+
+    columnas = ", ".join(f"t.{c}" for c in cfg["campos"])
+    grado = "t.grado" if cfg["grado"] else "NULL AS grado"
+    filtro = "AND t.empresa_id = ?" if empresa_id else ""
+
+    params = [desde]
+    if empresa_id:
+        params.append(empresa_id)
+    params.append(lote)
+
+    return conn.execute(f"""
+        SELECT t.{clave} AS clave, s.cereal, {cfg['fecha']} AS fecha,
+               {columnas},
+               {grado}, t.factor, t.tas, t.reglas_version
+        FROM {tabla} t
+        {cfg['join']}
+        WHERE t.{clave} > ? {filtro}
+        ORDER BY t.{clave}
+        LIMIT ?
+    """, params).fetchall()
+
+
+# ======================================================
+# CÁLCULO Y COMPARACIÓN
+# ======================================================
+
+def _grado_guardado(forma, grado):
+    if forma == "valor":
+        return grado if grado else "F/E"
+    return str(grado or "F/E")
+
+
+def _distinto_factor(a, b):
+    if a is None or b is None:
+        return a is not b
+    return abs(float(a) - float(b)) > TOLERANCIA_FACTOR
+
+
+def _distinto_tas(a, b):
+    if a is None or b is None:
+        return a is not b
+    return int(a) != int(b)
+
+
+def recalcular_lote(tabla, filas, fecha=None):
+    """
+    filas → (updates, cambios por columna, omitidas).
+    updates: [(grado, factor, tas, reglas_version, clave)] solo de
+    filas con algún valor distinto al guardado.
+    """
+    cfg = TABLAS[tabla]
+    grupos = {}
+    omitidas = 0
+
+    for f in filas:
+        campana = reglas.campana(fecha or f["fecha"])
+        if f["cereal"] not in campana["cereales"]:
+            omitidas += 1
+            continue
+        grupos.setdefault((f["cereal"], campana["version"]), []).append(f)
+
+    updates = []
+    cambios = {"grado": 0, "factor": 0, "tas": 0, "reglas_version": 0}
+
+    for (cereal, version), grupo in grupos.items():
+        columnas = {}
+        for c in cfg["campos"]:
+            valores = [g[c] for g in grupo]
+            if cfg["faltante_cero"]:
+                valores = [0 if v is None else v for v in valores]
+            columnas[c] = valores
+
+        res = calcular_comercial_lote(cereal, columnas, fecha=fecha or grupo[0]["fecha"])
+
+        for i, g in enumerate(grupo):
+            nuevo_factor = float(res["factor"][i])
+            t = res["tas"][i]
+            nuevo_tas = None if math.isnan(t) else int(t)
+            nuevo_grado = (
+                _grado_guardado(cfg["grado"], res["grado"][i]) if cfg["grado"] else None
+            )
+
+            distinto = {
+                "grado": bool(cfg["grado"]) and str(g["grado"]) != str(nuevo_grado),
+                "factor": _distinto_factor(g["factor"], nuevo_factor),
+                "tas": _distinto_tas(g["tas"], nuevo_tas),
+                "reglas_version": g["reglas_version"] != res["reglas_version"],
+            }
+
+            if any(distinto.values()):
+                for k, v in distinto.items():
+                    cambios[k] += v
+                updates.append((
+                    nuevo_grado, nuevo_factor, nuevo_tas, res["reglas_version"], g["clave"]
+                ))
+
+    return updates, cambios, omitidas
+
+
+def escribir_lote(conn, tabla, updates):
+    clave = _clave(conn)
+    if TABLAS[tabla]["grado"]:
+        conn.executemany(f"""
+            UPDATE {tabla} SET grado=?, factor=?, tas=?, reglas_version=?
+            WHERE {clave}=?
+        """, updates)
+    else:
+        conn.executemany(f"""
+            UPDATE {tabla} SET factor=?, tas=?, reglas_version=?
+            WHERE {clave}=?
+        """, [u[1:] for u in updates])
+
+
+# ======================================================
+# TRABAJO
+# ======================================================
+
+def recalcular(tablas=None, lote=LOTE_DEFAULT, dry_run=False, trabajo=None,
+               empresa_id=None, fecha=None, reiniciar=False, informar=print):
+    """
+    Recorre las tablas y devuelve un resumen por tabla. Con
+    dry_run no escribe nada (ni el progreso) y solo cuenta.
+    """
+    tablas = tablas or list(TABLAS)
+    trabajo = trabajo or f"reglas-{reglas.version_vigente(fecha)}" + (
+        f"-empresa{empresa_id}" if empresa_id else ""
+    )
+
+    conn = get_db()
+    resumen = {"trabajo": trabajo, "dry_run": dry_run, "tablas": {}}
+
+    try:
+        if reiniciar and not dry_run:
+            reiniciar_progreso(conn, trabajo)
+
+        for tabla in tablas:
+            if tabla not in TABLAS:
+                raise ValueError(f"Tabla no soportada: {tabla}")
+
+            progreso = (
+                {"ultima_clave": 0, "leidos": 0, "actualizados": 0, "terminado": 0}
+                if dry_run else leer_progreso(conn, trabajo, tabla)
+            )
+
+            r = {"leidos": 0, "actualizados": 0, "omitidas": 0,
+                 "cambios": {"grado": 0, "factor": 0, "tas": 0, "reglas_version": 0},
+                 "segundos": 0.0, "filas_por_segundo": None,
+                 "retomado_desde": progreso["ultima_clave"]}
+            resumen["tablas"][tabla] = r
+
+            if progreso["terminado"]:
+                informar(f"{tabla}: ya terminado en el trabajo {trabajo} (usar --reiniciar)")
+                continue
+
+            inicio = time.monotonic()
+
+            while True:
+                filas = leer_lote(conn, tabla, progreso["ultima_clave"], lote, empresa_id)
+                if not filas:
+                    break
+
+                updates, cambios, omitidas = recalcular_lote(tabla, filas, fecha)
+
+                progreso["ultima_clave"] = filas[-1]["clave"]
+                progreso["leidos"] += len(filas)
+                r["leidos"] += len(filas)
+                r["omitidas"] += omitidas
+                r["actualizados"] += len(updates)
+                for k, v in cambios.items():
+                    r["cambios"][k] += v
+
+                if not dry_run:
+                    if updates:
+                        escribir_lote(conn, tabla, updates)
+                    progreso["actualizados"] += len(updates)
+                    guardar_progreso(conn, trabajo, tabla, progreso)
+                    conn.commit()
+
+                transcurrido = time.monotonic() - inicio
+                informar(
+                    f"  {tabla}: {r['leidos']} filas, {r['actualizados']} con cambios "
+                    f"({r['leidos'] / transcurrido if transcurrido else 0:.0f} filas/s)"
+                )
+
+            if not dry_run:
+                progreso["terminado"] = 1
+                guardar_progreso(conn, trabajo, tabla, progreso)
+                conn.commit()
+
+            r["segundos"] = round(time.monotonic() - inicio, 3)
+            if r["segundos"]:
+                r["filas_por_segundo"] = round(r["leidos"] / r["segundos"], 1)
+
+        # Valores guardados distintos: invalidar caches de exportación / valuación
+        if not dry_run and any(t["actualizados"] for t in resumen["tablas"].values()):
+            ids = [empresa_id] if empresa_id else [
+                e["id"] for e in conn.execute("SELECT id FROM empresas").fetchall()
+            ]
+            for e in ids:
+                incrementar_version(conn, clave_empresa(e))
+            conn.commit()
+
+    finally:
+        conn.close()
+
+    return resumen
+
+
+def _imprimir(resumen):
+    modo = "DRY-RUN (sin escribir)" if resumen["dry_run"] else "aplicado"
+    print(f"\nTrabajo {resumen['trabajo']} — {modo}")
+    for tabla, r in resumen["tablas"].items():
+        c = r["cambios"]
+        print(
+            f"  {tabla}: {r['leidos']} leídas, {r['actualizados']} con cambios "
+            f"(grado {c['grado']}, factor {c['factor']}, tas {c['tas']}, "
+            f"versión {c['reglas_version']}), {r['omitidas']} omitidas, "
+            f"{r['filas_por_segundo'] or 0} filas/s"
+        )
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Recalcula grado/factor/TAS guardados")
+    p.add_argument("--tablas", default=",".join(TABLAS),
+                   help="analisis,llenado,vaciado")
+    p.add_argument("--lote", type=int, default=LOTE_DEFAULT)
+    p.add_argument("--dry-run", action="store_true",
+                   help="solo contar cuántos valores cambiarían")
+    p.add_argument("--empresa", type=int)
+    p.add_argument("--fecha", help="usar la campaña vigente en esta fecha para todas las filas")
+    p.add_argument("--trabajo", help="nombre del trabajo (para retomar)")
+    p.add_argument("--reiniciar", action="store_true",
+                   help="descartar el progreso guardado del trabajo")
+    a = p.parse_args()
+
+    # Mismo orden que app.py: columnas nuevas y tabla de progreso
+    ejecutar_migraciones()
+    init_db()
+
+    resumen = recalcular(
+        tablas=[t.strip() for t in a.tablas.split(",") if t.strip()],
+        lote=a.lote,
+        dry_run=a.dry_run,
+        trabajo=a.trabajo,
+        empresa_id=a.empresa,
+        fecha=a.fecha,
+        reiniciar=a.reiniciar,
+    )
+    _imprimir(resumen)
@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+
+from reglas.compilador import compilar_escalar, compilar_lote
+
+# ======================================================
+# REGLAS DE CALIDAD POR CAMPAÑA
+# ======================================================
+# Cada campaña es un JSON en reglas/campanas/ (o en el
+# directorio de REGLAS_DIR) con su versión, fecha de vigencia
+# y la definición de grado, factor y TAS por cereal.
+#
+# Para cambiar estándares se agrega un archivo nuevo: el
+# directorio se revisa cada VERIFICAR_CADA segundos y los
+# evaluadores se compilan una vez por (versión, cereal).
+
+DIRECTORIO = os.environ.get("REGLAS_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "campanas"
+)
+
+VERIFICAR_CADA = 30
+
+_lock = threading.Lock()
+_estado = {"firma": None, "campanas": [], "verificado": float("-inf"), "hoy": {}}
+_compilados = {}
+
+
+# ======================================================
+# CARGA
+# ======================================================
+
+def _firma():
+    try:
+        nombres = sorted(n for n in os.listdir(DIRECTORIO) if n.endswith(".json"))
+    except FileNotFoundError:
+        return ()
+    return tuple(
+        (n, os.path.getmtime(os.path.join(DIRECTORIO, n))) for n in nombres
+    )
+
+
+def _leer(firma):
+    campanas = []
+    versiones = set()
+
+    for nombre, _ in firma:
+        with open(os.path.join(DIRECTORIO, nombre), encoding="utf-8") as fh:
+            c = json.load(fh)
+
+        for clave in ("version", "vigente_desde", "cereales"):
+            if clave not in c:
+                raise ValueError(f"{nombre}: falta '{clave}'")
+        if c["version"] in versiones:
+            raise ValueError(f"{nombre}: versión repetida {c['version']}")
+        versiones.add(c["version"])
+
+        cereales = c["cereales"]
+        for cereal, definicion in list(cereales.items()):
+            if "igual_a" in definicion:
+                cereales[cereal] = cereales[definicion["igual_a"]]
+
+        campanas.append(c)
+
+    if not campanas:
+        raise ValueError(f"No hay reglas en {DIRECTORIO}")
+
+    campanas.sort(key=lambda c: c["vigente_desde"])
+    return campanas
+
+
+def _campanas():
+    ahora = time.monotonic()
+    if _estado["campanas"] and ahora - _estado["verificado"] < VERIFICAR_CADA:
+        return _estado["campanas"]
+
+    with _lock:
+        if _estado["campanas"] and ahora - _estado["verificado"] < VERIFICAR_CADA:
+            return _estado["campanas"]
+
+        firma = _firma()
+        if firma != _estado["firma"]:
+            try:
+                campanas = _leer(firma)
+                # Se compila todo antes de publicar: un archivo mal
+                # armado no reemplaza a las reglas que funcionan
+                for c in campanas:
+                    for cereal in c["cereales"]:
+                        _compilar(c, cereal)
+            except Exception as e:
+                if not _estado["campanas"]:
+                    raise
+                print(f"Reglas de calidad con error ({e}); sigo con las anteriores")
+            else:
+                _estado["campanas"] = campanas
+            _estado["firma"] = firma
+
+        # Evaluadores de la campaña de hoy, para el camino sin fecha
+        vigente = _vigente(_estado["campanas"], date.today().isoformat())
+        _estado["hoy"] = {
+            cereal: _compilar(vigente, cereal)[0] for cereal in vigente["cereales"]
+        }
+
+        _estado["verificado"] = ahora
+        return _estado["campanas"]
+
+
+def recargar():
+    """Fuerza releer el directorio en el próximo uso."""
+    with _lock:
+        _estado["firma"] = None
+        _estado["verificado"] = float("-inf")
+        _compilados.clear()
+
+
+# ======================================================
+# SELECCIÓN DE CAMPAÑA
+# ======================================================
+
+def _dia(fecha):
+    if fecha is None:
+        return date.today().isoformat()
+    if isinstance(fecha, (date, datetime)):
+        return fecha.isoformat()[:10]
+    return str(fecha)[:10]
+
+
+def _vigente(campanas, dia):
+    vigente = campanas[0]
+    for c in campanas:
+        if c["vigente_desde"] <= dia:
+            vigente = c
+    return vigente
+
+
+def campana(fecha=None):
+    """Campaña vigente en la fecha (hoy si no se indica)."""
+    return _vigente(_campanas(), _dia(fecha))
+
+
+def version_vigente(fecha=None):
+    return campana(fecha)["version"]
+
+
+# ======================================================
+# EVALUADORES
+# ======================================================
+
+def _compilar(c, cereal):
+    clave = (c["version"], cereal)
+    if clave not in _compilados:
+        from calculos import GRILLAS_TAS
+
+        definicion = c["cereales"][cereal]
+        grilla = GRILLAS_TAS[definicion["tas"]]
+        _compilados[clave] = (
+            compilar_escalar(cereal, definicion, c["version"], grilla),
+            compilar_lote(cereal, definicion, c["version"], grilla),
+        )
+    return _compilados[clave]
+
+
+def _evaluadores(cereal, fecha):
+    c = campana(fecha)
+    par = _compilados.get((c["version"], cereal))
+    if par is None:
+        if cereal not in c["cereales"]:
+            raise ValueError(f"Cereal no soportado: {cereal}")
+        with _lock:
+            par = _compilar(c, cereal)
+    return par, c["version"]
+
+
+def evaluador(cereal, fecha=None):
+    """Función d → {grado, factor, tas, reglas_version}."""
+    if fecha is None:
+        _campanas()
+        evaluar = _estado["hoy"].get(cereal)
+        if evaluar is not None:
+            return evaluar
+    return _evaluadores(cereal, fecha)[0][0]
+
+
+def evaluador_lote(cereal, fecha=None):
+    """(función (c, n) → (grado, factor, tas), versión)."""
+    par, version = _evaluadores(cereal, fecha)
+    return par[1], version
+
+
+def evaluar(cereal, d, fecha=None):
+    return evaluador(cereal, fecha)(d)
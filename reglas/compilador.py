@@ -0,0 +1,396 @@
+import math
+import numpy as np
+
+# ======================================================
+# COMPILADOR DE REGLAS
+# ======================================================
+# Convierte la definición de un cereal (JSON de la campaña)
+# en dos evaluadores:
+#
+#   escalar: función Python generada una vez, en línea recta,
+#            que lee cada campo una sola vez y calcula grado,
+#            factor y TAS en una pasada (el grado se reutiliza
+#            en las tolerancias, no se recalcula)
+#   lote:    la misma secuencia sobre columnas NumPy
+#
+# Reglas de equivalencia con los cálculos originales:
+#   - los descuentos se aplican en el orden del JSON
+#   - campo faltante = 0 en grado, exceso, tramos, escala y
+#     directo; en defecto, ajuste y proteína no aplica
+#   - el factor final es max(f, 0), redondeado si corresponde
+
+TIPOS_FACTOR = ("exceso", "defecto", "directo", "tramos", "escala",
+                "ajuste", "tolerancia_grado", "proteina")
+
+
+def _num(x):
+    if x is None:
+        return None
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return None
+
+
+def _numeros(d):
+    """Dict con strings u otros tipos → todo float o None."""
+    return {k: _num(v) for k, v in d.items()}
+
+
+def _lit(x, donde):
+    """Número del JSON → literal Python (solo int/float finitos)."""
+    if isinstance(x, bool) or not isinstance(x, (int, float)) or not math.isfinite(x):
+        raise ValueError(f"{donde}: se esperaba un número, vino {x!r}")
+    return repr(x)
+
+
+# ======================================================
+# VALIDACIÓN
+# ======================================================
+
+def _campos(definicion):
+    """Campos que lee la definición, en orden de aparición."""
+    vistos = []
+
+    def agregar(c):
+        if not isinstance(c, str) or not c:
+            raise ValueError(f"Campo inválido: {c!r}")
+        if c not in vistos:
+            vistos.append(c)
+
+    grado = definicion.get("grado")
+    if grado:
+        if grado.get("ph_minimo") is not None:
+            agregar("ph")
+        for esc in grado["escalones"]:
+            for c in esc["si_supera"]:
+                agregar(c)
+
+    for paso in definicion["factor"]:
+        tipo = paso.get("tipo")
+        if tipo not in TIPOS_FACTOR:
+            raise ValueError(f"Tipo de descuento desconocido: {tipo!r}")
+        if tipo == "directo":
+            for c in paso["campos"]:
+                agregar(c)
+        elif tipo == "tolerancia_grado":
+            for lim in paso["limites"].values():
+                for c in lim:
+                    agregar(c)
+        else:
+            agregar(paso["campo"])
+            if tipo == "proteina" and paso.get("requiere"):
+                agregar(paso["requiere"]["campo"])
+
+    return vistos
+
+
+def _orden_tolerancias(paso, donde):
+    limites = {int(g): lim for g, lim in paso["limites"].items()}
+    ordenes = {tuple(lim) for lim in limites.values()}
+    if len(ordenes) != 1:
+        # el evaluador en lote resta campo por campo: mismo orden en todos los grados
+        raise ValueError(f"{donde}: los grados deben tener los mismos campos y en el mismo orden")
+    return limites, list(ordenes.pop())
+
+
+# ======================================================
+# EVALUADOR ESCALAR
+# ======================================================
+
+def compilar_escalar(cereal, definicion, version, grilla):
+    donde = f"{version}/{cereal}"
+    campos = _campos(definicion)
+    var = {c: f"v{i}" for i, c in enumerate(campos)}
+    cero = {c: f"z{i}" for i, c in enumerate(campos)}
+
+    L = ["def _evaluar(d, _grilla=_grilla, _version=_version):", "    _g = d.get"]
+
+    for c in campos:
+        L.append(f"    {var[c]} = _g({c!r})")
+        L.append(f"    {cero[c]} = {var[c]} or 0")
+
+    # ----- grado -----
+    grado = definicion.get("grado")
+    if grado:
+        primero = True
+        ph_min = grado.get("ph_minimo")
+        if ph_min is not None:
+            L.append(f"    if {var['ph']} is not None and {var['ph']} < {_lit(ph_min, donde)}:")
+            L.append("        g = None")
+            primero = False
+        for esc in grado["escalones"]:
+            cond = " or ".join(
+                f"{cero[c]} > {_lit(lim, donde)}" for c, lim in esc["si_supera"].items()
+            )
+            L.append(f"    {'if' if primero else 'elif'} {cond}:")
+            L.append(f"        g = {esc['grado']!r}" if esc["grado"] is None else f"        g = {int(esc['grado'])}")
+            primero = False
+        if primero:
+            L.append(f"    g = {int(grado.get('base', 1))}")
+        else:
+            L.append("    else:")
+            L.append(f"        g = {int(grado.get('base', 1))}")
+    else:
+        L.append("    g = None")
+
+    # ----- factor -----
+    L.append("    f = 1.0")
+
+    for paso in definicion["factor"]:
+        tipo = paso["tipo"]
+
+        if tipo == "exceso":
+            z, lim, t = cero[paso["campo"]], _lit(paso["limite"], donde), _lit(paso["tasa"], donde)
+            L.append(f"    if {z} > {lim}: f -= ({z} - {lim}) * {t}")
+
+        elif tipo == "defecto":
+            v, lim, t = var[paso["campo"]], _lit(paso["limite"], donde), _lit(paso["tasa"], donde)
+            L.append(f"    if {v} is not None and {v} < {lim}: f -= ({lim} - {v}) * {t}")
+
+        elif tipo == "directo":
+            suma = " + ".join(cero[c] for c in paso["campos"])
+            if len(paso["campos"]) > 1:
+                suma = f"({suma})"
+            L.append(f"    f -= {suma} / 100")
+
+        elif tipo == "ajuste":
+            v, base, t = var[paso["campo"]], _lit(paso["base"], donde), _lit(paso["tasa"], donde)
+            L.append(f"    if {v} is not None: f += ({v} - {base}) * {t}")
+
+        elif tipo == "tramos":
+            z = cero[paso["campo"]]
+            for tr in paso["tramos"]:
+                desde, t = _lit(tr["desde"], donde), _lit(tr["tasa"], donde)
+                if tr.get("hasta") is None:
+                    L.append(f"    if {z} > {desde}: f -= ({z} - {desde}) * {t}")
+                else:
+                    hasta = _lit(tr["hasta"], donde)
+                    L.append(f"    if {z} > {desde}: f -= (({hasta} if {z} > {hasta} else {z}) - {desde}) * {t}")
+
+        elif tipo == "escala":
+            z = cero[paso["campo"]]
+            primero = True
+            for esc in paso["escalones"]:
+                if "mayor_a" in esc:
+                    cond = f"{z} > {_lit(esc['mayor_a'], donde)}"
+                else:
+                    cond = f"{_lit(esc['desde'], donde)} <= {z} <= {_lit(esc['hasta'], donde)}"
+                L.append(f"    {'if' if primero else 'elif'} {cond}: f -= {_lit(esc['descuento'], donde)}")
+                primero = False
+
+        elif tipo == "tolerancia_grado":
+            limites, _ = _orden_tolerancias(paso, donde)
+            t = _lit(paso["tasa"], donde)
+            primero = True
+            for g, lim in sorted(limites.items()):
+                L.append(f"    {'if' if primero else 'elif'} g == {g}:")
+                for c, valor in lim.items():
+                    z, l = cero[c], _lit(valor, donde)
+                    L.append(f"        if {z} > {l}: f -= ({z} - {l}) * {t}")
+                primero = False
+
+        elif tipo == "proteina":
+            v, base = var[paso["campo"]], _lit(paso["base"], donde)
+            cond = f"{v} is not None"
+            req = paso.get("requiere")
+            if req:
+                r = var[req["campo"]]
+                cond += f" and {r} is not None and {r} >= {_lit(req['minimo'], donde)}"
+            L.append(f"    if {cond}:")
+            L.append(f"        if {v} < {base}:")
+            L.append("            desc = 0")
+            for tr in paso["tramos"]:
+                techo, t = _lit(tr["techo"], donde), _lit(tr["tasa"], donde)
+                if tr.get("piso") is None:
+                    L.append(f"            if {v} < {techo}: desc += ({techo} - {v}) * {t}")
+                else:
+                    piso = _lit(tr["piso"], donde)
+                    L.append(f"            if {v} < {piso}: desc += ({techo} - {piso}) * {t}")
+                    L.append(f"            elif {v} < {techo}: desc += ({techo} - {v}) * {t}")
+            L.append("            f -= desc")
+            if paso.get("bonificacion"):
+                L.append(f"        elif {v} > {base}: f += ({v} - {base}) * {_lit(paso['bonificacion'], donde)}")
+
+    redondeo = definicion.get("redondeo")
+    if redondeo is None:
+        L.append("    f = max(f, 0)")
+    else:
+        L.append(f"    f = round(max(f, 0), {int(redondeo)})")
+
+    L.append("    tas = _grilla.valor(_g('temperatura'), _g('humedad'))")
+
+    if grado:
+        L.append("    g = g if g is not None else 'F/E'")
+
+    L.append("    return {'grado': g, 'factor': f, 'tas': tas, 'reglas_version': _version}")
+
+    # z* solo donde se usa el valor con faltante = 0
+    cuerpo = "\n".join(L)
+    L = [
+        l for l in L
+        if not l.startswith("    z") or cuerpo.count(l.split(" = ")[0].strip()) > 1
+    ]
+
+    # Los valores se usan tal cual; si algún campo no es numérico
+    # (string de un formulario) se convierte el dict y se reintenta
+    L += [
+        "",
+        "def evaluar(d):",
+        "    try:",
+        "        return _evaluar(d)",
+        "    except TypeError:",
+        "        return _evaluar(_numeros(d))",
+    ]
+
+    fuente = "\n".join(L) + "\n"
+    espacio = {"_numeros": _numeros, "_grilla": grilla, "_version": version}
+    exec(compile(fuente, f"<reglas {donde}>", "exec"), espacio)
+
+    evaluar = espacio["evaluar"]
+    evaluar.fuente = fuente
+    return evaluar
+
+
+# ======================================================
+# EVALUADOR EN LOTE
+# ======================================================
+
+def _cero(x):
+    return np.where(np.isnan(x), 0.0, x)
+
+
+def _descuento(f, mascara, valor):
+    return f - np.where(mascara, valor, 0.0)
+
+
+def compilar_lote(cereal, definicion, version, grilla):
+    """
+    Devuelve evaluar(c, n): c(campo) → array float (NaN = falta)
+    y n filas. Resultado: (grado object, factor float, tas float).
+    """
+    donde = f"{version}/{cereal}"
+    _campos(definicion)
+
+    grado = definicion.get("grado")
+    pasos = []
+
+    for paso in definicion["factor"]:
+        if paso["tipo"] == "tolerancia_grado":
+            limites, orden = _orden_tolerancias(paso, donde)
+            pasos.append({**paso, "_limites": limites, "_orden": orden})
+        else:
+            pasos.append(paso)
+
+    redondeo = definicion.get("redondeo")
+
+    def evaluar(c, n):
+        # ----- grado (0 = fuera de estándar) -----
+        if grado:
+            nivel = np.full(n, int(grado.get("base", 1)))
+            asignado = np.zeros(n, dtype=bool)
+
+            ph_min = grado.get("ph_minimo")
+            if ph_min is not None:
+                ph = c("ph")
+                bajo = ~np.isnan(ph) & (ph < ph_min)
+                nivel[bajo] = 0
+                asignado |= bajo
+
+            for esc in grado["escalones"]:
+                supera = np.zeros(n, dtype=bool)
+                for campo, lim in esc["si_supera"].items():
+                    supera |= _cero(c(campo)) > lim
+                nuevo = supera & ~asignado
+                nivel[nuevo] = 0 if esc["grado"] is None else int(esc["grado"])
+                asignado |= nuevo
+
+            g = np.array(nivel.tolist(), dtype=object)
+            g[nivel == 0] = "F/E"
+        else:
+            nivel = np.zeros(n, dtype=int)
+            g = np.full(n, None, dtype=object)
+
+        # ----- factor -----
+        f = np.ones(n)
+
+        for paso in pasos:
+            tipo = paso["tipo"]
+
+            if tipo == "exceso":
+                z, lim = _cero(c(paso["campo"])), paso["limite"]
+                f = _descuento(f, z > lim, (z - lim) * paso["tasa"])
+
+            elif tipo == "defecto":
+                v, lim = c(paso["campo"]), paso["limite"]
+                f = _descuento(f, ~np.isnan(v) & (v < lim), (lim - v) * paso["tasa"])
+
+            elif tipo == "directo":
+                suma = _cero(c(paso["campos"][0]))
+                for campo in paso["campos"][1:]:
+                    suma = suma + _cero(c(campo))
+                f = f - suma / 100
+
+            elif tipo == "ajuste":
+                v = c(paso["campo"])
+                f = f + np.where(~np.isnan(v), (v - paso["base"]) * paso["tasa"], 0.0)
+
+            elif tipo == "tramos":
+                z = _cero(c(paso["campo"]))
+                for tr in paso["tramos"]:
+                    tope = z if tr.get("hasta") is None else np.minimum(z, tr["hasta"])
+                    f = _descuento(f, z > tr["desde"], (tope - tr["desde"]) * tr["tasa"])
+
+            elif tipo == "escala":
+                z = _cero(c(paso["campo"]))
+                condiciones, descuentos = [], []
+                for esc in paso["escalones"]:
+                    if "mayor_a" in esc:
+                        condiciones.append(z > esc["mayor_a"])
+                    else:
+                        condiciones.append((z >= esc["desde"]) & (z <= esc["hasta"]))
+                    descuentos.append(esc["descuento"])
+                f = f - np.select(condiciones, descuentos, 0.0)
+
+            elif tipo == "tolerancia_grado":
+                grados = sorted(paso["_limites"])
+                for campo in paso["_orden"]:
+                    v = c(campo)
+                    lim = np.select(
+                        [nivel == k for k in grados],
+                        [paso["_limites"][k][campo] for k in grados],
+                        np.inf
+                    )
+                    f = _descuento(f, v > lim, (v - lim) * paso["tasa"])
+
+            elif tipo == "proteina":
+                p, base = c(paso["campo"]), paso["base"]
+                aplica = ~np.isnan(p)
+                req = paso.get("requiere")
+                if req:
+                    r = c(req["campo"])
+                    aplica &= ~np.isnan(r) & (r >= req["minimo"])
+
+                desc = np.zeros(n)
+                for tr in paso["tramos"]:
+                    techo, t = tr["techo"], tr["tasa"]
+                    parcial = np.where(p < techo, (techo - p) * t, 0.0)
+                    if tr.get("piso") is None:
+                        desc = desc + parcial
+                    else:
+                        desc = desc + np.where(p < tr["piso"], (techo - tr["piso"]) * t, parcial)
+
+                f = _descuento(f, aplica & (p < base), desc)
+                if paso.get("bonificacion"):
+                    f = f + np.where(aplica & (p > base), (p - base) * paso["bonificacion"], 0.0)
+
+        f = np.where(f < 0, 0.0, f)
+        if redondeo is not None:
+            # round() de Python: mismo redondeo que el escalar
+            f = np.array([round(x, int(redondeo)) for x in f.tolist()], dtype=float)
+
+        tas = grilla.valores_lote(c("temperatura"), c("humedad"))
+
+        return g, f, tas
+
+    return evaluar
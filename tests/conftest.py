@@ -0,0 +1,80 @@
+import os
+import sys
+
+# Los módulos de la app viven en la raíz del repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _caches_de_proceso():
+    """Cada test trae su propia base: nada de lo que el proceso leyó en el anterior."""
+    from utils import login
+    from utils.empresas import olvidar_empresas
+    from utils.usuarios import olvidar_usuarios
+
+    olvidar_empresas()
+    olvidar_usuarios()
+    login.reiniciar()
+    yield
+    olvidar_empresas()
+    olvidar_usuarios()
+    login.reiniciar()
+
+
+# ======================================================
+# BASE DE PRUEBA
+# ======================================================
+# base_vacia: SQLite nueva en tmp_path, creada en el orden en que
+#   arranca app.py (migraciones y después init_db): una columna que
+#   solo agregue una migración falta acá igual que en producción.
+# base: además, datos de generar_datos. El tamaño se elige por
+#   test o por módulo con la marca `datos`:
+#       pytestmark = pytest.mark.datos(empresas=2, silos=15, dias_mercado=2)
+# entrar: cliente de la app logueado como el usuario pedido (admin
+#   de la primera empresa si no se pide otro).
+
+DATOS_DEFAULT = {"empresas": 1, "silos": 10, "dias_mercado": 0}
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "datos(**kw): argumentos de generar_datos.generar para la fixture base")
+
+
+@pytest.fixture
+def base_vacia(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+
+    from db_init import init_db
+    from migraciones import ejecutar_migraciones
+
+    ejecutar_migraciones()
+    init_db()
+    return tmp_path
+
+
+@pytest.fixture
+def base(base_vacia, request):
+    from datetime import datetime
+
+    import generar_datos
+
+    marca = request.node.get_closest_marker("datos")
+    kw = {**DATOS_DEFAULT, **(marca.kwargs if marca else {})}
+    generar_datos.generar(hasta=datetime(2026, 10, 15), informar=lambda m: None, **kw)
+    return base_vacia
+
+
+@pytest.fixture
+def entrar(base):
+    import generar_datos
+    from app import app
+
+    def entrar(usuario="sintética0001_admin", clave=generar_datos.CLAVE):
+        cliente = app.test_client()
+        cliente.post("/login", data={"username": usuario, "password": clave})
+        return cliente
+
+    return entrar
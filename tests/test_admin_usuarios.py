@@ -0,0 +1,178 @@
+import pytest
+
+pytestmark = pytest.mark.datos(empresas=2, silos=2)
+
+
+@pytest.fixture
+def admin(entrar):
+    """Admin de la primera de dos empresas, con 60 usuarios extra en cada una."""
+    from db import get_db
+
+    conn = get_db()
+    empresas = [r["id"] for r in conn.execute("SELECT id FROM empresas ORDER BY id").fetchall()]
+    for e, empresa_id in enumerate(empresas, start=1):
+        for n in range(60):
+            conn.execute(
+                "INSERT INTO usuarios (username, password, rol, empresa_id) VALUES (?,?,?,?)",
+                (f"e{e}_extra{n:02d}", "x", "user", empresa_id)
+            )
+            uid = conn.execute("SELECT id FROM usuarios WHERE username=?", (f"e{e}_extra{n:02d}",)).fetchone()["id"]
+            conn.execute("INSERT INTO permisos (user_id, pantalla) VALUES (?,?)", (uid, "calado"))
+    conn.commit()
+    conn.close()
+
+    return entrar()
+
+
+def test_paginado_y_solo_de_la_empresa(admin):
+    datos = admin.get("/admin/usuarios/datos").get_json()
+
+    # 60 extra + admin + oper de la empresa
+    assert datos["total"] == 62
+    assert datos["paginas"] == 2
+    assert len(datos["usuarios"]) == 50
+
+    ultima = admin.get("/admin/usuarios/datos?pagina=9").get_json()
+    assert ultima["pagina"] == 2 and len(ultima["usuarios"]) == 12
+
+    nombres = {u["username"] for u in datos["usuarios"] + ultima["usuarios"]}
+    assert not any(n.startswith("e2_") or n.startswith("sintética0002") for n in nombres)
+
+    extra = next(u for u in datos["usuarios"] if u["username"].startswith("e1_extra"))
+    assert extra["permisos"] == ["calado"]
+
+
+def test_busqueda(admin):
+    datos = admin.get("/admin/usuarios/datos?q=EXTRA1&por_pagina=5").get_json()
+    assert datos["total"] == 10
+    assert datos["paginas"] == 2
+    assert all("extra1" in u["username"] for u in datos["usuarios"])
+
+
+def test_pagina_html_y_vuelta_al_listado(admin):
+    r = admin.get("/admin/usuarios?q=extra0")
+    assert r.status_code == 200
+    assert b"e1_extra05" in r.data and b"e1_extra15" not in r.data
+
+    datos = admin.get("/admin/usuarios/datos?q=extra05").get_json()
+    uid = datos["usuarios"][0]["id"]
+    r = admin.post("/admin/permisos", data={"user_id": uid, "permisos": ["panel"], "q": "extra05", "pagina": "1"})
+    assert r.status_code == 302
+    assert "q=extra05" in r.headers["Location"]
+
+    datos = admin.get("/admin/usuarios/datos?q=extra05").get_json()
+    assert datos["usuarios"][0]["permisos"] == ["panel"]
+
+
+def test_operario_sin_acceso(admin, entrar):
+
+    oper = entrar("sintética0001_oper")
+    assert oper.get("/admin/usuarios/datos").status_code == 403
+
+
+def _ids(*nombres):
+    from db import get_db
+    conn = get_db()
+    ids = [conn.execute("SELECT id FROM usuarios WHERE username=?", (n,)).fetchone()["id"] for n in nombres]
+    conn.close()
+    return ids
+
+
+def _permisos(uid):
+    from db import get_db
+    conn = get_db()
+    filas = conn.execute("SELECT id, pantalla FROM permisos WHERE user_id=? ORDER BY pantalla", (uid,)).fetchall()
+    conn.close()
+    return [(f["id"], f["pantalla"]) for f in filas]
+
+
+def test_lote_aplica_solo_diferencias(admin):
+    a, b, ajeno = _ids("e1_extra00", "e1_extra01", "e2_extra00")
+    calado_a = _permisos(a)[0]
+
+    r = admin.post("/admin/permisos/lote", json={"usuarios": {
+        str(a): ["calado", "panel"],
+        str(b): [],
+        str(ajeno): ["admin"],
+    }})
+    assert r.get_json() == {"ok": True, "altas": 1, "bajas": 1}
+
+    # La fila existente no se borró y reinsertó
+    assert _permisos(a)[0] == calado_a
+    assert [p for _, p in _permisos(a)] == ["calado", "panel"]
+    assert _permisos(b) == []
+    # Otra empresa: intacta
+    assert [p for _, p in _permisos(ajeno)] == ["calado"]
+
+    # Repetir no cambia nada
+    r = admin.post("/admin/permisos/lote", json={"usuarios": {str(a): ["calado", "panel"]}})
+    assert r.get_json() == {"ok": True, "altas": 0, "bajas": 0}
+
+
+def test_lote_rechaza_pantallas_desconocidas(admin):
+    a, = _ids("e1_extra00")
+    r = admin.post("/admin/permisos/lote", json={"usuarios": {str(a): ["panel", "root"]}})
+    assert r.status_code == 400
+    assert [p for _, p in _permisos(a)] == ["calado"]
+
+
+def test_aprobar_varias_solicitudes(admin):
+    from db import get_db
+
+    a, b, ajeno = _ids("e1_extra00", "e1_extra01", "e2_extra00")
+    conn = get_db()
+    for uid, pantalla in [(a, "panel"), (b, "comercial"), (b, "calado"), (ajeno, "admin")]:
+        conn.execute("INSERT INTO solicitudes (user_id, pantalla, fecha) VALUES (?,?,?)", (uid, pantalla, "2026-10-15"))
+    conn.commit()
+    ids = [r["id"] for r in conn.execute("SELECT id FROM solicitudes ORDER BY id").fetchall()]
+    conn.close()
+
+    assert admin.post("/admin/aprobar_solicitud", data={"id": ids}).status_code == 302
+
+    assert [p for _, p in _permisos(a)] == ["calado", "panel"]
+    assert [p for _, p in _permisos(b)] == ["calado", "comercial"]
+    assert [p for _, p in _permisos(ajeno)] == ["calado"]
+
+    conn = get_db()
+    estados = [r["estado"] for r in conn.execute("SELECT estado FROM solicitudes ORDER BY id").fetchall()]
+    conn.close()
+    assert estados == ["aprobado", "aprobado", "aprobado", "pendiente"]
+
+
+def test_solicitudes_solo_las_resuelve_el_admin(admin, entrar):
+    from db import get_db
+
+    oper = entrar("sintética0001_oper")
+    uid, = _ids("sintética0001_oper")
+
+    oper.post("/admin/solicitar_acceso/admin")
+    conn = get_db()
+    sid = conn.execute("SELECT id FROM solicitudes WHERE user_id=?", (uid,)).fetchone()["id"]
+    conn.close()
+
+    # El que pidió no puede aprobarse (ni rechazar) a sí mismo
+    assert oper.post("/admin/aprobar_solicitud", data={"id": sid}).status_code == 403
+    assert oper.post("/admin/rechazar_solicitud", data={"id": sid}).status_code == 403
+    assert "admin" not in [p for _, p in _permisos(uid)]
+
+
+def test_no_se_aprueban_pantallas_inexistentes(admin):
+    from db import get_db
+
+    a, ajeno = _ids("e1_extra00", "e2_extra00")
+    conn = get_db()
+    conn.execute("INSERT INTO solicitudes (user_id, pantalla, fecha) VALUES (?,?,?)", (a, "root", "2026-10-15"))
+    conn.execute("INSERT INTO solicitudes (user_id, pantalla, fecha) VALUES (?,?,?)", (ajeno, "panel", "2026-10-15"))
+    conn.commit()
+    ids = [r["id"] for r in conn.execute("SELECT id FROM solicitudes ORDER BY id").fetchall()]
+    conn.close()
+
+    admin.post("/admin/aprobar_solicitud", data={"id": ids[0]})
+    # Rechazar una solicitud de otra empresa no hace nada
+    admin.post("/admin/rechazar_solicitud", data={"id": ids[1]})
+
+    assert [p for _, p in _permisos(a)] == ["calado"]
+    conn = get_db()
+    estados = [r["estado"] for r in conn.execute("SELECT estado FROM solicitudes ORDER BY id").fetchall()]
+    conn.close()
+    assert estados == ["pendiente", "pendiente"]
@@ -0,0 +1,85 @@
+import os
+import time
+
+import pytest
+
+pytestmark = pytest.mark.datos(dias_mercado=1)
+
+
+@pytest.fixture
+def cliente(entrar):
+    return entrar()
+
+
+def _detalles():
+    from db import get_db
+
+    conn = get_db()
+    filas = conn.execute("""
+        SELECT detalle FROM auditoria WHERE accion='exportacion_excel' ORDER BY id
+    """).fetchall()
+    conn.close()
+    return [f["detalle"] for f in filas]
+
+
+def test_mismos_datos_sale_del_cache(cliente):
+    primera = cliente.get("/exportar_excel")
+    assert primera.status_code == 200
+    etag = primera.headers["ETag"]
+    assert primera.headers["Last-Modified"]
+
+    segunda = cliente.get("/exportar_excel")
+    assert segunda.status_code == 200
+    assert segunda.headers["ETag"] == etag
+    assert segunda.data == primera.data
+
+    revalida = cliente.get("/exportar_excel", headers={"If-None-Match": etag})
+    assert revalida.status_code == 304
+
+    assert _detalles() == ["Exportación nivel admin"] + ["Exportación nivel admin (cache)"] * 2
+
+
+def test_cambio_de_datos_o_de_pizarra_invalida(cliente):
+    from db import get_db
+    from utils.versiones import marcar_cambio_empresa
+
+    etag = cliente.get("/exportar_excel").headers["ETag"]
+
+    marcar_cambio_empresa(1)
+    r = cliente.get("/exportar_excel", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    etag = r.headers["ETag"]
+
+    conn = get_db()
+    conn.execute("UPDATE mercado SET pizarra_manual=123456, usar_manual=1 WHERE empresa_id=1")
+    conn.commit()
+    conn.close()
+    assert cliente.get("/exportar_excel").headers["ETag"] != etag
+
+    # La versión reemplazada se borra del disco
+    from panel import cache_excel
+    assert len(os.listdir(cache_excel.EXPORT_CACHE_DIR)) == 1
+
+
+def test_desalojo_por_edad_y_tamano(cliente, monkeypatch):
+    from panel import cache_excel
+
+    cliente.get("/exportar_excel")
+    (entrada,) = os.listdir(cache_excel.EXPORT_CACHE_DIR)
+    clave = entrada[:-len(".xlsx")]
+    assert cache_excel.vigente(clave)
+
+    viejo = time.time() - (cache_excel.EXPORT_CACHE_HORAS + 1) * 3600
+    os.utime(cache_excel.ruta(clave), (viejo, viejo))
+    assert not cache_excel.vigente(clave)
+    cache_excel.limpiar()
+    assert os.listdir(cache_excel.EXPORT_CACHE_DIR) == []
+
+    # Por tamaño: sin lugar, sobrevive solo la recién guardada
+    for n in range(3):
+        with open(cache_excel.ruta(f"9_admin_xlsx_{n}"), "wb") as f:
+            f.write(b"x" * 1024)
+    monkeypatch.setattr(cache_excel, "EXPORT_CACHE_MB", 0)
+    cliente.get("/exportar_excel")
+    assert os.listdir(cache_excel.EXPORT_CACHE_DIR) == [entrada]
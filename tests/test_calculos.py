@@ -0,0 +1,221 @@
+import json
+import math
+import os
+import random
+
+import pytest
+
+import calculos
+
+
+CEREALES = ["Maíz", "Trigo", "Soja", "Girasol", "Colza", "Sorgo"]
+
+GOLDEN = os.path.join(os.path.dirname(__file__), "golden", "calculos.json")
+
+FACTORES = {
+    "Maíz": calculos.factor_maiz,
+    "Trigo": calculos.factor_trigo,
+    "Soja": calculos.factor_soja,
+    "Girasol": calculos.factor_girasol,
+    "Sorgo": calculos.factor_sorgo,
+}
+
+TAS = [
+    ("Maíz", calculos.TAS_MAIZ, "hum_temp"),
+    ("Trigo", calculos.TAS_TRIGO, "temp_hum"),
+    ("Soja", calculos.TAS_SOJA, "hum_temp"),
+    ("Girasol", calculos.TAS_COLZA_GIRASOL, "hum_temp"),
+]
+
+MERMAS = [
+    ("Maíz", calculos.merma_maiz, calculos.MERMA_MAIZ, 14.5, 0.25),
+    ("Soja", calculos.merma_soja, calculos.MERMA_SOJA, 13.5, 0.25),
+    ("Trigo", calculos.merma_trigo, calculos.MERMA_TRIGO, 14.0, 0.10),
+    ("Girasol", calculos.merma_girasol, calculos.MERMA_GIRASOL, 11.0, 0.20),
+    ("Sorgo", calculos.merma_sorgo, calculos.MERMA_SORGO, 15.0, 0.25),
+]
+
+# Campos cuyo aumento nunca puede mejorar el factor, por cereal.
+# En trigo danados / quebrados / materia extraña cambian el grado
+# y con él las tolerancias, así que no son monótonos por diseño.
+DANOS = {
+    "Maíz": ["danados", "quebrados", "materia_extrana", "olor", "moho"],
+    "Trigo": ["granos_carbon", "panza_blanca", "olor", "punta_sombreada",
+              "revolcado_tierra", "punta_negra"],
+    "Soja": ["danados", "materia_extrana", "olor", "moho"],
+    "Girasol": ["acidez", "materia_extrana", "chamico", "olor", "moho"],
+    "Sorgo": ["danados", "materia_extrana", "quebrados", "granos_picados",
+              "olor", "moho", "chamico"],
+}
+
+
+def _analisis(rnd, cereal):
+    """Análisis completo al azar, sin bonificaciones (grasa ≤ 42, proteína ≤ 11)."""
+    return {
+        "temperatura": rnd.uniform(0, 45),
+        "humedad": rnd.uniform(8, 30),
+        "ph": rnd.uniform(60, 85),
+        "danados": rnd.uniform(0, 15),
+        "quebrados": rnd.uniform(0, 10),
+        "materia_extrana": rnd.uniform(0, 8),
+        "olor": rnd.choice([0, 0, 1, 2.5]),
+        "moho": rnd.choice([0, 0, 1, 3]),
+        "chamico": rnd.uniform(0, 150),
+        "granos_carbon": rnd.uniform(0, 0.5),
+        "panza_blanca": rnd.uniform(0, 50),
+        "granos_picados": rnd.uniform(0, 3),
+        "punta_sombreada": rnd.uniform(0, 2),
+        "revolcado_tierra": rnd.uniform(0, 1),
+        "punta_negra": rnd.uniform(0, 2),
+        "proteinas": rnd.uniform(7, 11),
+        "materia_grasa": rnd.uniform(35, 42),
+        "acidez": rnd.uniform(0, 4),
+    }
+
+
+# ======================================================
+# PROPIEDADES
+# ======================================================
+
+@pytest.mark.parametrize("cereal", list(DANOS))
+def test_factor_no_mejora_con_mas_dano(cereal):
+    rnd = random.Random(sum(map(ord, cereal)))
+    factor = FACTORES[cereal]
+
+    for _ in range(500):
+        d = _analisis(rnd, cereal)
+        campo = rnd.choice(DANOS[cereal])
+        if cereal == "Sorgo" and campo == "chamico":
+            # Cantidad de semillas: las escalas saltan de 10 a 11, de
+            # 20 a 21... y un valor fraccionario cae entre escalas
+            d[campo] = float(int(d[campo]))
+            mas = dict(d, **{campo: d[campo] + rnd.randint(1, 5)})
+        else:
+            mas = dict(d, **{campo: d[campo] + rnd.uniform(0.01, 5)})
+        assert factor(mas) <= factor(d), (campo, d, mas)
+
+
+@pytest.mark.parametrize("cereal", CEREALES)
+def test_factor_acotado(cereal):
+    rnd = random.Random(sum(map(ord, cereal)) + 7)
+
+    for _ in range(2000):
+        d = _analisis(rnd, cereal)
+        res = calculos.calcular_comercial(cereal, d)
+        assert math.isfinite(res["factor"])
+        # Sin bonificaciones el factor queda en [0, 1]
+        assert 0 <= res["factor"] <= 1, d
+
+        # Con bonificación puede superar 1, nunca bajar de 0
+        d["materia_grasa"] = rnd.uniform(42, 55)
+        d["proteinas"] = rnd.uniform(11, 15)
+        assert calculos.calcular_comercial(cereal, d)["factor"] >= 0
+
+
+@pytest.mark.parametrize("cereal", CEREALES)
+def test_grado_valido(cereal):
+    rnd = random.Random(sum(map(ord, cereal)) + 11)
+    con_grado = cereal in ("Maíz", "Trigo", "Sorgo")
+
+    for _ in range(1000):
+        grado = calculos.calcular_comercial(cereal, _analisis(rnd, cereal))["grado"]
+        if con_grado:
+            assert grado in (1, 2, 3, "F/E")
+        else:
+            assert grado is None
+
+
+@pytest.mark.parametrize("cereal,tabla,orden", TAS)
+def test_tas_cubre_toda_la_tabla(cereal, tabla, orden):
+    for externo, fila in tabla.items():
+        for interno, dias in fila.items():
+            temp, hum = (interno, externo) if orden == "hum_temp" else (externo, interno)
+            assert calculos.calcular_comercial(cereal, {"temperatura": temp, "humedad": hum})["tas"] == dias
+
+
+def test_tas_sin_datos():
+    for cereal in CEREALES:
+        assert calculos.calcular_comercial(cereal, {"humedad": 14})["tas"] is None
+        assert calculos.calcular_comercial(cereal, {"temperatura": 20})["tas"] is None
+
+
+@pytest.mark.parametrize("cereal,merma,tabla,umbral,manipuleo", MERMAS)
+def test_merma_cubre_toda_la_tabla(cereal, merma, tabla, umbral, manipuleo):
+    for humedad, valor in tabla.items():
+        assert merma(humedad) == round(valor + manipuleo, 2)
+
+    assert merma(umbral) == 0
+    assert merma(umbral - 3) == 0
+    assert merma(None) == 0
+
+    # No decrece con la humedad
+    anterior = 0
+    h = umbral
+    while h < max(tabla) + 2:
+        actual = merma(h)
+        assert actual >= anterior, h
+        anterior = actual
+        h = round(h + 0.05, 2)
+
+
+# ======================================================
+# VALORES DE REFERENCIA (golden)
+# ======================================================
+# tests/golden/calculos.json guarda entrada → salida por cereal.
+# Si un cambio de reglas es intencional, regenerar con:
+#   GOLDEN_REGENERAR=1 python -m pytest tests/test_calculos.py -k golden
+
+def _casos_golden():
+    rnd = random.Random(2025)
+    casos = {}
+    for cereal in CEREALES:
+        lista = [
+            {"temperatura": 20, "humedad": 14},
+            {"temperatura": 25, "humedad": 16, "ph": 68.5, "danados": 9, "quebrados": 6, "materia_extrana": 2.5},
+            {"temperatura": 12.5, "humedad": 15, "ph": 76, "proteinas": 9.5, "danados": 1.5},
+            {"temperatura": 30, "humedad": 18, "materia_grasa": 45, "acidez": 2, "materia_extrana": 4},
+            {"temperatura": 5, "humedad": 24, "chamico": 55, "granos_picados": 1.5, "olor": 1, "moho": 1},
+        ]
+        for _ in range(10):
+            d = _analisis(rnd, cereal)
+            lista.append({k: round(v, 2) for k, v in d.items()})
+        casos[cereal] = lista
+    return casos
+
+
+def _salida(cereal, d):
+    res = calculos.calcular_comercial(cereal, d, fecha="2025-08-01")
+    return {
+        "grado": res["grado"],
+        "factor": res["factor"],
+        "tas": res["tas"],
+        "merma": calculos.calcular_merma_humedad(cereal, d.get("humedad")),
+    }
+
+
+def test_golden():
+    casos = _casos_golden()
+
+    if os.environ.get("GOLDEN_REGENERAR"):
+        os.makedirs(os.path.dirname(GOLDEN), exist_ok=True)
+        datos = {
+            cereal: [{"entrada": d, "salida": _salida(cereal, d)} for d in lista]
+            for cereal, lista in casos.items()
+        }
+        # Un caso por línea para que los diffs se lean
+        with open(GOLDEN, "w", encoding="utf-8") as fh:
+            fh.write("{\n")
+            for i, (cereal, lista) in enumerate(datos.items()):
+                fh.write(f" {json.dumps(cereal, ensure_ascii=False)}: [\n")
+                fh.write(",\n".join("  " + json.dumps(c, ensure_ascii=False) for c in lista))
+                fh.write("\n ]" + ("," if i < len(datos) - 1 else "") + "\n")
+            fh.write("}\n")
+        pytest.skip("golden regenerado")
+
+    with open(GOLDEN, encoding="utf-8") as fh:
+        datos = json.load(fh)
+
+    assert set(datos) == set(CEREALES)
+    for cereal, lista in datos.items():
+        for caso in lista:
+            assert _salida(cereal, caso["entrada"]) == caso["salida"], (cereal, caso)
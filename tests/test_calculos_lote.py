@@ -0,0 +1,113 @@
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculos import calcular_comercial
+from calculos_lote import calcular_comercial_lote, a_registros
+
+
+# ======================================================
+# GENERADOR DE ANÁLISIS
+# ======================================================
+# Mezcla valores al azar con los bordes de cada tolerancia
+# (8, 69, 10.5 de chamico, empates de TAS, etc.) y campos
+# faltantes.
+
+CAMPOS = {
+    "humedad": [13.5, 14, 15, 16, 17, 18, 19, 21, 23, 24, 30, 5, 6.7, 7.8, 11.45, 16.3],
+    "temperatura": [0, 5, 7.5, 10, 12.5, 15, 22.5, 25, 27.5, 37.5, 40, 45],
+    "ph": [60, 68.99, 69, 72.9, 73, 74.99, 75, 80],
+    "danados": [0, 1, 2, 3, 4, 5, 6, 8, 8.01, 12],
+    "quebrados": [0, 0.5, 1.2, 2, 3, 5, 5.5, 7, 9],
+    "materia_extrana": [0, 0.2, 0.8, 1, 1.5, 2, 3, 4, 6],
+    "olor": [0, 1, 2.5],
+    "moho": [0, 1, 3],
+    "chamico": [0, 0.25, 2, 3, 10, 10.5, 11, 20, 21, 50, 65, 66, 80, 81, 100, 101, 250],
+    "granos_carbon": [0, 0.1, 0.25, 0.4],
+    "panza_blanca": [0, 15, 20, 30, 45],
+    "granos_picados": [0, 1, 1.5, 3],
+    "punta_sombreada": [0, 1.5],
+    "revolcado_tierra": [0, 0.7],
+    "punta_negra": [0, 2],
+    "proteinas": [8, 8.5, 9, 9.3, 10, 10.7, 11, 11.4, 13],
+    "materia_grasa": [38, 42, 44.7, 50],
+    "acidez": [0.5, 1.5, 2, 3.3],
+}
+
+# Campos que el escalar compara sin `or 0`: si faltan se
+# omite la clave (con None el escalar lanzaría TypeError)
+SOLO_AUSENTE = {"danados", "quebrados", "materia_extrana"}
+
+
+def _valor(rnd, campo):
+    if rnd.random() < 0.5:
+        return rnd.choice(CAMPOS[campo])
+    lo, hi = min(CAMPOS[campo]), max(CAMPOS[campo])
+    return round(rnd.uniform(lo, hi), rnd.choice([0, 1, 2, 3]))
+
+
+def generar(cereal, n, semilla):
+    rnd = random.Random(semilla)
+    filas = []
+    for _ in range(n):
+        d = {}
+        for campo in CAMPOS:
+            r = rnd.random()
+            if r < 0.1:
+                continue
+            if r < 0.2 and campo not in SOLO_AUSENTE:
+                d[campo] = None
+                continue
+            d[campo] = _valor(rnd, campo)
+        filas.append(d)
+    return filas
+
+
+def _igual(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return a == b
+
+
+# ======================================================
+# TESTS
+# ======================================================
+
+@pytest.mark.parametrize("cereal", ["Maíz", "Trigo", "Soja", "Girasol", "Colza", "Sorgo"])
+def test_lote_coincide_con_escalar(cereal):
+    filas = generar(cereal, 4000, semilla=sum(map(ord, cereal)))
+
+    tabla = {campo: [f.get(campo) for f in filas] for campo in CAMPOS}
+    lote = a_registros(calcular_comercial_lote(cereal, tabla))
+
+    for d, obtenido in zip(filas, lote):
+        esperado = calcular_comercial(cereal, d)
+        assert _igual(obtenido["grado"], esperado["grado"]), (d, obtenido, esperado)
+        assert obtenido["factor"] == esperado["factor"], (d, obtenido, esperado)
+        assert _igual(obtenido["tas"], esperado["tas"]), (d, obtenido, esperado)
+
+
+def test_acepta_dataframe_y_columnas_faltantes():
+    df = pd.DataFrame({
+        "humedad": [14.0, np.nan, 19.0],
+        "temperatura": [20.0, 20.0, 30.0],
+        "danados": [0.0, 9.0, 4.0],
+    })
+
+    res = calcular_comercial_lote("Maíz", df)
+
+    for i, fila in df.iterrows():
+        d = {k: v for k, v in fila.items() if not (isinstance(v, float) and math.isnan(v))}
+        esperado = calcular_comercial("Maíz", d)
+        assert res["grado"][i] == esperado["grado"]
+        assert res["factor"][i] == esperado["factor"]
+
+    assert np.isnan(res["tas"][1])
+
+
+def test_cereal_no_soportado():
+    with pytest.raises(ValueError):
+        calcular_comercial_lote("Arroz", {"humedad": [14]})
@@ -0,0 +1,202 @@
+import random
+from datetime import date
+
+import numpy as np
+import pytest
+
+from calculos import calcular_merma_humedad
+from comercial import evaluacion
+from comercial.evaluacion import evaluar_contratos, futuro_mas_cercano_tas, mes_contrato
+
+HOY = date(2026, 10, 15)
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("MAY26", "2026-05-31"),
+    ("SOJ.ROS/MAY26", "2026-05-31"),
+    ("TRI.ROS/DIC 2026", "2026-12-31"),
+    ("FEB28", "2028-02-29"),
+    ("05/2026", "2026-05-31"),
+    ("2026-05", "2026-05-31"),
+    ("DLR052026", "2026-05-31"),
+    ("DLR112026", "2026-11-30"),
+    ("sep26", "2026-09-30"),
+])
+def test_mes_contrato(texto, esperado):
+    assert mes_contrato(texto) == np.datetime64(esperado, "D")
+
+
+@pytest.mark.parametrize("texto", [None, "", "DISPONIBLE", "13/2026", "2026-00"])
+def test_mes_contrato_sin_mes(texto):
+    assert mes_contrato(texto) is None
+
+
+def _silo(qr, factor=1.0, kg=100000, humedad=None, tas=None, confeccion="2026-10-01"):
+    return {"numero_qr": qr, "kg": kg, "factor_prom": factor, "humedad_prom": humedad,
+            "tas_min": tas, "fecha_confeccion": confeccion}
+
+
+FUTUROS = [
+    {"posicion": "SOJ.ROS/NOV26", "precio": 300, "mes": "NOV26"},
+    {"posicion": "SOJ.ROS/ENE27", "precio": 310, "mes": "ENE27"},
+    {"posicion": "SOJ.ROS/MAY27", "precio": 330, "mes": "MAY27"},
+]
+ROFEX = [
+    {"posicion": "DLR112026", "ajuste": 1010},
+    {"posicion": "DLR012027", "ajuste": 1050},
+    {"posicion": "DLR052027", "ajuste": 1150},
+]
+
+
+def test_corte_de_tas():
+    # Sin TAS llega a mayo; con TAS que vence en diciembre, solo noviembre
+    silos = [_silo("libre"), _silo("corto", tas=70), _silo("vencido", tas=5)]
+    r = evaluar_contratos("Soja", silos, FUTUROS, ROFEX, 200000, 1000,
+                          gastos_futuro=0, hoy=HOY)
+
+    assert r["libre"]["posicion"] == "SOJ.ROS/MAY27"
+    assert r["libre"]["rofex"] == "DLR052027"
+
+    assert r["corto"]["vence_tas"] == "2026-12-10"
+    assert r["corto"]["posicion"] == "SOJ.ROS/NOV26"
+    assert r["corto"]["rofex"] == "DLR112026"
+
+    # Ningún contrato llega: vende hoy
+    assert r["vencido"]["opcion"] == "pizarra"
+
+
+def test_dolar_no_posterior_al_contrato():
+    # Un dólar de mayo no sirve para fijar un contrato de noviembre
+    futuros = [{"posicion": "SOJ.ROS/NOV26", "precio": 300, "mes": "NOV26"}]
+    r = evaluar_contratos("Soja", [_silo("a")], futuros, ROFEX, 0, 1000,
+                          gastos_futuro=0, hoy=HOY)
+    assert r["a"]["rofex"] == "DLR112026"
+
+
+def test_futuro_mas_cercano_tas():
+    assert futuro_mas_cercano_tas([], np.datetime64("2027-01-01")) is None
+    assert futuro_mas_cercano_tas(FUTUROS, None) is FUTUROS[0]
+    assert futuro_mas_cercano_tas(FUTUROS, np.datetime64("NaT")) is FUTUROS[0]
+
+    assert futuro_mas_cercano_tas(FUTUROS, np.datetime64("2027-02-15"))["mes"] == "ENE27"
+    assert futuro_mas_cercano_tas(FUTUROS, np.datetime64("2027-01-31"))["mes"] == "ENE27"
+    assert futuro_mas_cercano_tas(FUTUROS, np.datetime64("2030-01-01"))["mes"] == "MAY27"
+
+    # Ninguno llega antes: el primero
+    assert futuro_mas_cercano_tas(FUTUROS, np.datetime64("2026-10-20")) is FUTUROS[0]
+
+    # El mes sale de la posición si no viene aparte
+    sin_mes = [{"posicion": "SOJ.ROS/NOV26"}, {"posicion": "SOJ.ROS/MAR27"}]
+    assert futuro_mas_cercano_tas(sin_mes, np.datetime64("2027-04-01")) is sin_mes[1]
+
+
+def test_precio_neto_con_gastos():
+    silos = [_silo("a", factor=0.98, kg=50000, humedad=15)]
+    futuros = [{"posicion": "SOJ.ROS/NOV26", "precio": 300, "mes": "NOV26"}]
+    rofex = [{"posicion": "DLR112026", "ajuste": 1010}]
+
+    r = evaluar_contratos("Soja", silos, futuros, rofex, 0, 1000,
+                          gastos_futuro=20, hoy=HOY)["a"]
+    merma = calcular_merma_humedad("Soja", 15)
+    kg_neto = 50000 * (1 - merma / 100)
+
+    assert r["opcion"] == "futuro"
+    assert r["merma"] == pytest.approx(merma)
+    assert r["neto_usd_tn"] == pytest.approx(300 * 0.98 - 20)
+    assert r["neto_ars_tn"] == pytest.approx((300 * 0.98 - 20) * 1010)
+    assert r["valor_ars"] == pytest.approx(kg_neto / 1000 * (300 * 0.98 - 20) * 1010, abs=0.01)
+
+    # Pizarra con gastos en USD/TN pasados a pesos al dólar de hoy
+    r = evaluar_contratos("Soja", silos, [], [], 290000, 1000,
+                          gastos_pizarra=5, hoy=HOY)["a"]
+    assert r["opcion"] == "pizarra"
+    assert r["neto_ars_tn"] == pytest.approx(290000 * 0.98 - 5 * 1000)
+    assert r["neto_usd_tn"] == pytest.approx((290000 * 0.98 - 5 * 1000) / 1000, abs=0.01)
+
+    # Con factor 1 el neto es el precio del comparador (precio - gastos)
+    r = evaluar_contratos("Soja", [_silo("b")], futuros, [], 0, 1000,
+                          gastos_futuro=evaluacion.GASTOS_FUTURO_DEFAULT, hoy=HOY)["b"]
+    assert r["neto_usd_tn"] == 300 - evaluacion.GASTOS_FUTURO_DEFAULT
+    assert r["rofex"] == "Dólar hoy"
+
+
+def test_silos_sin_factor_quedan_afuera():
+    r = evaluar_contratos("Soja", [_silo("a", factor=None), _silo("b")], FUTUROS, ROFEX, 1, 1000, hoy=HOY)
+    assert list(r) == ["b"]
+    assert evaluar_contratos("Soja", [], FUTUROS, ROFEX, 1, 1000, hoy=HOY) == {}
+
+
+def _escalar(cereal, silo, futuros, rofex, pizarra, dolar, gastos_futuro, gastos_pizarra, hoy):
+    """Un silo a la vez, opción por opción: la referencia del cálculo vectorizado."""
+    merma = calcular_merma_humedad(cereal, silo["humedad_prom"]) or 0
+    kg_neto = silo["kg"] * (1 - merma / 100)
+    vence = evaluacion.vencimiento_tas(silo["fecha_confeccion"], silo["tas_min"])
+
+    mejor = ("pizarra", kg_neto / 1000 * (pizarra * silo["factor_prom"] - gastos_pizarra * dolar))
+    dolares = [("Dólar hoy", dolar, np.datetime64(hoy, "D"))] + [
+        (r["posicion"], r["ajuste"], mes_contrato(r["posicion"])) for r in rofex
+    ]
+    for f in futuros:
+        mes = mes_contrato(f["mes"])
+        if vence is not None and mes > vence:
+            continue
+        for posicion, ajuste, mes_dolar in dolares:
+            if ajuste <= 0 or (posicion != "Dólar hoy" and mes_dolar > mes):
+                continue
+            valor = kg_neto / 1000 * (f["precio"] * silo["factor_prom"] - gastos_futuro) * ajuste
+            if valor > mejor[1]:
+                mejor = (f["posicion"] + " " + posicion, valor)
+    return mejor
+
+
+def _cartera(n, m, r, semilla=1):
+    rnd = random.Random(semilla)
+    meses = ["NOV26", "DIC26", "ENE27", "FEB27", "MAR27", "ABR27", "MAY27", "JUN27", "JUL27"]
+    silos = [
+        _silo(f"QR{i:05d}", factor=rnd.uniform(0.85, 1.02), kg=rnd.uniform(50000, 250000),
+              humedad=rnd.choice([None, rnd.uniform(12, 18)]),
+              tas=rnd.choice([None, rnd.randint(10, 300)]),
+              confeccion=f"2026-{rnd.randint(6, 10):02d}-{rnd.randint(1, 28):02d}")
+        for i in range(n)
+    ]
+    futuros = [
+        {"posicion": f"SOJ.ROS/{meses[j % len(meses)]}", "precio": rnd.uniform(280, 340),
+         "mes": meses[j % len(meses)]}
+        for j in range(m)
+    ]
+    rofex = [
+        {"posicion": f"DLR{mes_contrato(meses[k % len(meses)]).astype(object):%m%Y}",
+         "ajuste": 1000 + 15 * k + rnd.uniform(0, 10)}
+        for k in range(r)
+    ]
+    return silos, futuros, rofex
+
+
+def test_igual_que_el_calculo_escalar(monkeypatch):
+    # Bloques chicos: también cubre el corte entre bloques
+    monkeypatch.setattr(evaluacion, "TAMANO_BLOQUE", 7)
+    silos, futuros, rofex = _cartera(60, 9, 6)
+
+    r = evaluar_contratos("Soja", silos, futuros, rofex, 300000, 1000,
+                          gastos_futuro=25, gastos_pizarra=3, hoy=HOY)
+
+    for s in silos:
+        opcion, valor = _escalar("Soja", s, futuros, rofex, 300000, 1000, 25, 3, HOY)
+        obtenido = r[s["numero_qr"]]
+        assert obtenido["valor_ars"] == pytest.approx(valor, abs=0.01), s["numero_qr"]
+        if opcion == "pizarra":
+            assert obtenido["opcion"] == "pizarra"
+        else:
+            assert obtenido["posicion"] + " " + obtenido["rofex"] == opcion
+
+
+def test_base_nueva_trae_los_gastos(base_vacia):
+    # base_vacia arranca como app.py: las migraciones antes que la tabla
+    from db import get_db
+
+    conn = get_db()
+    conn.execute("INSERT INTO empresas (nombre, fecha_alta) VALUES ('Nueva', '2026-10-15')")
+    fila = conn.execute("SELECT gastos_futuro, gastos_pizarra FROM empresas").fetchone()
+    conn.close()
+    assert (fila["gastos_futuro"], fila["gastos_pizarra"]) == (evaluacion.GASTOS_FUTURO_DEFAULT,
+                                                               evaluacion.GASTOS_PIZARRA_DEFAULT)
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+
+pytestmark = pytest.mark.datos(silos=20, dias_mercado=1)
+
+
+@pytest.fixture
+def cliente(entrar, monkeypatch):
+    """Logueado como admin, sin arrancar el hilo."""
+    from panel import exportaciones
+
+    # Todo a la cola; el test procesa a mano
+    monkeypatch.setattr(exportaciones, "EXPORTAR_SINCRONO_HASTA", 0)
+    monkeypatch.setattr(exportaciones, "asegurar_trabajador", lambda: None)
+    return entrar()
+
+
+def test_encola_procesa_y_descarga(cliente):
+    from db import get_db
+    from panel import exportaciones
+
+    r = cliente.get("/exportar_excel")
+    assert r.status_code == 302
+    assert "/exportaciones?nuevo=" in r.headers["Location"]
+
+    trabajos = cliente.get("/exportaciones/estado").get_json()
+    assert [(t["estado"], t["nivel"]) for t in trabajos] == [("pendiente", "admin")]
+    trabajo_id = trabajos[0]["id"]
+
+    conn = get_db()
+    detalle = conn.execute("""
+        SELECT detalle FROM auditoria WHERE accion='exportacion_excel' ORDER BY id DESC LIMIT 1
+    """).fetchone()["detalle"]
+    conn.close()
+    assert detalle == f"Exportación nivel admin (trabajo #{trabajo_id})"
+
+    assert exportaciones.procesar_siguiente() is True
+    assert exportaciones.procesar_siguiente() is False
+
+    t = cliente.get("/exportaciones/estado").get_json()[0]
+    assert t["estado"] == "lista"
+    assert t["progreso"] == 100
+
+    r = cliente.get(f"/exportaciones/{trabajo_id}/descargar")
+    assert r.status_code == 200
+    assert len(r.data) == t["tamano"]
+    wb = load_workbook(BytesIO(r.data))
+    assert wb.sheetnames[:2] == ["Resumen", "_AuxDropdowns"]
+
+    assert cliente.get("/exportaciones").status_code == 200
+
+
+def test_descarga_solo_del_dueno(cliente, entrar):
+    from panel import exportaciones
+
+    cliente.get("/exportar_excel")
+    exportaciones.procesar_siguiente()
+    trabajo_id = cliente.get("/exportaciones/estado").get_json()[0]["id"]
+
+    otro = entrar("sintética0001_oper")
+    assert otro.get(f"/exportaciones/{trabajo_id}/descargar").status_code in (403, 404)
+
+
+def test_retencion_borra_archivos_vencidos(cliente):
+    import os
+    from panel import exportaciones
+
+    cliente.get("/exportar_excel")
+    exportaciones.procesar_siguiente()
+    trabajo_id = cliente.get("/exportaciones/estado").get_json()[0]["id"]
+    ruta = exportaciones.ruta_archivo(trabajo_id)
+    assert os.path.exists(ruta)
+
+    exportaciones.limpiar()
+    assert os.path.exists(ruta)
+
+    exportaciones.limpiar(datetime.now() + timedelta(days=exportaciones.EXPORTACIONES_DIAS + 1))
+    assert not os.path.exists(ruta)
+    assert cliente.get("/exportaciones/estado").get_json()[0]["estado"] == "vencida"
+    assert cliente.get(f"/exportaciones/{trabajo_id}/descargar").status_code == 404
+
+
+def test_cola_huerfana_se_reanuda_al_mirar(cliente, monkeypatch):
+    from db import get_db
+    from panel import exportaciones
+
+    arranques = []
+    monkeypatch.setattr(exportaciones, "asegurar_trabajador", lambda: arranques.append(1))
+
+    cliente.get("/exportaciones/estado")
+    assert arranques == []
+
+    # Trabajo que quedó de un proceso anterior, sin hilo que lo tome
+    conn = get_db()
+    trabajo_id = exportaciones.encolar(conn, 1, 2, "basico")
+    otro_id = exportaciones.encolar(conn, 1, 2, "form")
+    conn.commit()
+    conn.close()
+    assert otro_id == trabajo_id + 1
+
+    cliente.get("/exportaciones")
+    assert arranques == [1]
+
+
+def test_colgado_vuelve_a_la_cola_si_su_dueno_no_sigue(cliente, monkeypatch):
+    import os
+    import socket
+    import subprocess
+    import sys
+
+    from db import get_db
+    from panel import exportaciones
+
+    host = socket.gethostname()
+    terminado = subprocess.Popen([sys.executable, "-c", "pass"])
+    terminado.wait()
+
+    duenos = {
+        "este_proceso_trabajando": f"{host}:{os.getpid()}",
+        "este_proceso_sin_hilo": f"{host}:{os.getpid()}",
+        "otro_proceso_vivo": f"{host}:{os.getppid()}",
+        "proceso_terminado": f"{host}:{terminado.pid}",
+        "otro_host": f"otro-{host}:{os.getpid()}",
+        "sin_dueno": None,
+    }
+    conn = get_db()
+    ids = {}
+    for caso, dueno in duenos.items():
+        ids[caso] = exportaciones.encolar(conn, 1, 2, "basico")
+        conn.execute("""
+            UPDATE exportaciones SET estado='procesando', dueno=?, actualizada='2000-01-01 00:00:00'
+            WHERE id=?
+        """, (dueno, ids[caso]))
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(exportaciones, "_en_curso", {ids["este_proceso_trabajando"]})
+
+    exportaciones.limpiar()
+
+    conn = get_db()
+    estados = {caso: conn.execute("SELECT estado FROM exportaciones WHERE id=?", (i,)).fetchone()["estado"]
+               for caso, i in ids.items()}
+    conn.close()
+    assert estados == {
+        "este_proceso_trabajando": "procesando",
+        "este_proceso_sin_hilo": "pendiente",
+        "otro_proceso_vivo": "procesando",
+        "proceso_terminado": "pendiente",
+        "otro_host": "pendiente",
+        "sin_dueno": "pendiente",
+    }
@@ -0,0 +1,94 @@
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+
+pytestmark = pytest.mark.datos(silos=30, dias_mercado=2)
+
+
+@pytest.fixture
+def cliente(entrar):
+    """Devuelve una función que loguea y exporta."""
+    from db import get_db
+
+    def exportar(usuario, permisos=None):
+        if permisos is not None:
+            conn = get_db()
+            uid = conn.execute("SELECT id FROM usuarios WHERE username=?", (usuario,)).fetchone()["id"]
+            conn.execute("DELETE FROM permisos WHERE user_id=?", (uid,))
+            for p in permisos:
+                conn.execute("INSERT INTO permisos (user_id, pantalla) VALUES (?,?)", (uid, p))
+            conn.commit()
+            conn.close()
+        r = entrar(usuario).get("/exportar_excel")
+        assert r.status_code == 200
+        assert r.content_length == len(r.data)
+        return load_workbook(BytesIO(r.data))
+
+    return exportar
+
+
+def test_resumen_conserva_formulas_y_desplegables(cliente):
+    wb = cliente("sintética0001_admin")
+
+    assert wb.sheetnames[:2] == ["Resumen", "_AuxDropdowns"]
+    assert {"Vaciado", "Mejor Combo", "ROFEX", "Futuros MATBA"} <= set(wb.sheetnames)
+    aux = wb["_AuxDropdowns"]
+    assert aux.sheet_state == "hidden"
+
+    ws = wb["Resumen"]
+    validaciones = ws.data_validations.dataValidation
+    n_rofex = sum(1 for v in aux["A"][1:] if v.value is not None)
+    assert validaciones[0].formula1 == f"_AuxDropdowns!$A$2:$A${n_rofex + 1}"
+    assert all(v.formula1.startswith("_AuxDropdowns!$") for v in validaciones[1:])
+
+    # Todas las filas del análisis buscan el dólar en la misma columna de ajustes ROFEX
+    encabezados = [c.value for c in aux[1]]
+    ajuste = aux.cell(row=1, column=encabezados.index("ROFEX_AJUSTE") + 1).column_letter
+    filas = [str(v.sqref) for v in validaciones[1:]]
+    assert filas
+    for ref in filas:
+        fila = int(ref[1:])
+        assert ws[f"G{fila}"].value.startswith("=IFERROR(INDEX(_AuxDropdowns!")
+        assert f"MATCH(F{fila}," in ws[f"G{fila}"].value
+        assert f"_AuxDropdowns!${ajuste}$2:" in ws[f"I{fila}"].value
+        assert ws[f"L{fila}"].value.startswith(f'=IFERROR(IF(G{fila}="","Pizarra"')
+
+    # Las celdas referencian estilos con nombre compartidos
+    assert ws["A1"].style.startswith("exp_")
+    assert ws["A5"].style == ws["B5"].style
+    assert len(wb.named_styles) < 100
+
+
+def test_exportacion_basica_sin_resumen(cliente):
+    wb = cliente("sintética0001_oper", permisos=["panel"])
+
+    assert "Resumen" not in wb.sheetnames
+    for nombre in wb.sheetnames:
+        ws = wb[nombre]
+        assert ws["A3"].value == "QR"
+        assert ws.freeze_panes == "A4"
+        assert ws.max_row > 3
+
+
+def test_columnas_segun_permiso(cliente):
+    wb = cliente("sintética0001_oper", permisos=["panel", "form"])
+
+    assert "_AuxDropdowns" not in wb.sheetnames
+    assert not wb["Resumen"].data_validations.dataValidation
+    ws = wb["Soja"]
+    assert [c.value for c in ws[3]][-1] == "KG Vaciado"
+    assert sorted(str(r) for r in ws.merged_cells.ranges) == ["A1:H1", "A2:H2"]
+
+
+def test_queda_registrada_en_auditoria(cliente):
+    from db import get_db
+
+    cliente("sintética0001_admin")
+
+    conn = get_db()
+    fila = conn.execute("""
+        SELECT detalle FROM auditoria WHERE accion='exportacion_excel' ORDER BY id DESC LIMIT 1
+    """).fetchone()
+    conn.close()
+    assert fila["detalle"] == "Exportación nivel admin"
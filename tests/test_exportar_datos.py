@@ -0,0 +1,206 @@
+import gzip
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+pytestmark = pytest.mark.datos(empresas=2, silos=15, dias_mercado=2)
+
+
+def _contar(sql, params=()):
+    from db import get_db
+
+    conn = get_db()
+    n = conn.execute(sql, params).fetchone()["n"]
+    conn.close()
+    return n
+
+
+def test_csv_por_lotes_con_un_solo_encabezado(base, tmp_path):
+    import exportar_datos
+
+    rutas = exportar_datos.exportar(1, salida=str(tmp_path / "bi"), lote=7)
+
+    assert set(rutas) == set(exportar_datos.DATASETS)
+    silos = pd.read_csv(rutas["silos"])
+    assert len(silos) == _contar("SELECT COUNT(*) n FROM silos WHERE empresa_id=1")
+    assert set(silos["empresa_id"]) == {1}
+    assert {"grado", "factor_prom", "tas_min", "fecha_ultimo_calado"} <= set(silos.columns)
+    assert silos["fecha_ultimo_calado"].notna().any()
+
+    analisis = pd.read_csv(rutas["analisis"])
+    assert len(analisis) == _contar("SELECT COUNT(*) n FROM analisis WHERE empresa_id=1")
+    assert analisis["numero_qr"].notna().all()
+    assert (analisis.columns == "numero_qr").sum() == 1
+
+    for tabla in ("llenado", "vaciado", "monitoreos"):
+        df = pd.read_csv(rutas[tabla])
+        assert len(df) == _contar(f"SELECT COUNT(*) n FROM {tabla} WHERE empresa_id=1"), tabla
+
+
+def test_lotes_no_cambian_el_resultado(base):
+    import exportar_datos
+    from db import get_db
+
+    conn = get_db()
+    chico = b"".join(exportar_datos.csv_gz(conn, 1, "analisis", lote=5))
+    grande = b"".join(exportar_datos.csv_gz(conn, 1, "analisis", lote=100000))
+    conn.close()
+    assert gzip.decompress(chico) == gzip.decompress(grande)
+
+
+def test_endpoint_streaming_y_permisos(entrar):
+    from db import get_db
+
+    c = entrar()
+    r = c.get("/exportar_datos/vaciado")
+    assert r.status_code == 200
+    assert r.mimetype == "application/gzip"
+    assert r.is_streamed
+    df = pd.read_csv(BytesIO(gzip.decompress(r.data)))
+    assert len(df) == _contar("SELECT COUNT(*) n FROM vaciado WHERE empresa_id=1")
+
+    assert c.get("/exportar_datos/usuarios").status_code == 404
+
+    oper = entrar("sintética0001_oper")
+    conn = get_db()
+    uid = conn.execute("SELECT id FROM usuarios WHERE username='sintética0001_oper'").fetchone()["id"]
+    conn.execute("DELETE FROM permisos WHERE user_id=?", (uid,))
+    conn.execute("INSERT INTO permisos (user_id, pantalla) VALUES (?,?)", (uid, "panel"))
+    conn.commit()
+    conn.close()
+    # Solo panel: nada con calidad (grado, factor, TAS) ni precios, como en el Excel
+    for dataset in ("silos", "analisis", "llenado", "vaciado", "monitoreos", "mercado_historico"):
+        assert oper.get(f"/exportar_datos/{dataset}").status_code == 403, dataset
+
+    conn = get_db()
+    conn.execute("INSERT INTO permisos (user_id, pantalla) VALUES (?,?)", (uid, "form"))
+    conn.commit()
+    conn.close()
+    assert oper.get("/exportar_datos/monitoreos").status_code == 200
+    assert oper.get("/exportar_datos/analisis").status_code == 403
+
+    conn = get_db()
+    conn.execute("INSERT INTO permisos (user_id, pantalla) VALUES (?,?)", (uid, "laboratorio"))
+    conn.commit()
+    conn.close()
+    assert oper.get("/exportar_datos/analisis").status_code == 200
+    assert oper.get("/exportar_datos/mercado").status_code == 403
+
+
+def test_parquet_sin_pyarrow(monkeypatch, entrar):
+    import exportar_datos
+
+    monkeypatch.setattr(exportar_datos, "PARQUET_DISPONIBLE", False)
+
+    c = entrar()
+    assert c.get("/exportar_datos/silos?formato=parquet").status_code == 501
+
+
+def test_parquet_ida_y_vuelta_por_lotes(base, tmp_path):
+    import exportar_datos
+    import pyarrow.parquet as pq
+    from db import get_db
+
+    conn = get_db()
+    esperado = pd.concat(list(exportar_datos.marcos(conn, 1, "analisis", lote=100000)), ignore_index=True)
+    filas = exportar_datos.escribir_parquet(conn, 1, "analisis", str(tmp_path / "a.parquet"), lote=7)
+    conn.close()
+
+    archivo = pq.ParquetFile(tmp_path / "a.parquet")
+    assert filas == len(esperado)
+    assert archivo.metadata.num_rows == len(esperado)
+    assert archivo.num_row_groups == -(-len(esperado) // 7)
+
+    leido = pd.read_parquet(tmp_path / "a.parquet")
+    assert list(leido.columns) == list(esperado.columns)
+    assert pd.api.types.is_integer_dtype(leido["id"])
+    assert pd.api.types.is_float_dtype(leido["factor"])
+    assert pd.api.types.is_string_dtype(leido["numero_qr"])
+    assert leido["id"].tolist() == esperado["id"].tolist()
+    assert leido["numero_qr"].tolist() == esperado["numero_qr"].tolist()
+
+
+def test_parquet_por_el_endpoint(entrar):
+
+    c = entrar()
+    r = c.get("/exportar_datos/silos?formato=parquet")
+    assert r.status_code == 200
+    assert r.mimetype == "application/vnd.apache.parquet"
+
+    silos = pd.read_parquet(BytesIO(r.data))
+    assert len(silos) == _contar("SELECT COUNT(*) n FROM silos WHERE empresa_id=1")
+    assert {"grado", "factor_prom", "tas_min"} <= set(silos.columns)
+
+
+def test_parquet_columna_que_cambia_de_tipo_entre_lotes(base):
+    import exportar_datos
+    from db import get_db
+
+    # SQLite: el primer lote ve grado numérico, uno posterior trae 'F/E'
+    conn = get_db()
+    conn.execute("UPDATE analisis SET grado=2 WHERE empresa_id=1")
+    ultimo = conn.execute("SELECT MAX(id) n FROM analisis WHERE empresa_id=1").fetchone()["n"]
+    conn.execute("UPDATE analisis SET grado='F/E', factor=NULL WHERE id=?", (ultimo,))
+    conn.commit()
+
+    archivo = BytesIO()
+    filas = exportar_datos.escribir_parquet(conn, 1, "analisis", archivo, lote=3)
+    conn.close()
+
+    archivo.seek(0)
+    leido = pd.read_parquet(archivo)
+    assert len(leido) == filas
+    assert leido["grado"].tolist()[-2:] == ["2", "F/E"]
+
+
+def test_dataset_vacio_trae_las_columnas(base, tmp_path):
+    import exportar_datos
+    from db import get_db
+
+    # Una empresa sin datos: un archivo por dataset, con encabezado / esquema
+    rutas = exportar_datos.exportar(99, salida=str(tmp_path / "csv"))
+    silos = pd.read_csv(rutas["silos"])
+    assert len(silos) == 0
+    assert {"numero_qr", "grado", "fecha_ultimo_calado"} <= set(silos.columns)
+
+    conn = get_db()
+    archivo = BytesIO()
+    assert exportar_datos.escribir_parquet(conn, 99, "analisis", archivo) == 0
+    conn.close()
+    archivo.seek(0)
+    leido = pd.read_parquet(archivo)
+    assert len(leido) == 0
+    assert {"numero_qr", "cereal", "factor"} <= set(leido.columns)
+
+
+def test_dataset_vacio_por_el_endpoint(entrar):
+    from db import get_db
+
+    conn = get_db()
+    conn.execute("DELETE FROM monitoreos WHERE empresa_id=1")
+    conn.commit()
+    conn.close()
+
+    c = entrar()
+    df = pd.read_csv(BytesIO(gzip.decompress(c.get("/exportar_datos/monitoreos").data)))
+    assert len(df) == 0 and "numero_qr" in df.columns
+
+    r = c.get("/exportar_datos/monitoreos?formato=parquet")
+    assert r.status_code == 200
+    assert "numero_qr" in pd.read_parquet(BytesIO(r.data)).columns
+
+
+def test_linea_de_comandos_con_datasets_vacios(base, tmp_path):
+    import subprocess
+    import sys
+
+    import exportar_datos
+
+    r = subprocess.run(
+        [sys.executable, exportar_datos.__file__, "--empresa", "99", "--formato", "parquet",
+         "--salida", str(tmp_path / "bi")],
+        cwd=base, capture_output=True, text=True
+    )
+    assert r.returncode == 0, r.stderr
+    assert len(list((tmp_path / "bi").glob("*.parquet"))) == len(exportar_datos.DATASETS)
@@ -0,0 +1,166 @@
+import numpy as np
+import pytest
+
+MATBA = [
+    # posicion, cereal, precio, mes, fecha
+    ("SR.ROS/MAY27", "Soja", 330.0, "MAY27", "2026-10-15 10:00"),
+    ("SR.ROS/NOV26", "Soja", 300.0, "NOV26", "2026-10-15 10:00"),
+    ("SR.ROS/ENE27", "Soja", 330.0, "ENE27", "2026-10-15 10:01"),
+    ("SR.DISPONIBLE", "Soja", 290.0, None, "2026-10-15 10:02"),
+    ("CR.ROS/DIC26", "Maíz", 180.0, "DIC26", "2026-10-15 10:00"),
+    ("CR.ROS/JUL27", "Maíz", 195.5, "JUL27", "2026-10-15 10:00"),
+    ("CR.ROS/ABR27", "Maíz", 0.0, "ABR27", "2026-10-15 10:00"),
+    ("WR.ROS/ENE27", "Trigo", 210.0, None, "2026-10-15 10:00"),
+]
+
+
+@pytest.fixture
+def base(base_vacia):
+    from comercial import futuros
+    from db import get_db
+
+    conn = get_db()
+    conn.executemany(
+        "INSERT INTO matba (posicion, cereal, precio, mes, fecha) VALUES (?,?,?,?,?)",
+        MATBA
+    )
+    conn.executemany(
+        "INSERT INTO rofex (posicion, ajuste) VALUES (?,?)",
+        [("DLR112026", 1010.0), ("DLR012027", 1050.0)]
+    )
+    conn.commit()
+
+    futuros.invalidar_indice()
+    yield conn
+    futuros.invalidar_indice()
+    conn.close()
+
+
+def _mejor_matba_con_like(conn, cereal, factor):
+    """calculos.mejor_matba antes del índice: LIKE y recorrido en Python."""
+    prefijo = {"Maíz": "CR", "Soja": "SR", "Trigo": "WR"}.get(cereal)
+    if not prefijo:
+        return None
+
+    rows = conn.execute(
+        "SELECT posicion, precio, mes FROM matba WHERE posicion LIKE ?",
+        (f"{prefijo}%",)
+    ).fetchall()
+
+    mejor = None
+    mejor_precio = 0
+    for r in rows:
+        precio = float(r["precio"])
+        neto = precio * factor
+        if neto > mejor_precio:
+            mejor_precio = neto
+            mejor = {"posicion": r["posicion"], "mes": r["mes"], "precio": precio, "neto": round(neto, 2)}
+    return mejor
+
+
+@pytest.mark.parametrize("cereal", ["Soja", "Maíz", "Trigo", "Girasol"])
+@pytest.mark.parametrize("factor", [1.0, 0.9731, 0.0, -1.0])
+def test_mejor_matba_igual_que_con_like(base, cereal, factor):
+    import calculos
+
+    assert calculos.mejor_matba(base, cereal, factor) == _mejor_matba_con_like(base, cereal, factor)
+
+
+def test_mejor_y_empates(base):
+    from comercial.futuros import indice_futuros
+
+    indice = indice_futuros(base)
+
+    # Empate en 330: gana el primero en el orden de la base
+    assert indice.mejor("Soja") == {"posicion": "SR.ROS/MAY27", "mes": "MAY27", "precio": 330.0}
+    assert indice.mejor_neto("Soja", 0.5) == {
+        "posicion": "SR.ROS/MAY27", "mes": "MAY27", "precio": 330.0, "neto": 165.0
+    }
+    assert indice.mejor("Maíz")["posicion"] == "CR.ROS/JUL27"
+    assert indice.mejor("Girasol") is None
+    assert indice.mejor_neto("Girasol", 1) is None
+
+    # Una copia por llamada: modificarla no toca el índice
+    indice.mejor("Soja")["precio"] = 1
+    assert indice.mejor("Soja")["precio"] == 330.0
+
+
+def test_orden_por_mes(base):
+    from comercial.futuros import indice_futuros
+
+    indice = indice_futuros(base)
+    assert [f["posicion"] for f in indice.futuros("Soja")] == [
+        "SR.ROS/NOV26", "SR.ROS/ENE27", "SR.ROS/MAY27", "SR.DISPONIBLE"
+    ]
+    assert [f["posicion"] for f in indice.futuros("Maíz")] == [
+        "CR.ROS/DIC26", "CR.ROS/ABR27", "CR.ROS/JUL27"
+    ]
+    # Sin columna mes, el mes sale de la posición
+    assert [f["posicion"] for f in indice.hasta("Trigo", np.datetime64("2027-01-31"))] == ["WR.ROS/ENE27"]
+    assert indice.futuros("Girasol") == []
+
+    hasta = indice.hasta("Soja", np.datetime64("2027-01-31"))
+    assert [f["posicion"] for f in hasta] == ["SR.ROS/NOV26", "SR.ROS/ENE27"]
+    assert indice.hasta("Soja", np.datetime64("2026-10-31")) == []
+
+    assert [r["posicion"] for r in indice.rofex] == ["DLR112026", "DLR012027"]
+
+
+def test_se_reconstruye_al_cambiar_la_version(base, monkeypatch):
+    from comercial import futuros
+    from utils.versiones import incrementar_version
+
+    monkeypatch.setattr(futuros, "VERIFICAR_CADA", 0)
+    primero = futuros.indice_futuros(base)
+
+    # Sin cambio de versión: el mismo índice
+    assert futuros.indice_futuros(base) is primero
+
+    # Otro worker refresca MATBA y sube la versión
+    base.execute(
+        "INSERT INTO matba (posicion, cereal, precio, mes, fecha) VALUES (?,?,?,?,?)",
+        ("SR.ROS/JUL27", "Soja", 345.0, "JUL27", "2026-10-16 10:00")
+    )
+    base.commit()
+    assert futuros.indice_futuros(base) is primero
+
+    incrementar_version(base, "matba")
+    base.commit()
+    segundo = futuros.indice_futuros(base)
+    assert segundo is not primero
+    assert segundo.versiones["matba"] == primero.versiones["matba"] + 1
+    assert segundo.mejor("Soja")["posicion"] == "SR.ROS/JUL27"
+    assert primero.mejor("Soja")["posicion"] == "SR.ROS/MAY27"
+
+    incrementar_version(base, "rofex")
+    base.commit()
+    assert futuros.indice_futuros(base) is not segundo
+
+
+def test_invalidar_indice(base):
+    from comercial import futuros
+
+    primero = futuros.indice_futuros(base)
+    assert futuros.indice_futuros(base) is primero
+
+    base.execute("DELETE FROM matba WHERE cereal='Maíz'")
+    base.commit()
+    futuros.invalidar_indice()
+
+    segundo = futuros.indice_futuros(base)
+    assert segundo is not primero
+    assert segundo.mejor("Maíz") is None
+    assert segundo.futuros("Maíz") == []
+
+
+def test_sin_verificar_hasta_el_intervalo(base, monkeypatch):
+    from comercial import futuros
+    from utils.versiones import incrementar_version
+
+    monkeypatch.setattr(futuros, "VERIFICAR_CADA", 3600)
+    primero = futuros.indice_futuros(base)
+    incrementar_version(base, "matba")
+    base.commit()
+
+    # Dentro del intervalo no se consulta la base
+    assert futuros.indice_futuros(base) is primero
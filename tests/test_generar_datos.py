@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+
+def _contar(tabla):
+    from db import get_db
+    conn = get_db()
+    n = conn.execute(f"SELECT COUNT(*) AS n FROM {tabla}").fetchone()["n"]
+    conn.close()
+    return n
+
+
+def test_genera_empresas_y_silos(base_vacia):
+    import generar_datos
+
+    totales = generar_datos.generar(empresas=2, silos=15, lote=50, hasta=datetime(2026, 10, 15),
+                                    dias_mercado=10, informar=lambda m: None)
+
+    assert totales["silos"] == 30
+    assert _contar("silos") == 30
+    # Usuarios generados + el superadmin de init_db
+    assert _contar("usuarios") == 5
+    for tabla in ("muestreos", "analisis", "llenado", "auditoria", "precios_historicos"):
+        assert totales[tabla] == _contar(tabla) > 0
+    assert totales["analisis"] == 3 * totales["muestreos"]
+
+
+def test_valores_guardados_coinciden_con_las_reglas(base_vacia):
+    import generar_datos
+    import recalcular
+
+    generar_datos.generar(empresas=1, silos=20, hasta=datetime(2026, 10, 15),
+                          dias_mercado=0, informar=lambda m: None)
+
+    r = recalcular.recalcular(dry_run=True, informar=lambda m: None)
+    for tabla, res in r["tablas"].items():
+        assert res["leidos"] > 0, tabla
+        assert res["actualizados"] == 0, (tabla, res)
+
+
+def test_misma_semilla_mismos_datos(base_vacia):
+    import generar_datos
+    from db import get_db
+
+    generar_datos.generar(empresas=1, silos=5, semilla=3, prefijo="A", hasta=datetime(2026, 10, 15),
+                          dias_mercado=0, informar=lambda m: None)
+    generar_datos.generar(empresas=1, silos=5, semilla=3, prefijo="B", hasta=datetime(2026, 10, 15),
+                          dias_mercado=0, informar=lambda m: None)
+
+    conn = get_db()
+    filas = conn.execute("""
+        SELECT e.nombre, s.cereal, s.metros, s.fecha_confeccion
+        FROM silos s JOIN empresas e ON e.id = s.empresa_id
+        ORDER BY e.nombre, s.numero_qr
+    """).fetchall()
+    conn.close()
+
+    a = [tuple(f)[1:] for f in filas if f["nombre"].startswith("A ")]
+    b = [tuple(f)[1:] for f in filas if f["nombre"].startswith("B ")]
+    assert a == b and len(a) == 5
+
+    with pytest.raises(ValueError):
+        generar_datos.generar(empresas=1, silos=1, prefijo="A", informar=lambda m: None)
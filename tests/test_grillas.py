@@ -0,0 +1,112 @@
+import random
+
+import numpy as np
+import pytest
+
+import calculos
+from grillas import CERCANO, INTERPOLADO
+
+
+# Búsqueda original por clave más cercana (referencia)
+def _merma_referencia(tabla, umbral, manipuleo, humedad):
+    if humedad is None:
+        return 0
+    humedad = float(humedad)
+    if humedad <= umbral:
+        return 0
+    h = round(humedad, 1)
+    if h not in tabla:
+        h = min(tabla.keys(), key=lambda x: abs(x - h))
+    return round(tabla[h] + manipuleo, 2)
+
+
+TAS = [
+    ("Maíz", calculos.TAS_MAIZ, calculos._tas_tabla_hum_temp),
+    ("Trigo", calculos.TAS_TRIGO, calculos._tas_tabla_temp_hum),
+    ("Soja", calculos.TAS_SOJA, calculos._tas_tabla_hum_temp),
+    ("Girasol", calculos.TAS_COLZA_GIRASOL, calculos._tas_tabla_hum_temp),
+]
+
+MERMA = [
+    ("Maíz", calculos.MERMA_MAIZ, 14.5, 0.25),
+    ("Soja", calculos.MERMA_SOJA, 13.5, 0.25),
+    ("Trigo", calculos.MERMA_TRIGO, 14.0, 0.10),
+    ("Girasol", calculos.MERMA_GIRASOL, 11.0, 0.20),
+    ("Sorgo", calculos.MERMA_SORGO, 15.0, 0.25),
+]
+
+
+def _valores(semilla, n):
+    rnd = random.Random(semilla)
+    # puntos medios entre claves (empates), bordes y valores al azar
+    especiales = [
+        5, 6.7, 7.5, 7.8, 9.75, 11.45, 11.6, 12.5, 12.95, 13.7, 14.65,
+        15, 15.65, 16.3, 17, 19, 21, 22.5, 23, 27.5, 32.5, 37.5, 45, -3, 60,
+    ]
+    out = []
+    for _ in range(n):
+        r = rnd.random()
+        if r < 0.3:
+            out.append(rnd.choice(especiales))
+        elif r < 0.6:
+            out.append(round(rnd.uniform(-5, 50), rnd.choice([1, 2, 3])))
+        else:
+            out.append(rnd.uniform(-5, 50))
+    return out
+
+
+@pytest.mark.parametrize("cereal,tabla,referencia", TAS)
+def test_tas_cercano_identico(cereal, tabla, referencia):
+    temps = _valores(1, 20000)
+    hums = _valores(2, 20000)
+    grilla = calculos.GRILLAS_TAS[cereal]
+
+    esperado = [referencia(tabla, t, h) for t, h in zip(temps, hums)]
+
+    assert [grilla.valor(t, h) for t, h in zip(temps, hums)] == esperado
+    assert np.array_equal(
+        calculos.tas_lote(cereal, temps, hums),
+        np.array(esperado, dtype=float)
+    )
+
+
+@pytest.mark.parametrize("cereal,tabla,umbral,manipuleo", MERMA)
+def test_merma_cercano_identico(cereal, tabla, umbral, manipuleo):
+    rnd = random.Random(3)
+    hums = [round(rnd.uniform(5, 35), rnd.choice([1, 2, 3, 6])) for _ in range(20000)]
+    hums += [x / 100 for x in range(500, 3500)]
+
+    grilla = calculos.GRILLAS_MERMA[cereal]
+    esperado = [_merma_referencia(tabla, umbral, manipuleo, h) for h in hums]
+
+    assert [grilla.valor(h) for h in hums] == esperado
+    assert np.array_equal(grilla.valores_lote(hums), np.array(esperado, dtype=float))
+
+
+def test_merma_lote_sigue_a_calcular_merma_humedad():
+    hums = [None, 12, 16.37, 30]
+    for cereal in ("Maíz", "Soja", "Trigo", "Girasol", "Sorgo", "Colza"):
+        lote = calculos.merma_lote(cereal, [np.nan if h is None else h for h in hums])
+        assert list(lote) == [calculos.calcular_merma_humedad(cereal, h) for h in hums]
+
+
+def test_tas_interpolado_en_claves_coincide_con_tabla():
+    grilla = calculos.GRILLAS_TAS["Maíz"]
+    for hum, fila in calculos.TAS_MAIZ.items():
+        for temp, tas in fila.items():
+            assert grilla.valor(temp, hum, INTERPOLADO) == tas
+
+
+def test_tas_interpolado_queda_entre_vecinos():
+    grilla = calculos.GRILLAS_TAS["Soja"]
+    v = grilla.valor(22.5, 15, INTERPOLADO)
+    # entre 20°C (80) y 25°C (40) con humedad 14, y 16 (54 / 36)
+    assert 36 <= v <= 80
+    assert grilla.valor(22.5, 15, CERCANO) in (80, 40, 54, 36)
+
+
+def test_merma_interpolada():
+    grilla = calculos.GRILLAS_MERMA["Maíz"]
+    assert grilla.valor(15.0, INTERPOLADO) == round(1.73 + 0.25, 2)
+    assert grilla.valor(15.05, INTERPOLADO) == round((1.73 + 1.85) / 2 + 0.25, 2)
+    assert grilla.valor(14.0, INTERPOLADO) == 0
@@ -0,0 +1,237 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import http
+
+
+# ======================================================
+# SERVIDOR STUB
+# ======================================================
+
+class Stub:
+    """Respuestas programables + registro de pedidos recibidos."""
+
+    def __init__(self):
+        self.respuestas = []       # lista de (status, body, headers)
+        self.por_defecto = (200, b'{"ok": 1}', {"ETag": '"v1"'})
+        self.pedidos = []
+        self.puertos_cliente = set()
+
+    def siguiente(self):
+        return self.respuestas.pop(0) if self.respuestas else self.por_defecto
+
+
+@pytest.fixture
+def stub():
+    estado = Stub()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            estado.pedidos.append(dict(self.headers))
+            estado.puertos_cliente.add(self.client_address[1])
+
+            status, body, headers = estado.siguiente()
+
+            if status == 200 and self.headers.get("If-None-Match") == headers.get("ETag"):
+                status, body = 304, b""
+
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+
+    estado.url = f"http://127.0.0.1:{server.server_address[1]}/datos"
+    estado.server = server
+    yield estado
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def limpio(monkeypatch):
+    http.reiniciar()
+    monkeypatch.setattr(http, "BACKOFF_BASE", 0)
+    yield
+    http.reiniciar()
+
+
+# ======================================================
+# TESTS
+# ======================================================
+
+def test_get_devuelve_json(stub):
+    r = http.get(stub.url, fuente="stub")
+    assert r.status == 200
+    assert r.json() == {"ok": 1}
+    assert not r.obsoleto
+
+
+def test_reutiliza_conexion(stub):
+    stub.por_defecto = (200, b"{}", {})
+    for _ in range(5):
+        http.get(stub.url, fuente="stub")
+
+    assert len(stub.pedidos) == 5
+    assert len(stub.puertos_cliente) == 1
+
+
+def test_reintenta_errores_transitorios(stub):
+    stub.respuestas = [(503, b"", {}), (502, b"", {})]
+
+    r = http.get(stub.url, fuente="stub")
+
+    assert r.json() == {"ok": 1}
+    assert len(stub.pedidos) == 3
+    assert http.metricas()["fuentes"]["stub"]["reintentos"] == 2
+
+
+def test_no_reintenta_errores_del_cliente(stub):
+    stub.respuestas = [(404, b"", {})]
+
+    with pytest.raises(http.ErrorUpstream):
+        http.get(stub.url, fuente="stub")
+
+    assert len(stub.pedidos) == 1
+
+
+def test_revalida_con_etag(stub):
+    primera = http.get(stub.url, fuente="stub")
+    segunda = http.get(stub.url, fuente="stub")
+
+    assert stub.pedidos[1].get("If-None-Match") == '"v1"'
+    assert segunda.desde_cache
+    assert segunda.contenido == primera.contenido
+    assert http.metricas()["fuentes"]["stub"]["no_modificado"] == 1
+
+
+def test_ttl_evita_el_pedido(stub):
+    http.get(stub.url, fuente="stub", ttl=60)
+    r = http.get(stub.url, fuente="stub", ttl=60)
+
+    assert r.desde_cache
+    assert len(stub.pedidos) == 1
+
+
+def test_fallback_a_ultima_respuesta_buena(stub):
+    http.get(stub.url, fuente="stub")
+
+    stub.por_defecto = (500, b"", {})
+    r = http.get(stub.url, fuente="stub")
+
+    assert r.obsoleto
+    assert r.json() == {"ok": 1}
+    assert http.metricas()["fuentes"]["stub"]["obsoletos"] == 1
+
+
+def test_sin_respuesta_previa_lanza_error(stub):
+    stub.por_defecto = (503, b"", {})
+
+    with pytest.raises(http.ErrorUpstream):
+        http.get(stub.url, fuente="stub")
+
+
+def test_circuito_se_abre_y_corta_pedidos(stub, monkeypatch):
+    monkeypatch.setattr(http, "REINTENTOS", 0)
+    stub.por_defecto = (503, b"", {})
+
+    for _ in range(http.FALLOS_PARA_ABRIR):
+        with pytest.raises(http.ErrorUpstream):
+            http.get(stub.url, fuente="stub")
+
+    recibidos = len(stub.pedidos)
+
+    with pytest.raises(http.ErrorUpstream):
+        http.get(stub.url, fuente="stub")
+
+    assert len(stub.pedidos) == recibidos
+    hosts = http.metricas()["hosts"]
+    assert list(hosts.values())[0]["estado"] == "abierto"
+
+
+def test_circuito_semiabierto_se_cierra_con_exito(stub, monkeypatch):
+    monkeypatch.setattr(http, "REINTENTOS", 0)
+    monkeypatch.setattr(http, "ESPERA_REAPERTURA", 0)
+    stub.respuestas = [(503, b"", {})] * http.FALLOS_PARA_ABRIR
+
+    for _ in range(http.FALLOS_PARA_ABRIR):
+        with pytest.raises(http.ErrorUpstream):
+            http.get(stub.url, fuente="stub")
+
+    r = http.get(stub.url, fuente="stub")
+
+    assert r.json() == {"ok": 1}
+    assert list(http.metricas()["hosts"].values())[0]["estado"] == "cerrado"
+
+
+def test_host_caido(monkeypatch):
+    monkeypatch.setattr(http, "REINTENTOS", 1)
+
+    with pytest.raises(http.ErrorUpstream):
+        http.get("http://127.0.0.1:9/nada", fuente="caido", timeout=1)
+
+    m = http.metricas()["fuentes"]["caido"]
+    assert m["errores"] == 1
+    assert m["reintentos"] == 1
+    assert m["ultimo_error"]
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba(monkeypatch):
+    monkeypatch.setattr(http, "ESPERA_REAPERTURA", 0)
+    b = http.CircuitBreaker()
+    for _ in range(http.FALLOS_PARA_ABRIR):
+        b.fallo()
+    assert b.estado == "semiabierto"
+
+    assert b.permite()
+    assert not b.permite()
+
+    # La prueba falla: se vuelve a abrir y hay otra prueba después de la espera
+    b.fallo()
+    assert b.permite()
+    assert not b.permite()
+
+    b.exito()
+    assert b.estado == "cerrado"
+    assert b.permite() and b.permite()
+
+
+def test_errores_del_cliente_no_abren_el_circuito(stub, monkeypatch):
+    monkeypatch.setattr(http, "REINTENTOS", 0)
+    stub.por_defecto = (404, b"", {})
+
+    for _ in range(http.FALLOS_PARA_ABRIR + 1):
+        with pytest.raises(http.ErrorUpstream):
+            http.get(stub.url, fuente="stub")
+
+    assert len(stub.pedidos) == http.FALLOS_PARA_ABRIR + 1
+    assert list(http.metricas()["hosts"].values())[0] == {"estado": "cerrado", "fallos": 0}
+
+
+def test_circuito_abierto_usa_la_anterior_sin_avisar_cada_vez(stub, monkeypatch, capsys):
+    monkeypatch.setattr(http, "REINTENTOS", 0)
+    http.get(stub.url, fuente="stub")
+
+    stub.por_defecto = (500, b"", {})
+    for _ in range(http.FALLOS_PARA_ABRIR):
+        assert http.get(stub.url, fuente="stub").obsoleto
+    capsys.readouterr()
+
+    # Abierto: no sale pedido ni se imprime por cada respuesta vieja
+    for _ in range(5):
+        assert http.get(stub.url, fuente="stub").obsoleto
+    assert capsys.readouterr().out == ""
+    assert http.metricas()["fuentes"]["stub"]["obsoletos"] == http.FALLOS_PARA_ABRIR + 5
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+pytestmark = pytest.mark.datos(silos=2)
+
+
+@pytest.fixture
+def app_login(base):
+    from app import app
+    return app
+
+
+def _entrar(cliente, usuario, clave):
+    return cliente.post("/login", data={"username": usuario, "password": clave})
+
+
+def test_fallos_por_usuario_bloquean_aunque_la_clave_sea_buena(app_login):
+    import generar_datos
+    from utils import login
+
+    c = app_login.test_client()
+    for _ in range(login.LOGIN_FALLOS_USUARIO):
+        assert _entrar(c, "sintética0001_oper", "mala").status_code == 200
+
+    r = _entrar(c, "sintética0001_oper", generar_datos.CLAVE)
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) > 0
+
+    # Otro usuario desde la misma IP sigue entrando
+    assert _entrar(c, "sintética0001_admin", generar_datos.CLAVE).status_code == 302
+
+    m = login.metricas()
+    assert m["clave_incorrecta"] == login.LOGIN_FALLOS_USUARIO
+    assert m["limitado"] == 1 and m["ok"] == 1
+    assert 0 < m["tasa_fallos"] < 1
+
+
+def test_rafaga_desde_una_ip(app_login, monkeypatch):
+    from utils import login
+
+    monkeypatch.setattr(login, "LOGIN_POR_IP", 3)
+    c = app_login.test_client()
+    estados = [_entrar(c, f"nadie{n}", "x").status_code for n in range(5)]
+    assert estados == [200, 200, 200, 429, 429]
+
+
+def test_usuario_inexistente_no_hashea_pero_tarda_igual(app_login, monkeypatch):
+    from utils import login
+
+    c = app_login.test_client()
+    inicio = time.perf_counter()
+    _entrar(c, "sintética0001_oper", "mala")
+    con_hash = time.perf_counter() - inicio
+
+    hashes = []
+    verificar = login.check_password_hash
+    monkeypatch.setattr(login, "check_password_hash", lambda h, p: hashes.append(1) or verificar(h, p))
+
+    inicio = time.perf_counter()
+    _entrar(c, "no_existe", "mala")
+    sin_usuario = time.perf_counter() - inicio
+
+    assert hashes == []
+    assert sin_usuario > con_hash * 0.5
+
+
+def test_rehash_al_entrar(app_login):
+    import generar_datos
+    from db import get_db
+    from utils import login
+
+    conn = get_db()
+    conn.execute("UPDATE usuarios SET password=? WHERE username='sintética0001_oper'",
+                 (generate_password_hash(generar_datos.CLAVE, method="pbkdf2:sha256:1000"),))
+    conn.commit()
+    conn.close()
+
+    c = app_login.test_client()
+    assert _entrar(c, "sintética0001_oper", generar_datos.CLAVE).status_code == 302
+
+    conn = get_db()
+    guardado = conn.execute("SELECT password FROM usuarios WHERE username='sintética0001_oper'").fetchone()["password"]
+    conn.close()
+    assert guardado.startswith(login.PASSWORD_METODO + "$")
+    assert login.metricas()["rehash"] == 1
+
+    # Con el hash nuevo entra igual y ya no rehashea
+    assert _entrar(app_login.test_client(), "sintética0001_oper", generar_datos.CLAVE).status_code == 302
+    assert login.metricas()["rehash"] == 1
+
+
+def test_metricas_solo_superadmin(app_login):
+    import generar_datos
+
+    c = app_login.test_client()
+    _entrar(c, "sintética0001_admin", generar_datos.CLAVE)
+    assert c.get("/login/metricas").status_code == 403
+
+    root = app_login.test_client()
+    _entrar(root, "superadmin", "Super123")
+    m = root.get("/login/metricas").get_json()
+    assert m["intentos"] == 2
+    assert m["latencia_ms_prom"] > 0
@@ -0,0 +1,109 @@
+import pytest
+
+pytestmark = pytest.mark.datos(silos=5)
+
+
+@pytest.fixture
+def operario(entrar, monkeypatch):
+    """Operario logueado con permiso solo de panel; cuenta conexiones de permissions."""
+    import permissions
+    from db import get_db
+
+    conn = get_db()
+    uid = conn.execute("SELECT id FROM usuarios WHERE username='sintética0001_oper'").fetchone()["id"]
+    conn.execute("DELETE FROM permisos WHERE user_id=?", (uid,))
+    conn.execute("INSERT INTO permisos (user_id, pantalla) VALUES (?,?)", (uid, "panel"))
+    conn.commit()
+    conn.close()
+
+    conexiones = {"abiertas": 0, "cerradas": 0}
+
+    def contar():
+        c = get_db()
+        conexiones["abiertas"] += 1
+        cerrar = c.close
+
+        def close():
+            conexiones["cerradas"] += 1
+            return cerrar()
+        c.close = close
+        return c
+
+    monkeypatch.setattr(permissions, "get_db", contar)
+
+    cliente = entrar("sintética0001_oper")
+    conexiones.update(abiertas=0, cerradas=0)
+    return cliente, conexiones
+
+
+def test_una_lectura_por_request(operario):
+    cliente, conexiones = operario
+
+    # El panel y su template consultan varios permisos
+    assert cliente.get("/panel").status_code == 200
+    assert conexiones == {"abiertas": 1, "cerradas": 1}
+
+    assert cliente.get("/form").status_code == 403
+    # acceso_denegado abre la suya para las solicitudes
+    assert conexiones["abiertas"] == conexiones["cerradas"] == 3
+
+
+def test_empresa_pausada_solo_form(operario):
+    from db import get_db
+    from utils.empresas import invalidar_empresas
+
+    cliente, conexiones = operario
+    assert cliente.get("/panel").status_code == 200
+
+    conn = get_db()
+    conn.execute("UPDATE empresas SET activa=0 WHERE id=1")
+    invalidar_empresas(conn)
+    conn.commit()
+    conn.close()
+
+    assert cliente.get("/panel").status_code == 403
+    assert cliente.get("/form").status_code == 200
+    assert conexiones["abiertas"] == conexiones["cerradas"]
+
+
+def test_cambio_de_permisos_vale_en_el_proximo_request(operario):
+    from db import get_db
+
+    cliente, _ = operario
+    assert cliente.get("/form").status_code == 403
+
+    conn = get_db()
+    conn.execute("""
+        INSERT INTO permisos (user_id, pantalla)
+        SELECT id, 'form' FROM usuarios WHERE username='sintética0001_oper'
+    """)
+    conn.commit()
+    conn.close()
+
+    assert cliente.get("/form").status_code == 200
+
+
+def test_empresas_en_cache_entre_requests(operario, monkeypatch):
+    from utils import empresas
+
+    cliente, _ = operario
+    lecturas = []
+    leer = empresas._leer
+    monkeypatch.setattr(empresas, "_leer", lambda conn: lecturas.append(1) or leer(conn))
+
+    for _ in range(3):
+        assert cliente.get("/panel").status_code == 200
+    assert len(lecturas) <= 1
+
+    # Otro worker pausó la empresa: se entera al vencer VERIFICAR_CADA
+    from db import get_db
+    from utils.versiones import incrementar_version
+
+    conn = get_db()
+    conn.execute("UPDATE empresas SET activa=0 WHERE id=1")
+    incrementar_version(conn, empresas.CLAVE_VERSION)
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(empresas, "VERIFICAR_CADA", 0)
+    assert cliente.get("/panel").status_code == 403
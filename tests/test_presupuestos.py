@@ -0,0 +1,325 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import db
+
+# ======================================================
+# PRESUPUESTO DE CONSULTAS POR ENDPOINT
+# ======================================================
+# Siembra una empresa realista en SQLite en memoria, entra con
+# cada rol y pega a los endpoints calientes contando consultas y
+# tiempo. Se mide con SILOS_CHICO y SILOS_GRANDE silos: si la
+# cantidad de consultas crece con los silos (N+1) falla.
+#
+# Los presupuestos están en tests/presupuestos.json:
+#   consultas  máximo con SILOS_GRANDE silos (peor rol), constante
+#   ms         tiempo máximo con SILOS_GRANDE silos
+#
+# El tiempo depende de la máquina: se compara solo a pedido.
+#
+#   PRESUPUESTOS_MEDIR=1   imprime lo medido sin comparar
+#   PRESUPUESTOS_TIEMPOS=1 compara también los ms
+#   UMBRALES_ESCALA=2      tolera el doble de tiempo (máquinas lentas)
+
+PRESUPUESTOS = os.path.join(os.path.dirname(__file__), "presupuestos.json")
+
+SILOS_CHICO = 10
+SILOS_GRANDE = 40
+
+ROLES = {
+    "superadmin": ("root", "Root123!"),
+    "admin_empresa": ("admin", "Admin123!"),
+    "operario": ("oper", "Oper123!"),
+}
+
+# nombre → (método, url, json). {qr} y {muestreo} se completan
+# con un silo activo de la empresa.
+ENDPOINTS = {
+    "panel.panel": ("GET", "/panel", None),
+    "panel.ver_silo": ("GET", "/silo/{qr}", None),
+    "panel.exportar_excel": ("GET", "/exportar_excel", None),
+    "comercial.comparador": ("GET", "/comercial/Soja", None),
+    "auditoria.index": ("GET", "/auditoria/", None),
+    "api.api_silo": ("GET", "/api/silo/{qr}", None),
+    "api.listar_camionadas": ("GET", "/api/camionadas/{qr}", None),
+    "api.monitoreos_pendientes": ("GET", "/api/monitoreo/pendiente/{qr}", None),
+    "api.monitoreos_resueltos": ("GET", "/api/monitoreo/resueltos/{qr}", None),
+    "api.api_valuacion": ("GET", "/api/valuacion", None),
+    "api.guardar_analisis_seccion": ("POST", "/api/analisis_seccion", {
+        "id_muestreo": "{muestreo}", "seccion": "punta",
+        "temperatura": 18, "humedad": 15.5, "ph": 75, "danados": 2,
+    }),
+    "api.nueva_carga_llenado": ("POST", "/api/llenado", {
+        "numero_qr": "{qr}", "kg": 25000, "temperatura": 18, "humedad": 14.5,
+    }),
+}
+
+
+def _presupuestos():
+    with open(PRESUPUESTOS, encoding="utf-8") as fh:
+        return {k: v for k, v in json.load(fh).items() if not k.startswith("_")}
+
+
+# ======================================================
+# DATOS
+# ======================================================
+
+def sembrar(conn, n_silos, semilla=1):
+    """Empresa con sucursal, usuarios por rol, mercado y n_silos con su historia."""
+    from calculos import calcular_comercial
+
+    rnd = random.Random(semilla)
+
+    conn.execute("""
+        INSERT INTO empresas (nombre, fecha_alta, activa, fecha_vencimiento)
+        VALUES ('Acopio Demo', '2026-01-01', 1, '2099-01-01')
+    """)
+    eid = conn.execute("SELECT id FROM empresas WHERE nombre='Acopio Demo'").fetchone()["id"]
+    conn.execute("INSERT INTO sucursales (empresa_id, nombre) VALUES (?, 'Casa Central')", (eid,))
+    sid = conn.execute("SELECT id FROM sucursales WHERE empresa_id=?", (eid,)).fetchone()["id"]
+
+    # Hash barato: el login no es lo que se mide
+    for usuario, rol, es_super in [("root", None, 1), ("admin", "admin_empresa", 0), ("oper", "operario", 0)]:
+        clave = ROLES[rol or "superadmin"][1]
+        conn.execute("""
+            INSERT INTO usuarios (username, password, rol, empresa_id, sucursal_id, es_superadmin)
+            VALUES (?,?,?,?,?,?)
+        """, (usuario, generate_password_hash(clave, method="pbkdf2:sha256:1"),
+              rol or "superadmin", None if es_super else eid, None if es_super else sid, es_super))
+
+    oper = conn.execute("SELECT id FROM usuarios WHERE username='oper'").fetchone()["id"]
+    for pantalla in ["panel", "form", "comercial", "comparador", "calado", "laboratorio"]:
+        conn.execute("INSERT INTO permisos (user_id, pantalla) VALUES (?,?)", (oper, pantalla))
+
+    for cereal, pizarra in [("Soja", 450000), ("Maíz", 250000), ("Trigo", 260000),
+                            ("Girasol", 500000), ("Sorgo", 200000)]:
+        conn.execute("""
+            INSERT INTO mercado (empresa_id, cereal, pizarra_auto, dolar, fecha)
+            VALUES (?,?,?,1400, '2026-10-01 10:00:00')
+        """, (eid, cereal, pizarra))
+
+    for posicion, cereal, precio, mes in [
+        ("SOJ.ROS/NOV26", "Soja Rosario", 320, "NOV26"), ("SOJ.ROS/MAY27", "Soja Rosario", 330, "MAY27"),
+        ("MAI.ROS/DIC26", "Maíz Rosario", 180, "DIC26"), ("MAI.ROS/JUL27", "Maíz Rosario", 190, "JUL27"),
+    ]:
+        conn.execute("""
+            INSERT INTO matba (posicion, cereal, precio, mes, fecha)
+            VALUES (?,?,?,?, '2026-10-01 10:00:00')
+        """, (posicion, cereal, precio, mes))
+
+    for posicion, ajuste in [("DLR102026", 1420), ("DLR112026", 1450), ("DLR052027", 1600)]:
+        conn.execute("INSERT INTO rofex (posicion, ajuste, variacion) VALUES (?,?,0.5)", (posicion, ajuste))
+
+    cereales = ["Soja", "Maíz", "Trigo", "Girasol", "Sorgo"]
+    for i in range(n_silos):
+        qr = f"SB{i:04d}"
+        cereal = cereales[i % len(cereales)]
+        estado = "Extraído" if i % 7 == 6 else "Activo"
+
+        conn.execute("""
+            INSERT INTO silos (numero_qr, empresa_id, sucursal_id, cereal, estado_grano,
+                               estado_silo, metros, fecha_confeccion)
+            VALUES (?,?,?,?, 'Seco', ?, 60, ?)
+        """, (qr, eid, sid, cereal, estado, f"2026-0{1 + i % 9}-10 10:00"))
+
+        for mes in (8, 9):
+            conn.execute("""
+                INSERT INTO muestreos (numero_qr, empresa_id, fecha_muestreo)
+                VALUES (?,?,?)
+            """, (qr, eid, f"2026-0{mes}-01 10:00"))
+            mid = conn.execute("SELECT MAX(id) AS id FROM muestreos").fetchone()["id"]
+
+            for seccion in ["punta", "medio", "final"]:
+                d = {
+                    "temperatura": rnd.uniform(8, 30), "humedad": rnd.uniform(12, 18), "ph": 75,
+                    "danados": rnd.uniform(0, 6), "quebrados": rnd.uniform(0, 4),
+                    "materia_extrana": rnd.uniform(0, 2),
+                }
+                r = calcular_comercial(cereal, d)
+                conn.execute("""
+                    INSERT INTO analisis (id_muestreo, empresa_id, seccion, temperatura, humedad, ph,
+                                          danados, quebrados, materia_extrana, grado, factor, tas,
+                                          reglas_version)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+                """, (mid, eid, seccion, d["temperatura"], d["humedad"], d["ph"], d["danados"],
+                      d["quebrados"], d["materia_extrana"], r["grado"], r["factor"], r["tas"],
+                      r["reglas_version"]))
+
+        conn.execute("""
+            INSERT INTO llenado (numero_qr, empresa_id, fecha, kg, humedad, factor, tas, grado)
+            VALUES (?,?, '2026-08-01 10:00', 200000, 14, 0.99, 100, '1')
+        """, (qr, eid))
+
+        if estado == "Extraído":
+            conn.execute("""
+                INSERT INTO vaciado (numero_qr, empresa_id, fecha, kg, factor, nro_camion, completado)
+                VALUES (?,?, '2026-09-10', 30000, 0.98, 1, 1)
+            """, (qr, eid))
+
+        conn.execute("""
+            INSERT INTO monitoreos (numero_qr, empresa_id, fecha_evento, tipo, resuelto)
+            VALUES (?,?, '2026-09-01', 'rotura', 0)
+        """, (qr, eid))
+
+        conn.execute("""
+            INSERT INTO auditoria (empresa_id, user_id, accion, fecha)
+            VALUES (?,?, 'editar_silo', '2026-09-02 10:00')
+        """, (eid, oper))
+
+    conn.commit()
+    return eid
+
+
+# ======================================================
+# MEDICIÓN
+# ======================================================
+
+class Contador:
+    """Cuenta las consultas que pasan por DBWrapper."""
+
+    def __init__(self, monkeypatch):
+        self.consultas = 0
+        execute = db.DBWrapper.execute
+        executemany = db.DBWrapper.executemany
+
+        def contar_execute(wrapper, query, params=None):
+            self.consultas += 1
+            return execute(wrapper, query, params)
+
+        def contar_executemany(wrapper, query, params_seq):
+            self.consultas += 1
+            return executemany(wrapper, query, params_seq)
+
+        monkeypatch.setattr(db.DBWrapper, "execute", contar_execute)
+        monkeypatch.setattr(db.DBWrapper, "executemany", contar_executemany)
+
+
+def _completar(valor, datos):
+    if isinstance(valor, str):
+        return valor.format(**datos)
+    if isinstance(valor, dict):
+        return {k: _completar(v, datos) for k, v in valor.items()}
+    return valor
+
+
+def _medir_escala(n_silos, monkeypatch):
+    """{(endpoint, rol): (consultas, ms, status)} con n_silos silos."""
+    uri = f"file:presupuestos_{n_silos}?mode=memory&cache=shared"
+    # La base en memoria vive mientras haya una conexión abierta
+    ancla = sqlite3.connect(uri, uri=True)
+    monkeypatch.setattr(db, "SQLITE_PATH", uri)
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setattr(db, "DATABASE_URL", None)
+
+    # Cache de exportaciones propio: sin archivos de otra corrida
+    from panel import cache_excel
+    monkeypatch.setattr(cache_excel, "EXPORT_CACHE_DIR", tempfile.mkdtemp(prefix="cache_presupuestos_"))
+
+    # Caches de proceso vacíos y sin rechequeos por tiempo en el medio
+    # de la medición (sumarían una consulta en una escala y no en la otra)
+    from utils import empresas, usuarios
+    empresas.olvidar_empresas()
+    usuarios.olvidar_usuarios()
+    monkeypatch.setattr(empresas, "VERIFICAR_CADA", 3600)
+    monkeypatch.setattr(usuarios, "VERIFICAR_CADA", 3600)
+
+    try:
+        from db_init import init_db
+        from migraciones import ejecutar_migraciones
+        import app as app_modulo
+
+        # Como una base ya desplegada: tablas y luego columnas nuevas
+        init_db()
+        ejecutar_migraciones()
+
+        conn = db.get_db()
+        eid = sembrar(conn, n_silos)
+        datos = {
+            "qr": "SB0000",
+            "muestreo": conn.execute(
+                "SELECT MAX(id) AS id FROM muestreos WHERE numero_qr='SB0000'"
+            ).fetchone()["id"],
+        }
+        conn.close()
+
+        app = app_modulo.app
+        app.config["TESTING"] = True
+        contador = Contador(monkeypatch)
+        resultados = {}
+
+        for rol, (usuario, clave) in ROLES.items():
+            cliente = app.test_client()
+            cliente.post("/login", data={"username": usuario, "password": clave})
+            if rol == "superadmin":
+                cliente.get(f"/seleccionar_empresa/{eid}")
+
+            for nombre, (metodo, url, cuerpo) in ENDPOINTS.items():
+                contador.consultas = 0
+                inicio = time.perf_counter()
+                resp = cliente.open(_completar(url, datos), method=metodo, json=_completar(cuerpo, datos))
+                ms = (time.perf_counter() - inicio) * 1000
+                resultados[(nombre, rol)] = (contador.consultas, ms, resp.status_code)
+
+        monkeypatch.undo()
+        return resultados
+    finally:
+        ancla.close()
+
+
+@pytest.fixture(scope="module")
+def medicion():
+    mp = pytest.MonkeyPatch()
+    try:
+        chico = _medir_escala(SILOS_CHICO, mp)
+        grande = _medir_escala(SILOS_GRANDE, mp)
+    finally:
+        mp.undo()
+    return chico, grande
+
+
+# ======================================================
+# TESTS
+# ======================================================
+
+def test_todos_los_endpoints_tienen_presupuesto():
+    assert set(ENDPOINTS) == set(_presupuestos())
+
+
+@pytest.mark.parametrize("nombre", list(ENDPOINTS))
+def test_presupuesto(nombre, medicion):
+    chico, grande = medicion
+
+    for rol in ROLES:
+        consultas_chico, _, _ = chico[(nombre, rol)]
+        consultas, ms, status = grande[(nombre, rol)]
+
+        if os.environ.get("PRESUPUESTOS_MEDIR"):
+            print(f"{nombre} [{rol}] {status}: {consultas_chico} → {consultas} consultas, {ms:.1f} ms")
+            continue
+
+        presupuesto = _presupuestos()[nombre]
+        assert status < 500, (nombre, rol, status)
+        assert consultas <= presupuesto["consultas"], \
+            f"{nombre} [{rol}]: {consultas} consultas > {presupuesto['consultas']}"
+        assert consultas <= consultas_chico, \
+            f"{nombre} [{rol}]: {consultas_chico} → {consultas} consultas de {SILOS_CHICO} a {SILOS_GRANDE} silos (N+1)"
+
+
+@pytest.mark.skipif(not os.environ.get("PRESUPUESTOS_TIEMPOS"), reason="tiempos solo con PRESUPUESTOS_TIEMPOS=1")
+@pytest.mark.parametrize("nombre", list(ENDPOINTS))
+def test_tiempo(nombre, medicion):
+    _, grande = medicion
+    escala = float(os.environ.get("UMBRALES_ESCALA", 1))
+    presupuesto = _presupuestos()[nombre]
+
+    for rol in ROLES:
+        _, ms, _ = grande[(nombre, rol)]
+        assert ms <= presupuesto["ms"] * escala, \
+            f"{nombre} [{rol}]: {ms:.1f} ms > {presupuesto['ms']} ms"
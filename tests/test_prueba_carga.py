@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+
+def test_percentil():
+    from prueba_carga import percentil
+
+    datos = list(range(1, 101))
+    assert percentil(datos, 50) == 50
+    assert percentil(datos, 95) == 95
+    assert percentil(datos, 99) == 99
+    assert percentil(datos, 100) == 100
+    assert percentil([7], 99) == 7
+    assert percentil([], 50) is None
+
+
+@pytest.fixture
+def servidor(base):
+    """La app sobre una base generada, servida en un hilo."""
+    from werkzeug.serving import make_server
+
+    from app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.mark.datos(empresas=2)
+def test_corrida_corta(servidor):
+    import prueba_carga
+
+    reporte = prueba_carga.correr(servidor, empresas=2, silos=10, usuarios=6, duracion=1.5,
+                                  rampa=0, pausa=0, mezcla={"campo": 3, "laboratorio": 2, "oficina": 1})
+
+    endpoints = reporte["endpoints"]
+    assert endpoints["login"]["pedidos"] == 6
+    assert endpoints["login"]["errores"] == 0
+    assert endpoints["api/silo"]["pedidos"] > 0
+    assert endpoints["TOTAL"]["pedidos"] == sum(
+        r["pedidos"] for nombre, r in endpoints.items() if nombre != "TOTAL")
+    for r in endpoints.values():
+        assert r["p50"] <= r["p95"] <= r["p99"] <= r["max"]
+
+
+def test_perfil_desconocido():
+    import prueba_carga
+
+    with pytest.raises(ValueError):
+        prueba_carga.correr("http://127.0.0.1:1", empresas=1, silos=1, mezcla={"turista": 1})
@@ -0,0 +1,94 @@
+import pytest
+
+from calculos import calcular_comercial
+
+
+@pytest.fixture
+def base(base_vacia):
+    """Una empresa con cargas guardadas con valores viejos."""
+    from db import get_db
+
+    conn = get_db()
+    conn.execute("INSERT INTO empresas (nombre, fecha_alta) VALUES ('Demo', '2025-01-01')")
+    eid = conn.execute("SELECT id FROM empresas WHERE nombre='Demo'").fetchone()["id"]
+
+    for i, cereal in enumerate(["Maíz", "Soja", "Trigo", "Sorgo", "Girasol"] * 2):
+        qr = f"Q{i}"
+        conn.execute(
+            "INSERT INTO silos (numero_qr, empresa_id, sucursal_id, cereal) VALUES (?,?,1,?)",
+            (qr, eid, cereal)
+        )
+        # Valores guardados viejos: factor 0.5 y sin versión
+        conn.execute("""
+            INSERT INTO llenado (numero_qr, empresa_id, fecha, kg, temperatura,
+                                 humedad, danados, quebrados, materia_extrana,
+                                 grado, factor, tas)
+            VALUES (?,?, '2025-09-01', 1000, 20, 15, ?, 1, 0.5, '1', 0.5, 1)
+        """, (qr, eid, float(i)))
+
+    conn.commit()
+    conn.close()
+    return eid
+
+
+def _llenado():
+    from db import get_db
+    conn = get_db()
+    filas = conn.execute("""
+        SELECT l.*, s.cereal FROM llenado l
+        JOIN silos s ON s.numero_qr = l.numero_qr
+        ORDER BY l.rowid
+    """).fetchall()
+    conn.close()
+    return [dict(f) for f in filas]
+
+
+def test_dry_run_no_escribe(base):
+    import recalcular
+
+    r = recalcular.recalcular(tablas=["llenado"], dry_run=True, informar=lambda m: None)
+
+    assert r["tablas"]["llenado"]["leidos"] == 10
+    assert r["tablas"]["llenado"]["actualizados"] == 10
+    assert r["tablas"]["llenado"]["cambios"]["factor"] == 10
+    assert all(f["factor"] == 0.5 and f["reglas_version"] is None for f in _llenado())
+
+
+def test_retoma_despues_de_un_corte(base):
+    import recalcular
+
+    class Corte(Exception):
+        pass
+
+    mensajes = []
+
+    def cortar_al_segundo_lote(m):
+        mensajes.append(m)
+        if len(mensajes) == 2:
+            raise Corte()
+
+    with pytest.raises(Corte):
+        recalcular.recalcular(tablas=["llenado"], lote=3, informar=cortar_al_segundo_lote)
+
+    # Los dos primeros lotes quedaron escritos con su progreso
+    filas = _llenado()
+    assert sum(1 for f in filas if f["reglas_version"]) == 6
+
+    r = recalcular.recalcular(tablas=["llenado"], lote=3, informar=lambda m: None)
+    assert r["tablas"]["llenado"]["retomado_desde"] > 0
+    assert r["tablas"]["llenado"]["leidos"] == 4
+
+    for f in _llenado():
+        esperado = calcular_comercial(f["cereal"], f, fecha=f["fecha"])
+        assert f["factor"] == esperado["factor"]
+        assert f["tas"] == esperado["tas"]
+        assert f["grado"] == str(esperado["grado"] or "F/E")
+        assert f["reglas_version"] == esperado["reglas_version"]
+
+    # Terminado: otra corrida no vuelve a leer; con --reiniciar no cambia nada
+    r = recalcular.recalcular(tablas=["llenado"], informar=lambda m: None)
+    assert r["tablas"]["llenado"]["leidos"] == 0
+
+    r = recalcular.recalcular(tablas=["llenado"], reiniciar=True, informar=lambda m: None)
+    assert r["tablas"]["llenado"]["leidos"] == 10
+    assert r["tablas"]["llenado"]["actualizados"] == 0
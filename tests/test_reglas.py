@@ -0,0 +1,103 @@
+import json
+import shutil
+
+import pytest
+
+import calculos
+import reglas
+from test_calculos_lote import generar, _igual
+
+
+# Implementación original (calculos.py) como referencia de la
+# campaña 2025/26
+def _referencia(cereal, d):
+    if cereal == "Maíz":
+        grado = calculos.normalizar_grado(calculos.grado_maiz(d))
+        factor = calculos.factor_maiz(d)
+        tas = calculos._tas_tabla_hum_temp(calculos.TAS_MAIZ, d.get("temperatura"), d.get("humedad"))
+    elif cereal == "Trigo":
+        grado = calculos.normalizar_grado(calculos.grado_trigo(d))
+        factor = calculos.factor_trigo(d)
+        tas = calculos._tas_tabla_temp_hum(calculos.TAS_TRIGO, d.get("temperatura"), d.get("humedad"))
+    elif cereal == "Sorgo":
+        grado = calculos.normalizar_grado(calculos.grado_sorgo(d))
+        factor = calculos.factor_sorgo(d)
+        tas = calculos._tas_tabla_hum_temp(calculos.TAS_MAIZ, d.get("temperatura"), d.get("humedad"))
+    elif cereal == "Soja":
+        grado = None
+        factor = calculos.factor_soja(d)
+        tas = calculos._tas_tabla_hum_temp(calculos.TAS_SOJA, d.get("temperatura"), d.get("humedad"))
+    else:
+        grado = None
+        factor = calculos.factor_girasol(d)
+        tas = calculos._tas_tabla_hum_temp(calculos.TAS_COLZA_GIRASOL, d.get("temperatura"), d.get("humedad"))
+    return {"grado": grado, "factor": factor, "tas": tas}
+
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    """Copia de las campañas en un directorio temporal."""
+    destino = tmp_path / "campanas"
+    shutil.copytree(reglas.DIRECTORIO, destino)
+    monkeypatch.setattr(reglas, "DIRECTORIO", str(destino))
+    reglas.recargar()
+    yield destino
+    monkeypatch.undo()
+    reglas.recargar()
+
+
+@pytest.mark.parametrize("cereal", ["Maíz", "Trigo", "Soja", "Girasol", "Colza", "Sorgo"])
+def test_reglas_2025_26_reproducen_calculos_originales(cereal):
+    for d in generar(cereal, 4000, semilla=sum(map(ord, cereal)) + 1):
+        obtenido = calculos.calcular_comercial(cereal, d, fecha="2025-08-01")
+        esperado = _referencia(cereal, d)
+        assert _igual(obtenido["grado"], esperado["grado"]), (d, obtenido, esperado)
+        assert obtenido["factor"] == esperado["factor"], (d, obtenido, esperado)
+        assert _igual(obtenido["tas"], esperado["tas"]), (d, obtenido, esperado)
+        assert obtenido["reglas_version"] == "2025-26.1"
+
+
+def test_evaluador_se_compila_una_vez():
+    assert reglas.evaluador("Maíz") is reglas.evaluador("Maíz")
+
+
+def test_cereal_no_soportado():
+    with pytest.raises(ValueError):
+        calculos.calcular_comercial("Arroz", {})
+
+
+def test_nueva_campana_por_fecha(directorio):
+    base = json.loads((directorio / "2025-26.json").read_text(encoding="utf-8"))
+    nueva = dict(base, version="2026-27.1", campana="2026/27", vigente_desde="2026-07-01")
+    nueva["cereales"] = dict(base["cereales"])
+    nueva["cereales"]["Soja"] = dict(base["cereales"]["Soja"], redondeo=2)
+    (directorio / "2026-27.json").write_text(json.dumps(nueva), encoding="utf-8")
+    reglas.recargar()
+
+    d = {"materia_extrana": 1.55, "danados": 0}
+
+    antes = calculos.calcular_comercial("Soja", d, fecha="2026-06-30")
+    despues = calculos.calcular_comercial("Soja", d, fecha="2026-07-01")
+
+    assert antes["reglas_version"] == "2025-26.1"
+    assert antes["factor"] == 0.9945
+    assert despues["reglas_version"] == "2026-27.1"
+    assert despues["factor"] == 0.99
+
+    # Fechas anteriores a toda campaña usan la primera
+    assert reglas.version_vigente("2001-01-01") == "2025-26.1"
+
+
+def test_archivo_invalido_no_reemplaza_reglas(directorio):
+    calculos.calcular_comercial("Maíz", {}, fecha="2025-08-01")
+
+    (directorio / "rota.json").write_text(json.dumps({
+        "version": "rota", "vigente_desde": "2025-01-01",
+        "cereales": {"Maíz": {"tas": "Maíz", "grado": None,
+                              "factor": [{"tipo": "inventado"}]}},
+    }), encoding="utf-8")
+    reglas._estado["verificado"] = float("-inf")
+
+    res = calculos.calcular_comercial("Maíz", {"danados": 9}, fecha="2025-08-01")
+    assert res["reglas_version"] == "2025-26.1"
+    assert res["factor"] == 0.99
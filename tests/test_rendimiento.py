@@ -0,0 +1,133 @@
+import json
+import os
+import random
+import timeit
+
+import pytest
+
+import calculos
+from comercial.evaluacion import evaluar_contratos
+
+# ======================================================
+# MICROBENCHMARKS DE calculos.py Y comercial/evaluacion.py
+# ======================================================
+# Umbrales en tests/rendimiento.json, en µs por llamada (mínimo
+# de REPETICIONES corridas sobre los mismos análisis). Superar
+# un umbral falla el test. evaluar_contratos se mide en µs por
+# silo de una cartera de LLAMADAS silos × 24 contratos × 12 dólares
+# (el umbral mantiene 5000 silos debajo del segundo).
+#
+#   UMBRALES_ESCALA=2   tolera el doble (máquinas lentas / CI)
+#   SALTAR_RENDIMIENTO=1 no corre estos tests
+#   RENDIMIENTO_MEDIR=1  imprime lo medido sin comparar
+
+UMBRALES = os.path.join(os.path.dirname(__file__), "rendimiento.json")
+
+REPETICIONES = 5
+LLAMADAS = 2000
+
+pytestmark = pytest.mark.skipif(
+    bool(os.environ.get("SALTAR_RENDIMIENTO")), reason="SALTAR_RENDIMIENTO"
+)
+
+
+def _umbrales():
+    with open(UMBRALES, encoding="utf-8") as fh:
+        return {k: v for k, v in json.load(fh).items() if not k.startswith("_")}
+
+
+def _analisis(n, semilla=1):
+    rnd = random.Random(semilla)
+    return [
+        {
+            "temperatura": rnd.uniform(0, 45),
+            "humedad": rnd.choice([rnd.uniform(10, 25), float(rnd.randint(10, 25))]),
+            "ph": rnd.uniform(65, 80),
+            "danados": rnd.uniform(0, 10),
+            "quebrados": rnd.uniform(0, 6),
+            "materia_extrana": rnd.uniform(0, 4),
+            "olor": rnd.choice([0, 1]),
+            "moho": rnd.choice([0, 1]),
+            "chamico": float(rnd.randint(0, 120)),
+            "granos_carbon": rnd.uniform(0, 0.4),
+            "panza_blanca": rnd.uniform(0, 45),
+            "granos_picados": rnd.uniform(0, 2),
+            "proteinas": rnd.uniform(8, 13),
+            "materia_grasa": rnd.uniform(38, 48),
+            "acidez": rnd.uniform(0, 3),
+        }
+        for _ in range(n)
+    ]
+
+
+def _cartera(n, semilla=1):
+    rnd = random.Random(semilla)
+    silos = [
+        {
+            "numero_qr": f"QR{i:05d}",
+            "kg": rnd.uniform(50000, 250000),
+            "factor_prom": rnd.uniform(0.85, 1.02),
+            "humedad_prom": rnd.uniform(12, 18),
+            "tas_min": rnd.choice([None, rnd.randint(10, 300)]),
+            "fecha_confeccion": f"2026-{rnd.randint(6, 10):02d}-{rnd.randint(1, 28):02d}",
+        }
+        for i in range(n)
+    ]
+    futuros = [
+        {"posicion": f"SOJ.ROS/{m:02d}/{2027 + a}", "precio": rnd.uniform(280, 340)}
+        for a in range(2) for m in range(1, 13)
+    ]
+    rofex = [{"posicion": f"DLR{m:02d}2027", "ajuste": 1000 + 15 * m} for m in range(1, 13)]
+    return silos, futuros, rofex
+
+
+DATOS = _analisis(LLAMADAS)
+HUMEDADES = [d["humedad"] for d in DATOS]
+CARTERA = _cartera(LLAMADAS)
+
+
+def _casos():
+    casos = {}
+    for nombre in ("factor_maiz", "factor_trigo", "factor_sorgo", "factor_soja", "factor_girasol",
+                   "tas_maiz", "tas_sorgo", "tas_trigo", "tas_soja", "tas_colza_girasol"):
+        fn = getattr(calculos, nombre)
+        casos[nombre] = (lambda fn=fn: [fn(d) for d in DATOS])
+
+    for nombre in ("merma_maiz", "merma_soja", "merma_trigo", "merma_girasol", "merma_sorgo"):
+        fn = getattr(calculos, nombre)
+        casos[nombre] = (lambda fn=fn: [fn(h) for h in HUMEDADES])
+
+    for cereal in ("Maíz", "Trigo", "Soja", "Girasol", "Sorgo"):
+        casos[f"calcular_comercial[{cereal}]"] = (
+            lambda cereal=cereal: [calculos.calcular_comercial(cereal, d) for d in DATOS]
+        )
+
+    casos["evaluar_contratos"] = (
+        lambda: evaluar_contratos("Soja", *CARTERA, 300000, 1000, hoy="2026-10-15")
+    )
+    return casos
+
+
+CASOS = _casos()
+
+
+def medir(fn):
+    """µs por llamada: mínimo de REPETICIONES (el menos afectado por ruido)."""
+    fn()  # calentar (compilación de reglas, caches)
+    return min(timeit.repeat(fn, number=1, repeat=REPETICIONES)) / LLAMADAS * 1e6
+
+
+def test_todos_los_casos_tienen_umbral():
+    assert set(CASOS) == set(_umbrales())
+
+
+@pytest.mark.parametrize("nombre", sorted(CASOS))
+def test_rendimiento(nombre):
+    medido = medir(CASOS[nombre])
+
+    if os.environ.get("RENDIMIENTO_MEDIR"):
+        print(f"{nombre}: {medido:.2f} µs (umbral {_umbrales().get(nombre)})")
+        return
+
+    umbral = _umbrales()[nombre] * float(os.environ.get("UMBRALES_ESCALA", 1))
+    assert medido <= umbral, f"{nombre}: {medido:.2f} µs > umbral {umbral:.2f} µs"
@@ -0,0 +1,131 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+HOY = date(2026, 10, 15)
+
+
+def _silos(n, tas_min=60):
+    return [{
+        "numero_qr": f"Q{i:04d}",
+        "kg": 100000 + 1000 * i,
+        "factor": 0.95 + (i % 5) / 100,
+        "tas_min": tas_min,
+        "fecha_confeccion": "2026-09-01",
+    } for i in range(n)]
+
+
+def _serie(dias=60, precio=300000.0):
+    rng = np.random.default_rng(7)
+    fechas = np.arange(np.datetime64("2026-08-01"), np.datetime64("2026-08-01") + dias)
+    precios = precio * np.exp(np.cumsum(rng.normal(0, 0.01, dias)))
+    return [(str(f), float(p)) for f, p in zip(fechas, precios)]
+
+
+def test_misma_semilla_mismo_resultado():
+    from comercial.simulacion import simular
+
+    a = simular(_silos(5), 300000, 320000, _serie(), caminos=2000, semilla=3, hoy=HOY)
+    b = simular(_silos(5), 300000, 320000, _serie(), caminos=2000, semilla=3, hoy=HOY)
+    c = simular(_silos(5), 300000, 320000, _serie(), caminos=2000, semilla=4, hoy=HOY)
+
+    assert a == b
+    assert a["valor"] != c["valor"]
+
+
+def test_limites_de_horizonte_y_caminos():
+    from comercial import simulacion
+
+    r = simulacion.simular(_silos(3), 300000, 320000, horizonte=-5, caminos=10**9, semilla=1, hoy=HOY)
+    assert r["horizonte"] == 1
+    assert r["caminos"] == simulacion.CAMINOS_MAX
+
+    r = simulacion.simular(_silos(3), 300000, 320000, horizonte=10**6, caminos=-1, semilla=1, hoy=HOY)
+    assert r["horizonte"] <= simulacion.HORIZONTE_MAX
+    assert r["caminos"] == 100
+
+
+def test_probabilidades():
+    from comercial.simulacion import simular
+
+    # Objetivo por debajo de hoy: se vende el día 0, nada vence antes
+    r = simular(_silos(4), 300000, 250000, _serie(), caminos=1000, semilla=1, hoy=HOY)
+    assert r["prob_toca_objetivo"] == 1.0
+    assert r["prob_vence_antes_objetivo"] == 0.0
+    assert r["valor"]["esperado_ars"] == pytest.approx(r["valor"]["hoy_ars"], rel=1e-4)
+    assert all(s["dias_venta_esperado"] == 0 for s in r["silos"])
+
+    # Objetivo inalcanzable: todos se venden forzados al vencer la TAS
+    r = simular(_silos(4), 300000, 10**9, _serie(), caminos=1000, semilla=1, hoy=HOY)
+    assert r["prob_toca_objetivo"] == 0.0
+    assert r["prob_vence_antes_objetivo"] == 1.0
+    for s in r["silos"]:
+        assert s["prob_vence_antes_objetivo"] == 1.0
+        assert s["dias_venta_esperado"] == s["dias_tas"]
+
+    r = simular(_silos(4), 300000, 315000, _serie(), caminos=1000, semilla=1, hoy=HOY)
+    assert 0 < r["prob_toca_objetivo"] < 1
+    assert 0 <= r["valor"]["prob_pierde_vs_hoy"] <= 1
+
+
+def test_solo_vence_la_tas_dentro_del_horizonte():
+    from comercial.simulacion import simular
+
+    # TAS de 60 días desde el 1/9: vence a los 16 días; sin TAS no vence
+    silos = _silos(2) + _silos(2, tas_min=None) + _silos(2, tas_min=200)
+    for i, s in enumerate(silos):
+        s["numero_qr"] = f"S{i}"
+
+    r = simular(silos, 300000, 10**9, _serie(), horizonte=10, caminos=500, semilla=1, hoy=HOY)
+    assert [s["prob_vence_antes_objetivo"] for s in r["silos"]] == [0.0] * 6
+    assert r["prob_vence_antes_objetivo"] == 0.0
+
+    r = simular(silos, 300000, 10**9, _serie(), horizonte=60, caminos=500, semilla=1, hoy=HOY)
+    assert [s["prob_vence_antes_objetivo"] for s in r["silos"]] == [1.0, 1.0, 0, 0, 0, 0]
+    assert 0 < r["prob_vence_antes_objetivo"] < 1
+
+
+def test_bloques_no_cambian_el_resultado(monkeypatch):
+    from comercial import simulacion
+
+    silos = _silos(50, tas_min=None) + _silos(50)
+    for i, s in enumerate(silos):
+        s["numero_qr"] = f"S{i}"
+
+    entero = simulacion.simular(silos, 300000, 320000, _serie(), caminos=500, semilla=9, hoy=HOY)
+    monkeypatch.setattr(simulacion, "CELDAS_BLOQUE", 500 * 7)
+    por_bloques = simulacion.simular(silos, 300000, 320000, _serie(), caminos=500, semilla=9, hoy=HOY)
+
+    assert por_bloques["silos"] == entero["silos"]
+    assert por_bloques["valor"]["esperado_ars"] == pytest.approx(entero["valor"]["esperado_ars"])
+    assert por_bloques["valor"]["percentiles_ars"] == pytest.approx(entero["valor"]["percentiles_ars"])
+
+
+def test_precios_repetidos_en_el_dia():
+    from comercial.simulacion import estimar_parametros
+
+    serie = _serie(30)
+    repetida = sorted(serie + [(f, p * 1.01) for f, p in serie[::3]])
+    mu, sigma, origen = estimar_parametros(repetida)
+    assert origen == "historico"
+    assert np.isfinite(mu) and np.isfinite(sigma) and sigma > 0
+
+
+@pytest.fixture
+def comercial(entrar):
+    return entrar()
+
+
+@pytest.mark.datos(dias_mercado=5)
+def test_endpoint_valida_parametros(comercial):
+    for consulta in ("horizonte=-3", "horizonte=0", "horizonte=abc", "caminos=1000000",
+                     "caminos=0", "objetivo=-1", "semilla=-2", "objetivo=nan", "objetivo=inf",
+                     "objetivo=-inf"):
+        r = comercial.get(f"/comercial/api/simulacion/Soja?{consulta}")
+        assert r.status_code == 400, consulta
+        assert r.get_json()["ok"] is False
+
+    r = comercial.get("/comercial/api/simulacion/Soja?horizonte=30&caminos=500&semilla=1")
+    assert r.status_code == 200
+    assert r.get_json()["ok"] is True
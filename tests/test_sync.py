@@ -0,0 +1,274 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+
+pytestmark = pytest.mark.datos(silos=4)
+
+
+@pytest.fixture
+def campo(entrar):
+    """Operario logueado; un silo activo y otro en extracción."""
+    from db import get_db
+
+    conn = get_db()
+    qrs = [r["numero_qr"] for r in conn.execute("SELECT numero_qr FROM silos ORDER BY numero_qr").fetchall()]
+    conn.execute("UPDATE silos SET estado_silo='Activo' WHERE numero_qr=?", (qrs[0],))
+    conn.execute("UPDATE silos SET estado_silo='En extracción' WHERE numero_qr=?", (qrs[1],))
+    conn.commit()
+    conn.close()
+
+    return entrar("sintética0001_oper"), qrs[0], qrs[1]
+
+
+def _contar(tabla, qr):
+    from db import get_db
+    conn = get_db()
+    n = conn.execute(f"SELECT COUNT(*) AS n FROM {tabla} WHERE numero_qr=?", (qr,)).fetchone()["n"]
+    conn.close()
+    return n
+
+
+def _ahora():
+    from utils.fechas import ARG
+    return datetime.now(ARG).replace(microsecond=0)
+
+
+def _lote(activo, en_extraccion):
+    hace_dos_horas = _ahora() - timedelta(hours=2)
+    return [
+        {"clave": "a1", "tipo": "registrar_silo", "fecha": hace_dos_horas.isoformat(),
+         "datos": {"numero_qr": "QR-NUEVO", "cereal": "Soja", "estado_grano": "Seco", "metros": 60}},
+        {"clave": "a2", "tipo": "llenado", "datos": {"numero_qr": "QR-NUEVO", "kg": 1000, "humedad": 13}},
+        {"clave": "a3", "tipo": "informar_calado", "fecha": hace_dos_horas.isoformat(),
+         "datos": {"numero_qr": activo, "informar_temperatura": True, "temp_punta": "21"}},
+        {"clave": "a4", "tipo": "vaciado", "datos": {"numero_qr": activo, "patente": "aa123bb"}},
+        {"clave": "a5", "tipo": "vaciado", "datos": {"numero_qr": en_extraccion, "patente": "aa123bb"}},
+        {"clave": "a6", "tipo": "actualizar_gps", "datos": {"numero_qr": activo, "lat": -33, "lon": -61}},
+        {"clave": "a7", "tipo": "borrar_todo", "datos": {}},
+    ]
+
+
+def test_lote_con_resultados_por_operacion(campo):
+    cliente, activo, en_extraccion = campo
+
+    r = cliente.post("/api/sync", json={"operaciones": _lote(activo, en_extraccion)})
+    assert r.status_code == 200
+    datos = r.get_json()
+
+    estados = [(x["clave"], x["estado"]) for x in datos["resultados"]]
+    assert estados == [
+        ("a1", "ok"), ("a2", "ok"), ("a3", "ok"),
+        ("a4", "conflicto"),   # el silo no está en extracción
+        ("a5", "ok"),
+        ("a6", "error"),       # GPS: solo admin
+        ("a7", "error"),       # tipo desconocido
+    ]
+    assert datos["resumen"] == {"ok": 4, "conflicto": 1, "error": 2}
+    assert datos["resultados"][2]["resultado"]["id_muestreo"]
+    assert datos["resultados"][4]["resultado"]["nro_camion"] == 1
+
+    assert _contar("llenado", "QR-NUEVO") == 1
+
+    # La fecha es la del campo, no la del envío
+    from db import get_db
+    conn = get_db()
+    confeccion = conn.execute("SELECT fecha_confeccion FROM silos WHERE numero_qr='QR-NUEVO'").fetchone()[0]
+    conn.close()
+    assert confeccion == (_ahora() - timedelta(hours=2)).strftime("%Y-%m-%d %H:%M")
+
+
+def test_reenvio_es_idempotente(campo):
+    cliente, activo, en_extraccion = campo
+    lote = _lote(activo, en_extraccion)
+
+    primero = cliente.post("/api/sync", json={"operaciones": lote}).get_json()
+    segundo = cliente.post("/api/sync", json={"operaciones": lote}).get_json()
+
+    for a, b in zip(primero["resultados"], segundo["resultados"]):
+        if a["estado"] == "ok":
+            assert b["estado"] == "duplicado"
+            assert b["resultado"] == a["resultado"]
+        else:
+            assert b["estado"] == a["estado"]
+
+    assert _contar("llenado", "QR-NUEVO") == 1
+    assert _contar("vaciado", en_extraccion) == 1
+    assert segundo["resumen"] == {"duplicado": 4, "conflicto": 1, "error": 2}
+
+
+def test_falla_inesperada_deshace_solo_esa(campo, monkeypatch):
+    from api import sync
+
+    cliente, activo, en_extraccion = campo
+
+    def rompe(conn, d, fecha=None):
+        conn.execute("INSERT INTO llenado (numero_qr, empresa_id, fecha, kg) VALUES (?,?,?,?)",
+                     (d["numero_qr"], 1, "2026-10-15 10:00", 1))
+        raise RuntimeError("se cortó")
+
+    original = sync.OPERACIONES["llenado"]
+    monkeypatch.setitem(sync.OPERACIONES, "llenado", (rompe, lambda: True))
+    antes = _contar("llenado", activo)
+
+    datos = cliente.post("/api/sync", json={"operaciones": [
+        {"clave": "b1", "tipo": "llenado", "datos": {"numero_qr": activo}},
+        {"clave": "b2", "tipo": "vaciado", "datos": {"numero_qr": en_extraccion, "patente": "ab"}},
+    ]}).get_json()
+
+    assert [x["estado"] for x in datos["resultados"]] == ["error", "ok"]
+    assert _contar("llenado", activo) == antes
+    assert _contar("vaciado", en_extraccion) == 1
+
+    # Lo que falló se puede reintentar con la misma clave
+    sync.OPERACIONES["llenado"] = original
+    datos = cliente.post("/api/sync", json={"operaciones": [
+        {"clave": "b1", "tipo": "llenado", "datos": {"numero_qr": activo, "kg": 5}},
+    ]}).get_json()
+    assert datos["resultados"][0]["estado"] == "ok"
+
+
+def test_validaciones(campo, monkeypatch):
+    from api import sync
+
+    cliente, activo, _ = campo
+
+    futura = (_ahora() + timedelta(hours=1)).isoformat()
+    datos = cliente.post("/api/sync", json={"operaciones": [
+        {"clave": "c1", "tipo": "llenado", "fecha": futura, "datos": {"numero_qr": activo}},
+        {"tipo": "llenado", "datos": {"numero_qr": activo}},
+    ]}).get_json()
+    assert [x["error"] for x in datos["resultados"]] == ["Fecha futura", "Falta la clave"]
+
+    assert cliente.post("/api/sync", json={}).status_code == 400
+
+    monkeypatch.setattr(sync, "SYNC_MAX_OPERACIONES", 2)
+    r = cliente.post("/api/sync", json={"operaciones": [{}, {}, {}]})
+    assert r.status_code == 413
+
+
+def test_endpoints_individuales(campo):
+    cliente, activo, en_extraccion = campo
+
+    r = cliente.post("/api/registrar_silo", json={"numero_qr": activo})
+    assert r.status_code == 409
+
+    r = cliente.post("/api/vaciado", json={"numero_qr": activo, "patente": "x"})
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "El silo no está en extracción"
+
+    r = cliente.post("/api/vaciado", json={"numero_qr": en_extraccion, "patente": "x"})
+    assert r.get_json() == {"ok": True, "nro_camion": 1}
+
+    r = cliente.post("/calado/api/informar_calado", json={"numero_qr": activo})
+    assert r.get_json()["ok"] and r.get_json()["id_muestreo"]
+
+
+def test_monitoreo_con_foto(campo, monkeypatch):
+    import cloudinary.uploader
+    from db import get_db
+
+    cliente, activo, _ = campo
+
+    def sube(foto, **kw):
+        # La foto se sube sin la transacción del lote abierta: otro puede escribir
+        otra = get_db()
+        otra.execute("UPDATE silos SET metros=metros WHERE numero_qr=?", (activo,))
+        otra.commit()
+        otra.close()
+        return {"secure_url": "https://fotos/" + kw["folder"]}
+
+    monkeypatch.setattr(cloudinary.uploader, "upload", sube)
+    datos = cliente.post("/api/sync", json={"operaciones": [
+        {"clave": "d1", "tipo": "monitoreo",
+         "datos": {"numero_qr": activo, "tipo": "Rotura", "foto": "data:image/jpeg;base64,AAAA"}},
+    ]}).get_json()
+    assert datos["resultados"][0]["estado"] == "ok"
+
+    conn = get_db()
+    foto = conn.execute("SELECT foto_evento FROM monitoreos WHERE numero_qr=? AND tipo='Rotura'",
+                        (activo,)).fetchone()["foto_evento"]
+    conn.close()
+    assert foto == "https://fotos/silobolsas/monitoreos"
+
+
+def test_foto_que_no_sube_queda_para_reintentar(campo, monkeypatch):
+    import cloudinary.uploader
+
+    cliente, activo, en_extraccion = campo
+
+    def falla(foto, **kw):
+        raise ConnectionError("sin servicio")
+
+    monkeypatch.setattr(cloudinary.uploader, "upload", falla)
+    antes = _contar("monitoreos", activo)
+    datos = cliente.post("/api/sync", json={"operaciones": [
+        {"clave": "e1", "tipo": "monitoreo",
+         "datos": {"numero_qr": activo, "tipo": "Rotura", "foto": "data:image/jpeg;base64,AAAA"}},
+        {"clave": "e2", "tipo": "vaciado", "datos": {"numero_qr": en_extraccion, "patente": "ab"}},
+    ]}).get_json()
+
+    primero, segundo = datos["resultados"]
+    assert primero["estado"] == "error" and primero["reintentar"]
+    assert segundo["estado"] == "ok" and "reintentar" not in segundo
+    assert _contar("monitoreos", activo) == antes
+
+    # No quedó registrada: con el servicio de vuelta, la misma clave entra
+    monkeypatch.setattr(cloudinary.uploader, "upload", lambda foto, **kw: {"secure_url": "https://f"})
+    datos = cliente.post("/api/sync", json={"operaciones": [
+        {"clave": "e1", "tipo": "monitoreo",
+         "datos": {"numero_qr": activo, "tipo": "Rotura", "foto": "data:image/jpeg;base64,AAAA"}},
+    ]}).get_json()
+    assert datos["resultados"][0]["estado"] == "ok"
+    assert _contar("monitoreos", activo) == antes + 1
+
+    # El form en línea, como siempre: el evento se guarda sin la foto
+    monkeypatch.setattr(cloudinary.uploader, "upload", falla)
+    r = cliente.post("/api/monitoreo", data={"numero_qr": activo, "tipo": "Pérdida",
+                                             "foto": (BytesIO(b"x"), "f.jpg")})
+    assert r.status_code == 200 and r.get_json()["ok"]
+
+    from db import get_db
+    conn = get_db()
+    fila = conn.execute("SELECT foto_evento FROM monitoreos WHERE numero_qr=? AND tipo='Pérdida'",
+                        (activo,)).fetchone()
+    conn.close()
+    assert fila["foto_evento"] is None
+
+
+def test_foto_no_se_sube_si_la_operacion_se_rechaza(campo, monkeypatch):
+    import cloudinary.uploader
+    from db import get_db
+
+    cliente, activo, _ = campo
+    conn = get_db()
+    conn.execute("UPDATE silos SET estado_silo='Extraído' WHERE numero_qr=?", (activo,))
+    conn.commit()
+    conn.close()
+
+    subidas = []
+    monkeypatch.setattr(cloudinary.uploader, "upload",
+                        lambda foto, **kw: subidas.append(foto) or {"secure_url": "https://f"})
+    foto = "data:image/jpeg;base64,AAAA"
+    manana = (_ahora() + timedelta(days=1)).isoformat()
+
+    datos = cliente.post("/api/sync", json={"operaciones": [
+        {"clave": "g1", "tipo": "monitoreo", "datos": {"numero_qr": activo, "tipo": "Rotura", "foto": foto}},
+        {"clave": "g2", "tipo": "monitoreo", "datos": {"numero_qr": "NO-EXISTE", "tipo": "Rotura", "foto": foto}},
+        {"clave": "g3", "tipo": "monitoreo", "fecha": manana,
+         "datos": {"numero_qr": "QR-G", "tipo": "Rotura", "foto": foto}},
+        # Un silo dado de alta antes en el mismo lote sí lleva su foto
+        {"clave": "g4", "tipo": "registrar_silo",
+         "datos": {"numero_qr": "QR-G", "cereal": "Soja", "estado_grano": "Seco", "metros": 60}},
+        {"clave": "g5", "tipo": "monitoreo", "datos": {"numero_qr": "QR-G", "tipo": "Rotura", "foto": foto}},
+    ]}).get_json()
+
+    estados = [(r["estado"], r.get("error")) for r in datos["resultados"]]
+    assert estados == [("conflicto", "Silo extraído"), ("conflicto", "Silo extraído"),
+                       ("error", "Fecha futura"), ("ok", None), ("ok", None)]
+    assert len(subidas) == 1
+
+    r = cliente.post("/api/monitoreo", data={"numero_qr": activo, "tipo": "Rotura",
+                                             "foto": (BytesIO(b"x"), "f.jpg")})
+    assert r.status_code == 400 and r.get_json()["error"] == "Silo extraído"
+    assert len(subidas) == 1
@@ -0,0 +1,71 @@
+import pytest
+
+pytestmark = pytest.mark.datos(silos=3)
+
+
+@pytest.fixture
+def sesion(entrar, monkeypatch):
+    """(entrar, lecturas): cada lectura de User.get queda anotada."""
+    from auth.models import User
+
+    lecturas = []
+    get = User.get
+    monkeypatch.setattr(User, "get", staticmethod(lambda uid: lecturas.append(uid) or get(uid)))
+    return entrar, lecturas
+
+
+def test_requests_sin_leer_el_usuario(sesion):
+    entrar, lecturas = sesion
+    c = entrar("sintética0001_admin")
+
+    for _ in range(3):
+        assert c.get("/panel").status_code == 200
+    assert lecturas == []
+
+    with c.session_transaction() as s:
+        assert "password" not in s["usuario"]
+
+
+def test_borrado_corta_la_sesion_en_el_request_siguiente(sesion):
+    from db import get_db
+
+    entrar, _ = sesion
+    oper = entrar("sintética0001_oper")
+    assert oper.get("/panel").status_code in (200, 403)
+
+    conn = get_db()
+    uid = conn.execute("SELECT id FROM usuarios WHERE username='sintética0001_oper'").fetchone()["id"]
+    conn.close()
+
+    admin = entrar("sintética0001_admin")
+    admin.post("/admin/eliminar_usuario", data={"user_id": uid})
+
+    r = oper.get("/panel")
+    assert r.status_code == 302
+    assert "/login" in r.headers["Location"]
+
+
+def test_cambio_en_otro_worker(sesion, monkeypatch):
+    from db import get_db
+    from utils import usuarios
+    from utils.versiones import incrementar_version
+
+    entrar, lecturas = sesion
+    c = entrar("sintética0001_admin")
+    assert c.get("/panel").status_code == 200
+
+    # Otro proceso le reseteó la clave: sube la versión y el contador global
+    conn = get_db()
+    conn.execute("""
+        UPDATE usuarios SET forzar_cambio_password=1, version=version+1
+        WHERE username='sintética0001_admin'
+    """)
+    incrementar_version(conn, usuarios.CLAVE_VERSION)
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(usuarios, "VERIFICAR_CADA", 0)
+    c.get("/panel")
+    assert len(lecturas) == 1
+    with c.session_transaction() as s:
+        assert s["usuario"]["forzar_cambio_password"] == 1
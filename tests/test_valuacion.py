@@ -0,0 +1,162 @@
+import json
+
+import pytest
+
+pytestmark = pytest.mark.datos(dias_mercado=1)
+
+
+@pytest.fixture
+def cliente(entrar):
+    """Logueado como admin; sin valuaciones en memoria."""
+    from comercial import futuros, valuacion
+
+    valuacion._cache.clear()
+    futuros.invalidar_indice()
+    yield entrar()
+    valuacion._cache.clear()
+    futuros.invalidar_indice()
+
+
+@pytest.fixture
+def calculos(monkeypatch):
+    """Cuenta las veces que se carga el stock (= valuaciones calculadas)."""
+    from comercial import valuacion
+
+    original = valuacion.cargar_stock
+    veces = []
+
+    def contando(conn, empresa_id):
+        veces.append(empresa_id)
+        return original(conn, empresa_id)
+
+    monkeypatch.setattr(valuacion, "cargar_stock", contando)
+    return veces
+
+
+def test_cache_y_etag(cliente, calculos):
+    primera = cliente.get("/api/valuacion")
+    assert primera.status_code == 200
+    etag = primera.headers["ETag"]
+    assert primera.get_json()["empresa"]["silos"] > 0
+
+    segunda = cliente.get("/api/valuacion")
+    assert segunda.headers["ETag"] == etag
+    assert segunda.get_json() == primera.get_json()
+    assert len(calculos) == 1
+
+    revalida = cliente.get("/api/valuacion", headers={"If-None-Match": etag})
+    assert revalida.status_code == 304
+    assert revalida.headers["ETag"] == etag
+    assert revalida.data == b""
+    assert len(calculos) == 1
+
+
+def test_escritura_de_la_empresa_invalida(cliente, calculos):
+    from db import get_db
+
+    etag = cliente.get("/api/valuacion").headers["ETag"]
+
+    # Una escritura por la API sube la versión de la empresa
+    conn = get_db()
+    qr = conn.execute("SELECT numero_qr FROM silos WHERE empresa_id=1 LIMIT 1").fetchone()["numero_qr"]
+    conn.close()
+    assert cliente.post("/api/actualizar_gps", json={"numero_qr": qr, "lat": -33, "lon": -61}).get_json()["ok"]
+
+    r = cliente.get("/api/valuacion", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    assert r.get_json()["version_datos"] > int(etag.strip('"').split(":")[1])
+    assert len(calculos) == 2
+
+    # Cambio de pizarra: otra foto de mercado
+    etag = r.headers["ETag"]
+    conn = get_db()
+    conn.execute("UPDATE mercado SET pizarra_manual=123456, usar_manual=1 WHERE empresa_id=1")
+    conn.commit()
+    conn.close()
+    r = cliente.get("/api/valuacion")
+    assert r.headers["ETag"] != etag
+    assert {p["precio"] for p in r.get_json()["precios"].values()} == {123456.0}
+    assert len(calculos) == 3
+
+
+def test_escritura_rechazada_no_invalida(cliente):
+    from db import get_db
+    from utils.versiones import clave_empresa, obtener_version
+
+    def version():
+        conn = get_db()
+        v = obtener_version(conn, clave_empresa(1))
+        conn.close()
+        return v
+
+    antes = version()
+
+    # 200 con todas las operaciones rechazadas, y un 400
+    r = cliente.post("/api/sync", json={"operaciones": [
+        {"clave": "v1", "tipo": "vaciado", "datos": {"numero_qr": "NO-EXISTE", "patente": "ab"}},
+        {"clave": "v2", "tipo": "borrar_todo", "datos": {}},
+    ]})
+    assert r.status_code == 200
+    assert not any(x["estado"] == "ok" for x in r.get_json()["resultados"])
+    assert cliente.post("/api/registrar_silo", json={}).status_code == 400
+    assert version() == antes
+
+    conn = get_db()
+    qr = conn.execute("SELECT numero_qr FROM silos WHERE empresa_id=1 LIMIT 1").fetchone()["numero_qr"]
+    conn.close()
+    assert cliente.post("/api/actualizar_gps", json={"numero_qr": qr, "lat": -33, "lon": -61}).get_json()["ok"]
+    assert version() == antes + 1
+
+
+@pytest.mark.parametrize("consulta", ["", "?fuente=matba", "?fuente=matba&posicion=SR.ROS/MAY27"])
+def test_streaming_igual_que_sin_streaming(cliente, consulta):
+    entero = cliente.get("/api/valuacion" + consulta)
+    sep = "&" if consulta else "?"
+    partes = cliente.get("/api/valuacion" + consulta + sep + "stream=1")
+
+    assert partes.is_streamed
+    assert partes.mimetype == "application/json"
+    assert partes.headers["ETag"] == entero.headers["ETag"]
+    assert json.loads(partes.data) == entero.get_json()
+
+
+def test_json_en_partes_sin_silos():
+    from comercial.valuacion import json_en_partes
+
+    resultado = {"empresa_id": 1, "precios": {}, "silos": []}
+    assert json.loads("".join(json_en_partes(resultado))) == resultado
+
+
+def test_valuar():
+    from comercial.valuacion import valuar
+
+    stock = [
+        {"numero_qr": "A", "cereal": "Soja", "sucursal_id": 1, "sucursal": "Norte", "kg": 10000, "factor": 0.98},
+        {"numero_qr": "B", "cereal": "Soja", "sucursal_id": 2, "sucursal": "Sur", "kg": 5000, "factor": 1.0},
+        {"numero_qr": "C", "cereal": "Maíz", "sucursal_id": 1, "sucursal": "Norte", "kg": 8000, "factor": 1.0},
+        {"numero_qr": "D", "cereal": "Soja", "sucursal_id": 1, "sucursal": "Norte", "kg": 1000, "factor": None},
+    ]
+    foto = {"dolar": 1000.0, "precios": {
+        "Soja": {"moneda": "ARS", "precio": 300000.0, "posicion": None},
+        "Maíz": {"moneda": "USD", "precio": 180.0, "posicion": "CR.ROS/DIC26"},
+    }}
+
+    r = valuar(stock, foto)
+    silos = {s["numero_qr"]: s for s in r["silos"]}
+
+    assert silos["A"]["valor_ars"] == pytest.approx(10 * 300000 * 0.98)
+    assert silos["A"]["valor_usd"] == pytest.approx(10 * 300 * 0.98)
+    assert silos["C"]["valor_usd"] == pytest.approx(8 * 180)
+    assert silos["C"]["valor_ars"] == pytest.approx(8 * 180 * 1000)
+    assert silos["C"]["posicion"] == "CR.ROS/DIC26"
+    assert silos["D"]["valor_ars"] is None
+
+    soja = r["por_cereal"]["Soja"]
+    assert soja["silos"] == 3 and soja["sin_precio"] == 1
+    assert soja["kg"] == 16000
+    assert soja["valor_ars"] == pytest.approx(10 * 300000 * 0.98 + 5 * 300000)
+
+    norte = next(g for g in r["por_sucursal"] if g["sucursal_id"] == 1)
+    assert norte["nombre"] == "Norte" and norte["silos"] == 3
+    assert r["empresa"]["valor_usd"] == pytest.approx(10 * 300 * 0.98 + 5 * 300 + 8 * 180)
@@ -0,0 +1,100 @@
+# utils/empresas.py
+# Datos de empresa (nombre, activa, vencimiento) en memoria del proceso.
+# Los usan los context processors, el login y tiene_permiso en cada
+# request; cambian solo desde admin. Se lee la tabla entera (son pocas
+# filas) y se vuelve a leer:
+# - si la versión "empresas" cambió (se mira cada VERIFICAR_CADA s),
+# - si pasaron TTL segundos (por cambios hechos a mano en la base),
+# - si piden una empresa que no está (recién creada en otro worker).
+
+import threading
+import time
+
+from db import get_db
+from utils.versiones import obtener_version, incrementar_version
+
+CLAVE_VERSION = "empresas"
+
+# Segundos entre chequeos de versión contra la base
+VERIFICAR_CADA = 5
+
+# Segundos máximos sin releer la tabla
+TTL = 300
+
+_empresas = None
+_lock = threading.Lock()
+
+
+class _Foto:
+
+    def __init__(self, filas, version):
+        self.por_id = {f["id"]: dict(f) for f in filas}
+        self.version = version
+        self.leida = self.verificada = time.monotonic()
+
+
+def _leer(conn):
+    version = obtener_version(conn, CLAVE_VERSION)
+    filas = conn.execute("""
+        SELECT id, nombre, activa, fecha_vencimiento
+        FROM empresas
+    """).fetchall()
+    return _Foto(filas, version)
+
+
+def _foto(forzar=False):
+    global _empresas
+
+    foto = _empresas
+    ahora = time.monotonic()
+    if (not forzar and foto is not None and ahora - foto.verificada < VERIFICAR_CADA
+            and ahora - foto.leida < TTL):
+        return foto
+
+    with _lock:
+        foto = _empresas
+        ahora = time.monotonic()
+        if (not forzar and foto is not None and ahora - foto.verificada < VERIFICAR_CADA
+                and ahora - foto.leida < TTL):
+            return foto
+
+        conn = get_db()
+        try:
+            if not forzar and foto is not None and ahora - foto.leida < TTL:
+                if obtener_version(conn, CLAVE_VERSION) == foto.version:
+                    foto.verificada = ahora
+                    return foto
+
+            _empresas = _leer(conn)
+            return _empresas
+        finally:
+            conn.close()
+
+
+def datos_empresa(empresa_id):
+    """{id, nombre, activa, fecha_vencimiento} o None si no existe."""
+    if not empresa_id:
+        return None
+
+    empresa = _foto().por_id.get(int(empresa_id))
+    if empresa is None:
+        empresa = _foto(forzar=True).por_id.get(int(empresa_id))
+    return dict(empresa) if empresa else None
+
+
+def invalidar_empresas(conn):
+    """
+    Llamar desde los endpoints que modifican empresas, antes del commit:
+    los demás workers releen en el próximo chequeo, este proceso ya.
+    """
+    global _empresas
+    incrementar_version(conn, CLAVE_VERSION)
+    with _lock:
+        _empresas = None
+
+
+def olvidar_empresas():
+    """Descarta la foto del proceso sin tocar la base (tests, scripts)."""
+    global _empresas
+    with _lock:
+        _empresas = None
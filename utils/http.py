@@ -0,0 +1,358 @@
+# utils/http.py
+# Cliente HTTP compartido para las fuentes externas
+# (bluelytics, BCR, acacoop).
+#
+# - Session con pool de conexiones (keep-alive)
+# - Circuit breaker por host
+# - Reintentos acotados con jitter
+# - Cache con ETag / Last-Modified
+# - Si la fuente falla, devuelve la última respuesta buena
+# - Métricas de latencia y errores por fuente
+
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0"
+
+TIMEOUT_DEFAULT = 10
+REINTENTOS = 2
+BACKOFF_BASE = 0.3
+BACKOFF_MAX = 3.0
+ESTADOS_REINTENTABLES = (429, 502, 503, 504)
+
+# Circuit breaker: tras N fallos seguidos no se llama al host
+# durante ESPERA_REAPERTURA segundos; después se prueba una vez.
+# Fallo es un 5xx, un timeout o un error de conexión: un 4xx es
+# problema del pedido, no del host.
+FALLOS_PARA_ABRIR = 3
+ESPERA_REAPERTURA = 60
+
+# Tamaño del pool por host
+POOL_HOSTS = 10
+POOL_CONEXIONES = 10
+
+
+class ErrorUpstream(Exception):
+    """La fuente falló y no hay respuesta previa para devolver."""
+
+    def __init__(self, fuente, mensaje):
+        super().__init__(f"{fuente}: {mensaje}")
+        self.fuente = fuente
+
+
+class Respuesta:
+
+    def __init__(self, status, contenido, headers, encoding=None):
+        self.status = status
+        self.contenido = contenido
+        self.headers = dict(headers)
+        self.encoding = encoding or "utf-8"
+        self.obtenido = time.time()
+        self.desde_cache = False
+        self.obsoleto = False
+
+    @property
+    def texto(self):
+        return self.contenido.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.texto)
+
+    @property
+    def etag(self):
+        return self.headers.get("ETag") or self.headers.get("etag")
+
+    @property
+    def last_modified(self):
+        return self.headers.get("Last-Modified") or self.headers.get("last-modified")
+
+    def copia(self, desde_cache=False, obsoleto=False):
+        r = Respuesta(self.status, self.contenido, self.headers, self.encoding)
+        r.obtenido = self.obtenido
+        r.desde_cache = desde_cache
+        r.obsoleto = obsoleto
+        return r
+
+
+# ======================================================
+# CIRCUIT BREAKER
+# ======================================================
+
+class CircuitBreaker:
+
+    def __init__(self):
+        self.fallos = 0
+        self.abierto_desde = None
+        self.probando = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        if self.abierto_desde is None:
+            return "cerrado"
+        if time.monotonic() - self.abierto_desde >= ESPERA_REAPERTURA:
+            return "semiabierto"
+        return "abierto"
+
+    def permite(self):
+        """En semiabierto deja pasar un solo pedido de prueba a la vez."""
+        with self._lock:
+            estado = self.estado
+            if estado == "cerrado":
+                return True
+            if estado == "abierto" or self.probando:
+                return False
+            self.probando = True
+            return True
+
+    def exito(self):
+        with self._lock:
+            self.fallos = 0
+            self.abierto_desde = None
+            self.probando = False
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            if self.fallos >= FALLOS_PARA_ABRIR or self.abierto_desde is not None:
+                # en semiabierto un fallo vuelve a abrir el circuito
+                self.abierto_desde = time.monotonic()
+            self.probando = False
+
+    def liberar(self):
+        """Terminó un pedido que no cuenta como éxito ni como fallo (4xx)."""
+        with self._lock:
+            self.probando = False
+
+
+def _es_fallo_del_host(status=None, excepcion=None):
+    if excepcion is not None:
+        return isinstance(excepcion, (requests.Timeout, requests.ConnectionError))
+    return status >= 500
+
+
+# ======================================================
+# ESTADO DEL MÓDULO
+# ======================================================
+
+_lock = threading.Lock()
+_session = None
+_breakers = {}
+_cache = {}
+_metricas = {}
+
+
+def _nueva_session():
+    s = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_CONEXIONES,
+    )
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers["User-Agent"] = USER_AGENT
+    return s
+
+
+def session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _nueva_session()
+    return _session
+
+
+def reiniciar():
+    """Vacía session, cache, breakers y métricas."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _breakers.clear()
+        _cache.clear()
+        _metricas.clear()
+
+
+def _breaker(host):
+    with _lock:
+        return _breakers.setdefault(host, CircuitBreaker())
+
+
+def _metrica(fuente):
+    with _lock:
+        return _metricas.setdefault(fuente, {
+            "pedidos": 0,
+            "errores": 0,
+            "reintentos": 0,
+            "cache": 0,
+            "no_modificado": 0,
+            "obsoletos": 0,
+            "latencia_ms_total": 0.0,
+            "latencia_ms_max": 0.0,
+            "latencia_ms_ultima": None,
+            "ultimo_error": None,
+            "ultimo_ok": None,
+        })
+
+
+def _registrar(fuente, **incrementos):
+    m = _metrica(fuente)
+    with _lock:
+        for k, v in incrementos.items():
+            m[k] += v
+
+
+def _registrar_latencia(fuente, segundos):
+    m = _metrica(fuente)
+    ms = segundos * 1000
+    with _lock:
+        m["latencia_ms_total"] += ms
+        m["latencia_ms_max"] = max(m["latencia_ms_max"], ms)
+        m["latencia_ms_ultima"] = round(ms, 1)
+
+
+def metricas():
+    """Métricas por fuente + estado del breaker de cada host."""
+    with _lock:
+        fuentes = {}
+        for fuente, m in _metricas.items():
+            d = dict(m)
+            intentos = d["pedidos"] + d["reintentos"]
+            d["latencia_ms_prom"] = (
+                round(d["latencia_ms_total"] / intentos, 1) if intentos else None
+            )
+            d["latencia_ms_total"] = round(d["latencia_ms_total"], 1)
+            d["latencia_ms_max"] = round(d["latencia_ms_max"], 1)
+            fuentes[fuente] = d
+
+        hosts = {
+            h: {"estado": b.estado, "fallos": b.fallos}
+            for h, b in _breakers.items()
+        }
+
+    return {"fuentes": fuentes, "hosts": hosts}
+
+
+def _espera(intento):
+    # full jitter: entre 0 y base·2^intento
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** intento)))
+
+
+def _clave(url, params):
+    if not params:
+        return url
+    return url + "?" + urlencode(sorted(params.items()))
+
+
+# ======================================================
+# GET
+# ======================================================
+
+def get(url, params=None, headers=None, timeout=TIMEOUT_DEFAULT,
+        fuente=None, ttl=0):
+    """
+    GET con pool, breaker, reintentos y cache.
+
+    ttl: segundos en los que la respuesta cacheada se usa
+         sin consultar a la fuente (0 = siempre revalidar).
+
+    Devuelve Respuesta. Si la fuente falla y hay una respuesta
+    anterior buena, la devuelve con obsoleto=True; si no hay,
+    lanza ErrorUpstream.
+    """
+    host = urlsplit(url).netloc
+    fuente = fuente or host
+    clave = _clave(url, params)
+
+    with _lock:
+        previa = _cache.get(clave)
+
+    if previa is not None and ttl and time.time() - previa.obtenido < ttl:
+        _registrar(fuente, cache=1)
+        return previa.copia(desde_cache=True)
+
+    breaker = _breaker(host)
+
+    if not breaker.permite():
+        return _fallback(fuente, previa, "circuito abierto")
+
+    hdrs = dict(headers or {})
+    if previa is not None:
+        if previa.etag:
+            hdrs["If-None-Match"] = previa.etag
+        if previa.last_modified:
+            hdrs["If-Modified-Since"] = previa.last_modified
+
+    _registrar(fuente, pedidos=1)
+    error = None
+    del_host = False
+
+    try:
+        for intento in range(REINTENTOS + 1):
+            if intento:
+                _registrar(fuente, reintentos=1)
+                time.sleep(_espera(intento - 1))
+
+            inicio = time.monotonic()
+            try:
+                r = session().get(url, params=params, headers=hdrs, timeout=timeout)
+            except requests.RequestException as e:
+                _registrar_latencia(fuente, time.monotonic() - inicio)
+                error = f"{type(e).__name__}: {e}"
+                del_host = _es_fallo_del_host(excepcion=e)
+                continue
+
+            _registrar_latencia(fuente, time.monotonic() - inicio)
+
+            if r.status_code == 304 and previa is not None:
+                breaker.exito()
+                previa.obtenido = time.time()
+                _registrar(fuente, no_modificado=1)
+                _metrica(fuente)["ultimo_ok"] = time.time()
+                return previa.copia(desde_cache=True)
+
+            if r.status_code in ESTADOS_REINTENTABLES:
+                error = f"HTTP {r.status_code}"
+                del_host = _es_fallo_del_host(r.status_code)
+                continue
+
+            if r.status_code >= 400:
+                error = f"HTTP {r.status_code}"
+                del_host = _es_fallo_del_host(r.status_code)
+                break
+
+            breaker.exito()
+            resp = Respuesta(r.status_code, r.content, r.headers, r.encoding)
+            with _lock:
+                _cache[clave] = resp
+            _metrica(fuente)["ultimo_ok"] = time.time()
+            return resp.copia()
+    except Exception:
+        breaker.liberar()
+        raise
+
+    if del_host:
+        breaker.fallo()
+    else:
+        breaker.liberar()
+    print(f"Fuente {fuente} con error: {error}")
+    return _fallback(fuente, previa, error)
+
+
+def _fallback(fuente, previa, error):
+    _registrar(fuente, errores=1)
+    _metrica(fuente)["ultimo_error"] = error
+
+    if previa is None:
+        raise ErrorUpstream(fuente, error)
+
+    _registrar(fuente, obsoletos=1)
+    return previa.copia(desde_cache=True, obsoleto=True)
@@ -0,0 +1,216 @@
+# utils/login.py
+# Protección y métricas del login.
+#
+# - Token bucket por IP (cada intento gasta una ficha: acota el CPU
+#   que se va en hashes) y por usuario (solo gastan los intentos
+#   fallidos; se revisa antes de hashear). En memoria del proceso;
+#   otro almacén (tabla, redis) se enchufa con usar_limitador().
+# - Usuario inexistente: no se hashea nada, se espera lo que tarda
+#   una verificación real (promedio móvil), así el tiempo de
+#   respuesta no delata qué usuarios existen.
+# - Hash guardado con otro método o costo que PASSWORD_METODO: se
+#   rehashea al entrar, con la clave que se acaba de verificar.
+# - Métricas: intentos por resultado, latencia y tasa de fallos.
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Método y costo de los hashes nuevos (formato de werkzeug)
+PASSWORD_METODO = os.getenv("PASSWORD_METODO", "scrypt:32768:8:1")
+
+# Fichas: ráfaga máxima y recarga por minuto
+LOGIN_POR_IP = int(os.getenv("LOGIN_POR_IP", "30"))
+LOGIN_POR_IP_MINUTO = float(os.getenv("LOGIN_POR_IP_MINUTO", "60"))
+LOGIN_FALLOS_USUARIO = int(os.getenv("LOGIN_FALLOS_USUARIO", "5"))
+LOGIN_FALLOS_USUARIO_MINUTO = float(os.getenv("LOGIN_FALLOS_USUARIO_MINUTO", "1"))
+
+# Proxies de confianza delante de la app (para tomar la IP de X-Forwarded-For)
+LOGIN_PROXIES = int(os.getenv("LOGIN_PROXIES", "0"))
+
+# Resultados recientes para la tasa de fallos
+VENTANA_RESULTADOS = 200
+
+
+# ======================================================
+# LIMITADOR
+# ======================================================
+
+class LimitadorMemoria:
+    """Token buckets por clave en un dict, con tope de claves."""
+
+    def __init__(self, max_claves=10000):
+        self.max_claves = max_claves
+        self._baldes = {}
+        self._lock = threading.Lock()
+
+    def _balde(self, clave, capacidad, por_segundo, ahora):
+        fichas, ultimo = self._baldes.get(clave, (capacidad, ahora))
+        return min(capacidad, fichas + (ahora - ultimo) * por_segundo)
+
+    def espera(self, clave, capacidad, por_segundo):
+        """Segundos hasta que haya una ficha (0 = hay)."""
+        ahora = time.monotonic()
+        with self._lock:
+            fichas = self._balde(clave, capacidad, por_segundo, ahora)
+        return 0 if fichas >= 1 else (1 - fichas) / por_segundo
+
+    def consumir(self, clave, capacidad, por_segundo):
+        """Gasta una ficha si hay; si no, devuelve los segundos de espera."""
+        ahora = time.monotonic()
+        with self._lock:
+            fichas = self._balde(clave, capacidad, por_segundo, ahora)
+            if fichas < 1:
+                self._baldes[clave] = (fichas, ahora)
+                return (1 - fichas) / por_segundo
+            self._baldes[clave] = (fichas - 1, ahora)
+            if len(self._baldes) > self.max_claves:
+                self._podar(ahora, capacidad, por_segundo)
+        return 0
+
+    def reiniciar(self, clave):
+        with self._lock:
+            self._baldes.pop(clave, None)
+
+    def _podar(self, ahora, capacidad, por_segundo):
+        # Baldes que ya se recargaron del todo equivalen a no tenerlos
+        for clave, (fichas, ultimo) in list(self._baldes.items()):
+            if fichas + (ahora - ultimo) * por_segundo >= capacidad:
+                del self._baldes[clave]
+
+
+_limitador = LimitadorMemoria()
+
+
+def usar_limitador(limitador):
+    """Reemplaza el almacén de fichas (mismos métodos que LimitadorMemoria)."""
+    global _limitador
+    _limitador = limitador
+
+
+def ip_cliente(request):
+    if LOGIN_PROXIES and len(request.access_route) >= LOGIN_PROXIES:
+        return request.access_route[-LOGIN_PROXIES]
+    return request.remote_addr
+
+
+def controlar(ip, usuario):
+    """Segundos a esperar antes de dejar intentar (0 = adelante)."""
+    espera = _limitador.espera("usuario:" + usuario, LOGIN_FALLOS_USUARIO,
+                               LOGIN_FALLOS_USUARIO_MINUTO / 60)
+    if espera:
+        return espera
+    return _limitador.consumir("ip:" + ip, LOGIN_POR_IP, LOGIN_POR_IP_MINUTO / 60)
+
+
+def fallo(usuario):
+    _limitador.consumir("usuario:" + usuario, LOGIN_FALLOS_USUARIO,
+                        LOGIN_FALLOS_USUARIO_MINUTO / 60)
+
+
+def exito(usuario):
+    _limitador.reiniciar("usuario:" + usuario)
+
+
+# ======================================================
+# HASHES
+# ======================================================
+
+_lock = threading.Lock()
+_duracion_hash = None  # segundos, promedio móvil de las verificaciones
+
+# Hash de relleno para medir el costo antes de la primera verificación real
+_RELLENO = None
+
+
+def hashear(password):
+    return generate_password_hash(password, method=PASSWORD_METODO)
+
+
+def verificar(hash_guardado, password):
+    """check_password_hash midiendo cuánto tarda (para igualar a los inexistentes)."""
+    global _duracion_hash
+    inicio = time.perf_counter()
+    ok = check_password_hash(hash_guardado, password)
+    duracion = time.perf_counter() - inicio
+    with _lock:
+        _duracion_hash = duracion if _duracion_hash is None else 0.8 * _duracion_hash + 0.2 * duracion
+    return ok
+
+
+def esperar_como_hash():
+    """Usuario inexistente: dormir lo que tardaría verificar, sin gastar CPU."""
+    global _RELLENO
+    if _duracion_hash is None:
+        # Primera vez en el proceso: una verificación de verdad para medir
+        if _RELLENO is None:
+            _RELLENO = hashear(os.urandom(16).hex())
+        verificar(_RELLENO, "")
+        return
+    time.sleep(_duracion_hash * random.uniform(0.9, 1.1))
+
+
+def necesita_rehash(hash_guardado):
+    return (hash_guardado or "").split("$", 1)[0] != PASSWORD_METODO
+
+
+# ======================================================
+# MÉTRICAS
+# ======================================================
+
+RESULTADOS = ("ok", "clave_incorrecta", "usuario_inexistente", "limitado", "empresa_bloqueada")
+
+_metricas = {}
+_recientes = deque(maxlen=VENTANA_RESULTADOS)
+
+
+def _vacias():
+    return {
+        "intentos": 0,
+        **{r: 0 for r in RESULTADOS},
+        "rehash": 0,
+        "latencia_ms_total": 0.0,
+        "latencia_ms_max": 0.0,
+    }
+
+
+_metricas.update(_vacias())
+
+
+def registrar(resultado, inicio, rehash=False):
+    """Cuenta el intento; `inicio` es time.perf_counter() al empezar el login."""
+    ms = (time.perf_counter() - inicio) * 1000
+    with _lock:
+        _metricas["intentos"] += 1
+        _metricas[resultado] += 1
+        _metricas["rehash"] += int(rehash)
+        _metricas["latencia_ms_total"] += ms
+        _metricas["latencia_ms_max"] = max(_metricas["latencia_ms_max"], ms)
+        _recientes.append(resultado != "ok")
+
+
+def metricas():
+    with _lock:
+        m = dict(_metricas)
+        recientes = list(_recientes)
+        duracion = _duracion_hash
+    m["latencia_ms_prom"] = round(m["latencia_ms_total"] / m["intentos"], 1) if m["intentos"] else None
+    m["tasa_fallos"] = round(1 - m["ok"] / m["intentos"], 3) if m["intentos"] else None
+    m["tasa_fallos_recientes"] = round(sum(recientes) / len(recientes), 3) if recientes else None
+    m["hash_ms_prom"] = round(duracion * 1000, 1) if duracion is not None else None
+    m["metodo"] = PASSWORD_METODO
+    return m
+
+
+def reiniciar():
+    """Vacía fichas y métricas (tests)."""
+    global _limitador
+    _limitador = LimitadorMemoria()
+    with _lock:
+        _metricas.clear()
+        _metricas.update(_vacias())
+        _recientes.clear()
@@ -0,0 +1,88 @@
+# utils/usuarios.py
+# Versión de cada usuario conocida por el proceso, para validar la copia
+# del usuario que viaja en la sesión sin leer `usuarios` en cada request.
+# - usuarios.version se incrementa al cambiar clave, rol o al borrarlo;
+#   en la misma transacción sube el contador global "usuarios".
+# - Cada VERIFICAR_CADA segundos se mira el contador global: si cambió,
+#   se olvidan las versiones conocidas y se releen a medida que se piden.
+# - En el proceso que hizo el cambio vale desde el request siguiente.
+
+import threading
+import time
+
+from db import get_db
+from utils.versiones import obtener_version, incrementar_version
+
+CLAVE_VERSION = "usuarios"
+
+# Segundos entre chequeos del contador global
+VERIFICAR_CADA = 1
+
+_versiones = {}
+_contador = None
+_verificado = 0.0
+_lock = threading.Lock()
+
+
+def version_usuario(user_id):
+    """Versión actual del usuario, o None si ya no existe."""
+    global _contador, _verificado
+
+    user_id = int(user_id)
+    with _lock:
+        vencido = time.monotonic() - _verificado >= VERIFICAR_CADA
+        if not vencido and user_id in _versiones:
+            return _versiones[user_id]
+
+    conn = get_db()
+    try:
+        if vencido:
+            contador = obtener_version(conn, CLAVE_VERSION)
+            with _lock:
+                if contador != _contador:
+                    _versiones.clear()
+                    _contador = contador
+                _verificado = time.monotonic()
+                if user_id in _versiones:
+                    return _versiones[user_id]
+
+        row = conn.execute(
+            "SELECT version FROM usuarios WHERE id=?",
+            (user_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+    version = (row["version"] or 0) if row else None
+    with _lock:
+        _versiones[user_id] = version
+    return version
+
+
+def cambio_usuario(conn, user_id=None):
+    """
+    Llamar en la transacción que cambia clave / rol o borra usuarios.
+    Sin user_id (borrado de una empresa entera) solo sube el contador.
+    No hace commit.
+    """
+    if user_id is not None:
+        conn.execute(
+            "UPDATE usuarios SET version = COALESCE(version, 0) + 1 WHERE id=?",
+            (user_id,)
+        )
+    incrementar_version(conn, CLAVE_VERSION)
+
+    with _lock:
+        if user_id is None:
+            _versiones.clear()
+        else:
+            _versiones.pop(int(user_id), None)
+
+
+def olvidar_usuarios():
+    """Descarta lo conocido por el proceso (tests, scripts)."""
+    global _contador, _verificado
+    with _lock:
+        _versiones.clear()
+        _contador = None
+        _verificado = 0.0
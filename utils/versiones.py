@@ -0,0 +1,65 @@
+# utils/versiones.py
+# Sellos de versión compartidos entre workers.
+# Cada clave ("matba", "rofex", ...) es un contador que se incrementa
+# en la misma transacción que modifica los datos; los caches de proceso
+# comparan su versión contra la de la base para saber si están viejos.
+
+
+def obtener_version(conn, clave):
+    row = conn.execute(
+        "SELECT valor FROM versiones WHERE clave=?",
+        (clave,)
+    ).fetchone()
+    return row["valor"] if row else 0
+
+
+def obtener_versiones(conn, claves):
+    """Devuelve {clave: valor} para varias claves en una sola consulta."""
+    claves = list(claves)
+    if not claves:
+        return {}
+
+    marcas = ",".join("?" for _ in claves)
+    rows = conn.execute(
+        f"SELECT clave, valor FROM versiones WHERE clave IN ({marcas})",
+        tuple(claves)
+    ).fetchall()
+
+    versiones = {c: 0 for c in claves}
+    for r in rows:
+        versiones[r["clave"]] = r["valor"]
+    return versiones
+
+
+def incrementar_version(conn, clave):
+    """No hace commit: se confirma junto con el cambio de datos."""
+    conn.execute("""
+        INSERT INTO versiones (clave, valor)
+        VALUES (?, 1)
+        ON CONFLICT (clave) DO UPDATE SET valor = versiones.valor + 1
+    """, (clave,))
+
+
+def clave_empresa(empresa_id):
+    """Versión de los datos operativos (silos, calados, cargas) de una empresa."""
+    return f"empresa:{empresa_id}"
+
+
+def confirmar_cambio_empresa(conn, empresa_id):
+    """Commit de una escritura de datos operativos junto con la versión de la empresa."""
+    incrementar_version(conn, clave_empresa(empresa_id))
+    conn.commit()
+
+
+def marcar_cambio_empresa(empresa_id):
+    from db import get_db
+
+    conn = get_db()
+    try:
+        incrementar_version(conn, clave_empresa(empresa_id))
+        conn.commit()
+    except Exception as e:
+        print("Error versionando empresa:", e)
+        conn.rollback()
+    finally:
+        conn.close()